@@ -0,0 +1,6 @@
+"""
+Benchmarks de rendimiento para los módulos MCP de AiDuxCare.
+
+Cada script de este paquete puede ejecutarse directamente con
+``python -m benchmarks.<nombre>`` desde la raíz del proyecto.
+"""
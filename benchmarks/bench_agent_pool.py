@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Benchmark de latencia de obtención de agentes MCP bajo carga concurrente.
+
+Compara la creación de un agente nuevo por petición (create_agent_by_role)
+con la reutilización de agentes mediante AgentPool.
+
+Uso:
+    python -m benchmarks.bench_agent_pool --hilos 8 --peticiones 2000
+"""
+
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List
+
+from mcp.context import MCPContext
+from mcp.agent_factory import AgentPool, create_agent_by_role
+from benchmarks.metricas import resumir_latencias
+
+ROLES = ["health_professional", "patient", "admin_staff"]
+
+
+def _crear_contexto(indice: int) -> MCPContext:
+    """Crea un contexto de petición con un rol rotatorio."""
+    return MCPContext(
+        paciente_id=f"P{indice:05d}",
+        paciente_nombre="Paciente Benchmark",
+        visita_id=f"V{indice:05d}",
+        profesional_email="bench@aiduxcare.com",
+        motivo_consulta="Dolor cervical persistente",
+        user_role=ROLES[indice % len(ROLES)]
+    )
+
+
+def _medir(obtener: Callable[[int], None], hilos: int, peticiones: int) -> Dict[str, float]:
+    """Ejecuta las peticiones concurrentemente y devuelve ops/s y percentiles."""
+    contextos = [_crear_contexto(i) for i in range(peticiones)]
+    latencias: List[float] = []
+
+    def tarea(indice: int) -> float:
+        inicio = time.perf_counter()
+        obtener(contextos[indice])
+        return time.perf_counter() - inicio
+
+    inicio_total = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=hilos) as ejecutor:
+        latencias = list(ejecutor.map(tarea, range(peticiones)))
+    total = time.perf_counter() - inicio_total
+
+    return resumir_latencias(latencias, duracion_total=total)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark de obtención de agentes MCP")
+    parser.add_argument("--hilos", type=int, default=8, help="Hilos concurrentes")
+    parser.add_argument("--peticiones", type=int, default=2000, help="Peticiones totales")
+    args = parser.parse_args()
+
+    pool = AgentPool(max_por_rol=args.hilos, precalentar=args.hilos)
+
+    def desde_pool(contexto: MCPContext) -> None:
+        with pool.usar(contexto):
+            pass
+
+    resultados = {
+        "create_agent_by_role": _medir(create_agent_by_role, args.hilos, args.peticiones),
+        "AgentPool.usar": _medir(desde_pool, args.hilos, args.peticiones),
+    }
+
+    print(f"Obtención de agentes ({args.peticiones} peticiones, {args.hilos} hilos)")
+    for nombre, r in resultados.items():
+        print(
+            f"  {nombre:<22} {r['ops_por_segundo']:>10.0f} ops/s  "
+            f"p50={r['p50_ms'] * 1000:.1f}us  p95={r['p95_ms'] * 1000:.1f}us  p99={r['p99_ms'] * 1000:.1f}us"
+        )
+    print(f"  Agentes creados por el pool: {pool.metricas['creados']}")
+
+
+if __name__ == "__main__":
+    main()
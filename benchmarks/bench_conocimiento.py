@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Benchmark de latencia de búsqueda en la base de conocimiento clínico.
+
+Genera bases sintéticas de tamaño creciente y mide la latencia de
+BaseConocimientoClinico.buscar para comprobar que se mantiene estable al
+crecer el número de condiciones.
+
+Uso:
+    python -m benchmarks.bench_conocimiento --tamanos 15 1000 10000 50000
+"""
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from typing import Any, Dict
+
+from mcp.conocimiento import RUTA_CONOCIMIENTO_POR_DEFECTO, BaseConocimientoClinico
+from benchmarks.metricas import cronometrar, resumir_latencias
+
+REGIONES = ["cervical", "lumbar", "rodilla", "hombro", "tobillo", "cadera", "codo", "muneca", "dorsal", "talon"]
+
+CONSULTAS = [
+    ["Dolor cervical persistente", "rigidez de cuello"],
+    ["Dolor lumbar", "dolor irradiado a la pierna", "ciática"],
+    ["Consulta de control", "dolor de rodilla al subir escaleras"],
+    ["Dolor", "molestias generales"]
+]
+
+
+def generar_base(total: int, semilla: int = 42) -> Dict[str, Any]:
+    """
+    Genera una base sintética con las condiciones reales más condiciones ficticias.
+
+    Cada condición ficticia combina una región anatómica con un término
+    propio, de modo que los términos comunes ("dolor" y las regiones) se
+    repiten como en una base real de gran tamaño.
+    """
+    aleatorio = random.Random(semilla)
+    with open(RUTA_CONOCIMIENTO_POR_DEFECTO, encoding="utf-8") as f:
+        condiciones = json.load(f)["condiciones"]
+
+    for i in range(max(0, total - len(condiciones))):
+        region = aleatorio.choice(REGIONES)
+        condiciones.append({
+            "clave": f"dolor {region} sindrome{i}",
+            "principal": f"Síndrome sintético {i}",
+            "secundarios": [],
+            "confianza": round(aleatorio.uniform(0.5, 0.9), 2),
+            "referencias": [],
+            "sinonimos": [f"signo{i}", f"{region}{i % 97}"]
+        })
+
+    return {"version": 1, "condiciones": condiciones[:total]}
+
+
+def medir_tamano(total: int, repeticiones: int) -> Dict[str, float]:
+    """Mide carga y búsqueda para una base sintética del tamaño indicado."""
+    with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False, encoding="utf-8") as f:
+        json.dump(generar_base(total), f, ensure_ascii=False)
+        ruta = f.name
+
+    try:
+        inicio = time.perf_counter()
+        base = BaseConocimientoClinico(ruta, intervalo_comprobacion=60)
+        carga = time.perf_counter() - inicio
+
+        consultas = iter(CONSULTAS * (repeticiones // len(CONSULTAS) + 1))
+        resultado = resumir_latencias(cronometrar(lambda: base.buscar(next(consultas)), repeticiones))
+        resultado["carga_ms"] = carga * 1000
+        resultado["condiciones"] = base.total_condiciones
+        return resultado
+    finally:
+        os.unlink(ruta)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark de la base de conocimiento clínico")
+    parser.add_argument("--tamanos", type=int, nargs="+", default=[15, 1000, 10000, 50000])
+    parser.add_argument("--repeticiones", type=int, default=5000)
+    args = parser.parse_args()
+
+    print(f"{'condiciones':>12} {'carga':>10} {'ops/s':>10} {'p50':>10} {'p95':>10} {'p99':>10}")
+    for total in args.tamanos:
+        r = medir_tamano(total, args.repeticiones)
+        print(f"{r['condiciones']:>12} {r['carga_ms']:>8.1f}ms {r['ops_por_segundo']:>10.0f} "
+              f"{r['p50_ms'] * 1000:>8.1f}us {r['p95_ms'] * 1000:>8.1f}us {r['p99_ms'] * 1000:>8.1f}us")
+
+
+if __name__ == "__main__":
+    main()
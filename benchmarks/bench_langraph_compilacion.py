@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Benchmark del coste por petición de preparar el grafo LangGraph del MCP.
+
+Compara compilar el grafo en cada petición (comportamiento anterior de
+run_graph) con reutilizar la aplicación compilada mediante get_compiled_app.
+
+Uso:
+    python -m benchmarks.bench_langraph_compilacion --peticiones 200
+"""
+
+import argparse
+
+from langraph_mcp import MemorySaver, build_mcp_graph, clear_compiled_apps, get_compiled_app
+from benchmarks.metricas import cronometrar, resumir_latencias
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark de compilación del grafo LangGraph MCP")
+    parser.add_argument("--peticiones", type=int, default=200, help="Peticiones simuladas")
+    args = parser.parse_args()
+
+    graph = build_mcp_graph()
+    checkpoint = MemorySaver()
+    clear_compiled_apps()
+
+    resultados = {
+        "compile() por petición": cronometrar(lambda: graph.compile(), args.peticiones),
+        "compile(checkpointer) por petición": cronometrar(
+            lambda: graph.compile(checkpointer=checkpoint), args.peticiones
+        ),
+        "get_compiled_app": cronometrar(lambda: get_compiled_app(graph), args.peticiones),
+        "get_compiled_app(checkpointer)": cronometrar(
+            lambda: get_compiled_app(graph, checkpoint), args.peticiones
+        ),
+    }
+
+    print(f"Sobrecoste del grafo por petición ({args.peticiones} peticiones)")
+    for nombre, latencias in resultados.items():
+        r = resumir_latencias(latencias)
+        print(
+            f"  {nombre:<36} p50={r['p50_ms'] * 1000:>9.1f}us  "
+            f"p95={r['p95_ms'] * 1000:>9.1f}us  p99={r['p99_ms'] * 1000:>9.1f}us"
+        )
+
+    antes = resumir_latencias(resultados["compile() por petición"])["p50_ms"]
+    despues = resumir_latencias(resultados["get_compiled_app"])["p50_ms"]
+    if despues > 0:
+        print(f"  Reducción del sobrecoste (p50): {antes / despues:.0f}x")
+
+
+if __name__ == "__main__":
+    main()
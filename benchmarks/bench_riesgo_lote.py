@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Benchmark de evaluación de riesgo legal: llamada individual frente a lote.
+
+Simula la revisión de cumplimiento de todos los tratamientos de un día de
+clínica (10k filas por defecto) y compara evaluar_riesgo_legal fila a fila
+con evaluar_riesgo_legal_lote.
+
+Uso:
+    python -m benchmarks.bench_riesgo_lote --filas 10000
+"""
+
+import argparse
+import random
+import time
+from typing import List, Optional, Tuple
+
+from mcp import tools
+from mcp.tools import evaluar_riesgo_legal, evaluar_riesgo_legal_lote
+
+TRATAMIENTOS = [
+    "Manipulación cervical de alta intensidad",
+    "Ejercicios domiciliarios de movilidad",
+    "Tracción lumbar y calor local",
+    "Punción seca con aguja en trapecio",
+    "Terapia manual suave y estiramientos",
+    "Estimulación eléctrica transcutánea",
+    "Movilización articular de hombro",
+    "Educación postural y ejercicio terapéutico"
+]
+
+CONDICIONES = [None, [], ["Embarazo"], ["Diabetes", "Anticoagulación"], ["Marcapasos"]]
+
+
+def generar_casos(filas: int, semilla: int = 7) -> List[Tuple[str, str, bool, Optional[List[str]]]]:
+    """Genera casos (diagnostico, tratamiento, consentimiento, condiciones) aleatorios."""
+    aleatorio = random.Random(semilla)
+    return [
+        (
+            "Cervicalgia mecánica",
+            aleatorio.choice(TRATAMIENTOS),
+            aleatorio.random() > 0.1,
+            aleatorio.choice(CONDICIONES)
+        )
+        for _ in range(filas)
+    ]
+
+
+def _mejor_tiempo(operacion, repeticiones: int) -> float:
+    """Devuelve el mejor tiempo de pared de varias ejecuciones."""
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        operacion()
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark de riesgo legal por lotes")
+    parser.add_argument("--filas", type=int, default=10000)
+    parser.add_argument("--repeticiones", type=int, default=5)
+    args = parser.parse_args()
+
+    casos = generar_casos(args.filas)
+
+    individual = _mejor_tiempo(lambda: [evaluar_riesgo_legal(*caso) for caso in casos], args.repeticiones)
+    lote = _mejor_tiempo(lambda: evaluar_riesgo_legal_lote(casos), args.repeticiones)
+
+    motor = "numpy" if tools.np is not None else "python puro"
+    print(f"Filas: {args.filas} (coincidencias con {motor})")
+    print(f"  evaluar_riesgo_legal (fila a fila): {individual * 1000:8.1f} ms  {args.filas / individual:>10.0f} filas/s")
+    print(f"  evaluar_riesgo_legal_lote:          {lote * 1000:8.1f} ms  {args.filas / lote:>10.0f} filas/s")
+    print(f"  Aceleración: {individual / lote:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
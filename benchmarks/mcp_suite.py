@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Suite de benchmarks de extremo a extremo para el paquete mcp.
+
+Ejecuta escenarios por rol y mide procesar_mensaje, filter_relevant_blocks
+y exportar_json:
+- chat_corto: conversación breve de pocos mensajes
+- sesion_larga: sesión de 200 mensajes
+- visita_emr: contexto cargado con MCPAgent.desde_visita_emr
+- rafaga_alta_prioridad: ráfaga de mensajes urgentes
+
+Para cada operación se informa ops/s, latencias p50/p95/p99, asignaciones
+de memoria por operación y el pico de RSS del proceso. Los resultados se
+guardan como JSON para poder compararlos entre commits; por defecto en
+benchmarks/resultados/, que git ignora.
+
+Uso:
+    python -m benchmarks.mcp_suite
+    python -m benchmarks.mcp_suite --salida resultados.json
+    python -m benchmarks.mcp_suite --comparar benchmarks/resultados/abc1234.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from mcp.context import MCPContext
+from mcp.agent_mcp import MCPAgent
+from mcp.agent_factory import create_agent_by_role
+from benchmarks.metricas import (
+    commit_actual,
+    cronometrar,
+    medir_asignaciones,
+    resumir_latencias,
+    rss_pico_mb
+)
+
+ROLES = ["health_professional", "patient", "admin_staff"]
+
+DIRECTORIO_RESULTADOS = os.path.join(os.path.dirname(__file__), "resultados")
+
+MENSAJES_CHAT = [
+    "Buenos días, vengo por el dolor cervical.",
+    "El dolor se irradia al brazo derecho desde hace una semana.",
+    "¿Cuál sería el diagnóstico más probable?",
+    "Estoy considerando aplicar manipulación cervical como tratamiento.",
+    "¿Tiene visitas anteriores en el historial?"
+]
+
+MENSAJES_URGENTES = [
+    "Urgente: dolor intenso 9/10 que empeora al mover el cuello.",
+    "El paciente refiere sangrado tras la sesión anterior.",
+    "Posible reacción adversa, alergia a AINEs documentada.",
+    "No puedo mover el brazo derecho, dolor insoportable."
+]
+
+
+def _crear_contexto(user_role: str) -> MCPContext:
+    """Crea un contexto base de benchmark para el rol indicado."""
+    return MCPContext(
+        paciente_id="P001",
+        paciente_nombre="Juan Pérez",
+        visita_id="V-BENCH-001",
+        profesional_email="fisio@aiduxcare.com",
+        motivo_consulta="Dolor cervical persistente",
+        user_role=user_role
+    )
+
+
+def _mensajes_sesion(total: int) -> List[str]:
+    """Genera una sesión de mensajes alternando consultas rutinarias y clínicas."""
+    base = MENSAJES_CHAT + ["Gracias.", "Perfecto, continuamos con la exploración."]
+    return [base[i % len(base)] for i in range(total)]
+
+
+def _escenarios(mensajes_sesion: int) -> Dict[str, Callable[[str], Dict[str, Any]]]:
+    """Define los escenarios: cada uno devuelve el agente y los mensajes a procesar."""
+    def chat_corto(user_role: str) -> Dict[str, Any]:
+        return {"agente": create_agent_by_role(_crear_contexto(user_role)), "mensajes": MENSAJES_CHAT}
+
+    def sesion_larga(user_role: str) -> Dict[str, Any]:
+        return {
+            "agente": create_agent_by_role(_crear_contexto(user_role)),
+            "mensajes": _mensajes_sesion(mensajes_sesion)
+        }
+
+    def visita_emr(user_role: str) -> Dict[str, Any]:
+        agente = asyncio.run(MCPAgent.desde_visita_emr("VISITA123", user_role=user_role))
+        return {"agente": agente, "mensajes": MENSAJES_CHAT}
+
+    def rafaga_alta_prioridad(user_role: str) -> Dict[str, Any]:
+        return {
+            "agente": create_agent_by_role(_crear_contexto(user_role)),
+            "mensajes": MENSAJES_URGENTES * 10
+        }
+
+    return {
+        "chat_corto": chat_corto,
+        "sesion_larga": sesion_larga,
+        "visita_emr": visita_emr,
+        "rafaga_alta_prioridad": rafaga_alta_prioridad
+    }
+
+
+def _medir_operacion(operacion: Callable[[], Any], repeticiones: int) -> Dict[str, Any]:
+    """Mide tiempos y asignaciones de una operación sin efectos acumulativos relevantes."""
+    resultado = resumir_latencias(cronometrar(operacion, repeticiones))
+    resultado.update(medir_asignaciones(operacion, max(1, repeticiones // 10)))
+    return resultado
+
+
+def ejecutar_escenario(
+    preparar: Callable[[str], Dict[str, Any]],
+    user_role: str,
+    repeticiones: int
+) -> Dict[str, Any]:
+    """
+    Ejecuta un escenario para un rol y mide las tres operaciones.
+
+    procesar_mensaje se mide mensaje a mensaje sobre la sesión completa; las
+    asignaciones se miden en una segunda sesión idéntica para no alterar los
+    tiempos. filter_relevant_blocks y exportar_json se miden sobre el
+    contexto resultante de la sesión.
+    """
+    escenario = preparar(user_role)
+    agente: MCPAgent = escenario["agente"]
+    mensajes: List[str] = escenario["mensajes"]
+
+    cola = iter(mensajes)
+    latencias = cronometrar(lambda: agente.procesar_mensaje(next(cola)), len(mensajes))
+    procesar = resumir_latencias(latencias)
+
+    segunda = preparar(user_role)
+    cola_asignaciones = iter(segunda["mensajes"])
+    procesar.update(medir_asignaciones(
+        lambda: segunda["agente"].procesar_mensaje(next(cola_asignaciones)),
+        len(segunda["mensajes"])
+    ))
+
+    contexto = agente.contexto
+    max_tokens = agente.config.get("max_tokens_memoria", 300)
+
+    return {
+        "mensajes": len(mensajes),
+        "eventos_historia": len(contexto.historia),
+        "operaciones": {
+            "procesar_mensaje": procesar,
+            "filter_relevant_blocks": _medir_operacion(
+                lambda: contexto.filter_relevant_blocks(max_tokens=max_tokens), repeticiones
+            ),
+            "exportar_json": _medir_operacion(contexto.exportar_json, repeticiones)
+        }
+    }
+
+
+def ejecutar_suite(
+    escenarios: Optional[List[str]] = None,
+    roles: Optional[List[str]] = None,
+    repeticiones: int = 200,
+    mensajes_sesion: int = 200
+) -> Dict[str, Any]:
+    """
+    Ejecuta la suite completa y devuelve los resultados estructurados.
+
+    Args:
+        escenarios: Escenarios a ejecutar (por defecto todos)
+        roles: Roles a evaluar (por defecto todos)
+        repeticiones: Repeticiones para operaciones sobre el contexto
+        mensajes_sesion: Mensajes de la sesión larga
+
+    Returns:
+        Diccionario con metadatos y resultados por escenario y rol
+    """
+    disponibles = _escenarios(mensajes_sesion)
+    seleccion = escenarios or list(disponibles)
+    resultados: Dict[str, Dict[str, Any]] = {}
+
+    for nombre in seleccion:
+        if nombre not in disponibles:
+            raise ValueError(f"Escenario desconocido: {nombre}")
+        resultados[nombre] = {}
+        for user_role in roles or ROLES:
+            resultados[nombre][user_role] = ejecutar_escenario(disponibles[nombre], user_role, repeticiones)
+
+    return {
+        "commit": commit_actual(),
+        "fecha": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "parametros": {"repeticiones": repeticiones, "mensajes_sesion": mensajes_sesion},
+        "rss_pico_mb": rss_pico_mb(),
+        "resultados": resultados
+    }
+
+
+def comparar(base: Dict[str, Any], actual: Dict[str, Any]) -> List[str]:
+    """
+    Compara dos ejecuciones y devuelve líneas con la variación de p50 y ops/s.
+
+    Solo se comparan los escenarios, roles y operaciones presentes en ambas.
+    """
+    lineas = [f"Comparando {base.get('commit')} -> {actual.get('commit')}"]
+    for escenario, por_rol in actual["resultados"].items():
+        for user_role, datos in por_rol.items():
+            previo = base.get("resultados", {}).get(escenario, {}).get(user_role)
+            if not previo:
+                continue
+            for operacion, medida in datos["operaciones"].items():
+                anterior = previo["operaciones"].get(operacion)
+                if not anterior or not anterior["p50_ms"]:
+                    continue
+                delta_p50 = (medida["p50_ms"] - anterior["p50_ms"]) / anterior["p50_ms"] * 100
+                delta_ops = (
+                    (medida["ops_por_segundo"] - anterior["ops_por_segundo"]) / anterior["ops_por_segundo"] * 100
+                    if anterior["ops_por_segundo"] else 0.0
+                )
+                lineas.append(
+                    f"  {escenario}/{user_role}/{operacion}: "
+                    f"p50 {anterior['p50_ms']:.3f} -> {medida['p50_ms']:.3f} ms ({delta_p50:+.1f}%), "
+                    f"ops/s {delta_ops:+.1f}%"
+                )
+    lineas.append(f"  RSS pico: {base.get('rss_pico_mb', 0):.1f} -> {actual['rss_pico_mb']:.1f} MB")
+    return lineas
+
+
+def _imprimir(resultado: Dict[str, Any]) -> None:
+    """Muestra un resumen legible de los resultados."""
+    print(f"Suite MCP - commit {resultado['commit']} - RSS pico {resultado['rss_pico_mb']:.1f} MB")
+    for escenario, por_rol in resultado["resultados"].items():
+        print(f"\n[{escenario}]")
+        for user_role, datos in por_rol.items():
+            print(f"  {user_role} ({datos['mensajes']} mensajes, {datos['eventos_historia']} eventos)")
+            for operacion, m in datos["operaciones"].items():
+                print(
+                    f"    {operacion:<24} {m['ops_por_segundo']:>10.0f} ops/s  "
+                    f"p50={m['p50_ms']:.3f}ms p95={m['p95_ms']:.3f}ms p99={m['p99_ms']:.3f}ms  "
+                    f"asig={m['pico_bytes_por_op'] / 1024:.1f}KB/op"
+                )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Suite de benchmarks del paquete mcp")
+    parser.add_argument("--escenario", action="append", help="Escenario a ejecutar (repetible)")
+    parser.add_argument("--rol", action="append", choices=ROLES, help="Rol a evaluar (repetible)")
+    parser.add_argument("--repeticiones", type=int, default=200, help="Repeticiones por operación")
+    parser.add_argument("--mensajes-sesion", type=int, default=200, help="Mensajes de la sesión larga")
+    parser.add_argument("--salida", help="Ruta del JSON de resultados (por defecto benchmarks/resultados/<commit>.json)")
+    parser.add_argument("--comparar", help="JSON de una ejecución anterior para comparar")
+    args = parser.parse_args()
+
+    resultado = ejecutar_suite(args.escenario, args.rol, args.repeticiones, args.mensajes_sesion)
+    _imprimir(resultado)
+
+    salida = args.salida or os.path.join(DIRECTORIO_RESULTADOS, f"{resultado['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(salida)), exist_ok=True)
+    with open(salida, "w", encoding="utf-8") as f:
+        json.dump(resultado, f, indent=2, ensure_ascii=False)
+    print(f"\nResultados guardados en {salida}")
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            base = json.load(f)
+        print("\n" + "\n".join(comparar(base, resultado)))
+
+
+if __name__ == "__main__":
+    main()
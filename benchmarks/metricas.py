@@ -0,0 +1,107 @@
+"""
+Utilidades comunes de medición para los benchmarks MCP.
+
+Proporciona el cálculo de percentiles de latencia, la medición de
+asignaciones de memoria con tracemalloc y el pico de memoria residente
+del proceso.
+"""
+
+import resource
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional
+
+
+def resumir_latencias(latencias: List[float], duracion_total: Optional[float] = None) -> Dict[str, float]:
+    """
+    Resume una lista de latencias (en segundos).
+    
+    Args:
+        latencias: Latencias individuales en segundos
+        duracion_total: Tiempo total de pared; por defecto la suma de latencias
+        
+    Returns:
+        Diccionario con ops/s y percentiles p50/p95/p99 en milisegundos
+    """
+    if not latencias:
+        return {"muestras": 0, "ops_por_segundo": 0.0, "p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0}
+    
+    total = duracion_total if duracion_total is not None else sum(latencias)
+    if len(latencias) > 1:
+        cuantiles = statistics.quantiles(latencias, n=100, method="inclusive")
+        p50, p95, p99 = cuantiles[49], cuantiles[94], cuantiles[98]
+    else:
+        p50 = p95 = p99 = latencias[0]
+    
+    return {
+        "muestras": len(latencias),
+        "ops_por_segundo": len(latencias) / total if total > 0 else 0.0,
+        "p50_ms": p50 * 1000,
+        "p95_ms": p95 * 1000,
+        "p99_ms": p99 * 1000,
+    }
+
+
+def cronometrar(operacion: Callable[[], Any], repeticiones: int) -> List[float]:
+    """Ejecuta una operación varias veces y devuelve cada latencia en segundos."""
+    latencias = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        operacion()
+        latencias.append(time.perf_counter() - inicio)
+    return latencias
+
+
+def medir_asignaciones(operacion: Callable[[], Any], repeticiones: int) -> Dict[str, float]:
+    """
+    Mide las asignaciones de memoria por operación con tracemalloc.
+    
+    Se ejecuta en una pasada separada de la de tiempos, ya que tracemalloc
+    introduce una sobrecarga considerable.
+    
+    Returns:
+        Bytes de pico y bytes retenidos por operación (promedios)
+    """
+    ya_activo = tracemalloc.is_tracing()
+    if not ya_activo:
+        tracemalloc.start()
+    
+    picos = []
+    retenidos = []
+    try:
+        for _ in range(repeticiones):
+            antes, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            operacion()
+            despues, pico = tracemalloc.get_traced_memory()
+            picos.append(pico - antes)
+            retenidos.append(despues - antes)
+    finally:
+        if not ya_activo:
+            tracemalloc.stop()
+    
+    return {
+        "pico_bytes_por_op": statistics.fmean(picos) if picos else 0.0,
+        "retenidos_bytes_por_op": statistics.fmean(retenidos) if retenidos else 0.0,
+    }
+
+
+def rss_pico_mb() -> float:
+    """Pico de memoria residente del proceso en MB."""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa en KB, macOS en bytes
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def commit_actual() -> str:
+    """Hash corto del commit actual, o 'desconocido' fuera de un repositorio git."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "desconocido"
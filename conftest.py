@@ -0,0 +1,54 @@
+"""
+Utilidades compartidas por las pruebas de la raíz del repositorio.
+"""
+
+import time
+
+import pytest
+from langchain_core.messages import AIMessage
+
+
+class LLMSimulado:
+    """Sustituto de ChatOpenAI que responde sin llamar a la API."""
+
+    # Respuestas generadas desde el último reinicio de la fixture
+    llamadas = 0
+    # Segundos que tarda en responder
+    retardo = 0.0
+
+    def __init__(self, **kwargs):
+        pass
+
+    def invoke(self, messages):
+        LLMSimulado.llamadas += 1
+        if self.retardo:
+            time.sleep(self.retardo)
+        return AIMessage(content="Respuesta simulada")
+
+
+@pytest.fixture
+def llm_simulado(monkeypatch):
+    """Sustituye el LLM del grafo LangGraph del MCP por LLMSimulado."""
+    import langraph_mcp
+
+    monkeypatch.setattr(LLMSimulado, "llamadas", 0)
+    monkeypatch.setattr(langraph_mcp, "ChatOpenAI", LLMSimulado)
+    return LLMSimulado
+
+
+@pytest.fixture
+def crear_contexto():
+    """Devuelve una función que crea un contexto MCP de prueba."""
+    from mcp.context import MCPContext
+
+    def crear(user_role="health_professional", visita_id="V20250508-001"):
+        return MCPContext(
+            paciente_id="P001",
+            paciente_nombre="Juan Pérez",
+            visita_id=visita_id,
+            profesional_email="fisio@aiduxcare.com",
+            motivo_consulta="Dolor cervical persistente",
+            user_role=user_role
+        )
+
+    return crear
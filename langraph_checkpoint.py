@@ -0,0 +1,669 @@
+"""
+Checkpointer duradero en SQLite para el grafo LangGraph del MCP.
+
+A diferencia de MemorySaver, los checkpoints sobreviven a los reinicios y
+pueden compartirse entre workers que usen el mismo fichero. El estado se
+guarda por hilo (thread_id = visit_id) como una cadena de deltas:
+- Cada checkpoint guarda solo los canales que cambiaron respecto a su padre;
+  las listas que solo crecen (mensajes, bloques de memoria, resultados de
+  herramientas) guardan únicamente los elementos añadidos
+- Cada `snapshot_interval` checkpoints se guarda una instantánea completa
+- Reanudar una visita es una única consulta: la instantánea base más los
+  deltas posteriores, sea cual sea la longitud de la conversación
+- La compactación elimina en segundo plano los checkpoints y deltas
+  anteriores a la instantánea base de los últimos checkpoints conservados
+"""
+
+import asyncio
+import random
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    parent_checkpoint_id TEXT,
+    depth INTEGER NOT NULL,
+    checkpoint_type TEXT NOT NULL,
+    checkpoint BLOB NOT NULL,
+    metadata_type TEXT NOT NULL,
+    metadata BLOB NOT NULL,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS channel_deltas (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    channel TEXT NOT NULL,
+    op TEXT NOT NULL,
+    value_type TEXT,
+    value BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, channel)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS checkpoint_writes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    value_type TEXT NOT NULL,
+    value BLOB NOT NULL,
+    task_path TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+) WITHOUT ROWID;
+"""
+
+# Instantánea base y deltas de un checkpoint, en orden de aplicación
+_CHAIN_QUERY = """
+WITH RECURSIVE chain(checkpoint_id, parent_checkpoint_id, depth, position) AS (
+    SELECT checkpoint_id, parent_checkpoint_id, depth, 0
+    FROM checkpoints
+    WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?
+    UNION ALL
+    SELECT c.checkpoint_id, c.parent_checkpoint_id, c.depth, chain.position + 1
+    FROM checkpoints c
+    JOIN chain ON c.checkpoint_id = chain.parent_checkpoint_id
+    WHERE chain.depth > 0 AND c.thread_id = ? AND c.checkpoint_ns = ?
+)
+SELECT d.channel, d.op, d.value_type, d.value
+FROM chain
+JOIN channel_deltas d
+  ON d.thread_id = ? AND d.checkpoint_ns = ? AND d.checkpoint_id = chain.checkpoint_id
+ORDER BY chain.position DESC
+"""
+
+# Operaciones de delta por canal
+OP_SET = "set"
+OP_APPEND = "append"
+OP_DELETE = "delete"
+
+
+def visit_config(visit_id: str, checkpoint_ns: str = "") -> RunnableConfig:
+    """
+    Devuelve la configuración de ejecución del grafo para una visita.
+
+    Args:
+        visit_id: ID de la visita, usado como thread_id
+        checkpoint_ns: Espacio de nombres del checkpoint (opcional)
+
+    Returns:
+        Configuración con el thread_id de la visita
+    """
+    return {"configurable": {"thread_id": visit_id, "checkpoint_ns": checkpoint_ns}}
+
+
+class SQLiteDeltaSaver(BaseCheckpointSaver[str]):
+    """
+    Checkpointer de LangGraph que guarda deltas por hilo en SQLite.
+
+    Es seguro entre hilos. Con un fichero en disco se usa el modo WAL, de
+    modo que varios procesos pueden compartir el mismo almacén.
+    """
+
+    def __init__(
+        self,
+        path: str = ":memory:",
+        snapshot_interval: int = 10,
+        keep_last: int = 20,
+        max_cached_threads: int = 1024,
+        **kwargs: Any
+    ):
+        """
+        Abre (o crea) el almacén de checkpoints.
+
+        Args:
+            path: Fichero SQLite o ":memory:"
+            snapshot_interval: Checkpoints entre instantáneas completas
+            keep_last: Checkpoints por hilo que la compactación mantiene recuperables
+            max_cached_threads: Hilos cuyo último estado se recuerda para detectar
+                listas que solo crecen
+            **kwargs: Opciones de BaseCheckpointSaver (p.ej. serde)
+        """
+        super().__init__(**kwargs)
+        self.path = path
+        self.snapshot_interval = max(1, snapshot_interval)
+        self.keep_last = max(1, keep_last)
+        self.max_cached_threads = max_cached_threads
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.executescript(_SCHEMA)
+
+        # Último checkpoint escrito por hilo: (checkpoint_id, profundidad, listas guardadas)
+        self._last_lists: "OrderedDict[Tuple[str, str], Tuple[str, int, Dict[str, List[Any]]]]" = OrderedDict()
+
+        self._compaction_thread: Optional[threading.Thread] = None
+        self._compaction_stop = threading.Event()
+        self._compaction_wakeup = threading.Event()
+        self.stats = {"snapshots": 0, "deltas": 0, "appends": 0, "compactions": 0, "compacted": 0}
+
+    # ---- Escritura ----
+
+    def _delta_for(
+        self,
+        channel: str,
+        value: Any,
+        parent_lists: Optional[Dict[str, List[Any]]]
+    ) -> Tuple[str, Any]:
+        """Calcula la operación que lleva un canal del valor del padre al actual."""
+        if isinstance(value, list) and parent_lists is not None:
+            previous = parent_lists.get(channel)
+            if previous is not None and len(value) >= len(previous) and value[:len(previous)] == previous:
+                return OP_APPEND, value[len(previous):]
+        return OP_SET, value
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions
+    ) -> RunnableConfig:
+        """
+        Guarda un checkpoint como delta respecto a su padre (o como instantánea).
+
+        Args:
+            config: Configuración con thread_id, checkpoint_ns y el checkpoint padre
+            checkpoint: Checkpoint a guardar
+            metadata: Metadatos del checkpoint
+            new_versions: Canales que cambiaron respecto al padre
+
+        Returns:
+            Configuración que apunta al checkpoint guardado
+        """
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        parent_id = config["configurable"].get("checkpoint_id")
+        values: Dict[str, Any] = checkpoint["channel_values"]
+        skeleton = {k: v for k, v in checkpoint.items() if k != "channel_values"}
+        key = (thread_id, checkpoint_ns)
+
+        with self._lock:
+            cached = self._last_lists.get(key)
+            parent_lists = cached[2] if cached and cached[0] == parent_id else None
+            if parent_id is None:
+                parent_depth = None
+            elif cached and cached[0] == parent_id:
+                parent_depth = cached[1]
+            else:
+                row = self._conn.execute(
+                    "SELECT depth FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                    (thread_id, checkpoint_ns, parent_id)
+                ).fetchone()
+                parent_depth = row[0] if row else None
+
+            # Instantánea completa al empezar la cadena o cada snapshot_interval checkpoints
+            is_snapshot = parent_depth is None or parent_depth + 1 >= self.snapshot_interval
+            depth = 0 if is_snapshot else parent_depth + 1
+
+            rows = []
+            if is_snapshot:
+                for channel, value in values.items():
+                    rows.append((channel, OP_SET, *self.serde.dumps_typed(value)))
+            else:
+                for channel in new_versions:
+                    if channel not in values:
+                        rows.append((channel, OP_DELETE, None, None))
+                        continue
+                    op, payload = self._delta_for(channel, values[channel], parent_lists)
+                    rows.append((channel, op, *self.serde.dumps_typed(payload)))
+
+            with self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO checkpoints (thread_id, checkpoint_ns, checkpoint_id, "
+                    "parent_checkpoint_id, depth, checkpoint_type, checkpoint, metadata_type, metadata) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        thread_id, checkpoint_ns, checkpoint["id"], parent_id, depth,
+                        *self.serde.dumps_typed(skeleton),
+                        *self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
+                    )
+                )
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO channel_deltas (thread_id, checkpoint_ns, checkpoint_id, "
+                    "channel, op, value_type, value) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [(thread_id, checkpoint_ns, checkpoint["id"], *row) for row in rows]
+                )
+
+            # Listas guardadas, para detectar el próximo append. Los reductores
+            # devuelven listas nuevas, así que no cambian después de guardarse
+            lists = {channel: value for channel, value in values.items() if isinstance(value, list)}
+            self._last_lists[key] = (checkpoint["id"], depth, lists)
+            self._last_lists.move_to_end(key)
+            while len(self._last_lists) > self.max_cached_threads:
+                self._last_lists.popitem(last=False)
+
+            if is_snapshot:
+                self.stats["snapshots"] += 1
+            else:
+                self.stats["deltas"] += 1
+                self.stats["appends"] += sum(1 for row in rows if row[1] == OP_APPEND)
+
+        if is_snapshot and parent_depth is not None:
+            # Una nueva instantánea permite descartar la cadena anterior
+            self._compaction_wakeup.set()
+
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"]
+            }
+        }
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = ""
+    ) -> None:
+        """
+        Guarda las escrituras pendientes de una tarea.
+
+        Args:
+            config: Configuración del checkpoint al que pertenecen
+            writes: Pares (canal, valor)
+            task_id: Identificador de la tarea
+            task_path: Ruta de la tarea
+        """
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+
+        rows = []
+        for idx, (channel, value) in enumerate(writes):
+            rows.append((
+                WRITES_IDX_MAP.get(channel, idx), channel, *self.serde.dumps_typed(value)
+            ))
+
+        with self._lock, self._conn:
+            for idx, channel, value_type, value in rows:
+                # Las escrituras especiales (errores, interrupciones) se sobrescriben
+                verb = "INSERT OR REPLACE" if idx < 0 else "INSERT OR IGNORE"
+                self._conn.execute(
+                    f"{verb} INTO checkpoint_writes (thread_id, checkpoint_ns, checkpoint_id, task_id, "
+                    "idx, channel, value_type, value, task_path) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (thread_id, checkpoint_ns, checkpoint_id, task_id, idx, channel, value_type, value, task_path)
+                )
+
+    # ---- Lectura ----
+
+    def _load_values(self, thread_id: str, checkpoint_ns: str, checkpoint_id: str) -> Dict[str, Any]:
+        """Reconstruye los valores de los canales: instantánea base más deltas."""
+        values: Dict[str, Any] = {}
+        rows = self._conn.execute(
+            _CHAIN_QUERY,
+            (thread_id, checkpoint_ns, checkpoint_id) + (thread_id, checkpoint_ns) * 2
+        ).fetchall()
+        for channel, op, value_type, value in rows:
+            if op == OP_DELETE:
+                values.pop(channel, None)
+            elif op == OP_APPEND and isinstance(values.get(channel), list):
+                values[channel] = values[channel] + self.serde.loads_typed((value_type, value))
+            else:
+                values[channel] = self.serde.loads_typed((value_type, value))
+        return values
+
+    def _build_tuple(self, thread_id: str, checkpoint_ns: str, row: Tuple[Any, ...]) -> CheckpointTuple:
+        """Construye el CheckpointTuple de una fila de la tabla checkpoints."""
+        checkpoint_id, parent_id, checkpoint_type, checkpoint_blob, metadata_type, metadata_blob = row
+        writes = self._conn.execute(
+            "SELECT task_id, channel, value_type, value FROM checkpoint_writes "
+            "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? ORDER BY task_path, task_id, idx",
+            (thread_id, checkpoint_ns, checkpoint_id)
+        ).fetchall()
+
+        checkpoint = self.serde.loads_typed((checkpoint_type, checkpoint_blob))
+        checkpoint["channel_values"] = self._load_values(thread_id, checkpoint_ns, checkpoint_id)
+
+        return CheckpointTuple(
+            config={
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": checkpoint_id
+                }
+            },
+            checkpoint=checkpoint,
+            metadata=self.serde.loads_typed((metadata_type, metadata_blob)),
+            pending_writes=[
+                (task_id, channel, self.serde.loads_typed((value_type, value)))
+                for task_id, channel, value_type, value in writes
+            ],
+            parent_config=(
+                {
+                    "configurable": {
+                        "thread_id": thread_id,
+                        "checkpoint_ns": checkpoint_ns,
+                        "checkpoint_id": parent_id
+                    }
+                }
+                if parent_id
+                else None
+            )
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        """
+        Recupera un checkpoint (el indicado o el último del hilo).
+
+        Args:
+            config: Configuración con thread_id y, opcionalmente, checkpoint_id
+
+        Returns:
+            El checkpoint, o None si no existe
+        """
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = get_checkpoint_id(config)
+
+        query = (
+            "SELECT checkpoint_id, parent_checkpoint_id, checkpoint_type, checkpoint, metadata_type, metadata "
+            "FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ?"
+        )
+        params: List[Any] = [thread_id, checkpoint_ns]
+        if checkpoint_id:
+            query += " AND checkpoint_id = ?"
+            params.append(checkpoint_id)
+        else:
+            query += " ORDER BY checkpoint_id DESC LIMIT 1"
+
+        with self._lock:
+            row = self._conn.execute(query, params).fetchone()
+            return self._build_tuple(thread_id, checkpoint_ns, row) if row else None
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None
+    ) -> Iterator[CheckpointTuple]:
+        """
+        Lista los checkpoints, del más reciente al más antiguo.
+
+        Args:
+            config: Configuración con thread_id (y checkpoint_ns) a listar, o None para todos
+            filter: Valores de metadatos que deben coincidir
+            before: Listar solo checkpoints anteriores a este
+            limit: Número máximo de checkpoints
+
+        Yields:
+            Checkpoints que cumplen los criterios
+        """
+        conditions = []
+        params: List[Any] = []
+        if config:
+            conditions.append("thread_id = ?")
+            params.append(config["configurable"]["thread_id"])
+            if "checkpoint_ns" in config["configurable"]:
+                conditions.append("checkpoint_ns = ?")
+                params.append(config["configurable"]["checkpoint_ns"])
+            if checkpoint_id := get_checkpoint_id(config):
+                conditions.append("checkpoint_id = ?")
+                params.append(checkpoint_id)
+        if before and (before_id := get_checkpoint_id(before)):
+            conditions.append("checkpoint_id < ?")
+            params.append(before_id)
+
+        query = (
+            "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, checkpoint_type, "
+            "checkpoint, metadata_type, metadata FROM checkpoints"
+        )
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY thread_id, checkpoint_ns, checkpoint_id DESC"
+
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+
+        remaining = limit
+        for thread_id, checkpoint_ns, *row in rows:
+            if filter:
+                metadata = self.serde.loads_typed((row[4], row[5]))
+                if not all(metadata.get(k) == v for k, v in filter.items()):
+                    continue
+            if remaining is not None:
+                if remaining <= 0:
+                    break
+                remaining -= 1
+            # Construir con el candado y soltarlo antes de ceder el control: quien
+            # itera puede llamar a get_tuple o put sin bloquearse
+            with self._lock:
+                item = self._build_tuple(thread_id, checkpoint_ns, tuple(row))
+            yield item
+
+    def delete_thread(self, thread_id: str) -> None:
+        """
+        Elimina todos los checkpoints y escrituras de un hilo.
+
+        Args:
+            thread_id: Hilo (visita) a eliminar
+        """
+        with self._lock, self._conn:
+            for table in ("checkpoints", "channel_deltas", "checkpoint_writes"):
+                self._conn.execute(f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,))
+            for key in [k for k in self._last_lists if k[0] == thread_id]:
+                del self._last_lists[key]
+
+    def get_next_version(self, current: Optional[str], channel: None) -> str:
+        """Genera la siguiente versión de un canal (mismo formato que MemorySaver)."""
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
+    # ---- Versiones asíncronas ----
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None
+    ) -> AsyncIterator[CheckpointTuple]:
+        items = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for item in items:
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions
+    ) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = ""
+    ) -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+    # ---- Compactación ----
+
+    def chain_length(self, config: RunnableConfig) -> int:
+        """
+        Devuelve cuántos checkpoints hay que leer para reconstruir uno.
+
+        Args:
+            config: Configuración del checkpoint (o del hilo, para el último)
+
+        Returns:
+            Instantánea base más deltas (0 si no existe)
+        """
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = get_checkpoint_id(config)
+        with self._lock:
+            if checkpoint_id:
+                row = self._conn.execute(
+                    "SELECT depth FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                    (thread_id, checkpoint_ns, checkpoint_id)
+                ).fetchone()
+            else:
+                row = self._conn.execute(
+                    "SELECT depth FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+                    "ORDER BY checkpoint_id DESC LIMIT 1",
+                    (thread_id, checkpoint_ns)
+                ).fetchone()
+        return row[0] + 1 if row else 0
+
+    def compact(self, thread_id: Optional[str] = None) -> int:
+        """
+        Elimina los checkpoints que ya no hacen falta para los últimos keep_last.
+
+        Se conservan los últimos keep_last checkpoints de cada hilo y la cadena
+        (instantánea base y deltas) necesaria para reconstruirlos; todo lo
+        anterior a esa instantánea base se borra junto con sus escrituras.
+
+        Args:
+            thread_id: Hilo a compactar (por defecto, todos)
+
+        Returns:
+            Número de checkpoints eliminados
+        """
+        removed = 0
+        with self._lock:
+            if thread_id is None:
+                threads = self._conn.execute("SELECT DISTINCT thread_id, checkpoint_ns FROM checkpoints").fetchall()
+            else:
+                threads = self._conn.execute(
+                    "SELECT DISTINCT thread_id, checkpoint_ns FROM checkpoints WHERE thread_id = ?", (thread_id,)
+                ).fetchall()
+
+            for thread, namespace in threads:
+                kept = self._conn.execute(
+                    "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+                    "ORDER BY checkpoint_id DESC LIMIT ?",
+                    (thread, namespace, self.keep_last)
+                ).fetchall()
+                if not kept:
+                    continue
+
+                # Instantánea base más antigua de entre los checkpoints conservados
+                cutoff = None
+                for (checkpoint_id,) in kept:
+                    base = self._conn.execute(
+                        "WITH RECURSIVE chain(checkpoint_id, parent_checkpoint_id, depth) AS ("
+                        " SELECT checkpoint_id, parent_checkpoint_id, depth FROM checkpoints"
+                        " WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?"
+                        " UNION ALL SELECT c.checkpoint_id, c.parent_checkpoint_id, c.depth FROM checkpoints c"
+                        " JOIN chain ON c.checkpoint_id = chain.parent_checkpoint_id"
+                        " WHERE chain.depth > 0 AND c.thread_id = ? AND c.checkpoint_ns = ?)"
+                        " SELECT MIN(checkpoint_id) FROM chain",
+                        (thread, namespace, checkpoint_id, thread, namespace)
+                    ).fetchone()[0]
+                    if base is not None and (cutoff is None or base < cutoff):
+                        cutoff = base
+                if cutoff is None:
+                    continue
+
+                with self._conn:
+                    cursor = self._conn.execute(
+                        "DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id < ?",
+                        (thread, namespace, cutoff)
+                    )
+                    removed += cursor.rowcount
+                    for table in ("channel_deltas", "checkpoint_writes"):
+                        self._conn.execute(
+                            f"DELETE FROM {table} WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id < ?",
+                            (thread, namespace, cutoff)
+                        )
+
+            self.stats["compactions"] += 1
+            self.stats["compacted"] += removed
+        return removed
+
+    def start_compaction(self, interval: float = 60.0) -> threading.Thread:
+        """
+        Lanza la compactación periódica en un hilo en segundo plano.
+
+        Además de cada `interval` segundos, se compacta cuando se escribe una
+        nueva instantánea que cierra una cadena de deltas.
+
+        Args:
+            interval: Segundos máximos entre compactaciones
+
+        Returns:
+            Hilo (daemon) de compactación
+        """
+        if self._compaction_thread and self._compaction_thread.is_alive():
+            return self._compaction_thread
+
+        self._compaction_stop.clear()
+
+        def run() -> None:
+            while not self._compaction_stop.is_set():
+                self._compaction_wakeup.wait(interval)
+                self._compaction_wakeup.clear()
+                if self._compaction_stop.is_set():
+                    break
+                try:
+                    self.compact()
+                except sqlite3.Error:
+                    # Un fallo puntual (p.ej. base de datos bloqueada) se reintenta en la próxima pasada
+                    pass
+
+        self._compaction_thread = threading.Thread(target=run, name="mcp-checkpoint-compaction", daemon=True)
+        self._compaction_thread.start()
+        return self._compaction_thread
+
+    def stop_compaction(self) -> None:
+        """Detiene la compactación en segundo plano."""
+        self._compaction_stop.set()
+        self._compaction_wakeup.set()
+        if self._compaction_thread:
+            self._compaction_thread.join()
+            self._compaction_thread = None
+
+    def close(self) -> None:
+        """Detiene la compactación y cierra la conexión."""
+        self.stop_compaction()
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self) -> "SQLiteDeltaSaver":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
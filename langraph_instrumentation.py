@@ -0,0 +1,212 @@
+"""
+Instrumentación por nodo del grafo LangGraph del MCP.
+
+Cada nodo de build_mcp_graph se envuelve con instrument_node, que mide:
+- Tiempo de reloj y tiempo de CPU del hilo que ejecuta el nodo
+- Bytes que el nodo añade al estado (tamaño serializado de su actualización)
+- Número de bloques de memoria, memoria filtrada y resultados de herramientas
+
+Las mediciones se registran en un registro global por proceso (con una
+ventana acotada de muestras por nodo para calcular p50/p95) y, si la
+ejecución se hace dentro de collect_node_timings, también en la lista de
+la petición para incluirlas en su traza.
+"""
+
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional
+
+# Muestras por nodo que se conservan para calcular percentiles
+DEFAULT_MAX_SAMPLES = 1024
+
+# Mediciones de la petición en curso. LangGraph copia el contexto a los hilos
+# en los que ejecuta los nodos, así que la lista es visible desde ellos
+_request_timings: ContextVar[Optional[List[Dict[str, Any]]]] = ContextVar("mcp_node_timings", default=None)
+
+
+def _percentile(values: List[float], percentile: float) -> float:
+    """Percentil por el método del rango más cercano (lista ordenada)."""
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, max(0, int(round(percentile / 100 * len(values))) - 1))
+    return values[index]
+
+
+def _update_bytes(update: Any) -> int:
+    """Tamaño serializado de la actualización devuelta por un nodo."""
+    if not update:
+        return 0
+    try:
+        return len(json.dumps(update, default=str, ensure_ascii=False).encode("utf-8"))
+    except (TypeError, ValueError):
+        return len(str(update).encode("utf-8"))
+
+
+def _count(state: Any, key: str) -> int:
+    """Número de elementos de una lista del estado (0 si no existe)."""
+    if isinstance(state, dict):
+        value = state.get(key)
+        return len(value) if isinstance(value, list) else 0
+    return 0
+
+
+class NodeMetricsRegistry:
+    """
+    Registro de mediciones por nodo del grafo, compartido por el proceso.
+    """
+
+    def __init__(self, max_samples: int = DEFAULT_MAX_SAMPLES):
+        """
+        Inicializa el registro.
+
+        Args:
+            max_samples: Muestras por nodo que se conservan para los percentiles
+        """
+        self.max_samples = max_samples
+        self._lock = threading.Lock()
+        self._samples: Dict[str, Dict[str, Deque[float]]] = {}
+        self._counts: Dict[str, int] = {}
+        self._errors: Dict[str, int] = {}
+        self._total_wall_ms: Dict[str, float] = {}
+
+    def record(self, timing: Dict[str, Any]) -> None:
+        """
+        Registra la medición de una ejecución de nodo.
+
+        Args:
+            timing: Medición generada por instrument_node
+        """
+        node = timing["node"]
+        with self._lock:
+            samples = self._samples.get(node)
+            if samples is None:
+                samples = {
+                    key: deque(maxlen=self.max_samples)
+                    for key in ("wall_ms", "cpu_ms", "update_bytes")
+                }
+                self._samples[node] = samples
+            for key, values in samples.items():
+                values.append(timing[key])
+            self._counts[node] = self._counts.get(node, 0) + 1
+            self._total_wall_ms[node] = self._total_wall_ms.get(node, 0.0) + timing["wall_ms"]
+            if timing.get("error"):
+                self._errors[node] = self._errors.get(node, 0) + 1
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Resume las mediciones de cada nodo.
+
+        Returns:
+            Por nodo: ejecuciones, errores, p50/p95 de tiempo de reloj, CPU y
+            bytes añadidos, tiempo total y proporción del tiempo de todos los nodos
+        """
+        with self._lock:
+            snapshot = {
+                node: {key: sorted(values) for key, values in samples.items()}
+                for node, samples in self._samples.items()
+            }
+            counts = dict(self._counts)
+            errors = dict(self._errors)
+            totals = dict(self._total_wall_ms)
+
+        grand_total = sum(totals.values())
+        result = {}
+        for node, samples in snapshot.items():
+            result[node] = {
+                "count": counts[node],
+                "errors": errors.get(node, 0),
+                "wall_p50_ms": round(_percentile(samples["wall_ms"], 50), 3),
+                "wall_p95_ms": round(_percentile(samples["wall_ms"], 95), 3),
+                "cpu_p50_ms": round(_percentile(samples["cpu_ms"], 50), 3),
+                "cpu_p95_ms": round(_percentile(samples["cpu_ms"], 95), 3),
+                "update_bytes_p50": int(_percentile(samples["update_bytes"], 50)),
+                "update_bytes_p95": int(_percentile(samples["update_bytes"], 95)),
+                "total_wall_ms": round(totals[node], 3),
+                "share": round(totals[node] / grand_total, 4) if grand_total else 0.0
+            }
+        return result
+
+    def reset(self) -> None:
+        """Descarta todas las mediciones."""
+        with self._lock:
+            self._samples.clear()
+            self._counts.clear()
+            self._errors.clear()
+            self._total_wall_ms.clear()
+
+
+_registry = NodeMetricsRegistry()
+
+
+def get_node_metrics() -> NodeMetricsRegistry:
+    """
+    Devuelve el registro de mediciones por nodo del proceso.
+
+    Returns:
+        Registro global de mediciones
+    """
+    return _registry
+
+
+@contextmanager
+def collect_node_timings() -> Iterator[List[Dict[str, Any]]]:
+    """
+    Recoge las mediciones de los nodos ejecutados dentro del bloque.
+
+    Yields:
+        Lista que se va llenando con una medición por ejecución de nodo
+    """
+    timings: List[Dict[str, Any]] = []
+    token = _request_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _request_timings.reset(token)
+
+
+def instrument_node(name: str, node: Callable[[Dict[str, Any]], Any]) -> Callable[[Dict[str, Any]], Any]:
+    """
+    Envuelve un nodo del grafo para medir cada ejecución.
+
+    Args:
+        name: Nombre del nodo en el grafo
+        node: Función del nodo (recibe el estado y devuelve una actualización)
+
+    Returns:
+        Función del nodo instrumentada
+    """
+    @wraps(node)
+    def instrumented(state: Dict[str, Any]) -> Any:
+        wall_start = time.perf_counter()
+        cpu_start = time.thread_time()
+        update = None
+        error = None
+        try:
+            update = node(state)
+            return update
+        except Exception as e:
+            error = type(e).__name__
+            raise
+        finally:
+            timing = {
+                "node": name,
+                "wall_ms": (time.perf_counter() - wall_start) * 1000,
+                "cpu_ms": (time.thread_time() - cpu_start) * 1000,
+                "update_bytes": _update_bytes(update),
+                "memory_blocks": _count(state, "memory_blocks"),
+                "filtered_memory": _count(state, "filtered_memory"),
+                "tool_results": _count(state, "tool_results")
+            }
+            if error:
+                timing["error"] = error
+            _registry.record(timing)
+            timings = _request_timings.get()
+            if timings is not None:
+                timings.append(timing)
+
+    return instrumented
@@ -8,7 +8,11 @@ modulares que gestionan el contexto, memoria y herramientas.
 
 import re
 import json
-from typing import Dict, List, Any, Optional, Union, TypeVar, Literal, Tuple, Callable, Annotated, cast
+import operator
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as ToolTimeoutError
+from typing import Dict, List, Any, Optional, Union, TypeVar, Literal, Tuple, Callable, Annotated, TypedDict, AsyncIterator, cast
 from datetime import datetime
 
 from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
@@ -16,13 +20,73 @@ from langchain_openai import ChatOpenAI
 from langgraph.graph import StateGraph, END
 from langgraph.graph.message import add_messages
 from langgraph.prebuilt import ToolNode
-from langgraph.persistence import MemorySaver
 from langgraph.pregel import Pregel
+from langgraph.types import Send
+
+from langraph_instrumentation import instrument_node
+
+# MemorySaver cambió de módulo entre versiones de LangGraph
+try:
+    from langgraph.checkpoint.memory import MemorySaver
+except ImportError:
+    from langgraph.persistence import MemorySaver
 
 # Tipos para el sistema
 Role = Literal["health_professional", "patient", "admin_staff"]
 Priority = Literal["high", "medium", "low"]
 MCPToolResult = Dict[str, Any]
+MCPTool = Callable[[Dict[str, Any]], Any]
+
+# Tiempo máximo por herramienta (segundos) cuando no se indica otro
+DEFAULT_TOOL_TIMEOUT = 10.0
+
+# Hilos para ejecutar herramientas con timeout. Una herramienta que agota su
+# timeout sigue ocupando su hilo hasta terminar, pero ya no bloquea el grafo.
+_tool_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="mcp-tool")
+
+class ResetItems(list):
+    """Lista que sustituye el valor acumulado de un canal append_items en lugar de ampliarlo."""
+
+
+def append_items(existing: Optional[List[Any]], new: Optional[List[Any]]) -> List[Any]:
+    """
+    Reductor que añade los elementos nuevos al final de la lista acumulada.
+    
+    Devuelve siempre una lista nueva: LangGraph guarda los valores de los
+    canales en los checkpoints (en segundo plano), así que la lista de un paso
+    no puede modificarse en los pasos siguientes. Los nodos devuelven solo los
+    elementos nuevos. Un nodo que devuelve ResetItems vacía el canal (y lo
+    inicia con los elementos que contenga).
+    
+    Args:
+        existing: Lista acumulada en el estado
+        new: Elementos devueltos por el nodo
+        
+    Returns:
+        Lista nueva con los elementos acumulados y los nuevos al final
+    """
+    if isinstance(new, ResetItems):
+        return list(new)
+    return (existing or []) + (new or [])
+
+
+class MCPGraphState(TypedDict, total=False):
+    """
+    Esquema del estado del grafo MCP.
+    
+    Los nodos devuelven actualizaciones parciales; los campos anotados con
+    reductor se acumulan (mensajes, bloques de memoria, resultados de
+    herramientas y tokens) y el resto se sustituye.
+    """
+    messages: Annotated[List[Union[HumanMessage, AIMessage, SystemMessage]], add_messages]
+    context: Dict[str, Any]
+    memory_blocks: Annotated[List[Dict[str, Any]], append_items]
+    filtered_memory: List[Dict[str, Any]]
+    tool_results: Annotated[List[MCPToolResult], append_items]
+    required_tools: List[str]
+    last_processed_message: Dict[str, Any]
+    token_count: Annotated[int, operator.add]
+
 
 class MCPState(dict):
     """Estado del grafo MCP."""
@@ -45,7 +109,7 @@ class MCPState(dict):
     
     @property
     def user_role(self) -> Role:
-        return self.context.get("user_role", "patient")
+        return _user_role(self)
     
     @property
     def visit_id(self) -> Optional[str]:
@@ -64,9 +128,14 @@ class MCPState(dict):
         return self.get("token_count", 0)
 
 
+def _user_role(state: Dict[str, Any]) -> Role:
+    """Devuelve el rol del usuario del estado (diccionario plano o MCPState)."""
+    return state.get("context", {}).get("user_role", "patient")
+
+
 # ---- Nodos del grafo ----
 
-def process_user_message(state: MCPState) -> MCPState:
+def process_user_message(state: MCPGraphState) -> Dict[str, Any]:
     """
     Procesa el mensaje del usuario y lo añade al contexto.
     
@@ -74,12 +143,13 @@ def process_user_message(state: MCPState) -> MCPState:
         state: Estado actual del grafo
         
     Returns:
-        Estado actualizado con el mensaje procesado
+        Actualización parcial con el nuevo bloque de memoria y sus tokens
     """
     # Obtener el último mensaje (siempre será un HumanMessage)
-    last_message = state.messages[-1] if state.messages else None
+    messages = state.get("messages", [])
+    last_message = messages[-1] if messages else None
     if not isinstance(last_message, HumanMessage):
-        return state
+        return {}
     
     message_content = str(last_message.content)
     
@@ -88,30 +158,28 @@ def process_user_message(state: MCPState) -> MCPState:
     
     # Crear un nuevo bloque de memoria
     new_block = {
-        "id": f"msg_{len(state.memory_blocks) + 1}",
+        "id": f"msg_{len(state.get('memory_blocks', [])) + 1}",
         "actor": "user",
         "text": message_content,
         "priority": priority,
         "timestamp": datetime.now().isoformat()
     }
     
-    # Actualizar los bloques de memoria
-    updated_blocks = state.memory_blocks + [new_block]
-    
-    # Actualizar el estado
-    new_state = MCPState(state)
-    new_state["memory_blocks"] = updated_blocks
-    new_state["last_processed_message"] = {
-        "content": message_content,
-        "priority": priority
+    # Solo se devuelve lo nuevo: los reductores lo añaden al estado. Los
+    # resultados de herramientas son de este turno: se vacían los anteriores,
+    # que con checkpointer seguirían en el hilo de la visita
+    return {
+        "memory_blocks": [new_block],
+        "tool_results": ResetItems(),
+        "last_processed_message": {
+            "content": message_content,
+            "priority": priority
+        },
+        # Estimar tokens (simplificado: 4 caracteres = 1 token)
+        "token_count": len(message_content) // 4
     }
-    
-    # Estimar tokens (simplificado: 4 caracteres = 1 token)
-    new_state["token_count"] = state.get("token_count", 0) + (len(message_content) // 4)
-    
-    return new_state
 
-def filter_memory_blocks(state: MCPState) -> MCPState:
+def filter_memory_blocks(state: MCPGraphState) -> Dict[str, Any]:
     """
     Filtra los bloques de memoria según rol y prioridad.
     
@@ -119,10 +187,10 @@ def filter_memory_blocks(state: MCPState) -> MCPState:
         state: Estado actual del grafo
         
     Returns:
-        Estado actualizado con memoria filtrada
+        Actualización parcial con la memoria filtrada
     """
-    user_role = state.user_role
-    memory_blocks = state.memory_blocks
+    user_role = _user_role(state)
+    memory_blocks = state.get("memory_blocks", [])
     max_tokens = 1000  # Límite base
     
     # Configuración por rol
@@ -177,13 +245,9 @@ def filter_memory_blocks(state: MCPState) -> MCPState:
             result.append(block)
             current_tokens += block_tokens
     
-    # Actualizar el estado
-    new_state = MCPState(state)
-    new_state["filtered_memory"] = result
-    
-    return new_state
+    return {"filtered_memory": result}
 
-def determine_tools_needed(state: MCPState) -> MCPState:
+def determine_tools_needed(state: MCPGraphState) -> Dict[str, Any]:
     """
     Determina qué herramientas se necesitan según el contexto y mensajes.
     
@@ -191,7 +255,7 @@ def determine_tools_needed(state: MCPState) -> MCPState:
         state: Estado actual del grafo
         
     Returns:
-        Estado actualizado con herramientas requeridas
+        Actualización parcial con las herramientas requeridas
     """
     # Configuración de herramientas por rol
     tools_by_role = {
@@ -200,7 +264,7 @@ def determine_tools_needed(state: MCPState) -> MCPState:
         "admin_staff": ["visitas_anteriores", "riesgo_legal"]
     }
     
-    user_role = state.user_role
+    user_role = _user_role(state)
     available_tools = tools_by_role.get(user_role, [])
     
     # Obtener último mensaje procesado
@@ -221,74 +285,132 @@ def determine_tools_needed(state: MCPState) -> MCPState:
         if "visitas_anteriores" in available_tools:
             required_tools.append("visitas_anteriores")
     
-    # Actualizar el estado
-    new_state = MCPState(state)
-    new_state["required_tools"] = required_tools
-    
-    return new_state
+    return {"required_tools": required_tools}
 
-def decide_next_step(state: MCPState) -> Union[str, Dict[str, Any]]:
+def decide_next_step(state: MCPGraphState) -> Union[str, List[Send]]:
     """
     Decide si ejecutar herramientas o generar respuesta final.
     
+    Si hay herramientas requeridas, lanza una rama run_tool por herramienta;
+    las ramas se ejecutan en paralelo y sus resultados se reúnen en
+    tool_results antes de generate_final_response.
+    
     Args:
         state: Estado actual del grafo
         
     Returns:
-        Nombre del siguiente nodo a ejecutar o END
+        Una tarea Send por herramienta, o el nombre del nodo de respuesta final
     """
-    required_tools = state.required_tools
+    required_tools = state.get("required_tools", [])
     
     if required_tools:
-        return "execute_tools"
+        task_state = {
+            "context": state.get("context", {}),
+            "last_processed_message": state.get("last_processed_message", {})
+        }
+        return [Send("run_tool", {**task_state, "tool_name": tool_name}) for tool_name in required_tools]
     else:
         return "generate_final_response"
 
-def execute_tools(state: MCPState) -> MCPState:
+def execute_tool(tool_name: str, state: Dict[str, Any]) -> MCPToolResult:
+    """
+    Ejecuta una herramienta simulada.
+    
+    Args:
+        tool_name: Nombre de la herramienta
+        state: Estado (o tarea) con el contexto de la ejecución
+        
+    Returns:
+        Resultado de la herramienta
+    """
+    if tool_name == "diagnostico":
+        return {
+            "tool": "diagnostico",
+            "result": "El paciente presenta signos compatibles con cervicalgia mecánica con componente radicular."
+        }
+    elif tool_name == "riesgo_legal":
+        return {
+            "tool": "riesgo_legal",
+            "result": "Nivel de riesgo bajo. Se recomienda documentar detalladamente la evolución de los síntomas."
+        }
+    elif tool_name == "visitas_anteriores":
+        return {
+            "tool": "visitas_anteriores",
+            "result": "Última visita: 15/02/2025 - Diagnóstico: Lumbalgia mecánica."
+        }
+    else:
+        return {
+            "tool": tool_name,
+            "result": "Herramienta no disponible o error en la ejecución."
+        }
+
+def execute_tools(state: MCPGraphState) -> Dict[str, Any]:
     """
-    Ejecuta las herramientas requeridas.
+    Ejecuta las herramientas requeridas de forma secuencial.
+    
+    El grafo usa run_tool (una rama por herramienta); esta variante se
+    mantiene para ejecutar las herramientas fuera del grafo.
     
     Args:
         state: Estado actual del grafo
         
     Returns:
-        Estado actualizado con resultados de herramientas
+        Actualización parcial con los resultados de herramientas
     """
-    required_tools = state.required_tools
-    tool_results = []
+    return {"tool_results": [execute_tool(tool_name, state) for tool_name in state.get("required_tools", [])]}
+
+def make_run_tool_node(
+    tools: Optional[Dict[str, MCPTool]] = None,
+    tool_timeouts: Optional[Dict[str, float]] = None,
+    default_timeout: Optional[float] = DEFAULT_TOOL_TIMEOUT
+) -> Callable[[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Crea el nodo que ejecuta una única herramienta con timeout.
     
-    # Simulación de ejecución de herramientas
-    for tool_name in required_tools:
-        if tool_name == "diagnostico":
-            result = {
-                "tool": "diagnostico",
-                "result": "El paciente presenta signos compatibles con cervicalgia mecánica con componente radicular."
-            }
-        elif tool_name == "riesgo_legal":
-            result = {
-                "tool": "riesgo_legal",
-                "result": "Nivel de riesgo bajo. Se recomienda documentar detalladamente la evolución de los síntomas."
-            }
-        elif tool_name == "visitas_anteriores":
+    Args:
+        tools: Funciones de herramienta por nombre (por defecto, las simuladas)
+        tool_timeouts: Timeout en segundos por herramienta
+        default_timeout: Timeout de las herramientas sin uno propio (None para no limitar)
+        
+    Returns:
+        Función nodo que recibe la tarea enviada por decide_next_step
+    """
+    tools = tools or {}
+    tool_timeouts = tool_timeouts or {}
+    
+    def call_tool(tool_name: str, task: Dict[str, Any]) -> MCPToolResult:
+        if tool_name not in tools:
+            return execute_tool(tool_name, task)
+        output = tools[tool_name](task)
+        return {"tool": tool_name, "result": output if isinstance(output, str) else json.dumps(output, ensure_ascii=False)}
+    
+    def run_tool(task: Dict[str, Any]) -> Dict[str, Any]:
+        tool_name = task["tool_name"]
+        timeout = tool_timeouts.get(tool_name, default_timeout)
+        
+        try:
+            if timeout is None:
+                result = call_tool(tool_name, task)
+            else:
+                result = _tool_executor.submit(call_tool, tool_name, task).result(timeout=timeout)
+        except ToolTimeoutError:
             result = {
-                "tool": "visitas_anteriores",
-                "result": "Última visita: 15/02/2025 - Diagnóstico: Lumbalgia mecánica."
+                "tool": tool_name,
+                "result": f"La herramienta no respondió en {timeout:g} s.",
+                "error": "timeout"
             }
-        else:
+        except Exception as e:
             result = {
                 "tool": tool_name,
-                "result": "Herramienta no disponible o error en la ejecución."
+                "result": "Herramienta no disponible o error en la ejecución.",
+                "error": str(e)
             }
         
-        tool_results.append(result)
+        return {"tool_results": [result]}
     
-    # Actualizar el estado
-    new_state = MCPState(state)
-    new_state["tool_results"] = state.get("tool_results", []) + tool_results
-    
-    return new_state
+    return run_tool
 
-def generate_final_response(state: MCPState) -> MCPState:
+def generate_final_response(state: MCPGraphState) -> Dict[str, Any]:
     """
     Genera la respuesta final del agente.
     
@@ -296,7 +418,7 @@ def generate_final_response(state: MCPState) -> MCPState:
         state: Estado actual del grafo
         
     Returns:
-        Estado actualizado con la respuesta final
+        Actualización parcial con el mensaje de respuesta
     """
     # Configuración por rol
     response_style = {
@@ -305,12 +427,12 @@ def generate_final_response(state: MCPState) -> MCPState:
         "admin_staff": "administrativo y formal"
     }
     
-    user_role = state.user_role
+    user_role = _user_role(state)
     style = response_style.get(user_role, "neutral")
     
     # Crear contexto para el LLM
-    filtered_memory = state.filtered_memory
-    tool_results = state.tool_results
+    filtered_memory = state.get("filtered_memory", [])
+    tool_results = state.get("tool_results", [])
     
     memory_text = "\n".join([f"- {block.get('text', '')}" for block in filtered_memory[-5:]])
     tools_text = "\n".join([f"- {result.get('tool', '')}: {result.get('result', '')}" for result in tool_results])
@@ -333,9 +455,8 @@ def generate_final_response(state: MCPState) -> MCPState:
     llm = ChatOpenAI(temperature=0.5, model="gpt-3.5-turbo")
     ai_message = llm.invoke([SystemMessage(content=prompt), HumanMessage(content="Responde al usuario")])
     
-    # Crear nuevo estado con la respuesta
-    new_state = MCPState(state)
-    return add_messages(new_state, [AIMessage(content=str(ai_message.content))])
+    # El reductor add_messages añade la respuesta a la conversación
+    return {"messages": [AIMessage(content=str(ai_message.content))]}
 
 def determine_message_priority(message: str) -> Priority:
     """
@@ -426,39 +547,57 @@ def visitas_anteriores_tool(state: Dict[str, Any]) -> Dict[str, Any]:
 
 # ---- Construcción del grafo ----
 
-def build_mcp_graph(model_name: str = "gpt-3.5-turbo") -> StateGraph:
+def build_mcp_graph(
+    model_name: str = "gpt-3.5-turbo",
+    tools: Optional[Dict[str, MCPTool]] = None,
+    tool_timeouts: Optional[Dict[str, float]] = None,
+    default_tool_timeout: Optional[float] = DEFAULT_TOOL_TIMEOUT,
+    instrument: bool = True
+) -> StateGraph:
     """
     Construye el grafo completo del MCP.
     
+    Las herramientas requeridas se ejecutan en paralelo (una rama por
+    herramienta), de modo que la latencia queda acotada por la más lenta.
+    
     Args:
         model_name: Nombre del modelo a utilizar
+        tools: Funciones de herramienta por nombre; reciben el contexto y el
+            último mensaje procesado (por defecto, las herramientas simuladas)
+        tool_timeouts: Timeout en segundos por herramienta
+        default_tool_timeout: Timeout de las herramientas sin uno propio
+        instrument: Si se miden tiempo, CPU y tamaño de cada nodo
+            (ver langraph_instrumentation)
         
     Returns:
         Grafo de estado configurado
     """
-    # Definir herramientas disponibles
-    tools = {
-        "diagnostico": diagnostico_tool,
-        "riesgo_legal": riesgo_legal_tool,
-        "visitas_anteriores": visitas_anteriores_tool
-    }
-    
     # Crear grafo
-    workflow = StateGraph(MCPState)
+    workflow = StateGraph(MCPGraphState)
+    
+    nodes = {
+        "process_user_message": process_user_message,
+        "filter_memory_blocks": filter_memory_blocks,
+        "determine_tools_needed": determine_tools_needed,
+        "run_tool": make_run_tool_node(tools, tool_timeouts, default_tool_timeout),
+        "generate_final_response": generate_final_response
+    }
     
     # Añadir nodos
-    workflow.add_node("process_user_message", process_user_message)
-    workflow.add_node("filter_memory_blocks", filter_memory_blocks)
-    workflow.add_node("determine_tools_needed", determine_tools_needed)
-    workflow.add_node("execute_tools", execute_tools)
-    workflow.add_node("generate_final_response", generate_final_response)
+    for name, node in nodes.items():
+        workflow.add_node(name, instrument_node(name, node) if instrument else node)
     
     # Configurar aristas
     workflow.set_entry_point("process_user_message")
     workflow.add_edge("process_user_message", "filter_memory_blocks")
     workflow.add_edge("filter_memory_blocks", "determine_tools_needed")
-    workflow.add_edge("determine_tools_needed", decide_next_step)
-    workflow.add_edge("execute_tools", "generate_final_response")
+    workflow.add_conditional_edges(
+        "determine_tools_needed",
+        decide_next_step,
+        ["run_tool", "generate_final_response"]
+    )
+    # Todas las ramas run_tool terminan antes de generar la respuesta
+    workflow.add_edge("run_tool", "generate_final_response")
     workflow.add_edge("generate_final_response", END)
     
     return workflow
@@ -506,6 +645,136 @@ def initialize_context(visit_id: str, user_role: Role = "health_professional") -
     
     return context
 
+# Máximo de aplicaciones compiladas en caché; al superarlo se descarta la
+# menos usada recientemente
+MAX_COMPILED_APPS = 32
+
+# Grafos compilados por (grafo, checkpointer), en orden de uso. Se guardan
+# también las referencias al grafo y al checkpointer para que sus id() no
+# puedan reutilizarse mientras la entrada siga en caché.
+_compiled_apps: "OrderedDict[Tuple[int, Optional[int]], Tuple[StateGraph, Optional[MemorySaver], Pregel]]" = OrderedDict()
+_compiled_apps_lock = threading.Lock()
+_compiled_apps_stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+# Grafo por defecto de cada modelo, construido una vez por proceso
+_default_graphs: Dict[str, StateGraph] = {}
+
+
+def get_compiled_app(graph: StateGraph, checkpoint: Optional[MemorySaver] = None) -> Pregel:
+    """
+    Devuelve el grafo compilado, compilándolo solo la primera vez.
+    
+    La compilación se cachea por grafo y por configuración de checkpointer,
+    de modo que las peticiones sucesivas reutilizan la misma aplicación. La
+    caché conserva como máximo MAX_COMPILED_APPS aplicaciones (LRU).
+    
+    Args:
+        graph: Grafo MCP configurado
+        checkpoint: Gestor de checkpoints opcional
+        
+    Returns:
+        Aplicación compilada lista para invocar
+    """
+    key = (id(graph), id(checkpoint) if checkpoint is not None else None)
+    
+    with _compiled_apps_lock:
+        cached = _compiled_apps.get(key)
+        if cached is not None:
+            _compiled_apps.move_to_end(key)
+            _compiled_apps_stats["hits"] += 1
+            return cached[2]
+        
+        if checkpoint:
+            app = graph.compile(checkpointer=checkpoint)
+        else:
+            app = graph.compile()
+        _compiled_apps[key] = (graph, checkpoint, app)
+        _compiled_apps_stats["misses"] += 1
+        while len(_compiled_apps) > MAX_COMPILED_APPS:
+            _compiled_apps.popitem(last=False)
+            _compiled_apps_stats["evictions"] += 1
+        return app
+
+def get_default_graph(model_name: str = "gpt-3.5-turbo") -> StateGraph:
+    """
+    Devuelve el grafo MCP del modelo indicado, construyéndolo una vez por proceso.
+    
+    Args:
+        model_name: Nombre del modelo a utilizar
+        
+    Returns:
+        Grafo de estado configurado
+    """
+    graph = _default_graphs.get(model_name)
+    if graph is None:
+        with _compiled_apps_lock:
+            graph = _default_graphs.get(model_name)
+            if graph is None:
+                graph = _default_graphs[model_name] = build_mcp_graph(model_name=model_name)
+    return graph
+
+def warm_up_graph(
+    model_name: str = "gpt-3.5-turbo",
+    checkpoint: Optional[MemorySaver] = None
+) -> Pregel:
+    """
+    Construye y compila el grafo por defecto de un modelo (p.ej. al arrancar el servicio).
+    
+    Args:
+        model_name: Nombre del modelo a utilizar
+        checkpoint: Gestor de checkpoints opcional
+        
+    Returns:
+        Aplicación compilada
+    """
+    return get_compiled_app(get_default_graph(model_name), checkpoint)
+
+def compiled_app_cache_info() -> Dict[str, int]:
+    """
+    Devuelve las estadísticas de la caché de grafos compilados.
+    
+    Returns:
+        Diccionario con aciertos ("hits"), compilaciones ("misses"),
+        aplicaciones descartadas ("evictions") y número de aplicaciones
+        compiladas ("size")
+    """
+    with _compiled_apps_lock:
+        return {**_compiled_apps_stats, "size": len(_compiled_apps)}
+
+def clear_compiled_apps() -> None:
+    """Descarta las aplicaciones compiladas y los grafos por defecto."""
+    with _compiled_apps_lock:
+        _compiled_apps.clear()
+        _default_graphs.clear()
+        _compiled_apps_stats.update(hits=0, misses=0, evictions=0)
+
+def _initial_state(context: Dict[str, Any], messages: List[HumanMessage]) -> MCPGraphState:
+    """Construye el estado inicial de una ejecución del grafo."""
+    return {
+        "context": context,
+        "messages": messages,
+        "memory_blocks": [],
+        "filtered_memory": [],
+        "tool_results": [],
+        "token_count": 0
+    }
+
+def _prepare_run(
+    graph: Union[StateGraph, Pregel],
+    context: Dict[str, Any],
+    checkpoint: Optional[MemorySaver]
+) -> Tuple[Pregel, Optional[Dict[str, Any]]]:
+    """Obtiene la aplicación compilada y la configuración de ejecución."""
+    # Reutilizar la aplicación compilada (se compila solo la primera vez)
+    if isinstance(graph, Pregel):
+        app = graph
+    else:
+        app = get_compiled_app(graph, checkpoint)
+    
+    # Con checkpointer, ejecutar en el hilo de la visita
+    config = {"configurable": {"thread_id": context["visit"]["id"]}} if app.checkpointer else None
+    return app, config
+
 def run_graph(
     graph: StateGraph,
     context: Dict[str, Any],
@@ -516,34 +785,80 @@ def run_graph(
     Ejecuta el grafo MCP con un mensaje de entrada.
     
     Args:
-        graph: Grafo MCP configurado
+        graph: Grafo MCP configurado (o una aplicación ya compilada)
         context: Contexto inicial del MCP
         messages: Lista de mensajes a procesar
-        checkpoint: Gestor de checkpoints opcional
+        checkpoint: Gestor de checkpoints opcional. Con checkpointer el estado
+            se guarda por visita (thread_id = ID de la visita) y cada llamada
+            continúa el hilo: solo hay que pasar los mensajes nuevos
         
     Returns:
         Estado final después de la ejecución
     """
-    # Preparar estado inicial
-    initial_state = MCPState({
-        "context": context,
-        "messages": messages,
-        "memory_blocks": [],
-        "filtered_memory": [],
-        "tool_results": [],
-        "token_count": 0
-    })
+    app, config = _prepare_run(graph, context, checkpoint)
+    final_state = app.invoke(_initial_state(context, messages), config)
     
-    # Configurar mecanismo de ejecución
-    if checkpoint:
-        app = graph.compile(checkpointer=checkpoint)
-    else:
-        app = graph.compile()
+    return MCPState(final_state)
+
+async def arun_graph(
+    graph: StateGraph,
+    context: Dict[str, Any],
+    messages: List[HumanMessage],
+    checkpoint: Optional[MemorySaver] = None
+) -> MCPState:
+    """
+    Versión asíncrona de run_graph.
     
-    # Ejecutar grafo
-    final_state = app.invoke(initial_state)
+    Los nodos del grafo son síncronos; LangGraph los ejecuta en el pool de
+    hilos del bucle de eventos, de modo que el bucle queda libre mientras
+    se ejecutan y varias peticiones pueden solaparse.
     
-    return final_state
+    Args:
+        graph: Grafo MCP configurado (o una aplicación ya compilada)
+        context: Contexto inicial del MCP
+        messages: Lista de mensajes a procesar
+        checkpoint: Gestor de checkpoints opcional
+        
+    Returns:
+        Estado final después de la ejecución
+    """
+    app, config = _prepare_run(graph, context, checkpoint)
+    final_state = await app.ainvoke(_initial_state(context, messages), config)
+    
+    return MCPState(final_state)
+
+async def astream_graph(
+    graph: StateGraph,
+    context: Dict[str, Any],
+    messages: List[HumanMessage],
+    checkpoint: Optional[MemorySaver] = None
+) -> AsyncIterator[Tuple[str, Any]]:
+    """
+    Ejecuta el grafo MCP emitiendo las actualizaciones de cada nodo.
+    
+    Args:
+        graph: Grafo MCP configurado (o una aplicación ya compilada)
+        context: Contexto inicial del MCP
+        messages: Lista de mensajes a procesar
+        checkpoint: Gestor de checkpoints opcional
+        
+    Yields:
+        Tuplas ("node", (nombre_nodo, actualización)) a medida que terminan
+        los nodos y, al final, ("final", MCPState) con el estado completo
+    """
+    app, config = _prepare_run(graph, context, checkpoint)
+    final_state: Dict[str, Any] = {}
+    
+    async for mode, chunk in app.astream(
+        _initial_state(context, messages), config, stream_mode=["updates", "values"]
+    ):
+        if mode == "values":
+            final_state = chunk
+            continue
+        for node_name, update in chunk.items():
+            yield "node", (node_name, update)
+    
+    yield "final", MCPState(final_state)
 
 # Ejemplo de uso
 if __name__ == "__main__":
@@ -6,11 +6,118 @@ con configuraciones específicas según el tipo de usuario,
 facilitando la personalización del comportamiento por rol.
 """
 
-from typing import Dict, Any, Optional, Callable
+import threading
+from collections import deque
+from contextlib import contextmanager
+from types import MappingProxyType
+from typing import Dict, Any, Optional, Callable, Deque, Iterator, Mapping
 from mcp.context import MCPContext
 from mcp.agent_mcp import MCPAgent
 
 
+def _compilar_perfil(**config: Any) -> Mapping[str, Any]:
+    """
+    Congela una configuración de rol para que pueda compartirse entre agentes.
+    
+    Las listas se convierten en tuplas y el diccionario en un mapping de solo
+    lectura, de modo que ningún agente pueda alterar el perfil de los demás.
+    """
+    return MappingProxyType({
+        clave: tuple(valor) if isinstance(valor, list) else valor
+        for clave, valor in config.items()
+    })
+
+
+# Perfiles por rol, compilados una única vez al importar el módulo
+PERFILES_POR_ROL: Mapping[str, Mapping[str, Any]] = MappingProxyType({
+    "health_professional": _compilar_perfil(
+        max_iteraciones=5,
+        herramientas_permitidas=[
+            "sugerir_diagnostico_clinico",
+            "evaluar_riesgo_legal",
+            "recordar_visitas_anteriores"
+        ],
+        mostrar_razonamiento=True,
+        nivel_detalle="alto"
+    ),
+    "patient": _compilar_perfil(
+        max_iteraciones=3,
+        herramientas_permitidas=[
+            "recordar_visitas_anteriores"
+        ],
+        mostrar_razonamiento=False,
+        nivel_detalle="bajo"
+    ),
+    "admin_staff": _compilar_perfil(
+        max_iteraciones=4,
+        herramientas_permitidas=[
+            "recordar_visitas_anteriores",
+            "evaluar_riesgo_legal"
+        ],
+        mostrar_razonamiento=True,
+        nivel_detalle="medio"
+    )
+})
+
+# Opciones propias de cada fábrica especializada, también precompiladas
+OPCIONES_PROFESIONAL_SALUD = _compilar_perfil(
+    formato_respuesta="clinico",
+    incluir_referencias=True
+)
+
+OPCIONES_PACIENTE = _compilar_perfil(
+    formato_respuesta="simplificado",
+    lenguaje_tecnico=False,
+    incluir_referencias=False
+)
+
+OPCIONES_ADMINISTRATIVO = _compilar_perfil(
+    formato_respuesta="estructurado",
+    enfoque_gestion=True
+)
+
+
+def resolver_configuracion(
+    role: str,
+    custom_config: Optional[Mapping[str, Any]] = None
+) -> Mapping[str, Any]:
+    """
+    Obtiene la configuración efectiva para un rol.
+    
+    Sin configuración personalizada se devuelve el perfil precompilado tal cual,
+    sin copias. Con configuración personalizada se devuelve un diccionario nuevo
+    con el perfil como base.
+    
+    Args:
+        role: Rol de usuario
+        custom_config: Configuración personalizada opcional
+        
+    Returns:
+        Configuración efectiva del agente
+        
+    Raises:
+        ValueError: Si el rol no es válido
+    """
+    perfil = PERFILES_POR_ROL.get(role)
+    if perfil is None:
+        raise ValueError(f"Rol de usuario no válido: {role}")
+    
+    if not custom_config:
+        return perfil
+    
+    return {**perfil, **custom_config}
+
+
+def _registrar_configuracion(contexto: MCPContext, config: Mapping[str, Any]) -> None:
+    """Registra en el contexto la configuración aplicada al agente."""
+    contexto.agregar_evento(
+        origen="sistema",
+        tipo="configuracion",
+        contenido=f"Configuración de agente para rol: {contexto.user_role}",
+        metadatos={"config": dict(config)}
+    )
+
+
 def create_agent_by_role(
     contexto: MCPContext,
     custom_config: Optional[Dict[str, Any]] = None
@@ -29,55 +136,11 @@ def create_agent_by_role(
     if not hasattr(contexto, 'user_role'):
         raise ValueError("El contexto debe tener un atributo 'user_role' definido")
     
-    # Configuraciones por defecto según el rol
-    role_configs = {
-        "health_professional": {
-            "max_iteraciones": 5,
-            "herramientas_permitidas": [
-                "sugerir_diagnostico_clinico",
-                "evaluar_riesgo_legal",
-                "recordar_visitas_anteriores"
-            ],
-            "mostrar_razonamiento": True,
-            "nivel_detalle": "alto"
-        },
-        "patient": {
-            "max_iteraciones": 3,
-            "herramientas_permitidas": [
-                "recordar_visitas_anteriores"
-            ],
-            "mostrar_razonamiento": False,
-            "nivel_detalle": "bajo"
-        },
-        "admin_staff": {
-            "max_iteraciones": 4,
-            "herramientas_permitidas": [
-                "recordar_visitas_anteriores",
-                "evaluar_riesgo_legal"
-            ],
-            "mostrar_razonamiento": True,
-            "nivel_detalle": "medio"
-        }
-    }
-    
-    # Obtener configuración base según el rol
-    role = contexto.user_role
-    if role not in role_configs:
-        raise ValueError(f"Rol de usuario no válido: {role}")
-    
-    config = role_configs[role]
-    
-    # Aplicar configuración personalizada si existe
-    if custom_config:
-        config.update(custom_config)
+    # Obtener configuración efectiva según el rol
+    config = resolver_configuracion(contexto.user_role, custom_config)
     
     # Extender el contexto con información de configuración
-    contexto.agregar_evento(
-        origen="sistema",
-        tipo="configuracion",
-        contenido=f"Configuración de agente para rol: {role}",
-        metadatos={"config": config}
-    )
+    _registrar_configuracion(contexto, config)
     
     # Crear instancia del agente
     agente = MCPAgent(
@@ -91,6 +154,115 @@ def create_agent_by_role(
     return agente
 
 
+class AgentPool:
+    """
+    Pool de agentes MCP reutilizables por rol.
+    
+    Los agentes se crean una sola vez y, en cada petición, se vinculan al
+    nuevo MCPContext en lugar de construir una instancia nueva. Es seguro
+    para uso concurrente desde varios hilos.
+    """
+    
+    def __init__(self, max_por_rol: int = 16, precalentar: int = 0):
+        """
+        Inicializa el pool.
+        
+        Args:
+            max_por_rol: Máximo de agentes inactivos retenidos por rol
+            precalentar: Agentes a crear de antemano para cada rol
+        """
+        self.max_por_rol = max_por_rol
+        self._lock = threading.Lock()
+        self._inactivos: Dict[str, Deque[MCPAgent]] = {
+            role: deque() for role in PERFILES_POR_ROL
+        }
+        self.metricas = {
+            "adquisiciones": 0,
+            "reutilizados": 0,
+            "creados": 0,
+            "descartados": 0
+        }
+        
+        for role in PERFILES_POR_ROL:
+            for _ in range(min(precalentar, max_por_rol)):
+                self._inactivos[role].append(self._crear_agente(role))
+    
+    def _crear_agente(self, role: str) -> MCPAgent:
+        """Crea un agente sin contexto para el rol indicado."""
+        perfil = PERFILES_POR_ROL[role]
+        agente = MCPAgent(contexto=None, max_iteraciones=perfil["max_iteraciones"])
+        agente.config = perfil
+        with self._lock:
+            self.metricas["creados"] += 1
+        return agente
+    
+    def adquirir(
+        self,
+        contexto: MCPContext,
+        custom_config: Optional[Dict[str, Any]] = None
+    ) -> MCPAgent:
+        """
+        Obtiene un agente del pool vinculado al contexto indicado.
+        
+        Args:
+            contexto: Contexto MCP de la petición
+            custom_config: Configuración personalizada opcional
+            
+        Returns:
+            Agente listo para procesar mensajes
+        """
+        role = contexto.user_role
+        config = resolver_configuracion(role, custom_config)
+        
+        with self._lock:
+            self.metricas["adquisiciones"] += 1
+            inactivos = self._inactivos[role]
+            agente = inactivos.pop() if inactivos else None
+            if agente is not None:
+                self.metricas["reutilizados"] += 1
+        
+        if agente is None:
+            agente = self._crear_agente(role)
+        
+        agente.vincular_contexto(contexto, config)
+        _registrar_configuracion(contexto, config)
+        return agente
+    
+    def liberar(self, agente: MCPAgent) -> None:
+        """
+        Devuelve un agente al pool para su reutilización.
+        
+        Args:
+            agente: Agente obtenido previamente con adquirir()
+        """
+        role = agente.contexto.user_role if agente.contexto is not None else None
+        agente.contexto = None
+        
+        with self._lock:
+            if role not in self._inactivos or len(self._inactivos[role]) >= self.max_por_rol:
+                self.metricas["descartados"] += 1
+                return
+            self._inactivos[role].append(agente)
+    
+    @contextmanager
+    def usar(
+        self,
+        contexto: MCPContext,
+        custom_config: Optional[Dict[str, Any]] = None
+    ) -> Iterator[MCPAgent]:
+        """Adquiere un agente y lo devuelve al pool al salir del bloque."""
+        agente = self.adquirir(contexto, custom_config)
+        try:
+            yield agente
+        finally:
+            self.liberar(agente)
+    
+    def inactivos(self, role: str) -> int:
+        """Número de agentes inactivos disponibles para un rol."""
+        with self._lock:
+            return len(self._inactivos.get(role, ()))
+
+
 def crear_agente_profesional_salud(
     contexto: MCPContext,
     custom_config: Optional[Dict[str, Any]] = None
@@ -108,14 +280,8 @@ def crear_agente_profesional_salud(
     # Establecer el rol en el contexto
     contexto.user_role = "health_professional"
     
-    # Opciones específicas para profesionales de salud
-    config = {
-        "formato_respuesta": "clinico",
-        "incluir_referencias": True
-    }
-    
-    if custom_config:
-        config.update(custom_config)
+    # Opciones específicas precompiladas del rol
+    config = {**OPCIONES_PROFESIONAL_SALUD, **custom_config} if custom_config else OPCIONES_PROFESIONAL_SALUD
     
     return create_agent_by_role(contexto, config)
 
@@ -137,15 +303,8 @@ def crear_agente_paciente(
     # Establecer el rol en el contexto
     contexto.user_role = "patient"
     
-    # Opciones específicas para pacientes
-    config = {
-        "formato_respuesta": "simplificado",
-        "lenguaje_tecnico": False,
-        "incluir_referencias": False
-    }
-    
-    if custom_config:
-        config.update(custom_config)
+    # Opciones específicas precompiladas del rol
+    config = {**OPCIONES_PACIENTE, **custom_config} if custom_config else OPCIONES_PACIENTE
     
     return create_agent_by_role(contexto, config)
 
@@ -167,13 +326,7 @@ def crear_agente_administrativo(
     # Establecer el rol en el contexto
     contexto.user_role = "admin_staff"
     
-    # Opciones específicas para administrativos
-    config = {
-        "formato_respuesta": "estructurado",
-        "enfoque_gestion": True
-    }
-    
-    if custom_config:
-        config.update(custom_config)
+    # Opciones específicas precompiladas del rol
+    config = {**OPCIONES_ADMINISTRATIVO, **custom_config} if custom_config else OPCIONES_ADMINISTRATIVO
     
     return create_agent_by_role(contexto, config) 
\ No newline at end of file
@@ -26,23 +26,27 @@ from mcp.tools import (
     sugerir_diagnostico_clinico,
     evaluar_riesgo_legal,
     recordar_visitas_anteriores,
-    formatear_resultado_herramienta
+    formatear_resultado_herramienta,
+    como_resultado_herramienta,
+    ResultadoHerramienta,
+    CAMPOS_VISITA_FORMATEADOS
 )
 from mcp.context import MCPContext, crear_contexto_desde_peticion, ActorType, PriorityLevel
+from mcp.sesiones import obtener_almacen_sesiones
 
 # Nuevo: Importar funciones de integración con EMR
 try:
     from mcp.integracion_emr import obtener_datos_visita, convertir_a_contexto_mcp, sincronizar_con_emr
 except ImportError:
     # Función placeholder en caso de que el módulo no esté disponible
-    async def obtener_datos_visita(visit_id: str) -> Dict:
+    async def obtener_datos_visita(visit_id: str, cliente: Optional[Any] = None, usar_cache: bool = False) -> Dict:
         raise NotImplementedError("Módulo de integración EMR no disponible")
     
     def convertir_a_contexto_mcp(datos_visita: Dict, user_role: str = "health_professional") -> MCPContext:
         raise NotImplementedError("Módulo de integración EMR no disponible")
     
-    async def sincronizar_con_emr(contexto: MCPContext, visit_id: str) -> None:
-        pass
+    async def sincronizar_con_emr(contexto: MCPContext, visit_id: str, cliente: Optional[Any] = None) -> Dict:
+        return {"estado": "sin_cambios", "cambios": {}}
 
 # Constantes para el agente MCP
 SYSTEM_PROMPT = """
@@ -67,7 +71,7 @@ HERRAMIENTAS_DISPONIBLES = {
     "recordar_visitas_anteriores": {
         "funcion": recordar_visitas_anteriores,
         "descripcion": "Recupera información de visitas anteriores del paciente",
-        "parametros": ["paciente_id", "limite"]
+        "parametros": ["paciente_id", "limite", "cursor", "fecha_desde", "fecha_hasta", "campos"]
     }
 }
 
@@ -86,7 +90,7 @@ class MCPAgent:
     
     def __init__(
         self,
-        contexto: MCPContext,
+        contexto: Optional[MCPContext],
         max_iteraciones: int = 5,
         simulacion_llm: Optional[Callable] = None,
         config: Optional[Dict[str, Any]] = None
@@ -95,7 +99,7 @@ class MCPAgent:
         Inicializa un nuevo agente MCP.
         
         Args:
-            contexto: Contexto MCP activo
+            contexto: Contexto MCP activo (None para agentes de un pool sin vincular)
             max_iteraciones: Número máximo de iteraciones de razonamiento
             simulacion_llm: Función opcional para simular respuestas LLM
             config: Configuración adicional según rol de usuario
@@ -126,6 +130,23 @@ class MCPAgent:
                 metadatos={"config": self.config}
             )
     
+    def vincular_contexto(
+        self,
+        contexto: MCPContext,
+        config: Optional[Dict[str, Any]] = None
+    ) -> None:
+        """
+        Vincula el agente a un nuevo contexto para reutilizarlo entre peticiones.
+        
+        Args:
+            contexto: Contexto MCP de la nueva petición
+            config: Configuración a aplicar (opcional, mantiene la actual si no se indica)
+        """
+        self.contexto = contexto
+        if config is not None:
+            self.config = config
+            self.max_iteraciones = config.get("max_iteraciones", self.max_iteraciones)
+    
     def procesar_mensaje(self, mensaje: str) -> str:
         """
         Procesa un mensaje de entrada y genera una respuesta.
@@ -201,6 +222,10 @@ class MCPAgent:
         # Preparamos respuesta final
         respuesta_final = ""
         
+        # Resultados de herramientas; su texto formateado se renderiza solo si se necesita
+        resultados: List[ResultadoHerramienta] = []
+        mostrar_razonamiento = self.config.get("mostrar_razonamiento", True)
+        
         # Ejecutar iteraciones de razonamiento
         while iteraciones < self.max_iteraciones:
             iteraciones += 1
@@ -213,7 +238,7 @@ class MCPAgent:
             # Si no hay más herramientas a usar, generar respuesta final
             if not herramientas_a_usar:
                 razonamiento.append("No se requieren más herramientas. Generando respuesta final.")
-                respuesta_final = self._generar_respuesta_final(razonamiento, bloques_memoria)
+                respuesta_final = self._generar_respuesta_final(razonamiento, bloques_memoria, resultados=resultados)
                 break
             
             # Ejecutar cada herramienta seleccionada
@@ -223,9 +248,13 @@ class MCPAgent:
                 # Ejecutar y registrar resultado
                 resultado = self._ejecutar_herramienta(nombre_herramienta, args)
                 
-                # Actualizar razonamiento con resultado
-                resultado_formateado = formatear_resultado_herramienta(resultado)
-                razonamiento.append(f"Resultado:\n{resultado_formateado}")
+                resultados.append(resultado)
+                
+                # Actualizar razonamiento con resultado (sin renderizar si el rol no lo muestra)
+                if mostrar_razonamiento:
+                    razonamiento.append(f"Resultado:\n{resultado.formateado}")
+                else:
+                    razonamiento.append(f"Resultado de {nombre_herramienta} registrado.")
                 
                 # Añadir resultado a la memoria con prioridad alta si contiene info relevante
                 if resultado and "contenido" in resultado and resultado.get("status") == "success":
@@ -243,13 +272,15 @@ class MCPAgent:
             
             # Si se indica generar respuesta final, terminar ciclo
             if "RESPUESTA_FINAL" in siguiente_paso:
-                respuesta_final = self._generar_respuesta_final(razonamiento, bloques_memoria)
+                respuesta_final = self._generar_respuesta_final(razonamiento, bloques_memoria, resultados=resultados)
                 break
         
         # Si se llegó al límite de iteraciones sin respuesta, generar una de emergencia
         if not respuesta_final:
             razonamiento.append("Se alcanzó el límite de iteraciones sin respuesta definitiva.")
-            respuesta_final = self._generar_respuesta_final(razonamiento, bloques_memoria, emergencia=True)
+            respuesta_final = self._generar_respuesta_final(
+                razonamiento, bloques_memoria, emergencia=True, resultados=resultados
+            )
         
         # Registrar respuesta en el contexto
         razonamiento_str = "\n".join(razonamiento)
@@ -336,7 +367,7 @@ class MCPAgent:
             if ("recordar_visitas_anteriores" in herramientas_mencionadas_filtradas or "historial" in mensaje_lower) and "recordar_visitas_anteriores" in herramientas_permitidas:
                 herramientas_a_usar.append((
                     "recordar_visitas_anteriores",
-                    {"paciente_id": paciente_id, "limite": 3}
+                    {"paciente_id": paciente_id, "limite": 3, "campos": list(CAMPOS_VISITA_FORMATEADOS)}
                 ))
         
         # Si se menciona dolor o síntomas, sugerir diagnóstico (solo para profesionales)
@@ -382,7 +413,7 @@ class MCPAgent:
         self, 
         nombre_herramienta: str, 
         argumentos: Dict[str, Any]
-    ) -> Dict[str, Any]:
+    ) -> ResultadoHerramienta:
         """
         Ejecuta una herramienta con los argumentos proporcionados.
         
@@ -391,7 +422,7 @@ class MCPAgent:
             argumentos: Argumentos para la herramienta
             
         Returns:
-            Resultado de la herramienta
+            Resultado de la herramienta con vista formateada perezosa
         """
         # Verificar que la herramienta existe
         if nombre_herramienta not in HERRAMIENTAS_DISPONIBLES:
@@ -417,6 +448,8 @@ class MCPAgent:
                     "inputs": argumentos
                 }
         
+        resultado = como_resultado_herramienta(resultado)
+        
         # Registrar uso de herramienta en el contexto
         self.contexto.agregar_resultado_herramienta(
             nombre_herramienta=nombre_herramienta,
@@ -505,7 +538,8 @@ class MCPAgent:
         self, 
         razonamiento: List[str], 
         bloques_memoria: List[Dict[str, Any]],
-        emergencia: bool = False
+        emergencia: bool = False,
+        resultados: Optional[List[ResultadoHerramienta]] = None
     ) -> str:
         """
         Genera la respuesta final basada en el razonamiento.
@@ -514,6 +548,8 @@ class MCPAgent:
             razonamiento: Lista de pasos de razonamiento
             bloques_memoria: Lista de bloques de memoria relevantes
             emergencia: Si es una respuesta de emergencia por límite de iteraciones
+            resultados: Resultados de herramientas del ciclo; si se indican, se usan
+                en lugar de buscar los resultados formateados en el razonamiento
             
         Returns:
             Respuesta generada
@@ -526,17 +562,30 @@ class MCPAgent:
         riesgos_legales = []
         visitas_previas = []
         
-        for paso in razonamiento:
-            if "SUGERENCIA DIAGNÓSTICA" in paso:
-                diagnosticos.append(paso)
-            if "EVALUACIÓN DE RIESGO LEGAL" in paso:
-                riesgos_legales.append(paso)
-            if "VISITAS ANTERIORES" in paso:
-                visitas_previas.append(paso)
-        
         # Obtener el rol de usuario y la configuración
         user_role = self.contexto.user_role if hasattr(self.contexto, 'user_role') else "health_professional"
         nivel_detalle = self.config.get("nivel_detalle", "alto")
+        
+        if resultados is None:
+            for paso in razonamiento:
+                if "SUGERENCIA DIAGNÓSTICA" in paso:
+                    diagnosticos.append(paso)
+                if "EVALUACIÓN DE RIESGO LEGAL" in paso:
+                    riesgos_legales.append(paso)
+                if "VISITAS ANTERIORES" in paso:
+                    visitas_previas.append(paso)
+        else:
+            # Solo se renderizan los resultados que la respuesta va a usar
+            usar_diagnosticos = user_role != "admin_staff" or nivel_detalle == "alto"
+            for resultado in resultados:
+                herramienta = resultado.get("tool")
+                if herramienta == "recordar_visitas_anteriores":
+                    if resultado.get("visitas_anteriores", {}).get("registros"):
+                        visitas_previas.append(f"Resultado:\n{resultado.formateado}")
+                elif herramienta == "sugerir_diagnostico_clinico" and usar_diagnosticos:
+                    diagnosticos.append(f"Resultado:\n{resultado.formateado}")
+                elif herramienta == "evaluar_riesgo_legal" and user_role != "patient":
+                    riesgos_legales.append(f"Resultado:\n{resultado.formateado}")
         formato_respuesta = self.config.get("formato_respuesta", "clinico")
         
         # Construir respuesta según la información disponible
@@ -891,13 +940,16 @@ class MCPAgent:
         user_role: str = "health_professional",
         max_iteraciones: int = 5,
         simulacion_llm: Optional[Callable] = None,
-        config: Optional[Dict[str, Any]] = None
+        config: Optional[Dict[str, Any]] = None,
+        cliente_emr: Optional[Any] = None
     ) -> "MCPAgent":
         """
         Crea un agente MCP a partir de un ID de visita del EMR.
         
         Obtiene los datos de la visita desde el EMR, crea el contexto
-        y configura el agente con el rol especificado.
+        y configura el agente con el rol especificado. Si la visita se
+        precalentó, se usa el contexto aparcado en el almacén de sesiones
+        (actualizado con los cambios del EMR) en lugar de construirlo.
         
         Args:
             visit_id: ID de la visita en el EMR
@@ -905,6 +957,8 @@ class MCPAgent:
             max_iteraciones: Número máximo de iteraciones de razonamiento
             simulacion_llm: Función opcional para simular respuestas LLM
             config: Configuración adicional para el agente
+            cliente_emr: Cliente EMR a utilizar (opcional, por defecto el configurado
+                en mcp.integracion_emr o los datos simulados)
             
         Returns:
             Instancia configurada de MCPAgent
@@ -913,11 +967,22 @@ class MCPAgent:
             ValueError: Si la visita no existe o hay error al cargar datos
         """
         try:
-            # Obtener datos de la visita desde el EMR
-            datos_visita = await obtener_datos_visita(visit_id)
+            almacen = obtener_almacen_sesiones()
             
-            # Convertir a formato de contexto MCP
-            contexto = convertir_a_contexto_mcp(datos_visita, user_role)
+            # Contexto precalentado para esta visita y rol, si lo hay
+            contexto = almacen.tomar(visit_id, user_role)
+            precalentado = contexto is not None
+            
+            if precalentado:
+                # Incorporar los cambios del EMR desde que se aparcó (incremental)
+                await sincronizar_con_emr(contexto, visit_id, cliente_emr)
+            else:
+                # Obtener datos de la visita desde el EMR
+                datos_visita = await obtener_datos_visita(visit_id, cliente_emr, usar_cache=True)
+                
+                # Convertir a formato de contexto MCP
+                contexto = convertir_a_contexto_mcp(datos_visita, user_role)
+                almacen.registrar_activo(contexto)
             
             # Crear instancia del agente
             agente = cls(
@@ -935,6 +1000,7 @@ class MCPAgent:
                 metadatos={
                     "visita_id": visit_id,
                     "user_role": user_role,
+                    "precalentado": precalentado,
                     "timestamp": datetime.now().isoformat()
                 }
             )
@@ -944,11 +1010,19 @@ class MCPAgent:
         except Exception as e:
             raise ValueError(f"Error al crear agente desde visita EMR: {str(e)}")
 
-    async def sincronizar_contexto_emr(self) -> None:
+    async def sincronizar_contexto_emr(self, cliente_emr: Optional[Any] = None) -> Dict[str, Any]:
         """
         Sincroniza el contexto actual con los datos más recientes del EMR.
         
         Útil cuando hay actualizaciones en el EMR durante una sesión activa.
+        La sincronización es incremental, por lo que puede ejecutarse
+        periódicamente; solo se registra un evento cuando hay cambios.
+        
+        Args:
+            cliente_emr: Cliente EMR a utilizar (opcional)
+            
+        Returns:
+            Resumen de la sincronización (ver sincronizar_con_emr)
         """
         if not hasattr(self.contexto, 'visita') or not self.contexto.visita.get('id'):
             raise ValueError("El contexto no tiene un ID de visita definido")
@@ -957,21 +1031,30 @@ class MCPAgent:
         visit_id = self.contexto.visita["id"]
         
         # Sincronizar con el EMR
-        await sincronizar_con_emr(self.contexto, visit_id)
+        resumen = await sincronizar_con_emr(self.contexto, visit_id, cliente_emr)
         
         # Registrar evento de sincronización
-        self.contexto.agregar_evento(
-            origen="sistema",
-            tipo="sincronizacion",
-            contenido=f"Contexto sincronizado con EMR para visita {visit_id}",
-            metadatos={
-                "timestamp": datetime.now().isoformat()
-            }
-        )
+        if resumen.get("estado") == "actualizado":
+            self.contexto.agregar_evento(
+                origen="sistema",
+                tipo="sincronizacion",
+                contenido=f"Contexto sincronizado con EMR para visita {visit_id}",
+                metadatos={
+                    "timestamp": datetime.now().isoformat()
+                }
+            )
+        
+        return resumen
 
 
-def ejecutar_shell_interactivo():
-    """Ejecuta un shell interactivo para probar el agente MCP."""
+def ejecutar_shell_interactivo(grabar_en: Optional[str] = None, user_role: str = "health_professional"):
+    """
+    Ejecuta un shell interactivo para probar el agente MCP.
+    
+    Args:
+        grabar_en: Ruta de un fichero JSONL donde grabar la transcripción de la sesión (opcional)
+        user_role: Rol del usuario de la sesión
+    """
     print("\n" + "="*80)
     print(" "*30 + "AGENTE MCP AIDUXCARE")
     print("="*80 + "\n")
@@ -984,12 +1067,20 @@ def ejecutar_shell_interactivo():
         paciente_nombre="Juan Pérez",
         visita_id="V20250508-001",
         profesional_email="fisio@aiduxcare.com",
-        motivo_consulta="Dolor cervical persistente"
+        motivo_consulta="Dolor cervical persistente",
+        user_role=user_role
     )
     
     # Crear agente
     agente = MCPAgent(contexto)
     
+    # Grabador de transcripción (modo grabación)
+    grabador = None
+    if grabar_en:
+        from mcp.transcripciones import GrabadorTranscripcion
+        grabador = GrabadorTranscripcion(grabar_en, contexto, agente.config)
+        print(f"Grabando transcripción en: {grabar_en}")
+    
     print("\nContexto inicializado:")
     print(f"Paciente: {contexto.paciente['nombre']} (ID: {contexto.paciente['id']})")
     print(f"Visita: {contexto.visita['id']} - Motivo: {contexto.visita['motivo_consulta']}")
@@ -1007,7 +1098,10 @@ def ejecutar_shell_interactivo():
             
             # Procesar mensaje con el agente
             print("\nProcesando mensaje...")
-            respuesta = agente.procesar_mensaje(mensaje)
+            if grabador:
+                respuesta = grabador.procesar(agente, mensaje)
+            else:
+                respuesta = agente.procesar_mensaje(mensaje)
             
             # Mostrar respuesta
             print("\n" + "="*80)
@@ -1034,6 +1128,10 @@ def ejecutar_shell_interactivo():
     print("\nFinalizando sesión del agente MCP...")
     contexto.finalizar_sesion("completada")
     
+    if grabador:
+        grabador.cerrar()
+        print(f"Transcripción guardada en {grabar_en} ({grabador.turnos} turnos)")
+    
     # Mostrar resumen final
     print("\n" + "="*80)
     print("RESUMEN DE LA SESIÓN MCP:")
@@ -1046,6 +1144,44 @@ def ejecutar_shell_interactivo():
     print("\n¡Gracias por utilizar el Agente MCP de AiDuxCare!")
 
 
+def ejecutar_reproduccion(rutas: List[str], ritmo: str = "maximo", user_role: Optional[str] = None) -> None:
+    """
+    Reproduce transcripciones grabadas sin interfaz y muestra la latencia por turno.
+    
+    Args:
+        rutas: Ficheros de transcripción a reproducir
+        ritmo: "maximo" o "original"
+        user_role: Rol con el que reproducir (por defecto el grabado en cada transcripción)
+    """
+    from mcp.transcripciones import reproducir_transcripcion
+    
+    for ruta in rutas:
+        informe = reproducir_transcripcion(ruta, ritmo=ritmo, user_role=user_role)
+        resumen = informe["resumen"]
+        
+        print(f"\n{ruta} [{informe['user_role']}, ritmo {ritmo}]")
+        for turno in informe["turnos"]:
+            grabada = turno["latencia_grabada_ms"]
+            referencia = f" (grabada {grabada:.2f} ms)" if grabada is not None else ""
+            print(f"  Turno {turno['indice']:>3}: {turno['latencia_ms']:8.2f} ms{referencia}")
+        print(f"  Turnos: {resumen['total_turnos']}  "
+              f"p50={resumen['p50_ms']:.2f} ms p95={resumen['p95_ms']:.2f} ms "
+              f"p99={resumen['p99_ms']:.2f} ms max={resumen['max_ms']:.2f} ms  "
+              f"respuestas idénticas: {resumen['respuestas_coincidentes']}/{resumen['total_turnos']}")
+
+
 if __name__ == "__main__":
-    # Si se ejecuta como script, iniciar shell interactivo
-    ejecutar_shell_interactivo() 
\ No newline at end of file
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Agente MCP de AiDuxCare")
+    parser.add_argument("--grabar", metavar="RUTA", help="Grabar la sesión interactiva en un fichero JSONL")
+    parser.add_argument("--reproducir", metavar="RUTA", nargs="+", help="Reproducir transcripciones sin interfaz")
+    parser.add_argument("--ritmo", choices=["maximo", "original"], default="maximo", help="Ritmo de reproducción")
+    parser.add_argument("--rol", choices=["health_professional", "patient", "admin_staff"], help="Rol del usuario")
+    args = parser.parse_args()
+    
+    if args.reproducir:
+        ejecutar_reproduccion(args.reproducir, args.ritmo, args.rol)
+    else:
+        # Si se ejecuta como script, iniciar shell interactivo
+        ejecutar_shell_interactivo(args.grabar, args.rol or "health_professional") 
\ No newline at end of file
@@ -0,0 +1,256 @@
+"""
+Caché de lectura de visitas del EMR para el agente MCP.
+
+Evita repetir la misma consulta al EMR cuando varios roles abren la misma
+visita:
+- Caché acotada (LRU) indexada por visit_id
+- Caducidad por TTL
+- Single-flight: los fallos concurrentes para una misma visita comparten
+  una única consulta al EMR
+- Invalidación explícita (p.ej. al almacenar campos en /api/mcp/store)
+- Métricas de aciertos y fallos
+
+Los datos devueltos se comparten entre lectores y deben tratarse como de
+solo lectura.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+
+class CacheVisitasEMR:
+    """Caché LRU con TTL y de-duplicación de consultas concurrentes."""
+
+    def __init__(self, max_entradas: int = 256, ttl: float = 30.0):
+        """
+        Inicializa la caché.
+
+        Args:
+            max_entradas: Número máximo de visitas en caché
+            ttl: Segundos de validez de cada entrada
+        """
+        self.max_entradas = max_entradas
+        self.ttl = ttl
+        self._entradas: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._en_curso: Dict[str, "asyncio.Future[Dict[str, Any]]"] = {}
+        # Generación de las visitas con cargas en curso (de cualquier bucle):
+        # una invalidación la incrementa para que esas cargas no se guarden.
+        # Sin cargas en curso no hace falta, así que se descarta.
+        self._generaciones: Dict[str, int] = {}
+        self._cargas: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._metricas = {
+            "aciertos": 0,
+            "fallos": 0,
+            "coalescidas": 0,
+            "expiradas": 0,
+            "desalojadas": 0,
+            "invalidaciones": 0
+        }
+
+    def _buscar(self, visit_id: str) -> Optional[Dict[str, Any]]:
+        """Devuelve la entrada vigente o None (debe llamarse con el lock tomado)."""
+        entrada = self._entradas.get(visit_id)
+        if entrada is None:
+            return None
+        expira, datos = entrada
+        if expira <= time.monotonic():
+            del self._entradas[visit_id]
+            self._metricas["expiradas"] += 1
+            return None
+        self._entradas.move_to_end(visit_id)
+        return datos
+
+    def _guardar(self, visit_id: str, datos: Dict[str, Any]) -> None:
+        """Guarda una entrada y desaloja las menos usadas (debe llamarse con el lock tomado)."""
+        self._entradas[visit_id] = (time.monotonic() + self.ttl, datos)
+        self._entradas.move_to_end(visit_id)
+        while len(self._entradas) > self.max_entradas:
+            self._entradas.popitem(last=False)
+            self._metricas["desalojadas"] += 1
+
+    def _terminar_carga(self, visit_id: str, futuro: "asyncio.Future[Dict[str, Any]]") -> None:
+        """Da por terminada una carga (debe llamarse con el lock tomado)."""
+        if self._en_curso.get(visit_id) is futuro:
+            del self._en_curso[visit_id]
+        pendientes = self._cargas[visit_id] - 1
+        if pendientes:
+            self._cargas[visit_id] = pendientes
+        else:
+            del self._cargas[visit_id]
+            self._generaciones.pop(visit_id, None)
+
+    def establecer(self, visit_id: str, datos: Dict[str, Any]) -> None:
+        """
+        Guarda los datos de una visita en la caché.
+
+        Args:
+            visit_id: Identificador de la visita
+            datos: Datos completos de la visita
+        """
+        with self._lock:
+            self._guardar(visit_id, datos)
+
+    async def obtener(
+        self,
+        visit_id: str,
+        cargador: Callable[[str], Awaitable[Dict[str, Any]]]
+    ) -> Dict[str, Any]:
+        """
+        Devuelve los datos de una visita, cargándolos si no están en caché.
+
+        Si ya hay una carga en curso para la misma visita en este bucle de
+        eventos, se espera a su resultado en lugar de lanzar otra consulta.
+        Si la petición que lanzó esa carga se cancela, las que esperaban
+        vuelven a intentarlo (una de ellas lanza la carga de nuevo).
+
+        Args:
+            visit_id: Identificador de la visita
+            cargador: Corrutina que obtiene la visita del EMR en caso de fallo
+
+        Returns:
+            Datos de la visita (compartidos, de solo lectura)
+
+        Raises:
+            Exception: Cualquier error del cargador, propagado a todos los que esperaban
+        """
+        bucle = asyncio.get_running_loop()
+        while True:
+            with self._lock:
+                datos = self._buscar(visit_id)
+                if datos is not None:
+                    self._metricas["aciertos"] += 1
+                    return datos
+
+                futuro = self._en_curso.get(visit_id)
+                if futuro is not None and futuro.get_loop() is bucle:
+                    self._metricas["coalescidas"] += 1
+                    propietario = False
+                else:
+                    futuro = bucle.create_future()
+                    self._en_curso[visit_id] = futuro
+                    self._metricas["fallos"] += 1
+                    generacion = self._generaciones.get(visit_id, 0)
+                    self._cargas[visit_id] = self._cargas.get(visit_id, 0) + 1
+                    propietario = True
+
+            if propietario:
+                break
+            try:
+                return await asyncio.shield(futuro)
+            except asyncio.CancelledError:
+                # Si se canceló la carga de otra petición (p.ej. el cliente se
+                # desconectó) y no esta, se reintenta en lugar de propagar la
+                # cancelación
+                if not futuro.cancelled() or _cancelando():
+                    raise
+
+        try:
+            datos = await cargador(visit_id)
+        except BaseException as e:
+            with self._lock:
+                self._terminar_carga(visit_id, futuro)
+            if isinstance(e, Exception):
+                futuro.set_exception(e)
+                # Evita el aviso de excepción no recuperada si nadie más esperaba
+                futuro.exception()
+            else:
+                futuro.cancel()
+            raise
+
+        with self._lock:
+            # No se guarda si la visita se invalidó mientras se cargaba
+            if self._generaciones.get(visit_id, 0) == generacion:
+                self._guardar(visit_id, datos)
+            self._terminar_carga(visit_id, futuro)
+        futuro.set_result(datos)
+        return datos
+
+    def invalidar(self, visit_id: str) -> bool:
+        """
+        Elimina una visita de la caché.
+
+        Args:
+            visit_id: Identificador de la visita
+
+        Returns:
+            True si la visita estaba en caché
+        """
+        with self._lock:
+            if visit_id in self._cargas:
+                self._generaciones[visit_id] = self._generaciones.get(visit_id, 0) + 1
+            self._metricas["invalidaciones"] += 1
+            return self._entradas.pop(visit_id, None) is not None
+
+    def invalidar_todo(self) -> None:
+        """Vacía la caché."""
+        with self._lock:
+            for visit_id in self._cargas:
+                self._generaciones[visit_id] = self._generaciones.get(visit_id, 0) + 1
+            self._entradas.clear()
+            self._metricas["invalidaciones"] += 1
+
+    def metricas(self) -> Dict[str, Any]:
+        """
+        Devuelve las métricas de la caché.
+
+        Returns:
+            Contadores de aciertos, fallos, consultas coalescidas, expiraciones,
+            desalojos e invalidaciones, además del tamaño y la tasa de aciertos
+        """
+        with self._lock:
+            metricas: Dict[str, Any] = dict(self._metricas)
+            metricas["entradas"] = len(self._entradas)
+        consultas = metricas["aciertos"] + metricas["fallos"] + metricas["coalescidas"]
+        metricas["tasa_aciertos"] = (metricas["aciertos"] + metricas["coalescidas"]) / consultas if consultas else 0.0
+        return metricas
+
+
+def _cancelando() -> bool:
+    """Si se ha pedido cancelar la tarea actual."""
+    tarea = asyncio.current_task()
+    cancelling = getattr(tarea, "cancelling", None)
+    return bool(cancelling()) if cancelling is not None else False
+
+
+_cache: Optional[CacheVisitasEMR] = None
+_lock_cache = threading.Lock()
+
+
+def obtener_cache_emr() -> CacheVisitasEMR:
+    """
+    Devuelve la caché de visitas compartida.
+
+    El tamaño y el TTL se pueden ajustar con AIDUXCARE_CACHE_EMR_MAX y
+    AIDUXCARE_CACHE_EMR_TTL.
+    """
+    global _cache
+    if _cache is None:
+        with _lock_cache:
+            if _cache is None:
+                _cache = CacheVisitasEMR(
+                    max_entradas=int(os.environ.get("AIDUXCARE_CACHE_EMR_MAX", 256)),
+                    ttl=float(os.environ.get("AIDUXCARE_CACHE_EMR_TTL", 30.0))
+                )
+    return _cache
+
+
+def configurar_cache_emr(max_entradas: int = 256, ttl: float = 30.0) -> CacheVisitasEMR:
+    """
+    Sustituye la caché de visitas compartida.
+
+    Args:
+        max_entradas: Número máximo de visitas en caché
+        ttl: Segundos de validez de cada entrada
+
+    Returns:
+        La nueva caché compartida
+    """
+    global _cache
+    with _lock_cache:
+        _cache = CacheVisitasEMR(max_entradas, ttl)
+    return _cache
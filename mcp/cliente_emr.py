@@ -0,0 +1,330 @@
+"""
+Cliente asíncrono del EMR (Historia Clínica Electrónica) para el agente MCP.
+
+Obtiene los subrecursos de una visita (visita, paciente, profesional,
+visitas anteriores y formularios) de forma concurrente sobre un transporte
+HTTP con conexiones reutilizadas:
+- Todos los subrecursos se indexan por visit_id, así que no hay dependencias
+  entre peticiones y la latencia total queda acotada por la más lenta
+- Cada petición tiene su propio timeout
+- Los subrecursos opcionales que fallan se sustituyen por valores vacíos
+
+Requiere httpx (dependencia del servidor MCP).
+"""
+
+import asyncio
+import time
+import weakref
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+# Subrecursos de una visita: nombre -> (ruta, obligatorio, valor por defecto)
+RECURSOS_VISITA: Dict[str, Tuple[str, bool, Any]] = {
+    "visita": ("/api/visitas/{visit_id}", True, None),
+    "paciente": ("/api/visitas/{visit_id}/paciente", True, None),
+    "profesional": ("/api/visitas/{visit_id}/profesional", True, None),
+    "visitas_anteriores": ("/api/visitas/{visit_id}/visitas_anteriores", False, []),
+    "formularios": ("/api/formularios/visita/{visit_id}", False, {})
+}
+
+
+class ErrorClienteEMR(Exception):
+    """Error al obtener un subrecurso obligatorio del EMR o respuesta no válida."""
+
+
+class ClienteEMR:
+    """
+    Cliente HTTP asíncrono del EMR con pool de conexiones.
+
+    El cliente httpx subyacente se crea de forma perezosa en el bucle de
+    eventos activo; si se usa desde otro bucle (p.ej. varias llamadas a
+    asyncio.run) se crea un transporte nuevo para ese bucle. Cada transporte
+    se cierra en su propio bucle cuando este termina.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        timeout_por_llamada: float = 2.0,
+        max_conexiones: int = 20,
+        max_conexiones_inactivas: int = 10,
+        cabeceras: Optional[Dict[str, str]] = None
+    ):
+        """
+        Inicializa el cliente EMR.
+
+        Args:
+            base_url: URL base de la API del EMR
+            timeout_por_llamada: Timeout en segundos de cada subpetición
+            max_conexiones: Máximo de conexiones simultáneas del pool
+            max_conexiones_inactivas: Conexiones keep-alive a conservar
+            cabeceras: Cabeceras adicionales (p.ej. autenticación)
+
+        Raises:
+            ImportError: Si httpx no está instalado
+        """
+        if httpx is None:
+            raise ImportError("ClienteEMR requiere httpx (pip install httpx)")
+
+        self.base_url = base_url.rstrip("/")
+        self.timeout_por_llamada = timeout_por_llamada
+        self.limites = httpx.Limits(
+            max_connections=max_conexiones,
+            max_keepalive_connections=max_conexiones_inactivas
+        )
+        self.cabeceras = cabeceras or {}
+        # Bucle de eventos -> (cliente httpx, generador que lo cierra al terminar el bucle)
+        self._clientes: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+        self.metricas = {
+            "peticiones": 0,
+            "errores": 0,
+            "timeouts": 0,
+            "no_modificados": 0,
+            "cargas_visita": 0,
+            "ultima_carga_ms": 0.0,
+            "ultimas_latencias_ms": {}
+        }
+
+    async def _obtener_cliente(self) -> "httpx.AsyncClient":
+        """Devuelve el cliente httpx del bucle activo, creándolo si hace falta."""
+        bucle = asyncio.get_running_loop()
+        actual = self._clientes.get(bucle)
+        if actual is not None and not actual[0].is_closed:
+            return actual[0]
+
+        # Los clientes de bucles ya cerrados no pueden cerrarse con aclose:
+        # se descartan para que se liberen sus conexiones
+        for otro in [b for b in list(self._clientes.keys()) if b.is_closed()]:
+            self._clientes.pop(otro, None)
+
+        cliente = httpx.AsyncClient(
+            base_url=self.base_url,
+            limits=self.limites,
+            headers=self.cabeceras,
+            timeout=self.timeout_por_llamada
+        )
+        # El bucle cierra sus generadores asíncronos antes de terminar
+        # (asyncio.run lo hace siempre), lo que cierra el cliente en su bucle
+        guardian = _cerrar_al_terminar(cliente)
+        await guardian.asend(None)
+        self._clientes[bucle] = (cliente, guardian)
+        return cliente
+
+    async def obtener_recurso(self, ruta: str, timeout: Optional[float] = None) -> Any:
+        """
+        Obtiene un recurso JSON del EMR.
+
+        Args:
+            ruta: Ruta relativa a la URL base
+            timeout: Timeout de la llamada (por defecto timeout_por_llamada)
+
+        Returns:
+            Contenido JSON del recurso
+
+        Raises:
+            asyncio.TimeoutError: Si la llamada supera el timeout
+            httpx.HTTPStatusError: Si el EMR responde con un error
+            ErrorClienteEMR: Si el cuerpo de la respuesta no es JSON
+        """
+        cliente = await self._obtener_cliente()
+        self.metricas["peticiones"] += 1
+        respuesta = await asyncio.wait_for(cliente.get(ruta), timeout or self.timeout_por_llamada)
+        respuesta.raise_for_status()
+        return _leer_json(respuesta)
+
+    async def obtener_formularios(
+        self,
+        visit_id: str,
+        etag: Optional[str] = None
+    ) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        """
+        Obtiene los formularios de una visita con una petición condicional.
+
+        Args:
+            visit_id: Identificador de la visita
+            etag: ETag de la última respuesta conocida (opcional)
+
+        Returns:
+            Tupla (formularios o None si no han cambiado, ETag actual)
+
+        Raises:
+            asyncio.TimeoutError: Si la llamada supera el timeout
+            httpx.HTTPStatusError: Si el EMR responde con un error
+            ErrorClienteEMR: Si el cuerpo de la respuesta no es JSON
+        """
+        cliente = await self._obtener_cliente()
+        cabeceras = {"If-None-Match": etag} if etag else {}
+        ruta = RECURSOS_VISITA["formularios"][0].format(visit_id=visit_id)
+
+        self.metricas["peticiones"] += 1
+        respuesta = await asyncio.wait_for(cliente.get(ruta, headers=cabeceras), self.timeout_por_llamada)
+        if respuesta.status_code == 304:
+            self.metricas["no_modificados"] += 1
+            return None, etag
+        respuesta.raise_for_status()
+        return _leer_json(respuesta) or {}, respuesta.headers.get("ETag")
+
+    async def listar_visitas(
+        self,
+        profesional_id: str,
+        estado: Optional[str] = None,
+        fecha: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Lista las visitas de un profesional.
+
+        Args:
+            profesional_id: Identificador del profesional
+            estado: Estado de las visitas (p.ej. "programada"), opcional
+            fecha: Día de las visitas en formato ISO (AAAA-MM-DD), opcional
+
+        Returns:
+            Resúmenes de las visitas (datos del subrecurso "visita")
+
+        Raises:
+            asyncio.TimeoutError: Si la llamada supera el timeout
+            httpx.HTTPStatusError: Si el EMR responde con un error
+            ErrorClienteEMR: Si el cuerpo de la respuesta no es JSON
+        """
+        cliente = await self._obtener_cliente()
+        parametros = {"profesional_id": profesional_id}
+        if estado:
+            parametros["estado"] = estado
+        if fecha:
+            parametros["fecha"] = fecha
+
+        self.metricas["peticiones"] += 1
+        respuesta = await asyncio.wait_for(cliente.get("/api/visitas", params=parametros), self.timeout_por_llamada)
+        respuesta.raise_for_status()
+        return _leer_json(respuesta) or []
+
+    async def obtener_cambios(self, desde: int = 0, limite: int = 500) -> Dict[str, Any]:
+        """
+        Obtiene los eventos del registro de cambios posteriores a una secuencia.
+
+        Args:
+            desde: Último número de secuencia ya procesado
+            limite: Número máximo de eventos a devolver
+
+        Returns:
+            Diccionario con "cambios" (eventos con secuencia, visit_id y
+            formulario) y "secuencia" (último número de secuencia devuelto)
+
+        Raises:
+            asyncio.TimeoutError: Si la llamada supera el timeout
+            httpx.HTTPStatusError: Si el EMR responde con un error
+            ErrorClienteEMR: Si el cuerpo de la respuesta no es JSON
+        """
+        cliente = await self._obtener_cliente()
+        self.metricas["peticiones"] += 1
+        respuesta = await asyncio.wait_for(
+            cliente.get("/api/cambios", params={"desde": desde, "limite": limite}),
+            self.timeout_por_llamada
+        )
+        respuesta.raise_for_status()
+        return _leer_json(respuesta)
+
+    async def _obtener_subrecurso(self, nombre: str, visit_id: str) -> Tuple[str, Any, Optional[str], float]:
+        """Obtiene un subrecurso y devuelve (nombre, valor, error, latencia en ms)."""
+        ruta = RECURSOS_VISITA[nombre][0].format(visit_id=visit_id)
+        inicio = time.perf_counter()
+        try:
+            valor = await self.obtener_recurso(ruta)
+            return nombre, valor, None, (time.perf_counter() - inicio) * 1000
+        except asyncio.TimeoutError:
+            self.metricas["timeouts"] += 1
+            error = f"timeout tras {self.timeout_por_llamada}s"
+        except httpx.HTTPStatusError as e:
+            error = f"HTTP {e.response.status_code}"
+        except ErrorClienteEMR as e:
+            error = str(e)
+        except httpx.HTTPError as e:
+            error = f"{type(e).__name__}: {e}"
+        self.metricas["errores"] += 1
+        return nombre, None, error, (time.perf_counter() - inicio) * 1000
+
+    async def obtener_visita(self, visit_id: str) -> Dict[str, Any]:
+        """
+        Obtiene todos los datos de una visita con subpeticiones concurrentes.
+
+        Args:
+            visit_id: Identificador de la visita
+
+        Returns:
+            Diccionario con la misma estructura que los datos simulados del EMR
+
+        Raises:
+            ValueError: Si la visita no existe
+            ErrorClienteEMR: Si falla un subrecurso obligatorio
+        """
+        inicio = time.perf_counter()
+        resultados = await asyncio.gather(*(
+            self._obtener_subrecurso(nombre, visit_id) for nombre in RECURSOS_VISITA
+        ))
+
+        datos: Dict[str, Any] = {}
+        errores: Dict[str, str] = {}
+        for nombre, valor, error, _ in resultados:
+            obligatorio, por_defecto = RECURSOS_VISITA[nombre][1:]
+            if error is None:
+                datos[nombre] = valor
+            elif obligatorio:
+                errores[nombre] = error
+            else:
+                datos[nombre] = type(por_defecto)()
+
+        self.metricas["cargas_visita"] += 1
+        self.metricas["ultima_carga_ms"] = (time.perf_counter() - inicio) * 1000
+        self.metricas["ultimas_latencias_ms"] = {nombre: latencia for nombre, _, _, latencia in resultados}
+
+        if errores.get("visita") == "HTTP 404":
+            raise ValueError(f"Visita no encontrada: {visit_id}")
+        if errores:
+            detalle = ", ".join(f"{nombre} ({error})" for nombre, error in errores.items())
+            raise ErrorClienteEMR(f"Error al obtener la visita {visit_id} del EMR: {detalle}")
+
+        return datos
+
+    async def cerrar(self) -> None:
+        """Cierra las conexiones del pool en todos los bucles de eventos."""
+        bucle_actual = asyncio.get_running_loop()
+        clientes = list(self._clientes.items())
+        self._clientes.clear()
+        for bucle, (cliente, guardian) in clientes:
+            if bucle is bucle_actual:
+                await guardian.aclose()
+            elif bucle.is_running():
+                # Cliente en uso desde otro hilo: se cierra en su propio bucle
+                futuro = asyncio.run_coroutine_threadsafe(guardian.aclose(), bucle)
+                await asyncio.wrap_future(futuro)
+
+    async def __aenter__(self) -> "ClienteEMR":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.cerrar()
+
+
+def _leer_json(respuesta: "httpx.Response") -> Any:
+    """Decodifica el cuerpo JSON de una respuesta del EMR."""
+    try:
+        return respuesta.json()
+    except ValueError as e:
+        # p.ej. una página de error de un proxy servida con 200
+        tipo = respuesta.headers.get("Content-Type", "desconocido")
+        raise ErrorClienteEMR(
+            f"Respuesta no JSON del EMR en {respuesta.request.url.path} (HTTP {respuesta.status_code}, {tipo})"
+        ) from e
+
+
+async def _cerrar_al_terminar(cliente: "httpx.AsyncClient") -> AsyncIterator[None]:
+    """Generador que cierra el cliente cuando se cierra el propio generador."""
+    try:
+        yield
+    finally:
+        if not cliente.is_closed:
+            await cliente.aclose()
@@ -0,0 +1,248 @@
+"""
+Base de conocimiento clínico indexada para las herramientas del agente MCP.
+
+Las condiciones clínicas se definen en un fichero JSON (por defecto
+mcp/data/conocimiento_clinico.json) que se carga una sola vez en un índice
+invertido a nivel de token:
+- El fichero se lee mediante mmap, de modo que los procesos que lo cargan
+  comparten las páginas de la caché del sistema operativo
+- Cada término apunta a la lista de condiciones que lo contienen
+- Las sugerencias se puntúan por solapamiento de términos ponderado por IDF
+- El índice se recarga automáticamente cuando cambia el fichero
+
+Los términos muy frecuentes (p.ej. "dolor") no generan candidatos por sí
+solos, solo puntúan; así el coste de una consulta depende de los términos
+discriminantes y no del tamaño de la base.
+"""
+
+import json
+import logging
+import math
+import mmap
+import os
+import re
+import threading
+import time
+import unicodedata
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+RUTA_CONOCIMIENTO_POR_DEFECTO = os.path.join(os.path.dirname(__file__), "data", "conocimiento_clinico.json")
+
+# Puntuación mínima (0-1) para considerar una condición como sugerencia
+UMBRAL_PUNTUACION = 0.6
+
+# Palabras vacías que no aportan información diagnóstica
+PALABRAS_VACIAS = frozenset({
+    "de", "del", "la", "las", "el", "los", "en", "con", "sin", "por", "para",
+    "que", "una", "uno", "unos", "unas", "al", "y", "o", "se", "su", "sus",
+    "muy", "mas", "desde", "hace", "tiene", "presenta", "paciente"
+})
+
+_PATRON_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def tokenizar(texto: str) -> List[str]:
+    """
+    Normaliza un texto (minúsculas, sin acentos) y lo divide en términos.
+
+    Args:
+        texto: Texto libre
+
+    Returns:
+        Lista de términos significativos en orden de aparición
+    """
+    normalizado = unicodedata.normalize("NFD", texto.lower())
+    sin_acentos = "".join(c for c in normalizado if unicodedata.category(c) != "Mn")
+    return [t for t in _PATRON_TOKEN.findall(sin_acentos) if len(t) > 2 and t not in PALABRAS_VACIAS]
+
+
+class BaseConocimientoClinico:
+    """
+    Índice invertido de condiciones clínicas respaldado por un fichero JSON.
+
+    Es seguro entre hilos: las consultas usan una instantánea inmutable del
+    índice y la recarga la sustituye de forma atómica.
+    """
+
+    def __init__(
+        self,
+        ruta: str = RUTA_CONOCIMIENTO_POR_DEFECTO,
+        umbral: float = UMBRAL_PUNTUACION,
+        intervalo_comprobacion: float = 1.0
+    ):
+        """
+        Inicializa la base de conocimiento y carga el índice.
+
+        Args:
+            ruta: Ruta del fichero JSON con las condiciones
+            umbral: Puntuación mínima para devolver una condición
+            intervalo_comprobacion: Segundos mínimos entre comprobaciones de
+                cambios en el fichero (0 para comprobar en cada consulta)
+        """
+        self.ruta = ruta
+        self.umbral = umbral
+        self.intervalo_comprobacion = intervalo_comprobacion
+        self._lock = threading.Lock()
+        self._ultima_comprobacion = 0.0
+        self._firma: Optional[Tuple[int, int]] = None
+        self.recargas = 0
+        self.errores_recarga = 0
+        self._cargar()
+
+    def _leer_fichero(self) -> Dict[str, Any]:
+        """Lee el JSON a través de un mapa de memoria de solo lectura."""
+        with open(self.ruta, "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapa:
+                return json.loads(mapa[:].decode("utf-8"))
+
+    def _cargar(self) -> None:
+        """Construye el índice invertido a partir del fichero."""
+        estado = os.stat(self.ruta)
+        datos = self._leer_fichero()
+
+        condiciones: List[Dict[str, Any]] = []
+        terminos: List[FrozenSet[str]] = []
+        pesos_clave: List[FrozenSet[str]] = []
+        indice: Dict[str, List[int]] = {}
+
+        for i, condicion in enumerate(datos.get("condiciones", [])):
+            clave = frozenset(tokenizar(condicion["clave"]))
+            todos = set(clave)
+            for sinonimo in condicion.get("sinonimos", []):
+                todos.update(tokenizar(sinonimo))
+            condiciones.append({
+                "principal": condicion["principal"],
+                "secundarios": list(condicion.get("secundarios", [])),
+                "confianza": condicion.get("confianza", 0.5),
+                "referencias": list(condicion.get("referencias", []))
+            })
+            terminos.append(frozenset(todos))
+            pesos_clave.append(clave)
+            for termino in todos:
+                indice.setdefault(termino, []).append(i)
+
+        total = len(condiciones)
+        idf = {t: math.log(1 + total / len(ids)) for t, ids in indice.items()}
+        # Términos presentes en demasiadas condiciones solo puntúan, no generan candidatos
+        limite_frecuencia = max(8, int(total * 0.05))
+
+        instantanea = {
+            "condiciones": condiciones,
+            "terminos": terminos,
+            "normalizador": [sum(idf[t] for t in clave) or 1.0 for clave in pesos_clave],
+            "indice": {t: tuple(ids) for t, ids in indice.items()},
+            "idf": idf,
+            "frecuentes": frozenset(t for t, ids in indice.items() if len(ids) > limite_frecuencia)
+        }
+
+        self._indice = instantanea
+        self._firma = (estado.st_mtime_ns, estado.st_size)
+
+    def _comprobar_cambios(self) -> None:
+        """Recarga el índice si el fichero ha cambiado desde la última carga."""
+        ahora = time.monotonic()
+        if ahora - self._ultima_comprobacion < self.intervalo_comprobacion:
+            return
+        with self._lock:
+            if ahora - self._ultima_comprobacion < self.intervalo_comprobacion:
+                return
+            self._ultima_comprobacion = ahora
+            try:
+                estado = os.stat(self.ruta)
+            except OSError:
+                return
+            firma = (estado.st_mtime_ns, estado.st_size)
+            if firma != self._firma:
+                try:
+                    self._cargar()
+                except (OSError, ValueError, KeyError, TypeError) as e:
+                    # Fichero a medio escribir o mal formado: se mantiene el índice
+                    # anterior y no se vuelve a leer hasta que cambie de nuevo
+                    self._firma = firma
+                    self.errores_recarga += 1
+                    logger.error(f"No se pudo recargar la base de conocimiento {self.ruta}: {e}")
+                    return
+                self.recargas += 1
+
+    @property
+    def total_condiciones(self) -> int:
+        """Número de condiciones cargadas."""
+        return len(self._indice["condiciones"])
+
+    def buscar(self, textos: List[str], limite: int = 5) -> List[Dict[str, Any]]:
+        """
+        Busca las condiciones que mejor encajan con los textos dados.
+
+        Args:
+            textos: Motivo de consulta, síntomas y demás textos libres
+            limite: Número máximo de condiciones a devolver
+
+        Returns:
+            Condiciones ordenadas por puntuación descendente, cada una con su
+            puntuación (0-1) y la confianza ajustada por la puntuación
+        """
+        self._comprobar_cambios()
+        indice = self._indice
+
+        consulta = set()
+        for texto in textos:
+            consulta.update(tokenizar(texto))
+
+        candidatos = set()
+        for termino in consulta:
+            if termino not in indice["frecuentes"]:
+                candidatos.update(indice["indice"].get(termino, ()))
+
+        idf = indice["idf"]
+        resultados = []
+        for i in candidatos:
+            peso = sum(idf[t] for t in consulta & indice["terminos"][i])
+            puntuacion = min(1.0, peso / indice["normalizador"][i])
+            if puntuacion >= self.umbral:
+                resultados.append((puntuacion, peso, indice["condiciones"][i]["confianza"], i))
+
+        # A igual puntuación, primero la condición con más solapamiento y después la más fiable
+        resultados.sort(key=lambda r: (-r[0], -r[1], -r[2], r[3]))
+
+        return [
+            {
+                **indice["condiciones"][i],
+                "confianza": round(confianza * puntuacion, 4),
+                "puntuacion": round(puntuacion, 4)
+            }
+            for puntuacion, _, confianza, i in resultados[:limite]
+        ]
+
+
+_base_conocimiento: Optional[BaseConocimientoClinico] = None
+_lock_base = threading.Lock()
+
+
+def obtener_base_conocimiento() -> BaseConocimientoClinico:
+    """Devuelve la base de conocimiento compartida, cargándola la primera vez."""
+    global _base_conocimiento
+    if _base_conocimiento is None:
+        with _lock_base:
+            if _base_conocimiento is None:
+                ruta = os.environ.get("AIDUXCARE_CONOCIMIENTO_CLINICO", RUTA_CONOCIMIENTO_POR_DEFECTO)
+                _base_conocimiento = BaseConocimientoClinico(ruta)
+    return _base_conocimiento
+
+
+def configurar_base_conocimiento(ruta: str, **opciones: Any) -> BaseConocimientoClinico:
+    """
+    Sustituye la base de conocimiento compartida por una cargada desde otra ruta.
+
+    Args:
+        ruta: Ruta del fichero JSON con las condiciones
+        **opciones: Opciones adicionales de BaseConocimientoClinico
+
+    Returns:
+        La nueva base de conocimiento compartida
+    """
+    global _base_conocimiento
+    with _lock_base:
+        _base_conocimiento = BaseConocimientoClinico(ruta, **opciones)
+    return _base_conocimiento
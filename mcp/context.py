@@ -91,6 +91,11 @@ class MCPContext:
         # Memoria a largo plazo (accesible solo para rol clínico)
         self.long_term_memory: List[Dict[str, Any]] = []
         
+        # Versiones de los formularios EMR cargados (hash por formulario y por campo)
+        # y ETag de la última respuesta del EMR, para la sincronización incremental
+        self.versiones_emr: Dict[str, Dict[str, str]] = {}
+        self.etag_emr: Optional[str] = None
+        
         # Configuración de memoria según roles
         self.memory_config = {
             "health_professional": {
@@ -484,7 +489,9 @@ class MCPContext:
             "historia": self.historia,
             "metricas": self.metricas,
             "short_term_memory": self.short_term_memory,
-            "long_term_memory": self.long_term_memory
+            "long_term_memory": self.long_term_memory,
+            "versiones_emr": self.versiones_emr,
+            "etag_emr": self.etag_emr
         }, indent=2, ensure_ascii=False)
     
     def finalizar_sesion(self, motivo: str = "completada") -> None:
@@ -541,6 +548,10 @@ class MCPContext:
         if "long_term_memory" in datos:
             contexto.long_term_memory = datos["long_term_memory"]
         
+        # Cargar versiones EMR si existen
+        contexto.versiones_emr = datos.get("versiones_emr", {})
+        contexto.etag_emr = datos.get("etag_emr")
+        
         return contexto
 
 
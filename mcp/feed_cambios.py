@@ -0,0 +1,340 @@
+"""
+Feed de cambios del EMR para mantener actualizados los contextos activos.
+
+En lugar de que cada petición pague una sincronización con el EMR, un
+consumidor lee eventos de cambio a nivel de visita desde una fuente
+intercambiable y los aplica de forma incremental a los contextos activos
+de esa visita (registrados en el almacén de sesiones):
+- FuenteCambiosCola: cola local en memoria en la que publican los productores
+  del mismo proceso (p.ej. el endpoint /api/mcp/store)
+- FuenteCambiosSondeo: sondeo periódico del registro de cambios del EMR
+  (/api/cambios, servido también por el servidor EMR local)
+
+Los eventos se agrupan por visita: una ráfaga de ediciones de formularios
+de la misma visita se traduce en una sola consulta al EMR y una sola
+actualización por contexto.
+"""
+
+import asyncio
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from mcp.cache_emr import obtener_cache_emr
+from mcp.integracion_emr import aplicar_formularios_emr, obtener_formularios_actuales
+from mcp.sesiones import AlmacenSesiones, obtener_almacen_sesiones
+
+
+# Máximo de eventos pendientes en la cola local antes de descartar los más antiguos
+MAX_EVENTOS_PENDIENTES = 10000
+
+
+class FuenteCambiosCola:
+    """
+    Fuente de cambios local: cola en memoria segura entre hilos.
+
+    La cola está acotada: si nadie la consume al ritmo de las publicaciones,
+    se descartan los eventos más antiguos y se cuentan en descartados().
+    """
+
+    def __init__(self, max_pendientes: int = MAX_EVENTOS_PENDIENTES):
+        """
+        Inicializa la cola.
+
+        Args:
+            max_pendientes: Máximo de eventos a la espera de ser leídos
+        """
+        self._eventos: Deque[Dict[str, Any]] = deque(maxlen=max(1, max_pendientes))
+        self._esperas: List[Tuple[asyncio.AbstractEventLoop, asyncio.Event]] = []
+        self._lock = threading.Lock()
+        self._secuencia = 0
+        self._descartados = 0
+        self._consumidores = 0
+
+    def publicar(self, visit_id: str, formulario: Optional[str] = None) -> int:
+        """
+        Publica un cambio de una visita. Puede llamarse desde cualquier hilo.
+
+        Args:
+            visit_id: Visita modificada
+            formulario: Formulario o campo modificado (opcional)
+
+        Returns:
+            Número de secuencia del evento
+        """
+        with self._lock:
+            self._secuencia += 1
+            if len(self._eventos) == self._eventos.maxlen:
+                self._descartados += 1
+            self._eventos.append({
+                "secuencia": self._secuencia,
+                "visit_id": visit_id,
+                "formulario": formulario,
+                "timestamp": time.time()
+            })
+            esperas, self._esperas = self._esperas, []
+            secuencia = self._secuencia
+
+        for bucle, evento in esperas:
+            if not bucle.is_closed():
+                bucle.call_soon_threadsafe(evento.set)
+        return secuencia
+
+    async def leer(self, max_eventos: int = 500, timeout: float = 1.0) -> List[Dict[str, Any]]:
+        """
+        Devuelve los eventos pendientes, esperando hasta timeout si no hay ninguno.
+
+        Args:
+            max_eventos: Número máximo de eventos a devolver
+            timeout: Segundos máximos de espera (0 para no esperar)
+
+        Returns:
+            Lista de eventos (vacía si no llegó ninguno)
+        """
+        with self._lock:
+            if not self._eventos and timeout > 0:
+                espera = (asyncio.get_running_loop(), asyncio.Event())
+                self._esperas.append(espera)
+            else:
+                espera = None
+
+        if espera is not None:
+            try:
+                await asyncio.wait_for(espera[1].wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                # Sin publicación la espera seguiría registrada hasta la siguiente
+                with self._lock:
+                    if espera in self._esperas:
+                        self._esperas.remove(espera)
+
+        with self._lock:
+            cantidad = min(max_eventos, len(self._eventos))
+            return [self._eventos.popleft() for _ in range(cantidad)]
+
+    def pendientes(self) -> int:
+        """Número de eventos a la espera de ser leídos."""
+        with self._lock:
+            return len(self._eventos)
+
+    def descartados(self) -> int:
+        """Número de eventos descartados por tener la cola llena."""
+        with self._lock:
+            return self._descartados
+
+    def conectar(self) -> None:
+        """Registra un consumidor activo de la cola."""
+        with self._lock:
+            self._consumidores += 1
+
+    def desconectar(self) -> None:
+        """Da de baja un consumidor registrado con conectar."""
+        with self._lock:
+            self._consumidores = max(0, self._consumidores - 1)
+
+    @property
+    def tiene_consumidor(self) -> bool:
+        """Si hay algún consumidor activo leyendo la cola."""
+        with self._lock:
+            return self._consumidores > 0
+
+
+class FuenteCambiosSondeo:
+    """Fuente de cambios por sondeo del registro de cambios del EMR."""
+
+    def __init__(self, cliente_emr: Any, intervalo: float = 1.0, desde: int = 0):
+        """
+        Inicializa la fuente.
+
+        Args:
+            cliente_emr: ClienteEMR con acceso a /api/cambios
+            intervalo: Segundos entre sondeos cuando no hay cambios
+            desde: Último número de secuencia ya procesado
+        """
+        self.cliente_emr = cliente_emr
+        self.intervalo = intervalo
+        self.secuencia = desde
+
+    async def leer(self, max_eventos: int = 500, timeout: float = 1.0) -> List[Dict[str, Any]]:
+        """
+        Consulta los cambios posteriores a la última secuencia leída.
+
+        Si no hay cambios espera el intervalo de sondeo (acotado por timeout)
+        antes de devolver una lista vacía.
+
+        Args:
+            max_eventos: Número máximo de eventos a devolver
+            timeout: Segundos máximos de espera (0 para no esperar)
+
+        Returns:
+            Lista de eventos (vacía si no hay cambios)
+        """
+        respuesta = await self.cliente_emr.obtener_cambios(self.secuencia, max_eventos)
+        cambios = respuesta.get("cambios", [])
+        if not cambios:
+            if timeout > 0:
+                await asyncio.sleep(min(self.intervalo, timeout))
+            return []
+        self.secuencia = respuesta.get("secuencia", cambios[-1]["secuencia"])
+        return cambios
+
+
+class ConsumidorCambios:
+    """Aplica los eventos de una fuente de cambios a los contextos activos."""
+
+    def __init__(
+        self,
+        fuente: Any,
+        almacen: Optional[AlmacenSesiones] = None,
+        cliente_emr: Optional[Any] = None,
+        ventana: float = 0.05,
+        max_eventos: int = 500
+    ):
+        """
+        Inicializa el consumidor.
+
+        Args:
+            fuente: Fuente de cambios (FuenteCambiosCola, FuenteCambiosSondeo o
+                cualquier objeto con una corrutina leer(max_eventos, timeout))
+            almacen: Almacén de sesiones con los contextos activos (por defecto el compartido)
+            cliente_emr: Cliente EMR a utilizar (opcional, por defecto el configurado)
+            ventana: Segundos que se espera tras el primer evento para agrupar la ráfaga
+            max_eventos: Número máximo de eventos leídos por lote
+        """
+        self.fuente = fuente
+        self.almacen = almacen or obtener_almacen_sesiones()
+        self.cliente_emr = cliente_emr
+        self.ventana = ventana
+        self.max_eventos = max_eventos
+        self._tarea: Optional["asyncio.Task[None]"] = None
+        self._metricas = {
+            "eventos": 0,
+            "lotes": 0,
+            "coalescidos": 0,
+            "visitas_actualizadas": 0,
+            "contextos_actualizados": 0,
+            "consultas_emr": 0,
+            "errores": 0
+        }
+
+    async def _actualizar_visita(self, visit_id: str) -> int:
+        """Aplica los formularios vigentes a los contextos activos de una visita."""
+        # Los datos en caché dejan de ser válidos aunque no haya contextos activos
+        obtener_cache_emr().invalidar(visit_id)
+
+        contextos = self.almacen.activos(visit_id)
+        if not contextos:
+            return 0
+
+        # Una sola consulta por visita, aplicada a todos sus contextos
+        formularios, etag = await obtener_formularios_actuales(visit_id, cliente=self.cliente_emr)
+        self._metricas["consultas_emr"] += 1
+
+        actualizados = 0
+        for contexto in contextos:
+            if aplicar_formularios_emr(contexto, visit_id, formularios, etag)["estado"] == "actualizado":
+                actualizados += 1
+        return actualizados
+
+    async def procesar_lote(self, timeout: float = 1.0) -> Dict[str, int]:
+        """
+        Lee un lote de eventos, los agrupa por visita y actualiza los contextos.
+
+        Args:
+            timeout: Segundos máximos de espera del primer evento
+
+        Returns:
+            Diccionario visit_id -> número de contextos actualizados
+        """
+        eventos = await self.fuente.leer(self.max_eventos, timeout)
+        if not eventos:
+            return {}
+
+        # Ventana de agrupación: se recoge el resto de la ráfaga antes de actualizar
+        if self.ventana > 0:
+            await asyncio.sleep(self.ventana)
+            eventos += await self.fuente.leer(self.max_eventos, 0)
+
+        visitas = list(dict.fromkeys(evento["visit_id"] for evento in eventos))
+        self._metricas["eventos"] += len(eventos)
+        self._metricas["lotes"] += 1
+        self._metricas["coalescidos"] += len(eventos) - len(visitas)
+
+        resultados = await asyncio.gather(
+            *(self._actualizar_visita(visit_id) for visit_id in visitas),
+            return_exceptions=True
+        )
+
+        actualizados: Dict[str, int] = {}
+        for visit_id, resultado in zip(visitas, resultados):
+            if isinstance(resultado, Exception):
+                self._metricas["errores"] += 1
+                continue
+            actualizados[visit_id] = resultado
+            if resultado:
+                self._metricas["visitas_actualizadas"] += 1
+                self._metricas["contextos_actualizados"] += resultado
+        return actualizados
+
+    async def ejecutar(self) -> None:
+        """Procesa lotes de forma continua hasta que se cancele la tarea."""
+        while True:
+            try:
+                await self.procesar_lote()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # Un fallo de la fuente no detiene el consumidor
+                self._metricas["errores"] += 1
+                await asyncio.sleep(self.ventana or 0.1)
+
+    def iniciar(self) -> "asyncio.Task[None]":
+        """
+        Lanza el consumidor como tarea en el bucle de eventos activo.
+
+        Returns:
+            Tarea del consumidor
+        """
+        if self._tarea is None or self._tarea.done():
+            if self._tarea is None and hasattr(self.fuente, "conectar"):
+                self.fuente.conectar()
+            self._tarea = asyncio.get_running_loop().create_task(self.ejecutar())
+        return self._tarea
+
+    async def detener(self) -> None:
+        """Detiene el consumidor lanzado con iniciar."""
+        if self._tarea is not None:
+            self._tarea.cancel()
+            try:
+                await self._tarea
+            except asyncio.CancelledError:
+                pass
+            self._tarea = None
+            if hasattr(self.fuente, "desconectar"):
+                self.fuente.desconectar()
+
+    def metricas(self) -> Dict[str, int]:
+        """
+        Devuelve las métricas del consumidor.
+
+        Returns:
+            Eventos y lotes procesados, eventos agrupados, visitas y contextos
+            actualizados, consultas al EMR y errores
+        """
+        return dict(self._metricas)
+
+
+_fuente_local: Optional[FuenteCambiosCola] = None
+_lock_fuente = threading.Lock()
+
+
+def obtener_fuente_cambios_local() -> FuenteCambiosCola:
+    """Devuelve la cola de cambios local compartida por el proceso."""
+    global _fuente_local
+    if _fuente_local is None:
+        with _lock_fuente:
+            if _fuente_local is None:
+                _fuente_local = FuenteCambiosCola()
+    return _fuente_local
@@ -0,0 +1,261 @@
+"""
+Almacén local del historial de visitas de pacientes para el agente MCP.
+
+Las visitas se guardan en SQLite en una tabla agrupada por paciente
+(WITHOUT ROWID con clave primaria paciente_id, fecha, id), de modo que las
+visitas de un paciente quedan contiguas y ordenadas por fecha:
+- Recuperar las últimas visitas es una búsqueda en el índice, no una carga completa
+- La paginación usa cursores por clave (fecha, id) en lugar de OFFSET
+- Solo se leen las columnas solicitadas (proyección)
+
+Por defecto el almacén vive en memoria y se siembra con las visitas
+simuladas; la variable de entorno AIDUXCARE_HISTORIAL_VISITAS o
+configurar_historial_visitas permiten usar un fichero persistente.
+"""
+
+import base64
+import json
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Campos almacenados por visita
+CAMPOS_VISITA: Tuple[str, ...] = ("fecha", "motivo", "diagnostico", "tratamiento", "evolucion")
+
+# Visitas simuladas usadas para sembrar el almacén
+VISITAS_SIMULADAS: Dict[str, List[Dict[str, str]]] = {
+    "P001": [
+        {
+            "fecha": "2025-04-10",
+            "motivo": "Dolor cervical agudo",
+            "diagnostico": "Cervicalgia por estrés",
+            "tratamiento": "Terapia manual + calor",
+            "evolucion": "Favorable con disminución de dolor en 70%"
+        },
+        {
+            "fecha": "2025-03-15",
+            "motivo": "Control mensual",
+            "diagnostico": "Cervicalgia en mejora",
+            "tratamiento": "Ejercicios domiciliarios",
+            "evolucion": "Estable, continúa con ejercicios"
+        }
+    ],
+    "P002": [
+        {
+            "fecha": "2025-05-01",
+            "motivo": "Dolor lumbar irradiado",
+            "diagnostico": "Lumbociática",
+            "tratamiento": "TENS + ejercicios específicos",
+            "evolucion": "Mejora leve, persiste dolor irradiado"
+        },
+        {
+            "fecha": "2025-04-20",
+            "motivo": "Evaluación inicial lumbar",
+            "diagnostico": "Lumbalgia mecánica",
+            "tratamiento": "Reposo relativo + antiinflamatorios",
+            "evolucion": "Sin cambios significativos"
+        },
+        {
+            "fecha": "2024-11-15",
+            "motivo": "Molestias en hombro",
+            "diagnostico": "Tendinitis supraespinoso",
+            "tratamiento": "Ultrasonido + ejercicios",
+            "evolucion": "Resuelto"
+        }
+    ],
+    "P003": []
+}
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS visitas (
+    paciente_id TEXT NOT NULL,
+    fecha TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    motivo TEXT,
+    diagnostico TEXT,
+    tratamiento TEXT,
+    evolucion TEXT,
+    PRIMARY KEY (paciente_id, fecha, id)
+) WITHOUT ROWID;
+"""
+
+
+def codificar_cursor(fecha: str, visita_id: int) -> str:
+    """Codifica la posición (fecha, id) de una visita como cursor opaco."""
+    return base64.urlsafe_b64encode(json.dumps([fecha, visita_id]).encode("utf-8")).decode("ascii")
+
+
+def decodificar_cursor(cursor: str) -> Tuple[str, int]:
+    """
+    Decodifica un cursor generado por codificar_cursor.
+
+    Raises:
+        ValueError: Si el cursor no es válido
+    """
+    try:
+        fecha, visita_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return str(fecha), int(visita_id)
+    except Exception as e:
+        raise ValueError(f"Cursor de paginación no válido: {cursor}") from e
+
+
+class HistorialVisitas:
+    """Almacén SQLite del historial de visitas, agrupado por paciente y fecha."""
+
+    def __init__(self, ruta: str = ":memory:", sembrar: bool = True):
+        """
+        Abre (o crea) el almacén de visitas.
+
+        Args:
+            ruta: Fichero SQLite o ":memory:"
+            sembrar: Si se cargan las visitas simuladas cuando el almacén está vacío
+        """
+        self.ruta = ruta
+        self._lock = threading.Lock()
+        self._conexion = sqlite3.connect(ruta, check_same_thread=False)
+        self._conexion.executescript(_ESQUEMA)
+
+        if sembrar and self._conexion.execute("SELECT 1 FROM visitas LIMIT 1").fetchone() is None:
+            for paciente_id, visitas in VISITAS_SIMULADAS.items():
+                self.agregar_visitas(paciente_id, visitas)
+
+    def agregar_visitas(self, paciente_id: str, visitas: Iterable[Dict[str, Any]]) -> int:
+        """
+        Añade visitas al historial de un paciente.
+
+        Args:
+            paciente_id: Identificador del paciente
+            visitas: Visitas con los campos de CAMPOS_VISITA
+
+        Returns:
+            Número de visitas añadidas
+        """
+        with self._lock, self._conexion:
+            siguiente = self._conexion.execute(
+                "SELECT COALESCE(MAX(id), 0) + 1 FROM visitas WHERE paciente_id = ?", (paciente_id,)
+            ).fetchone()[0]
+            filas = [
+                (paciente_id, visita["fecha"], siguiente + i,
+                 visita.get("motivo"), visita.get("diagnostico"),
+                 visita.get("tratamiento"), visita.get("evolucion"))
+                for i, visita in enumerate(visitas)
+            ]
+            self._conexion.executemany(
+                "INSERT INTO visitas (paciente_id, fecha, id, motivo, diagnostico, tratamiento, evolucion) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                filas
+            )
+        return len(filas)
+
+    def consultar(
+        self,
+        paciente_id: str,
+        limite: int = 3,
+        cursor: Optional[str] = None,
+        fecha_desde: Optional[str] = None,
+        fecha_hasta: Optional[str] = None,
+        campos: Optional[Sequence[str]] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Recupera una página de visitas de un paciente, de la más reciente a la más antigua.
+
+        Args:
+            paciente_id: Identificador del paciente
+            limite: Número máximo de visitas de la página
+            cursor: Cursor devuelto por la página anterior (opcional)
+            fecha_desde: Fecha mínima incluida, formato ISO (opcional)
+            fecha_hasta: Fecha máxima incluida, formato ISO (opcional)
+            campos: Campos a devolver (por defecto todos los de CAMPOS_VISITA)
+
+        Returns:
+            Tupla (visitas, cursor de la página siguiente o None si no hay más)
+
+        Raises:
+            ValueError: Si se solicita un campo desconocido o el cursor no es válido
+        """
+        campos = tuple(campos) if campos else CAMPOS_VISITA
+        desconocidos = [c for c in campos if c not in CAMPOS_VISITA]
+        if desconocidos:
+            raise ValueError(f"Campos de visita desconocidos: {', '.join(desconocidos)}")
+
+        condiciones = ["paciente_id = ?"]
+        parametros: List[Any] = [paciente_id]
+        if fecha_desde:
+            condiciones.append("fecha >= ?")
+            parametros.append(fecha_desde)
+        if fecha_hasta:
+            condiciones.append("fecha <= ?")
+            parametros.append(fecha_hasta)
+        if cursor:
+            condiciones.append("(fecha, id) < (?, ?)")
+            parametros.extend(decodificar_cursor(cursor))
+
+        # Se pide una fila más para saber si existe una página siguiente
+        parametros.append(max(0, limite) + 1)
+        columnas = ", ".join(("fecha", "id") + tuple(c for c in campos if c != "fecha"))
+        consulta = (
+            f"SELECT {columnas} FROM visitas WHERE {' AND '.join(condiciones)} "
+            "ORDER BY fecha DESC, id DESC LIMIT ?"
+        )
+
+        with self._lock:
+            filas = self._conexion.execute(consulta, parametros).fetchall()
+
+        pagina = filas[:limite]
+        visitas = []
+        for fila in pagina:
+            valores = dict(zip(("fecha", "id") + tuple(c for c in campos if c != "fecha"), fila))
+            visitas.append({campo: valores[campo] for campo in campos})
+
+        siguiente_cursor = None
+        if len(filas) > limite and pagina:
+            siguiente_cursor = codificar_cursor(pagina[-1][0], pagina[-1][1])
+
+        return visitas, siguiente_cursor
+
+    def plan_consulta(self, paciente_id: str) -> List[str]:
+        """Devuelve el plan de SQLite para la consulta de visitas de un paciente."""
+        with self._lock:
+            filas = self._conexion.execute(
+                "EXPLAIN QUERY PLAN SELECT fecha, id FROM visitas "
+                "WHERE paciente_id = ? ORDER BY fecha DESC, id DESC LIMIT 3",
+                (paciente_id,)
+            ).fetchall()
+        return [fila[-1] for fila in filas]
+
+    def cerrar(self) -> None:
+        """Cierra la conexión con el almacén."""
+        with self._lock:
+            self._conexion.close()
+
+
+_historial: Optional[HistorialVisitas] = None
+_lock_historial = threading.Lock()
+
+
+def obtener_historial_visitas() -> HistorialVisitas:
+    """Devuelve el almacén de visitas compartido, abriéndolo la primera vez."""
+    global _historial
+    if _historial is None:
+        with _lock_historial:
+            if _historial is None:
+                _historial = HistorialVisitas(os.environ.get("AIDUXCARE_HISTORIAL_VISITAS", ":memory:"))
+    return _historial
+
+
+def configurar_historial_visitas(ruta: str, sembrar: bool = True) -> HistorialVisitas:
+    """
+    Sustituye el almacén de visitas compartido por uno abierto en otra ruta.
+
+    Args:
+        ruta: Fichero SQLite o ":memory:"
+        sembrar: Si se cargan las visitas simuladas cuando el almacén está vacío
+
+    Returns:
+        El nuevo almacén compartido
+    """
+    global _historial
+    with _lock_historial:
+        _historial = HistorialVisitas(ruta, sembrar)
+    return _historial
@@ -10,10 +10,13 @@ Está diseñado para ser compatible con la arquitectura modular por roles
 y el sistema de memoria contextual adaptativa.
 """
 
+import hashlib
 import json
+import os
 from datetime import datetime
-from typing import Dict, List, Any, Optional, Union
+from typing import Dict, List, Any, Optional, Tuple, Union
 from mcp.context import MCPContext, UserRole, PriorityLevel
+from mcp.cache_emr import obtener_cache_emr
 
 # Simulación de base de datos EMR (en producción sería la integración con Supabase)
 # Estos datos se utilizan para las pruebas y como fallback cuando no hay conexión
@@ -112,15 +115,53 @@ EMR_VISITAS_SIMULADAS = {
     }
 }
 
-async def obtener_datos_visita(visit_id: str) -> Dict:
+# Cliente EMR configurado (None para usar los datos simulados)
+_cliente_emr = None
+
+
+def configurar_cliente_emr(cliente: Optional[Any]) -> None:
+    """
+    Configura el cliente EMR usado por defecto por obtener_datos_visita.
+    
+    Args:
+        cliente: Instancia de ClienteEMR, o None para volver a los datos simulados
+    """
+    global _cliente_emr
+    _cliente_emr = cliente
+
+
+def obtener_cliente_emr() -> Optional[Any]:
+    """
+    Devuelve el cliente EMR configurado.
+    
+    Si no se ha configurado ninguno y existe la variable de entorno
+    AIDUXCARE_EMR_URL, se crea un ClienteEMR apuntando a esa URL.
+    """
+    global _cliente_emr
+    if _cliente_emr is None and os.environ.get("AIDUXCARE_EMR_URL"):
+        from mcp.cliente_emr import ClienteEMR
+        _cliente_emr = ClienteEMR(os.environ["AIDUXCARE_EMR_URL"])
+    return _cliente_emr
+
+
+async def obtener_datos_visita(
+    visit_id: str,
+    cliente: Optional[Any] = None,
+    usar_cache: bool = False
+) -> Dict:
     """
     Obtiene los datos completos de una visita médica desde el EMR.
     
-    En un entorno de producción, esta función realizaría una consulta a la API del EMR
-    o directamente a la base de datos Supabase.
+    Si hay un cliente EMR (indicado o configurado), los subrecursos se obtienen
+    de la API del EMR de forma concurrente; si no, se usan los datos simulados.
+    Con usar_cache se lee a través de la caché de visitas compartida, de modo
+    que varias aperturas de la misma visita comparten una sola consulta.
     
     Args:
         visit_id: Identificador único de la visita
+        cliente: Cliente EMR a utilizar (opcional, por defecto el configurado)
+        usar_cache: Si se usa la caché de visitas (los datos devueltos son
+            compartidos y no deben modificarse)
         
     Returns:
         Diccionario con todos los datos de la visita, paciente y profesional
@@ -128,15 +169,117 @@ async def obtener_datos_visita(visit_id: str) -> Dict:
     Raises:
         ValueError: Si la visita no existe
     """
-    # Simulamos una pequeña latencia como en un entorno real
-    # En producción, aquí iría el código de consulta a la API o base de datos
+    cliente = cliente or obtener_cliente_emr()
     
-    # Verificamos si existe la visita simulada
-    if visit_id in EMR_VISITAS_SIMULADAS:
-        return EMR_VISITAS_SIMULADAS[visit_id]
+    async def cargar(visit_id: str) -> Dict:
+        if cliente is not None:
+            return await cliente.obtener_visita(visit_id)
+        
+        # Verificamos si existe la visita simulada
+        if visit_id in EMR_VISITAS_SIMULADAS:
+            return EMR_VISITAS_SIMULADAS[visit_id]
+        
+        # Si no existe, lanzamos un error
+        raise ValueError(f"Visita no encontrada: {visit_id}")
+    
+    if usar_cache:
+        return await obtener_cache_emr().obtener(visit_id, cargar)
+    return await cargar(visit_id)
+
+async def obtener_visitas_programadas(
+    profesional_id: str,
+    fecha: Optional[str] = None,
+    cliente: Optional[Any] = None
+) -> List[str]:
+    """
+    Obtiene los IDs de las visitas programadas de un profesional.
+    
+    Args:
+        profesional_id: Identificador del profesional
+        fecha: Día de las visitas en formato ISO (AAAA-MM-DD), opcional
+        cliente: Cliente EMR a utilizar (opcional, por defecto el configurado)
+        
+    Returns:
+        Lista de IDs de visita en estado "programada"
+    """
+    cliente = cliente or obtener_cliente_emr()
+    if cliente is not None:
+        visitas = await cliente.listar_visitas(profesional_id, estado="programada", fecha=fecha)
+        return [visita["id"] for visita in visitas]
     
-    # Si no existe, lanzamos un error
-    raise ValueError(f"Visita no encontrada: {visit_id}")
+    return [
+        visit_id for visit_id, datos in EMR_VISITAS_SIMULADAS.items()
+        if datos["profesional"]["id"] == profesional_id
+        and datos["visita"].get("estado") == "programada"
+        and (not fecha or datos["visita"]["fecha"].startswith(fecha))
+    ]
+
+def calcular_version(valor: Any) -> str:
+    """
+    Calcula un hash de contenido estable para un valor JSON del EMR.
+    
+    Args:
+        valor: Formulario, campo o cualquier valor serializable
+        
+    Returns:
+        Hash hexadecimal corto, independiente del orden de las claves
+    """
+    contenido = json.dumps(valor, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(contenido.encode("utf-8")).hexdigest()[:16]
+
+
+def versionar_formulario(datos_formulario: Dict[str, Any]) -> Dict[str, str]:
+    """
+    Calcula las versiones de un formulario: hash global ("_version") y hash por campo.
+    
+    Args:
+        datos_formulario: Campos y valores del formulario
+        
+    Returns:
+        Diccionario campo -> hash, con la clave "_version" para el formulario completo
+    """
+    versiones = {campo: calcular_version(valor) for campo, valor in datos_formulario.items()}
+    versiones["_version"] = calcular_version(datos_formulario)
+    return versiones
+
+
+def diferencias_formularios(
+    versiones: Dict[str, Dict[str, str]],
+    formularios: Dict[str, Dict[str, Any]]
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Calcula las diferencias por campo entre las versiones conocidas y los formularios actuales.
+    
+    Args:
+        versiones: Versiones registradas en el contexto (formulario -> campo -> hash)
+        formularios: Formularios actuales del EMR
+        
+    Returns:
+        Diccionario formulario -> {"nuevo": bool, "modificados": {campo: valor},
+        "eliminados": [campos], "versiones": nuevas versiones}. Solo incluye
+        los formularios con cambios.
+    """
+    cambios: Dict[str, Dict[str, Any]] = {}
+    for nombre_formulario, datos_formulario in formularios.items():
+        conocidas = versiones.get(nombre_formulario)
+        nuevas = versionar_formulario(datos_formulario)
+        
+        # Formulario sin cambios: se compara un único hash
+        if conocidas and conocidas.get("_version") == nuevas["_version"]:
+            continue
+        
+        conocidas = conocidas or {}
+        cambios[nombre_formulario] = {
+            "nuevo": not conocidas,
+            "modificados": {
+                campo: valor for campo, valor in datos_formulario.items()
+                if conocidas.get(campo) != nuevas[campo]
+            },
+            "eliminados": [c for c in conocidas if c != "_version" and c not in datos_formulario],
+            "versiones": nuevas
+        }
+    return cambios
+
 
 def convertir_a_contexto_mcp(
     datos_visita: Dict, 
@@ -168,8 +311,8 @@ def convertir_a_contexto_mcp(
         datos_iniciales={
             "edad": paciente["edad"],
             "genero": paciente["genero"],
-            "alergias": paciente.get("alergias", []),
-            "condiciones_cronicas": paciente.get("condiciones_cronicas", [])
+            "alergias": list(paciente.get("alergias", [])),
+            "condiciones_cronicas": list(paciente.get("condiciones_cronicas", []))
         }
     )
     
@@ -202,6 +345,9 @@ def convertir_a_contexto_mcp(
                 texto=texto_formulario,
                 prioridad="high"
             )
+            
+            # Registramos la versión cargada para la sincronización incremental
+            contexto.versiones_emr[nombre_formulario] = versionar_formulario(datos_formulario)
     
     # Registramos la carga de datos del EMR en la historia del contexto
     contexto.agregar_evento(
@@ -217,54 +363,143 @@ def convertir_a_contexto_mcp(
     
     return contexto
 
-async def sincronizar_con_emr(contexto: MCPContext, visit_id: str) -> None:
+def aplicar_formularios_emr(
+    contexto: MCPContext,
+    visit_id: str,
+    formularios: Optional[Dict[str, Dict[str, Any]]],
+    etag: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Aplica al contexto los formularios actuales de una visita de forma incremental.
+    
+    Cada formulario se compara por su hash de contenido y, si cambió, campo a
+    campo; solo los campos nuevos o modificados se añaden como bloques. Permite
+    obtener los formularios una sola vez y aplicarlos a varios contextos.
+    
+    Args:
+        contexto: Contexto MCP activo
+        visit_id: ID de la visita
+        formularios: Formularios actuales del EMR, o None si no han cambiado
+        etag: ETag (o hash) de los formularios, que se guarda en el contexto
+        
+    Returns:
+        Resumen con el estado ("sin_cambios" o "actualizado") y los campos
+        actualizados por formulario
+    """
+    if formularios is None or (etag is not None and etag == contexto.etag_emr):
+        return {"estado": "sin_cambios", "cambios": {}}
+    
+    # Contextos sin versiones registradas: se toman como base los formularios
+    # ya cargados según la historia, sin volver a añadirlos
+    if not contexto.versiones_emr:
+        for evento in contexto.historia:
+            if evento["tipo"] == "carga_emr":
+                for nombre in evento["metadatos"].get("formularios_cargados", []):
+                    if nombre in formularios:
+                        contexto.versiones_emr[nombre] = versionar_formulario(formularios[nombre])
+    
+    cambios = diferencias_formularios(contexto.versiones_emr, formularios)
+    
+    for nombre_formulario, cambio in cambios.items():
+        campos = [f"{campo}: {valor}. " for campo, valor in cambio["modificados"].items()]
+        campos += [f"{campo}: (eliminado). " for campo in cambio["eliminados"]]
+        if campos:
+            # Añadir solo los campos cambiados como bloque de alta prioridad
+            contexto.agregar_bloque_conversacion(
+                actor="professional",
+                texto=f"Formulario {nombre_formulario} (actualización): " + "".join(campos),
+                prioridad="high"
+            )
+        contexto.versiones_emr[nombre_formulario] = cambio["versiones"]
+    
+    contexto.etag_emr = etag
+    
+    resumen = {
+        "estado": "actualizado" if cambios else "sin_cambios",
+        "cambios": {
+            nombre: sorted(list(cambio["modificados"]) + cambio["eliminados"])
+            for nombre, cambio in cambios.items()
+        }
+    }
+    
+    if cambios:
+        # Registrar la sincronización
+        contexto.agregar_evento(
+            origen="sistema",
+            tipo="sincronizacion_emr",
+            contenido="Sincronización con EMR completada",
+            metadatos={
+                "visita_id": visit_id,
+                "campos_actualizados": resumen["cambios"],
+                "timestamp": datetime.now().isoformat()
+            }
+        )
+    
+    return resumen
+
+async def obtener_formularios_actuales(
+    visit_id: str,
+    etag: Optional[str] = None,
+    cliente: Optional[Any] = None
+) -> Tuple[Optional[Dict[str, Dict[str, Any]]], Optional[str]]:
+    """
+    Obtiene los formularios vigentes de una visita, sin pasar por la caché.
+    
+    Args:
+        visit_id: ID de la visita
+        etag: ETag conocido; si los formularios no han cambiado se devuelve None
+        cliente: Cliente EMR a utilizar (opcional, por defecto el configurado)
+        
+    Returns:
+        Tupla (formularios o None si no han cambiado, ETag o hash actual)
+    """
+    cliente = cliente or obtener_cliente_emr()
+    
+    # Con cliente EMR se hace una petición condicional (If-None-Match)
+    if cliente is not None:
+        return await cliente.obtener_formularios(visit_id, etag=etag)
+    
+    datos_visita = await obtener_datos_visita(visit_id)
+    formularios = datos_visita.get("formularios", {})
+    version = calcular_version(formularios)
+    return (None if version == etag else formularios), version
+
+async def sincronizar_con_emr(
+    contexto: MCPContext,
+    visit_id: str,
+    cliente: Optional[Any] = None
+) -> Dict[str, Any]:
     """
     Sincroniza el contexto MCP con los datos más recientes del EMR.
     
-    Esta función se puede llamar periódicamente para mantener
-    el contexto actualizado con los cambios en el EMR.
+    La sincronización es incremental:
+    - Con un cliente EMR se hace una petición condicional (If-None-Match con el
+      ETag guardado en el contexto); si el EMR responde 304 no hay más trabajo
+    - Cada formulario se compara por su hash de contenido y, si cambió, campo
+      a campo; solo los campos nuevos o modificados se añaden como bloques
+    
+    Es lo bastante barata para ejecutarse periódicamente cada pocos segundos.
     
     Args:
         contexto: Contexto MCP activo
         visit_id: ID de la visita a sincronizar
+        cliente: Cliente EMR a utilizar (opcional, por defecto el configurado)
+        
+    Returns:
+        Resumen con el estado ("sin_cambios", "actualizado" o "error") y los
+        campos actualizados por formulario
     """
     try:
-        # Obtener datos actualizados
-        datos_visita = await obtener_datos_visita(visit_id)
+        # Obtener los formularios solo si han cambiado
+        formularios, etag = await obtener_formularios_actuales(visit_id, contexto.etag_emr, cliente)
         
-        # Verificar si hay nuevos formularios
-        if "formularios" in datos_visita:
-            # Extraer los IDs de formularios ya procesados
-            formularios_procesados = set()
-            for evento in contexto.historia:
-                if evento["tipo"] == "carga_emr" and "formularios_cargados" in evento["metadatos"]:
-                    formularios_procesados.update(evento["metadatos"]["formularios_cargados"])
-            
-            # Procesar solo formularios nuevos
-            for nombre_formulario, datos_formulario in datos_visita["formularios"].items():
-                if nombre_formulario not in formularios_procesados:
-                    # Construir texto del formulario
-                    texto_formulario = f"Formulario {nombre_formulario} (actualización): "
-                    for campo, valor in datos_formulario.items():
-                        texto_formulario += f"{campo}: {valor}. "
-                    
-                    # Añadir como bloque de alta prioridad
-                    contexto.agregar_bloque_conversacion(
-                        actor="professional",
-                        texto=texto_formulario,
-                        prioridad="high"
-                    )
-            
-            # Registrar la sincronización
-            contexto.agregar_evento(
-                origen="sistema",
-                tipo="sincronizacion_emr",
-                contenido="Sincronización con EMR completada",
-                metadatos={
-                    "visita_id": visit_id,
-                    "timestamp": datetime.now().isoformat()
-                }
-            )
+        resumen = aplicar_formularios_emr(contexto, visit_id, formularios, etag)
+        
+        if resumen["estado"] == "actualizado":
+            # Los datos en caché de la visita ya no son los vigentes
+            obtener_cache_emr().invalidar(visit_id)
+        
+        return resumen
     
     except Exception as e:
         # Registrar error de sincronización
@@ -277,6 +512,7 @@ async def sincronizar_con_emr(contexto: MCPContext, visit_id: str) -> None:
                 "timestamp": datetime.now().isoformat()
             }
         )
+        return {"estado": "error", "cambios": {}, "error": str(e)}
 
 def obtener_estructura_emr() -> Dict[str, Any]:
     """
@@ -0,0 +1,169 @@
+"""
+Precalentamiento de contextos para las visitas programadas del día.
+
+Al inicio del turno (o a petición) obtiene las visitas programadas de un
+profesional, construye su MCPContext con convertir_a_contexto_mcp y lo deja
+aparcado en el almacén de sesiones. Cuando el profesional abre la visita,
+MCPAgent.desde_visita_emr toma el contexto ya construido en lugar de
+construirlo en frío.
+
+La concurrencia está acotada por un semáforo para no saturar el EMR, y el
+progreso se expone mediante métricas.
+"""
+
+import asyncio
+import threading
+import time
+from typing import Any, Dict, Optional, Sequence
+
+from mcp.integracion_emr import convertir_a_contexto_mcp, obtener_datos_visita, obtener_visitas_programadas
+from mcp.sesiones import AlmacenSesiones, obtener_almacen_sesiones
+
+
+class PrecalentadorVisitas:
+    """Construye y aparca los contextos de las visitas programadas."""
+
+    def __init__(
+        self,
+        almacen: Optional[AlmacenSesiones] = None,
+        cliente_emr: Optional[Any] = None,
+        max_concurrencia: int = 4,
+        roles: Sequence[str] = ("health_professional",)
+    ):
+        """
+        Inicializa el precalentador.
+
+        Args:
+            almacen: Almacén de sesiones donde aparcar los contextos (por defecto el compartido)
+            cliente_emr: Cliente EMR a utilizar (opcional, por defecto el configurado)
+            max_concurrencia: Número máximo de visitas construyéndose a la vez
+            roles: Roles para los que se prepara un contexto de cada visita
+        """
+        self.almacen = almacen or obtener_almacen_sesiones()
+        self.cliente_emr = cliente_emr
+        self.max_concurrencia = max_concurrencia
+        self.roles = tuple(roles)
+        self._lock = threading.Lock()
+        self._progreso: Dict[str, Any] = self._progreso_inicial()
+
+    @staticmethod
+    def _progreso_inicial() -> Dict[str, Any]:
+        return {
+            "estado": "inactivo",
+            "visitas": 0,
+            "pendientes": 0,
+            "en_curso": 0,
+            "completadas": 0,
+            "omitidas": 0,
+            "fallidas": 0,
+            "errores": {},
+            "duracion_ms": 0.0
+        }
+
+    def _actualizar(self, **cambios: int) -> None:
+        with self._lock:
+            for clave, incremento in cambios.items():
+                self._progreso[clave] += incremento
+
+    async def _precalentar_visita(self, visit_id: str, semaforo: asyncio.Semaphore) -> None:
+        """Construye y aparca los contextos de una visita para cada rol."""
+        async with semaforo:
+            self._actualizar(pendientes=-1, en_curso=1)
+            try:
+                roles = [rol for rol in self.roles if not self.almacen.esta_aparcado(visit_id, rol)]
+                if not roles:
+                    self._actualizar(omitidas=1)
+                    return
+                datos_visita = await obtener_datos_visita(visit_id, self.cliente_emr, usar_cache=True)
+                for rol in roles:
+                    self.almacen.aparcar(convertir_a_contexto_mcp(datos_visita, rol))
+                self._actualizar(completadas=1)
+            except Exception as e:
+                with self._lock:
+                    self._progreso["fallidas"] += 1
+                    self._progreso["errores"][visit_id] = str(e)
+            finally:
+                self._actualizar(en_curso=-1)
+
+    async def precalentar(self, profesional_id: str, fecha: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Precalienta los contextos de las visitas programadas de un profesional.
+
+        Las visitas que ya tienen contexto aparcado para todos los roles se omiten,
+        por lo que puede ejecutarse varias veces durante el turno.
+
+        Args:
+            profesional_id: Identificador del profesional
+            fecha: Día de las visitas en formato ISO (AAAA-MM-DD), opcional
+
+        Returns:
+            Métricas de progreso al terminar (ver progreso)
+        """
+        inicio = time.perf_counter()
+        with self._lock:
+            self._progreso = self._progreso_inicial()
+            self._progreso["estado"] = "en_curso"
+
+        try:
+            visitas = await obtener_visitas_programadas(profesional_id, fecha, self.cliente_emr)
+        except Exception as e:
+            with self._lock:
+                self._progreso["estado"] = "error"
+                self._progreso["errores"]["listado"] = str(e)
+                self._progreso["duracion_ms"] = (time.perf_counter() - inicio) * 1000
+            return self.progreso()
+
+        with self._lock:
+            self._progreso["visitas"] = self._progreso["pendientes"] = len(visitas)
+
+        semaforo = asyncio.Semaphore(self.max_concurrencia)
+        await asyncio.gather(*(self._precalentar_visita(visit_id, semaforo) for visit_id in visitas))
+
+        with self._lock:
+            self._progreso["estado"] = "completado"
+            self._progreso["duracion_ms"] = (time.perf_counter() - inicio) * 1000
+        return self.progreso()
+
+    def precalentar_en_segundo_plano(
+        self,
+        profesional_id: str,
+        fecha: Optional[str] = None,
+        retraso: float = 0.0
+    ) -> threading.Thread:
+        """
+        Lanza el precalentamiento en un hilo en segundo plano.
+
+        Args:
+            profesional_id: Identificador del profesional
+            fecha: Día de las visitas en formato ISO (AAAA-MM-DD), opcional
+            retraso: Segundos de espera antes de empezar (p.ej. hasta el inicio del turno)
+
+        Returns:
+            Hilo (daemon) que ejecuta el precalentamiento
+        """
+        def ejecutar() -> None:
+            if retraso > 0:
+                time.sleep(retraso)
+            asyncio.run(self.precalentar(profesional_id, fecha))
+
+        with self._lock:
+            self._progreso = self._progreso_inicial()
+            self._progreso["estado"] = "programado"
+
+        hilo = threading.Thread(target=ejecutar, name=f"precalentamiento-{profesional_id}", daemon=True)
+        hilo.start()
+        return hilo
+
+    def progreso(self) -> Dict[str, Any]:
+        """
+        Devuelve las métricas de progreso del último precalentamiento.
+
+        Returns:
+            Estado ("inactivo", "programado", "en_curso", "completado" o "error"),
+            número de visitas, pendientes, en curso, completadas, omitidas y
+            fallidas, errores por visita y duración en milisegundos
+        """
+        with self._lock:
+            progreso = dict(self._progreso)
+            progreso["errores"] = dict(self._progreso["errores"])
+        return progreso
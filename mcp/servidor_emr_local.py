@@ -0,0 +1,216 @@
+"""
+Servidor EMR local de sustitución para pruebas y benchmarks.
+
+Expone los datos simulados del EMR con las mismas rutas que usa ClienteEMR,
+sobre un ThreadingHTTPServer de la biblioteca estándar. Permite añadir
+latencia artificial por subrecurso para reproducir un EMR lento. Las
+respuestas llevan ETag por contenido y admiten peticiones condicionales
+(If-None-Match -> 304). El listado /api/visitas admite los filtros
+profesional_id, estado y fecha, y /api/cambios expone el registro de cambios
+(con número de secuencia) que alimenta el feed de cambios.
+
+Uso:
+    with ServidorEMRLocal(latencias={"formularios": 0.2}) as servidor:
+        cliente = ClienteEMR(servidor.url)
+"""
+
+import hashlib
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs, urlsplit
+
+from mcp.integracion_emr import EMR_VISITAS_SIMULADAS
+
+_RUTAS = [
+    (re.compile(r"^/api/visitas/([^/]+)$"), "visita"),
+    (re.compile(r"^/api/visitas/([^/]+)/paciente$"), "paciente"),
+    (re.compile(r"^/api/visitas/([^/]+)/profesional$"), "profesional"),
+    (re.compile(r"^/api/visitas/([^/]+)/visitas_anteriores$"), "visitas_anteriores"),
+    (re.compile(r"^/api/formularios/visita/([^/]+)$"), "formularios")
+]
+
+
+class ServidorEMRLocal:
+    """Servidor HTTP local que sirve datos de visitas con el formato de la API del EMR."""
+
+    def __init__(
+        self,
+        datos: Optional[Dict[str, Dict[str, Any]]] = None,
+        latencias: Optional[Dict[str, float]] = None,
+        host: str = "127.0.0.1",
+        puerto: int = 0
+    ):
+        """
+        Prepara el servidor (no lo arranca).
+
+        Args:
+            datos: Visitas a servir, con la estructura de EMR_VISITAS_SIMULADAS
+            latencias: Latencia artificial en segundos por subrecurso
+            host: Dirección de escucha
+            puerto: Puerto de escucha (0 para uno libre)
+        """
+        self.datos = datos if datos is not None else EMR_VISITAS_SIMULADAS
+        self.latencias = latencias or {}
+        self.peticiones: Dict[str, int] = {}
+        self.cambios: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._servidor = ThreadingHTTPServer((host, puerto), self._crear_manejador())
+        self._servidor.daemon_threads = True
+        self._hilo: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        """URL base del servidor."""
+        host, puerto = self._servidor.server_address[:2]
+        return f"http://{host}:{puerto}"
+
+    def _registrar_peticion(self, recurso: str) -> None:
+        with self._lock:
+            self.peticiones[recurso] = self.peticiones.get(recurso, 0) + 1
+
+    def registrar_cambio(self, visit_id: str, formulario: Optional[str] = None) -> int:
+        """
+        Añade un evento al registro de cambios.
+
+        Args:
+            visit_id: Visita modificada
+            formulario: Formulario modificado (opcional)
+
+        Returns:
+            Número de secuencia del evento
+        """
+        with self._lock:
+            secuencia = len(self.cambios) + 1
+            self.cambios.append({
+                "secuencia": secuencia,
+                "visit_id": visit_id,
+                "formulario": formulario,
+                "timestamp": time.time()
+            })
+        return secuencia
+
+    def actualizar_formulario(self, visit_id: str, formulario: str, campos: Dict[str, Any]) -> int:
+        """
+        Modifica campos de un formulario y registra el cambio.
+
+        Args:
+            visit_id: Visita a modificar
+            formulario: Nombre del formulario
+            campos: Campos nuevos o modificados
+
+        Returns:
+            Número de secuencia del evento
+        """
+        with self._lock:
+            formularios = self.datos[visit_id].setdefault("formularios", {})
+            formularios[formulario] = {**formularios.get(formulario, {}), **campos}
+        return self.registrar_cambio(visit_id, formulario)
+
+    def _cambios_desde(self, secuencia: int, limite: int) -> Dict[str, Any]:
+        with self._lock:
+            cambios = self.cambios[secuencia:secuencia + limite]
+            ultima = cambios[-1]["secuencia"] if cambios else secuencia
+        return {"cambios": cambios, "secuencia": ultima}
+
+    def _crear_manejador(self) -> type:
+        servidor = self
+
+        class Manejador(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self) -> None:
+                url = urlsplit(self.path)
+                if url.path == "/api/visitas":
+                    return self._listar_visitas(parse_qs(url.query))
+                if url.path == "/api/cambios":
+                    parametros = parse_qs(url.query)
+                    servidor._registrar_peticion("cambios")
+                    return self._responder(200, servidor._cambios_desde(
+                        int(parametros.get("desde", ["0"])[0]),
+                        int(parametros.get("limite", ["500"])[0])
+                    ))
+
+                for patron, recurso in _RUTAS:
+                    coincidencia = patron.match(url.path)
+                    if coincidencia:
+                        break
+                else:
+                    return self._responder(404, {"error": "Ruta no encontrada"})
+
+                servidor._registrar_peticion(recurso)
+                if servidor.latencias.get(recurso):
+                    time.sleep(servidor.latencias[recurso])
+
+                visita = servidor.datos.get(coincidencia.group(1))
+                if visita is None:
+                    return self._responder(404, {"error": f"Visita no encontrada: {coincidencia.group(1)}"})
+                return self._responder(200, visita.get(recurso), condicional=True)
+
+            def _listar_visitas(self, parametros: Dict[str, Any]) -> None:
+                servidor._registrar_peticion("listado")
+                filtros = {clave: valores[0] for clave, valores in parametros.items()}
+                visitas = []
+                for datos_visita in servidor.datos.values():
+                    visita = datos_visita.get("visita", {})
+                    if "profesional_id" in filtros and datos_visita.get("profesional", {}).get("id") != filtros["profesional_id"]:
+                        continue
+                    if "estado" in filtros and visita.get("estado") != filtros["estado"]:
+                        continue
+                    if "fecha" in filtros and not str(visita.get("fecha", "")).startswith(filtros["fecha"]):
+                        continue
+                    visitas.append(visita)
+                return self._responder(200, visitas)
+
+            def _responder(self, estado: int, cuerpo: Any, condicional: bool = False) -> None:
+                contenido = json.dumps(cuerpo, ensure_ascii=False, sort_keys=True).encode("utf-8")
+                etag = None
+                if condicional:
+                    # ETag por contenido; si coincide con If-None-Match se responde 304 sin cuerpo
+                    etag = f'"{hashlib.sha1(contenido).hexdigest()}"'
+                    if self.headers.get("If-None-Match") == etag:
+                        servidor._registrar_peticion("no_modificado")
+                        estado, contenido = 304, b""
+                try:
+                    self.send_response(estado)
+                    if etag:
+                        self.send_header("ETag", etag)
+                    if estado != 304:
+                        self.send_header("Content-Type", "application/json; charset=utf-8")
+                    self.send_header("Content-Length", str(len(contenido)))
+                    self.end_headers()
+                    self.wfile.write(contenido)
+                except (BrokenPipeError, ConnectionResetError):
+                    # El cliente abandonó la petición (p.ej. por timeout)
+                    self.close_connection = True
+
+            def log_message(self, *args: Any) -> None:
+                pass
+
+        return Manejador
+
+    def iniciar(self) -> "ServidorEMRLocal":
+        """Arranca el servidor en un hilo en segundo plano."""
+        self._hilo = threading.Thread(
+            target=self._servidor.serve_forever,
+            kwargs={"poll_interval": 0.05},
+            daemon=True
+        )
+        self._hilo.start()
+        return self
+
+    def detener(self) -> None:
+        """Detiene el servidor y libera el puerto."""
+        self._servidor.shutdown()
+        self._servidor.server_close()
+        if self._hilo:
+            self._hilo.join()
+
+    def __enter__(self) -> "ServidorEMRLocal":
+        return self.iniciar()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.detener()
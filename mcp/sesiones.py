@@ -0,0 +1,204 @@
+"""
+Almacén de sesiones MCP por visita y rol.
+
+Guarda dos tipos de contextos:
+- Contextos aparcados: construidos de antemano (p.ej. por el precalentamiento
+  de las visitas programadas) y a la espera de que se abra la visita. Abrir la
+  visita toma el contexto aparcado en lugar de construirlo en frío.
+- Contextos activos: los que están usando agentes en curso, agrupados por
+  visita para poder hacerles llegar los cambios del EMR.
+
+Los contextos activos se guardan mediante referencias débiles, de modo que
+desaparecen del almacén cuando el agente que los usaba deja de existir.
+"""
+
+import os
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from mcp.context import MCPContext
+
+# Validez por defecto de un contexto aparcado: un turno de trabajo
+TTL_APARCADO_POR_DEFECTO = 12 * 3600.0
+
+
+class AlmacenSesiones:
+    """Contextos MCP aparcados y activos, indexados por (visit_id, user_role)."""
+
+    def __init__(self, max_aparcados: int = 512, ttl_aparcado: float = TTL_APARCADO_POR_DEFECTO):
+        """
+        Inicializa el almacén.
+
+        Args:
+            max_aparcados: Número máximo de contextos aparcados
+            ttl_aparcado: Segundos de validez de un contexto aparcado
+        """
+        self.max_aparcados = max_aparcados
+        self.ttl_aparcado = ttl_aparcado
+        self._aparcados: "OrderedDict[Tuple[str, str], Tuple[float, MCPContext]]" = OrderedDict()
+        self._activos: Dict[str, "weakref.WeakSet[MCPContext]"] = {}
+        self._lock = threading.Lock()
+        self._metricas = {
+            "aparcados": 0,
+            "aciertos": 0,
+            "fallos": 0,
+            "expirados": 0,
+            "desalojados": 0
+        }
+
+    def aparcar(self, contexto: MCPContext) -> None:
+        """
+        Aparca un contexto ya construido hasta que se abra su visita.
+
+        Si ya había un contexto aparcado para la misma visita y rol, se sustituye.
+
+        Args:
+            contexto: Contexto MCP de la visita
+        """
+        clave = (contexto.visita["id"], contexto.user_role)
+        with self._lock:
+            self._aparcados[clave] = (time.monotonic() + self.ttl_aparcado, contexto)
+            self._aparcados.move_to_end(clave)
+            self._metricas["aparcados"] += 1
+            while len(self._aparcados) > self.max_aparcados:
+                self._aparcados.popitem(last=False)
+                self._metricas["desalojados"] += 1
+
+    def tomar(self, visit_id: str, user_role: str) -> Optional[MCPContext]:
+        """
+        Retira el contexto aparcado de una visita y lo registra como activo.
+
+        Cada contexto aparcado se entrega una sola vez, ya que pasa a ser
+        modificado por el agente que lo recibe.
+
+        Args:
+            visit_id: Identificador de la visita
+            user_role: Rol del usuario que abre la visita
+
+        Returns:
+            El contexto aparcado, o None si no hay ninguno vigente
+        """
+        with self._lock:
+            entrada = self._aparcados.pop((visit_id, user_role), None)
+            if entrada is not None and entrada[0] <= time.monotonic():
+                self._metricas["expirados"] += 1
+                entrada = None
+            if entrada is None:
+                self._metricas["fallos"] += 1
+                return None
+            self._metricas["aciertos"] += 1
+
+        contexto = entrada[1]
+        self.registrar_activo(contexto)
+        return contexto
+
+    def esta_aparcado(self, visit_id: str, user_role: str) -> bool:
+        """Indica si hay un contexto aparcado vigente para la visita y el rol."""
+        with self._lock:
+            entrada = self._aparcados.get((visit_id, user_role))
+            return entrada is not None and entrada[0] > time.monotonic()
+
+    def registrar_activo(self, contexto: MCPContext) -> None:
+        """
+        Registra un contexto en uso para su visita.
+
+        Args:
+            contexto: Contexto MCP activo
+        """
+        with self._lock:
+            self._activos.setdefault(contexto.visita["id"], weakref.WeakSet()).add(contexto)
+
+    def liberar(self, contexto: MCPContext) -> None:
+        """
+        Deja de considerar activo un contexto (p.ej. al cerrar la sesión).
+
+        Args:
+            contexto: Contexto MCP registrado como activo
+        """
+        visit_id = contexto.visita["id"]
+        with self._lock:
+            activos = self._activos.get(visit_id)
+            if activos is not None:
+                activos.discard(contexto)
+                if not activos:
+                    del self._activos[visit_id]
+
+    def activos(self, visit_id: str) -> List[MCPContext]:
+        """
+        Devuelve los contextos activos de una visita.
+
+        Args:
+            visit_id: Identificador de la visita
+
+        Returns:
+            Lista de contextos en uso para esa visita
+        """
+        with self._lock:
+            return list(self._activos.get(visit_id, ()))
+
+    def visitas_activas(self) -> List[str]:
+        """Devuelve los IDs de las visitas con algún contexto activo."""
+        with self._lock:
+            return [visit_id for visit_id, activos in self._activos.items() if activos]
+
+    def vaciar(self) -> None:
+        """Descarta todos los contextos aparcados y activos."""
+        with self._lock:
+            self._aparcados.clear()
+            self._activos.clear()
+
+    def metricas(self) -> Dict[str, Any]:
+        """
+        Devuelve las métricas del almacén.
+
+        Returns:
+            Contadores de contextos aparcados, aciertos, fallos, expirados y
+            desalojados, además del número de contextos aparcados y activos actuales
+        """
+        with self._lock:
+            metricas: Dict[str, Any] = dict(self._metricas)
+            metricas["en_espera"] = len(self._aparcados)
+            metricas["activos"] = sum(len(activos) for activos in self._activos.values())
+        consultas = metricas["aciertos"] + metricas["fallos"]
+        metricas["tasa_aciertos"] = metricas["aciertos"] / consultas if consultas else 0.0
+        return metricas
+
+
+_almacen: Optional[AlmacenSesiones] = None
+_lock_almacen = threading.Lock()
+
+
+def obtener_almacen_sesiones() -> AlmacenSesiones:
+    """
+    Devuelve el almacén de sesiones compartido.
+
+    La validez de los contextos aparcados se puede ajustar con
+    AIDUXCARE_SESIONES_TTL (segundos).
+    """
+    global _almacen
+    if _almacen is None:
+        with _lock_almacen:
+            if _almacen is None:
+                _almacen = AlmacenSesiones(
+                    ttl_aparcado=float(os.environ.get("AIDUXCARE_SESIONES_TTL", TTL_APARCADO_POR_DEFECTO))
+                )
+    return _almacen
+
+
+def configurar_almacen_sesiones(**opciones: Any) -> AlmacenSesiones:
+    """
+    Sustituye el almacén de sesiones compartido.
+
+    Args:
+        **opciones: Opciones de AlmacenSesiones
+
+    Returns:
+        El nuevo almacén compartido
+    """
+    global _almacen
+    with _lock_almacen:
+        _almacen = AlmacenSesiones(**opciones)
+    return _almacen
@@ -9,7 +9,40 @@ Cada herramienta sigue un patrón compatible con futuras migraciones a Langraph:
 
 import json
 from datetime import datetime
-from typing import Dict, List, Any, Optional, Tuple
+from typing import Callable, Dict, List, Any, Optional, Tuple
+
+from mcp.conocimiento import obtener_base_conocimiento
+from mcp.historial_visitas import obtener_historial_visitas
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Palabras clave que aumentan el riesgo legal
+PALABRAS_ALTO_RIESGO: Tuple[str, ...] = ("manipulación", "invasivo", "experimental", "aguja", "alta intensidad")
+PALABRAS_MEDIO_RIESGO: Tuple[str, ...] = ("movilización", "tracción", "eléctrico", "calor")
+
+# Campos de visita que usa formatear_resultado_herramienta
+CAMPOS_VISITA_FORMATEADOS: Tuple[str, ...] = ("fecha", "motivo", "diagnostico", "tratamiento")
+
+REFERENCIA_LEGAL = "Normativa de Práctica Clínica 2024"
+
+RIESGO_SIN_CONSENTIMIENTO = "Ausencia de consentimiento informado documentado"
+RECOMENDACION_SIN_CONSENTIMIENTO = "Obtener y documentar consentimiento informado antes de iniciar tratamiento"
+
+# Matriz precalculada palabra clave -> (nivel, riesgo, recomendación)
+MATRIZ_RIESGO: Tuple[Tuple[str, str, str, str], ...] = tuple(
+    [(palabra, "alto",
+      f"Técnica de alto riesgo identificada: {palabra}",
+      f"Documentar detalladamente procedimiento y respuesta para '{palabra}'")
+     for palabra in PALABRAS_ALTO_RIESGO] +
+    [(palabra, "medio",
+      f"Técnica de riesgo moderado: {palabra}",
+      f"Explicar beneficios y riesgos de '{palabra}' al paciente")
+     for palabra in PALABRAS_MEDIO_RIESGO]
+)
+_TOTAL_ALTO_RIESGO = len(PALABRAS_ALTO_RIESGO)
 
 # Herramientas simuladas para AiDuxCare
 
@@ -27,42 +60,29 @@ def sugerir_diagnostico_clinico(
         antecedentes: Antecedentes médicos relevantes (opcional)
     
     Returns:
-        Diccionario con diagnósticos sugeridos, confianza y referencias
+        Diccionario con el diagnóstico mejor puntuado, alternativas, confianza y referencias
     """
     timestamp = datetime.now().isoformat()
     
-    # Simulación de diagnósticos basados en síntomas comunes
-    diagnosticos_simulados = {
-        "dolor cervical": {
-            "principal": "Cervicalgia mecánica",
-            "secundarios": ["Contractura muscular", "Hernia discal cervical"],
-            "confianza": 0.85,
-            "referencias": ["Guía Clínica Cervicalgia 2024", "Manual de Fisioterapia 2023"]
-        },
-        "dolor lumbar": {
-            "principal": "Lumbalgia inespecífica",
-            "secundarios": ["Síndrome facetario", "Discopatía"],
-            "confianza": 0.78,
-            "referencias": ["Protocolo Lumbalgia MINSAL 2024", "European Spine Journal 2023"]
-        },
-        "dolor rodilla": {
-            "principal": "Condropatía rotuliana",
-            "secundarios": ["Tendinopatía", "Lesión meniscal"],
-            "confianza": 0.82,
-            "referencias": ["JOSPT Guidelines 2024", "Revista Fisioterapia 2022"]
-        }
-    }
+    # Búsqueda en el índice de la base de conocimiento clínico
+    sugerencias = obtener_base_conocimiento().buscar([motivo_consulta, *sintomas])
     
-    # Búsqueda simplificada basada en palabras clave
     diagnostico = {"principal": "No determinado", "secundarios": [], "confianza": 0.5, "referencias": []}
+    if sugerencias:
+        mejor = sugerencias[0]
+        diagnostico = {
+            "principal": mejor["principal"],
+            "secundarios": mejor["secundarios"],
+            "confianza": mejor["confianza"],
+            "referencias": mejor["referencias"]
+        }
     
-    for palabra_clave, diag in diagnosticos_simulados.items():
-        if palabra_clave in motivo_consulta.lower() or any(palabra_clave in s.lower() for s in sintomas):
-            diagnostico = diag
-            break
-    
-    return {
+    return ResultadoHerramienta({
         "diagnósticos": diagnostico,
+        "alternativas": [
+            {"principal": s["principal"], "confianza": s["confianza"], "puntuacion": s["puntuacion"]}
+            for s in sugerencias[1:]
+        ],
         "timestamp": timestamp,
         "tool": "sugerir_diagnostico_clinico",
         "inputs": {
@@ -70,7 +90,7 @@ def sugerir_diagnostico_clinico(
             "sintomas": sintomas,
             "antecedentes": antecedentes or []
         }
-    }
+    })
 
 
 def evaluar_riesgo_legal(
@@ -93,63 +113,150 @@ def evaluar_riesgo_legal(
     """
     timestamp = datetime.now().isoformat()
     
-    # Palabras clave que aumentan el riesgo legal
-    palabras_alto_riesgo = ["manipulación", "invasivo", "experimental", "aguja", "alta intensidad"]
-    palabras_medio_riesgo = ["movilización", "tracción", "eléctrico", "calor"]
+    nivel_riesgo, riesgos_identificados, recomendaciones = _evaluar_fila_riesgo(
+        tratamiento_propuesto.lower(),
+        consentimiento_informado,
+        condiciones_especiales
+    )
+    
+    return ResultadoHerramienta({
+        "evaluacion_riesgo": {
+            "nivel": nivel_riesgo,
+            "riesgos_identificados": riesgos_identificados,
+            "recomendaciones": recomendaciones,
+            "referencia_legal": REFERENCIA_LEGAL
+        },
+        "timestamp": timestamp,
+        "tool": "evaluar_riesgo_legal",
+        "inputs": {
+            "diagnostico": diagnostico,
+            "tratamiento_propuesto": tratamiento_propuesto,
+            "consentimiento_informado": consentimiento_informado,
+            "condiciones_especiales": condiciones_especiales or []
+        }
+    })
+
+
+def _evaluar_fila_riesgo(
+    tratamiento: str,
+    consentimiento_informado: bool,
+    condiciones_especiales: Optional[List[str]],
+    coincidencias: Optional[List[bool]] = None
+) -> Tuple[str, List[str], List[str]]:
+    """
+    Calcula nivel, riesgos y recomendaciones de un tratamiento.
+    
+    Args:
+        tratamiento: Tratamiento propuesto en minúsculas
+        consentimiento_informado: Si se ha obtenido consentimiento informado
+        condiciones_especiales: Condiciones que requieren atención especial
+        coincidencias: Presencia precalculada de cada palabra de MATRIZ_RIESGO (opcional)
+    
+    Returns:
+        Tupla (nivel, riesgos identificados, recomendaciones)
+    """
+    if coincidencias is None:
+        coincidencias = [palabra in tratamiento for palabra, _, _, _ in MATRIZ_RIESGO]
     
-    # Calcular nivel de riesgo básico
     nivel_riesgo = "bajo"
     riesgos_identificados = []
     recomendaciones = []
     
     if not consentimiento_informado:
         nivel_riesgo = "alto"
-        riesgos_identificados.append("Ausencia de consentimiento informado documentado")
-        recomendaciones.append("Obtener y documentar consentimiento informado antes de iniciar tratamiento")
+        riesgos_identificados.append(RIESGO_SIN_CONSENTIMIENTO)
+        recomendaciones.append(RECOMENDACION_SIN_CONSENTIMIENTO)
     
-    # Evaluar el tratamiento propuesto
-    for palabra in palabras_alto_riesgo:
-        if palabra in tratamiento_propuesto.lower():
+    # Técnicas de alto riesgo
+    for indice in range(_TOTAL_ALTO_RIESGO):
+        if coincidencias[indice]:
             nivel_riesgo = "alto"
-            riesgos_identificados.append(f"Técnica de alto riesgo identificada: {palabra}")
-            recomendaciones.append(f"Documentar detalladamente procedimiento y respuesta para '{palabra}'")
+            riesgos_identificados.append(MATRIZ_RIESGO[indice][2])
+            recomendaciones.append(MATRIZ_RIESGO[indice][3])
     
+    # Técnicas de riesgo moderado (solo si no hay riesgo alto)
     if nivel_riesgo != "alto":
-        for palabra in palabras_medio_riesgo:
-            if palabra in tratamiento_propuesto.lower():
+        for indice in range(_TOTAL_ALTO_RIESGO, len(MATRIZ_RIESGO)):
+            if coincidencias[indice]:
                 nivel_riesgo = "medio"
-                riesgos_identificados.append(f"Técnica de riesgo moderado: {palabra}")
-                recomendaciones.append(f"Explicar beneficios y riesgos de '{palabra}' al paciente")
+                riesgos_identificados.append(MATRIZ_RIESGO[indice][2])
+                recomendaciones.append(MATRIZ_RIESGO[indice][3])
     
     # Considerar condiciones especiales
     if condiciones_especiales:
         for condicion in condiciones_especiales:
             riesgos_identificados.append(f"Condición especial a considerar: {condicion}")
             recomendaciones.append(f"Documentar plan de manejo específico para: {condicion}")
-            if nivel_riesgo == "bajo":
-                nivel_riesgo = "medio"
+        if nivel_riesgo == "bajo":
+            nivel_riesgo = "medio"
     
-    return {
-        "evaluacion_riesgo": {
-            "nivel": nivel_riesgo,
-            "riesgos_identificados": riesgos_identificados,
-            "recomendaciones": recomendaciones,
-            "referencia_legal": "Normativa de Práctica Clínica 2024" 
-        },
-        "timestamp": timestamp,
-        "tool": "evaluar_riesgo_legal",
-        "inputs": {
-            "diagnostico": diagnostico,
-            "tratamiento_propuesto": tratamiento_propuesto,
-            "consentimiento_informado": consentimiento_informado,
-            "condiciones_especiales": condiciones_especiales or []
-        }
-    }
+    return nivel_riesgo, riesgos_identificados, recomendaciones
+
+
+def _matriz_coincidencias(tratamientos: List[str]) -> List[List[bool]]:
+    """
+    Calcula la matriz (tratamientos x palabras clave) de presencia de palabras.
+    
+    Usa operaciones vectorizadas de NumPy si está disponible y, si no,
+    búsquedas de subcadenas en Python puro.
+    """
+    if np is not None and tratamientos:
+        textos = np.asarray(tratamientos, dtype=np.str_)[:, None]
+        palabras = np.asarray([fila[0] for fila in MATRIZ_RIESGO], dtype=np.str_)[None, :]
+        return (np.char.find(textos, palabras) >= 0).tolist()
+    
+    return [[palabra in tratamiento for palabra, _, _, _ in MATRIZ_RIESGO] for tratamiento in tratamientos]
 
 
+def evaluar_riesgo_legal_lote(
+    casos: List[Tuple[str, str, bool, Optional[List[str]]]]
+) -> List[Dict[str, Any]]:
+    """
+    Evalúa el riesgo legal de muchos tratamientos a la vez.
+    
+    Calcula la presencia de todas las palabras clave para todos los casos en
+    una sola operación sobre la matriz precalculada MATRIZ_RIESGO y después
+    construye el resultado de cada fila.
+    
+    Args:
+        casos: Tuplas (diagnostico, tratamiento_propuesto, consentimiento_informado,
+            condiciones_especiales)
+    
+    Returns:
+        Lista con un resultado por caso, con la misma estructura que evaluar_riesgo_legal
+    """
+    timestamp = datetime.now().isoformat()
+    coincidencias = _matriz_coincidencias([caso[1].lower() for caso in casos])
+    
+    resultados = []
+    for (diagnostico, tratamiento, consentimiento, condiciones), fila in zip(casos, coincidencias):
+        nivel, riesgos, recomendaciones = _evaluar_fila_riesgo(tratamiento, consentimiento, condiciones, fila)
+        resultados.append(ResultadoHerramienta({
+            "evaluacion_riesgo": {
+                "nivel": nivel,
+                "riesgos_identificados": riesgos,
+                "recomendaciones": recomendaciones,
+                "referencia_legal": REFERENCIA_LEGAL
+            },
+            "timestamp": timestamp,
+            "tool": "evaluar_riesgo_legal",
+            "inputs": {
+                "diagnostico": diagnostico,
+                "tratamiento_propuesto": tratamiento,
+                "consentimiento_informado": consentimiento,
+                "condiciones_especiales": condiciones or []
+            }
+        }))
+    
+    return resultados
+
 def recordar_visitas_anteriores(
     paciente_id: str,
-    limite: int = 3
+    limite: int = 3,
+    cursor: Optional[str] = None,
+    fecha_desde: Optional[str] = None,
+    fecha_hasta: Optional[str] = None,
+    campos: Optional[List[str]] = None
 ) -> Dict[str, Any]:
     """
     Recupera información de visitas anteriores del paciente.
@@ -157,122 +264,173 @@ def recordar_visitas_anteriores(
     Args:
         paciente_id: Identificador único del paciente
         limite: Número máximo de visitas a recuperar
+        cursor: Cursor de paginación devuelto por una llamada anterior (opcional)
+        fecha_desde: Fecha mínima de las visitas, formato ISO (opcional)
+        fecha_hasta: Fecha máxima de las visitas, formato ISO (opcional)
+        campos: Campos de cada visita a recuperar (por defecto todos)
     
     Returns:
-        Resumen de visitas anteriores con diagnósticos y tratamientos
+        Resumen de visitas anteriores con diagnósticos, tratamientos y cursor de la página siguiente
     """
     timestamp = datetime.now().isoformat()
     
-    # Base de datos simulada de visitas por paciente
-    visitas_simuladas = {
-        "P001": [
-            {
-                "fecha": "2025-04-10",
-                "motivo": "Dolor cervical agudo",
-                "diagnostico": "Cervicalgia por estrés",
-                "tratamiento": "Terapia manual + calor",
-                "evolucion": "Favorable con disminución de dolor en 70%"
-            },
-            {
-                "fecha": "2025-03-15",
-                "motivo": "Control mensual",
-                "diagnostico": "Cervicalgia en mejora",
-                "tratamiento": "Ejercicios domiciliarios",
-                "evolucion": "Estable, continúa con ejercicios"
-            }
-        ],
-        "P002": [
-            {
-                "fecha": "2025-05-01",
-                "motivo": "Dolor lumbar irradiado",
-                "diagnostico": "Lumbociática",
-                "tratamiento": "TENS + ejercicios específicos",
-                "evolucion": "Mejora leve, persiste dolor irradiado"
-            },
-            {
-                "fecha": "2025-04-20",
-                "motivo": "Evaluación inicial lumbar",
-                "diagnostico": "Lumbalgia mecánica",
-                "tratamiento": "Reposo relativo + antiinflamatorios",
-                "evolucion": "Sin cambios significativos"
-            },
-            {
-                "fecha": "2024-11-15",
-                "motivo": "Molestias en hombro",
-                "diagnostico": "Tendinitis supraespinoso",
-                "tratamiento": "Ultrasonido + ejercicios",
-                "evolucion": "Resuelto"
-            }
-        ],
-        "P003": []
-    }
-    
-    # Obtener visitas del paciente o lista vacía
-    visitas = visitas_simuladas.get(paciente_id, [])[:limite]
+    visitas, siguiente_cursor = obtener_historial_visitas().consultar(
+        paciente_id,
+        limite=limite,
+        cursor=cursor,
+        fecha_desde=fecha_desde,
+        fecha_hasta=fecha_hasta,
+        campos=campos
+    )
     
-    return {
+    return ResultadoHerramienta({
         "visitas_anteriores": {
             "total_encontradas": len(visitas),
             "paciente_id": paciente_id,
-            "registros": visitas
+            "registros": visitas,
+            "siguiente_cursor": siguiente_cursor
         },
         "timestamp": timestamp,
         "tool": "recordar_visitas_anteriores",
         "inputs": {
             "paciente_id": paciente_id,
-            "limite": limite
+            "limite": limite,
+            "cursor": cursor,
+            "fecha_desde": fecha_desde,
+            "fecha_hasta": fecha_hasta,
+            "campos": list(campos) if campos else None
         }
-    }
+    })
 
 
-# Función utilitaria para formatear resultados de herramientas de forma legible
-def formatear_resultado_herramienta(resultado: Dict[str, Any]) -> str:
-    """Formatea el resultado de una herramienta para mostrar de forma legible"""
+# Formateadores de resultados registrados por herramienta
+FORMATEADORES: Dict[str, Callable[[Dict[str, Any]], str]] = {}
+
+# Plantillas precompiladas de los formateadores
+PLANTILLA_DIAGNOSTICO = (
+    "📋 SUGERENCIA DIAGNÓSTICA ({confianza:.0f}% confianza):\n"
+    "Principal: {principal}\n"
+    "Secundarios: {secundarios}\n"
+    "Referencias: {referencias}"
+)
+PLANTILLA_RIESGO_LEGAL = (
+    "⚖️ EVALUACIÓN DE RIESGO LEGAL - NIVEL {nivel}:\n"
+    "Riesgos identificados:{riesgos}\n"
+    "Recomendaciones:{recomendaciones}"
+)
+PLANTILLA_VISITAS = "📅 VISITAS ANTERIORES ({total}):{visitas}"
+PLANTILLA_VISITA = "\n{indice}. {fecha} - {motivo}\n   Dx: {diagnostico}\n   Tx: {tratamiento}\n"
+PLANTILLA_SIN_VISITAS = "📅 No se encontraron visitas anteriores para el paciente {paciente}"
+
+
+def registrar_formateador(nombre_herramienta: str) -> Callable:
+    """
+    Decorador que registra el formateador de resultados de una herramienta.
+    
+    Args:
+        nombre_herramienta: Nombre de la herramienta cuyo resultado se formatea
+    """
+    def decorador(funcion: Callable[[Dict[str, Any]], str]) -> Callable[[Dict[str, Any]], str]:
+        FORMATEADORES[nombre_herramienta] = funcion
+        return funcion
+    return decorador
+
+
+@registrar_formateador("sugerir_diagnostico_clinico")
+def _formatear_diagnostico(resultado: Dict[str, Any]) -> str:
+    diagnosticos = resultado.get("diagnósticos", {})
+    return PLANTILLA_DIAGNOSTICO.format(
+        confianza=diagnosticos.get("confianza", 0) * 100,
+        principal=diagnosticos.get("principal", "No determinado"),
+        secundarios=", ".join(diagnosticos.get("secundarios", [])),
+        referencias=", ".join(diagnosticos.get("referencias", []))
+    )
+
+
+@registrar_formateador("evaluar_riesgo_legal")
+def _formatear_riesgo_legal(resultado: Dict[str, Any]) -> str:
+    evaluacion = resultado.get("evaluacion_riesgo", {})
+    return PLANTILLA_RIESGO_LEGAL.format(
+        nivel=evaluacion.get("nivel", "desconocido").upper(),
+        riesgos="\n- ".join([""] + evaluacion.get("riesgos_identificados", [])),
+        recomendaciones="\n- ".join([""] + evaluacion.get("recomendaciones", []))
+    )
+
+
+@registrar_formateador("recordar_visitas_anteriores")
+def _formatear_visitas(resultado: Dict[str, Any]) -> str:
+    visitas = resultado.get("visitas_anteriores", {})
+    registros = visitas.get("registros", [])
+    
+    if not registros:
+        return PLANTILLA_SIN_VISITAS.format(paciente=visitas.get("paciente_id", ""))
+    
+    texto_visitas = "".join(
+        PLANTILLA_VISITA.format(
+            indice=i,
+            fecha=visita.get("fecha"),
+            motivo=visita.get("motivo"),
+            diagnostico=visita.get("diagnostico"),
+            tratamiento=visita.get("tratamiento")
+        )
+        for i, visita in enumerate(registros, 1)
+    )
+    return PLANTILLA_VISITAS.format(total=visitas.get("total_encontradas", 0), visitas=texto_visitas)
+
+
+def _renderizar_resultado(resultado: Dict[str, Any]) -> str:
+    """Renderiza un resultado con el formateador registrado para su herramienta."""
     if not resultado:
         return "No se obtuvo resultado de la herramienta."
     
     nombre_herramienta = resultado.get("tool", "desconocida")
-    timestamp = resultado.get("timestamp", "")
-    
-    if nombre_herramienta == "sugerir_diagnostico_clinico":
-        diagnosticos = resultado.get("diagnósticos", {})
-        principal = diagnosticos.get("principal", "No determinado")
-        secundarios = ", ".join(diagnosticos.get("secundarios", []))
-        confianza = diagnosticos.get("confianza", 0) * 100
-        referencias = ", ".join(diagnosticos.get("referencias", []))
-        
-        return (f"📋 SUGERENCIA DIAGNÓSTICA ({confianza:.0f}% confianza):\n"
-                f"Principal: {principal}\n"
-                f"Secundarios: {secundarios}\n"
-                f"Referencias: {referencias}")
-    
-    elif nombre_herramienta == "evaluar_riesgo_legal":
-        evaluacion = resultado.get("evaluacion_riesgo", {})
-        nivel = evaluacion.get("nivel", "desconocido").upper()
-        riesgos = "\n- ".join([""] + evaluacion.get("riesgos_identificados", []))
-        recomendaciones = "\n- ".join([""] + evaluacion.get("recomendaciones", []))
-        
-        return (f"⚖️ EVALUACIÓN DE RIESGO LEGAL - NIVEL {nivel}:\n"
-                f"Riesgos identificados:{riesgos}\n"
-                f"Recomendaciones:{recomendaciones}")
-    
-    elif nombre_herramienta == "recordar_visitas_anteriores":
-        visitas = resultado.get("visitas_anteriores", {})
-        paciente = visitas.get("paciente_id", "")
-        total = visitas.get("total_encontradas", 0)
-        registros = visitas.get("registros", [])
-        
-        if not registros:
-            return f"📅 No se encontraron visitas anteriores para el paciente {paciente}"
-        
-        texto_visitas = ""
-        for i, visita in enumerate(registros, 1):
-            texto_visitas += (f"\n{i}. {visita.get('fecha')} - {visita.get('motivo')}\n"
-                             f"   Dx: {visita.get('diagnostico')}\n"
-                             f"   Tx: {visita.get('tratamiento')}\n")
-        
-        return f"📅 VISITAS ANTERIORES ({total}):{texto_visitas}"
-    
-    else:
-        # Formato genérico para otras herramientas
-        return f"Resultado de {nombre_herramienta}:\n{json.dumps(resultado, indent=2, ensure_ascii=False)}" 
\ No newline at end of file
+    formateador = FORMATEADORES.get(nombre_herramienta)
+    if formateador:
+        return formateador(resultado)
+    
+    # Formato genérico para otras herramientas
+    return f"Resultado de {nombre_herramienta}:\n{json.dumps(resultado, indent=2, ensure_ascii=False)}"
+
+
+class ResultadoHerramienta(dict):
+    """
+    Resultado de una herramienta con vista formateada perezosa.
+    
+    Se comporta como el diccionario del resultado; el texto legible se
+    renderiza la primera vez que se consulta `formateado` y queda en caché
+    en el propio resultado. El resultado no debe modificarse después de
+    consultar la vista.
+    """
+    
+    __slots__ = ("_formateado",)
+    
+    def __init__(self, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self._formateado: Optional[str] = None
+    
+    @property
+    def formateado(self) -> str:
+        """Texto legible del resultado, renderizado como máximo una vez."""
+        if self._formateado is None:
+            self._formateado = _renderizar_resultado(self)
+        return self._formateado
+    
+    @property
+    def renderizado(self) -> bool:
+        """Indica si la vista formateada ya se ha renderizado."""
+        return self._formateado is not None
+
+
+def como_resultado_herramienta(resultado: Dict[str, Any]) -> ResultadoHerramienta:
+    """Envuelve un resultado en ResultadoHerramienta si aún no lo está."""
+    if isinstance(resultado, ResultadoHerramienta):
+        return resultado
+    return ResultadoHerramienta(resultado or {})
+
+
+# Función utilitaria para formatear resultados de herramientas de forma legible
+def formatear_resultado_herramienta(resultado: Dict[str, Any]) -> str:
+    """Formatea el resultado de una herramienta para mostrar de forma legible"""
+    if isinstance(resultado, ResultadoHerramienta):
+        return resultado.formateado
+    return _renderizar_resultado(resultado)
@@ -0,0 +1,246 @@
+"""
+Grabación y reproducción de transcripciones de sesiones del agente MCP.
+
+Una transcripción es un fichero JSONL:
+- Primera línea: cabecera de la sesión (tipo "sesion") con el contexto inicial
+- Líneas siguientes: un turno por línea (tipo "turno") con el mensaje, la
+  respuesta, el desfase desde el inicio de la sesión y la duración
+
+Las transcripciones grabadas en el shell interactivo permiten reproducir
+sesiones reales sin interfaz, a máxima velocidad o respetando el ritmo
+original, contra cualquier configuración de agente.
+"""
+
+import json
+import math
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Literal, Optional, Union
+
+from mcp.context import MCPContext
+
+# Ritmos de reproducción admitidos
+RitmoReproduccion = Literal["maximo", "original"]
+
+VERSION_TRANSCRIPCION = 1
+
+
+class GrabadorTranscripcion:
+    """
+    Escribe los turnos de una sesión en un fichero JSONL a medida que ocurren.
+
+    Cada línea se vuelca inmediatamente para que una sesión interrumpida
+    conserve los turnos ya completados.
+    """
+
+    def __init__(self, ruta: str, contexto: MCPContext, config: Optional[Dict[str, Any]] = None):
+        """
+        Abre el fichero de transcripción y escribe la cabecera de la sesión.
+
+        Args:
+            ruta: Ruta del fichero JSONL de salida
+            contexto: Contexto MCP de la sesión grabada
+            config: Configuración del agente durante la grabación (opcional)
+        """
+        self.ruta = ruta
+        self.turnos = 0
+        self._inicio = time.perf_counter()
+        self._fichero = open(ruta, "w", encoding="utf-8")
+        self._escribir({
+            "tipo": "sesion",
+            "version": VERSION_TRANSCRIPCION,
+            "fecha": datetime.now().isoformat(),
+            "user_role": contexto.user_role,
+            "paciente": {"id": contexto.paciente["id"], "nombre": contexto.paciente["nombre"]},
+            "visita": {
+                "id": contexto.visita["id"],
+                "profesional_email": contexto.visita["profesional_email"],
+                "motivo_consulta": contexto.visita["motivo_consulta"]
+            },
+            "config": dict(config) if config else {}
+        })
+
+    def _escribir(self, registro: Dict[str, Any]) -> None:
+        self._fichero.write(json.dumps(registro, ensure_ascii=False, default=str) + "\n")
+        self._fichero.flush()
+
+    def registrar_turno(self, mensaje: str, respuesta: str, inicio: float, duracion: float) -> None:
+        """
+        Registra un turno completado.
+
+        Args:
+            mensaje: Mensaje introducido por el usuario
+            respuesta: Respuesta generada por el agente
+            inicio: Instante de inicio del turno (time.perf_counter)
+            duracion: Duración del procesamiento en segundos
+        """
+        self._escribir({
+            "tipo": "turno",
+            "indice": self.turnos,
+            "desfase_s": round(inicio - self._inicio, 6),
+            "duracion_ms": round(duracion * 1000, 3),
+            "mensaje": mensaje,
+            "respuesta": respuesta
+        })
+        self.turnos += 1
+
+    def procesar(self, agente: Any, mensaje: str) -> str:
+        """Procesa un mensaje con el agente y graba el turno resultante."""
+        inicio = time.perf_counter()
+        respuesta = agente.procesar_mensaje(mensaje)
+        self.registrar_turno(mensaje, respuesta, inicio, time.perf_counter() - inicio)
+        return respuesta
+
+    def cerrar(self) -> None:
+        """Cierra el fichero de transcripción."""
+        if not self._fichero.closed:
+            self._fichero.close()
+
+    def __enter__(self) -> "GrabadorTranscripcion":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.cerrar()
+
+
+def cargar_transcripcion(ruta: str) -> Dict[str, Any]:
+    """
+    Carga una transcripción JSONL.
+
+    Args:
+        ruta: Ruta del fichero de transcripción
+
+    Returns:
+        Diccionario con la cabecera ("sesion") y la lista de turnos ("turnos")
+
+    Raises:
+        ValueError: Si el fichero no comienza con una cabecera de sesión
+    """
+    sesion: Optional[Dict[str, Any]] = None
+    turnos: List[Dict[str, Any]] = []
+
+    with open(ruta, encoding="utf-8") as f:
+        for linea in f:
+            if not linea.strip():
+                continue
+            registro = json.loads(linea)
+            if registro.get("tipo") == "sesion":
+                sesion = registro
+            elif registro.get("tipo") == "turno":
+                turnos.append(registro)
+
+    if sesion is None:
+        raise ValueError(f"Transcripción sin cabecera de sesión: {ruta}")
+
+    return {"sesion": sesion, "turnos": turnos}
+
+
+def contexto_desde_transcripcion(sesion: Dict[str, Any], user_role: Optional[str] = None) -> MCPContext:
+    """
+    Reconstruye el contexto inicial de una sesión grabada.
+
+    Args:
+        sesion: Cabecera de la transcripción
+        user_role: Rol con el que reproducir (por defecto el grabado)
+
+    Returns:
+        Nuevo contexto MCP equivalente al de la grabación
+    """
+    return MCPContext(
+        paciente_id=sesion["paciente"]["id"],
+        paciente_nombre=sesion["paciente"]["nombre"],
+        visita_id=sesion["visita"]["id"],
+        profesional_email=sesion["visita"]["profesional_email"],
+        motivo_consulta=sesion["visita"]["motivo_consulta"],
+        user_role=user_role or sesion.get("user_role", "health_professional")
+    )
+
+
+def _percentil(valores: List[float], percentil: float) -> float:
+    """Percentil por el método del rango más cercano."""
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    indice = max(0, math.ceil(percentil / 100 * len(ordenados)) - 1)
+    return ordenados[indice]
+
+
+def reproducir_transcripcion(
+    transcripcion: Union[str, Dict[str, Any]],
+    crear_agente: Optional[Callable[[MCPContext], Any]] = None,
+    ritmo: RitmoReproduccion = "maximo",
+    user_role: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Reproduce una transcripción sin interfaz y mide la latencia por turno.
+
+    Args:
+        transcripcion: Ruta del fichero o transcripción ya cargada
+        crear_agente: Fábrica de agentes a partir del contexto (por defecto se
+            usa la configuración grabada, o create_agent_by_role si se cambia
+            el rol o la transcripción no la incluye)
+        ritmo: "maximo" para encadenar turnos sin espera u "original" para
+            respetar los desfases grabados
+        user_role: Rol con el que reproducir (por defecto el grabado)
+
+    Returns:
+        Diccionario con la latencia de cada turno y un resumen agregado
+
+    Raises:
+        ValueError: Si el ritmo no es válido
+    """
+    if ritmo not in ("maximo", "original"):
+        raise ValueError(f"Ritmo de reproducción no válido: {ritmo}")
+
+    if isinstance(transcripcion, str):
+        transcripcion = cargar_transcripcion(transcripcion)
+
+    config_grabada = transcripcion["sesion"].get("config")
+    if crear_agente is None and config_grabada and user_role is None:
+        from mcp.agent_mcp import MCPAgent
+        crear_agente = lambda ctx: MCPAgent(ctx, config=config_grabada)
+    elif crear_agente is None:
+        from mcp.agent_factory import create_agent_by_role
+        crear_agente = create_agent_by_role
+
+    contexto = contexto_desde_transcripcion(transcripcion["sesion"], user_role)
+    agente = crear_agente(contexto)
+
+    turnos: List[Dict[str, Any]] = []
+    inicio_sesion = time.perf_counter()
+
+    for turno in transcripcion["turnos"]:
+        if ritmo == "original":
+            espera = turno.get("desfase_s", 0) - (time.perf_counter() - inicio_sesion)
+            if espera > 0:
+                time.sleep(espera)
+
+        inicio = time.perf_counter()
+        respuesta = agente.procesar_mensaje(turno["mensaje"])
+        latencia_ms = (time.perf_counter() - inicio) * 1000
+
+        turnos.append({
+            "indice": turno.get("indice", len(turnos)),
+            "latencia_ms": latencia_ms,
+            "latencia_grabada_ms": turno.get("duracion_ms"),
+            "respuesta_coincide": respuesta == turno.get("respuesta")
+        })
+
+    latencias = [t["latencia_ms"] for t in turnos]
+    duracion_total = time.perf_counter() - inicio_sesion
+
+    return {
+        "user_role": contexto.user_role,
+        "ritmo": ritmo,
+        "turnos": turnos,
+        "resumen": {
+            "total_turnos": len(turnos),
+            "duracion_total_s": duracion_total,
+            "latencia_media_ms": sum(latencias) / len(latencias) if latencias else 0.0,
+            "p50_ms": _percentil(latencias, 50),
+            "p95_ms": _percentil(latencias, 95),
+            "p99_ms": _percentil(latencias, 99),
+            "max_ms": max(latencias) if latencias else 0.0,
+            "respuestas_coincidentes": sum(1 for t in turnos if t["respuesta_coincide"])
+        }
+    }
@@ -5,12 +5,13 @@ Este módulo define las rutas relacionadas con la consulta y manejo de
 entradas clínicas almacenadas en el EMR.
 """
 
-from fastapi import APIRouter, HTTPException, Query, status
+from fastapi import APIRouter, HTTPException, Query, Request, Response, status
 from typing import Dict, Any, Optional, List
 from datetime import datetime
 import json
 
 from services.supabase_client import SupabaseClientError
+from core.response_cache import get_response_cache
 from settings import logger
 
 # Crear router
@@ -65,17 +66,21 @@ MOCK_ENTRIES = [
 
 @router.get("")
 async def get_emr_entries(
+    request: Request,
     visit_id: str = Query(..., description="ID de la visita médica"),
     field: Optional[str] = Query(None, description="Campo específico a consultar (ej: anamnesis)"),
     role: Optional[str] = Query(None, description="Rol del creador a filtrar")
-) -> Dict[str, Any]:
+) -> Response:
     """
     Consulta las entradas clínicas almacenadas para una visita.
     
     Este endpoint permite recuperar las entradas clínicas previamente registradas
     para una visita específica, con filtros opcionales por campo y rol del usuario.
+    Las respuestas se sirven desde la caché de respuestas con un ETag; si el
+    cliente envía If-None-Match con el ETag vigente se responde 304.
     
     Args:
+        request: Petición HTTP (para la cabecera If-None-Match)
         visit_id: ID de la visita a consultar (obligatorio)
         field: Campo específico a filtrar (opcional)
         role: Rol del usuario a filtrar (opcional)
@@ -83,6 +88,14 @@ async def get_emr_entries(
     Returns:
         Lista de entradas clínicas que cumplen con los criterios
     """
+    cache = get_response_cache()
+    cache_key = (visit_id, field, role)
+    cached = cache.get(cache_key)
+    if cached is not None:
+        return cache.respond(cached, request.headers.get("if-none-match"))
+    # Generación de la visita antes de leer: si se escribe mientras tanto, no se cachea
+    generation = cache.generation(visit_id)
+    
     logger.info(f"Consultando entradas EMR para visita: {visit_id}, campo: {field or 'todos'}, rol: {role or 'todos'}")
     
     try:
@@ -128,7 +141,8 @@ async def get_emr_entries(
         # Registrar trazabilidad si está habilitada
         logger.info(f"Devolviendo {len(filtered_entries)} entradas para la visita {visit_id}")
         
-        return response
+        cached = cache.put(cache_key, response, generation)
+        return cache.respond(cached, request.headers.get("if-none-match"))
         
     except Exception as e:
         # Manejar excepciones generales
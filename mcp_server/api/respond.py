@@ -5,15 +5,20 @@ Este módulo define las rutas relacionadas con la generación de respuestas
 del MCP, que es el punto principal de integración con el frontend.
 """
 
-from fastapi import APIRouter, Body, HTTPException, status
-from typing import Dict, Any, List, Optional
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from typing import AsyncIterator, Dict, Any, List, Optional
 from datetime import datetime
+import json
 import time
 import logging
 
-from schemas.request import FrontendMCPRequest
-from schemas.response import FrontendMCPResponse, ErrorResponse, ConversationItem, ContextSummary, TraceEntry
-from core.langraph_runner import run_mcp_graph
+from schemas.request import FrontendMCPRequest, MCPRequest
+from schemas.response import FrontendMCPResponse, ErrorResponse, ConversationItem, ContextSummary, TraceEntry, MCPResponse
+from core.langraph_runner import run_mcp_graph, get_graph_processor, get_graph_node_metrics
+from core.admission import admission_slot
+from core.middleware import require_auth
+from core.csrf import require_csrf
 from settings import logger
 
 # Crear router
@@ -25,7 +30,8 @@ router = APIRouter(
 # Logger para el módulo
 logger = logging.getLogger("mcp-server")
 
-@router.post("", response_model=FrontendMCPResponse, responses={500: {"model": ErrorResponse}})
+@router.post("", response_model=FrontendMCPResponse, responses={500: {"model": ErrorResponse}},
+             dependencies=[Depends(admission_slot)])
 async def frontend_mcp_respond(request: FrontendMCPRequest) -> Dict[str, Any]:
     """
     Endpoint optimizado para integración con el frontend de AiDuxCare.
@@ -96,7 +102,7 @@ async def frontend_mcp_respond(request: FrontendMCPRequest) -> Dict[str, Any]:
         
         return error_response
 
-@router.post("/respond", summary="Generar respuesta del copiloto clínico")
+@router.post("/respond", summary="Generar respuesta del copiloto clínico", dependencies=[Depends(admission_slot)])
 async def generate_response(
     request: Dict[str, Any] = Body(...)
 ) -> Dict[str, Any]:
@@ -155,4 +161,137 @@ async def generate_response(
         raise HTTPException(
             status_code=500,
             detail=f"Error al procesar la solicitud: {str(e)}"
-        ) 
\ No newline at end of file
+        )
+
+def _require_graph_processor():
+    """
+    Obtiene el procesador del grafo LangGraph o responde 503 si no está disponible.
+    
+    Returns:
+        Procesador del grafo MCP
+        
+    Raises:
+        HTTPException: Si las dependencias del grafo no están instaladas
+    """
+    processor = get_graph_processor()
+    if processor is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="El grafo LangGraph del MCP no está disponible en este servidor"
+        )
+    return processor
+
+@router.post("/graph", response_model=MCPResponse, summary="Generar respuesta con el grafo LangGraph",
+             dependencies=[Depends(admission_slot)])
+async def graph_respond(request: MCPRequest) -> Dict[str, Any]:
+    """
+    Genera una respuesta ejecutando el grafo LangGraph del MCP.
+    
+    El grafo se ejecuta de forma asíncrona: el bucle de eventos queda libre
+    mientras se ejecutan sus nodos, de modo que las solicitudes concurrentes
+    se solapan.
+    
+    Args:
+        request: Solicitud con visita, rol, mensaje y contexto opcional
+        
+    Returns:
+        Respuesta del MCP con la salida, herramientas usadas y traza
+    """
+    processor = _require_graph_processor()
+    logger.info(f"Ejecutando grafo MCP para visita: {request.visit_id}, rol: {request.role}")
+    
+    return await processor.aprocess_request(
+        visit_id=request.visit_id,
+        role=request.role,
+        user_input=request.user_input,
+        context_override=request.context_override,
+        previous_messages=request.previous_messages
+    )
+
+@router.post("/stream", summary="Generar respuesta con el grafo LangGraph en streaming",
+             dependencies=[Depends(admission_slot)])
+async def graph_respond_stream(request: MCPRequest) -> StreamingResponse:
+    """
+    Ejecuta el grafo LangGraph del MCP emitiendo un evento por nodo.
+    
+    La respuesta es NDJSON: una línea {"event": "node", "node", "update"} por
+    cada nodo completado y una última línea {"event": "final", "data"} con la
+    misma respuesta que /mcp/respond/graph (o {"event": "error", "data"}).
+    
+    Args:
+        request: Solicitud con visita, rol, mensaje y contexto opcional
+        
+    Returns:
+        Respuesta en streaming con los eventos del grafo
+    """
+    processor = _require_graph_processor()
+    logger.info(f"Ejecutando grafo MCP en streaming para visita: {request.visit_id}, rol: {request.role}")
+    
+    async def events() -> AsyncIterator[str]:
+        async for event in processor.astream_request(
+            visit_id=request.visit_id,
+            role=request.role,
+            user_input=request.user_input,
+            context_override=request.context_override,
+            previous_messages=request.previous_messages
+        ):
+            yield json.dumps(event, ensure_ascii=False, default=str) + "\n"
+    
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+@router.get("/nodes", summary="Latencia por nodo del grafo LangGraph")
+async def graph_node_metrics(
+    user_data: Dict[str, Any] = Depends(require_auth)
+) -> Dict[str, Any]:
+    """
+    Devuelve las mediciones por nodo acumuladas por el proceso.
+    
+    Permite ver qué nodo domina la latencia de las solicitudes: para cada
+    nodo, ejecuciones, p50/p95 de tiempo de reloj y de CPU, bytes añadidos
+    al estado y proporción del tiempo total de los nodos.
+    
+    Args:
+        user_data: Datos del usuario autenticado (inyectado por el middleware)
+        
+    Returns:
+        Mediciones por nodo, ordenadas por tiempo total
+    """
+    metrics = _node_metrics_or_503(reset=False)
+    nodes = dict(sorted(metrics.items(), key=lambda item: item[1]["total_wall_ms"], reverse=True))
+    return {
+        "nodes": nodes,
+        "slowest": next(iter(nodes), None),
+        "timestamp": datetime.now().isoformat()
+    }
+
+@router.post("/nodes/reset", summary="Descartar las mediciones por nodo del grafo LangGraph")
+async def reset_graph_node_metrics(
+    user_data: Dict[str, Any] = Depends(require_auth),
+    _: None = Depends(require_csrf)
+) -> Dict[str, Any]:
+    """
+    Descarta las mediciones por nodo acumuladas por el proceso.
+    
+    Args:
+        user_data: Datos del usuario autenticado (inyectado por el middleware)
+        
+    Returns:
+        Número de nodos cuyas mediciones se han descartado
+    """
+    logger.info(f"Usuario {user_data.get('email')} descartando las mediciones por nodo")
+    metrics = _node_metrics_or_503(reset=True)
+    return {
+        "success": True,
+        "nodes_reset": len(metrics),
+        "timestamp": datetime.now().isoformat()
+    }
+
+def _node_metrics_or_503(reset: bool) -> Dict[str, Dict[str, Any]]:
+    """Lee las mediciones por nodo o responde 503 si el grafo no está disponible."""
+    metrics = get_graph_node_metrics(reset=reset)
+    if metrics is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="El grafo LangGraph del MCP no está disponible en este servidor"
+        )
+    return metrics
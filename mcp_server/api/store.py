@@ -6,158 +6,220 @@ de historia clínica en la base de datos.
 """
 
 from fastapi import APIRouter, HTTPException, Depends, Body
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 import logging
-import uuid
 from datetime import datetime
 
 # Importar middleware de autenticación
 from core.middleware import require_auth
 # Importar protección CSRF
 from core.csrf import require_csrf
+# Invalidación de la caché de visitas EMR
+from core.emr_cache import invalidate_visit, publish_visit_change, get_cache_metrics
+# Almacenamiento en Supabase (una entrada o en bloque)
+from services.emr_service import EMREntryExistsError, store_emr_entry, store_emr_entries
+# Caché de respuestas de las consultas de entradas
+from core.response_cache import get_response_cache
 
 # Router para almacenamiento
 router = APIRouter(prefix="/api/mcp", tags=["almacenamiento"])
 
-# Simulación de almacenamiento
-stored_data = {}
+# Campos obligatorios de cada entrada a almacenar
+REQUIRED_FIELDS = ["visit_id", "field", "role", "content"]
 
-def simulate_store_emr_entry(
-    visit_id: str,
-    field: str,
-    role: str,
-    content: str,
-    overwrite: bool = False
+# Máximo de entradas aceptadas en una petición de almacenamiento en bloque
+MAX_BATCH_ENTRIES = 200
+
+@router.post("/store", summary="Almacenar campo de registro clínico")
+async def store_emr_field(
+    request: Dict[str, Any] = Body(...),
+    user_data: Dict[str, Any] = Depends(require_auth),  # Añadir dependencia de autenticación
+    _: None = Depends(require_csrf)  # Añadir dependencia de CSRF
 ) -> Dict[str, Any]:
     """
-    Simula el almacenamiento de una entrada EMR en Supabase.
+    Almacena un campo de registro clínico validado.
+    
+    Usa el mismo almacenamiento que /store/batch (upsert en Supabase sobre
+    la restricción única (visit_id, field)), así que ambos endpoints ven los
+    mismos campos y detectan los conflictos del mismo modo.
     
     Args:
-        visit_id: ID de la visita
-        field: Campo a almacenar (anamnesis, exploracion, etc.)
-        role: Rol del usuario (health_professional, etc.)
-        content: Contenido del campo
-        overwrite: Si se debe sobrescribir en caso de existir
+        request: Datos del campo a almacenar
+        user_data: Datos del usuario autenticado (inyectado por el middleware)
     
     Returns:
-        Dict con la información de la entrada almacenada
+        Dict con confirmación y detalles del almacenamiento
     
     Raises:
-        Exception: Si ocurre algún error en el almacenamiento
+        HTTPException: 422 si falta un campo obligatorio, 409 si el campo ya
+            existe y no se pidió overwrite, 500 ante cualquier otro error
     """
-    logging.info(f"Simulando almacenamiento para visita {visit_id}, campo {field}")
+    # Registrar quién realiza la acción (para auditoría)
+    logging.info(f"Usuario {user_data.get('email')} almacenando campo para visita {request.get('visit_id', 'desconocida')}")
+    
+    # Validar campos obligatorios
+    for field in REQUIRED_FIELDS:
+        if field not in request:
+            raise HTTPException(
+                status_code=422,
+                detail=f"Campo obligatorio '{field}' no proporcionado"
+            )
+    
+    visit_id = request["visit_id"]
+    field = request["field"]
     
-    # Crear clave única para el almacenamiento
-    key = f"{visit_id}:{field}"
+    try:
+        result = await store_emr_entry(
+            visit_id=visit_id,
+            field=field,
+            role=request["role"],
+            content=request["content"],
+            overwrite=request.get("overwrite", False)
+        )
+    except EMREntryExistsError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        logging.error(f"Error inesperado en store_emr_field: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error al almacenar: {str(e)}")
     
-    # Verificar si ya existe
-    if key in stored_data and not overwrite:
-        raise Exception(f"El campo {field} ya existe para la visita {visit_id}")
+    # Los datos en caché de la visita ya no son los vigentes (la caché de
+    # respuestas la invalida el propio servicio)
+    invalidate_visit(visit_id)
+    # Notificar a los contextos activos de la visita
+    publish_visit_change(visit_id, field)
     
-    # Generar entrada
-    entry = {
-        "id": str(uuid.uuid4()),
+    return {
+        "success": True,
+        "entry_id": result.get("id"),
         "visit_id": visit_id,
         "field": field,
-        "role": role,
-        "content": content,
-        "timestamp": datetime.now().isoformat()
+        "timestamp": result.get("timestamp")
     }
+
+def _validate_batch_entries(entries: List[Any]) -> List[Optional[str]]:
+    """
+    Valida en una pasada todas las entradas de un lote.
     
-    # Almacenar
-    stored_data[key] = entry
+    Args:
+        entries: Entradas recibidas en la petición
     
-    return entry
-
-class StoreEMRRequest:
-    """Modelo para petición de almacenamiento EMR."""
-    
-    def __init__(
-        self,
-        visit_id: str,
-        field: str,
-        role: str,
-        content: str,
-        overwrite: bool = False
-    ):
-        self.visit_id = visit_id
-        self.field = field
-        self.role = role
-        self.content = content
-        self.overwrite = overwrite
+    Returns:
+        Un error por entrada (None si la entrada es válida)
+    """
+    errors: List[Optional[str]] = []
+    seen = set()
+    for entry in entries:
+        if not isinstance(entry, dict):
+            errors.append("La entrada debe ser un objeto")
+            continue
+        missing = [field for field in REQUIRED_FIELDS if not entry.get(field)]
+        if missing:
+            errors.append(f"Campo obligatorio '{missing[0]}' no proporcionado")
+            continue
+        key = (entry["visit_id"], entry["field"])
+        if key in seen:
+            errors.append(f"El campo {key[1]} de la visita {key[0]} está repetido en el lote")
+            continue
+        seen.add(key)
+        errors.append(None)
+    return errors
 
-@router.post("/store", summary="Almacenar campo de registro clínico")
-async def store_emr_field(
+@router.post("/store/batch", summary="Almacenar varios campos de registro clínico")
+async def store_emr_fields_batch(
     request: Dict[str, Any] = Body(...),
-    user_data: Dict[str, Any] = Depends(require_auth),  # Añadir dependencia de autenticación
-    _: None = Depends(require_csrf)  # Añadir dependencia de CSRF
+    user_data: Dict[str, Any] = Depends(require_auth),
+    _: None = Depends(require_csrf)
 ) -> Dict[str, Any]:
     """
-    Almacena un campo de registro clínico validado.
+    Almacena en una sola petición varios campos validados de una o más visitas.
+    
+    Todas las entradas se validan antes de escribir y las válidas se guardan
+    con upserts en bloque. Un fallo en una entrada no impide guardar las
+    demás: la respuesta incluye un resultado por entrada, en el mismo orden.
     
     Args:
-        request: Datos del campo a almacenar
+        request: {"entries": [{visit_id, field, role, content, overwrite}, ...]}
         user_data: Datos del usuario autenticado (inyectado por el middleware)
     
     Returns:
-        Dict con confirmación y detalles del almacenamiento
+        Dict con el resultado de cada entrada y los totales almacenados y fallidos
+    
+    Raises:
+        HTTPException: 422 si el lote está vacío o supera MAX_BATCH_ENTRIES
     """
+    entries = request.get("entries")
+    if not isinstance(entries, list) or not entries:
+        raise HTTPException(status_code=422, detail="Se requiere una lista 'entries' no vacía")
+    if len(entries) > MAX_BATCH_ENTRIES:
+        raise HTTPException(
+            status_code=422,
+            detail=f"El lote supera el máximo de {MAX_BATCH_ENTRIES} entradas"
+        )
+    
+    logging.info(f"Usuario {user_data.get('email')} almacenando {len(entries)} campos en bloque")
+    
+    errors = _validate_batch_entries(entries)
+    valid = [i for i, error in enumerate(errors) if error is None]
+    
     try:
-        # Registrar quién realiza la acción (para auditoría)
-        logging.info(f"Usuario {user_data.get('email')} almacenando campo para visita {request.get('visit_id', 'desconocida')}")
-        
-        # Validar campos obligatorios
-        required_fields = ["visit_id", "field", "role", "content"]
-        for field in required_fields:
-            if field not in request:
-                raise HTTPException(
-                    status_code=422,
-                    detail=f"Campo obligatorio '{field}' no proporcionado"
-                )
-        
-        # Extraer valores
-        visit_id = request["visit_id"]
-        field = request["field"]
-        role = request["role"]
-        content = request["content"]
-        overwrite = request.get("overwrite", False)
-        
-        # Simulación de almacenamiento
-        try:
-            result = simulate_store_emr_entry(
-                visit_id=visit_id,
-                field=field,
-                role=role,
-                content=content,
-                overwrite=overwrite
-            )
-            
-            # Respuesta exitosa
-            return {
+        stored = await store_emr_entries([entries[i] for i in valid]) if valid else []
+    except Exception as e:
+        logging.error(f"Error inesperado en store_emr_fields_batch: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error interno del servidor: {str(e)}")
+    
+    stored_by_index = dict(zip(valid, stored))
+    results: List[Dict[str, Any]] = []
+    changed: Dict[str, List[str]] = {}
+    for i, entry in enumerate(entries):
+        result = {
+            "index": i,
+            "visit_id": entry.get("visit_id") if isinstance(entry, dict) else None,
+            "field": entry.get("field") if isinstance(entry, dict) else None
+        }
+        if errors[i] is not None:
+            result.update({"success": False, "status": 422, "error": errors[i]})
+        elif "error" in stored_by_index[i]:
+            error_msg = stored_by_index[i]["error"]
+            status_code = 409 if stored_by_index[i].get("code") == EMREntryExistsError.code else 500
+            result.update({"success": False, "status": status_code, "error": error_msg})
+        else:
+            stored_entry = stored_by_index[i]["entry"]
+            result.update({
                 "success": True,
-                "entry_id": result["id"],
-                "visit_id": visit_id,
-                "field": field,
-                "timestamp": result["timestamp"]
-            }
-        except Exception as e:
-            # Manejar errores específicos de almacenamiento
-            error_msg = str(e)
-            if "ya existe" in error_msg:
-                raise HTTPException(status_code=409, detail=error_msg)
-            elif "no existe" in error_msg:
-                raise HTTPException(status_code=404, detail=error_msg)
-            else:
-                raise HTTPException(status_code=500, detail=f"Error al almacenar: {error_msg}")
-    
-    except HTTPException:
-        # Re-lanzar excepciones HTTP ya procesadas
-        raise
+                "status": 200,
+                "entry_id": stored_entry.get("id"),
+                "timestamp": stored_entry.get("timestamp")
+            })
+            changed.setdefault(entry["visit_id"], []).append(entry["field"])
+        results.append(result)
+
+    # Una invalidación por visita y una notificación por campo almacenado
+    for visit_id, fields in changed.items():
+        invalidate_visit(visit_id)
+        for field in fields:
+            publish_visit_change(visit_id, field)
+
+    stored_count = sum(1 for r in results if r["success"])
+    return {
+        "success": stored_count == len(results),
+        "stored": stored_count,
+        "failed": len(results) - stored_count,
+        "results": results,
+        "timestamp": datetime.now().isoformat()
+    }
+
+@router.get("/store/cache", summary="Métricas de la caché de visitas EMR")
+async def emr_cache_metrics(
+    user_data: Dict[str, Any] = Depends(require_auth)
+) -> Dict[str, Any]:
+    """
+    Devuelve las métricas de aciertos y fallos de la caché de visitas EMR y
+    de la caché de respuestas de /api/mcp/entries.
     
-    except Exception as e:
-        # Error general no esperado
-        logging.error(f"Error inesperado en store_emr_field: {str(e)}")
-        raise HTTPException(
-            status_code=500,
-            detail=f"Error interno del servidor: {str(e)}"
-        ) 
\ No newline at end of file
+    Args:
+        user_data: Datos del usuario autenticado (inyectado por el middleware)
+    
+    Returns:
+        Dict con las métricas de ambas cachés
+    """
+    return {"cache": get_cache_metrics(), "responses": get_response_cache().metrics()}
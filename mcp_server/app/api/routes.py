@@ -8,7 +8,7 @@ Este módulo define las rutas principales del microservicio, incluyendo:
 
 import sys
 import os
-from fastapi import APIRouter, HTTPException, Request, status, Query
+from fastapi import APIRouter, HTTPException, Request, Response, status, Query
 from typing import Dict, Any, Optional, List
 from datetime import datetime
 import time
@@ -19,6 +19,7 @@ sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(os.path.dirna
 # Importar componentes
 from schemas.emr_models import EMRFieldEntry, EMREntriesResponse, StorageError
 from services.supabase_client import get_emr_entries_by_visit, SupabaseClientError
+from core.response_cache import get_response_cache
 from settings import settings, logger
 
 # Crear router
@@ -31,17 +32,21 @@ router = APIRouter()
                500: {"model": StorageError}
            })
 async def get_emr_entries(
+    request: Request,
     visit_id: str = Query(..., description="ID de la visita médica"),
     field: Optional[str] = Query(None, description="Campo específico a consultar (ej: anamnesis)"),
     role: Optional[str] = Query(None, description="Rol del creador a filtrar")
-) -> Dict[str, Any]:
+) -> Response:
     """
     Consulta las entradas clínicas almacenadas para una visita.
     
     Este endpoint permite recuperar las entradas clínicas previamente registradas
     para una visita específica, con filtros opcionales por campo y rol del usuario.
+    Las respuestas se sirven desde la caché de respuestas con un ETag; si el
+    cliente envía If-None-Match con el ETag vigente se responde 304.
     
     Args:
+        request: Petición HTTP (para la cabecera If-None-Match)
         visit_id: ID de la visita a consultar (obligatorio)
         field: Campo específico a filtrar (opcional)
         role: Rol del usuario a filtrar (opcional)
@@ -66,6 +71,14 @@ async def get_emr_entries(
             ).dict()
         )
     
+    cache = get_response_cache()
+    cache_key = (visit_id, field, role)
+    cached = cache.get(cache_key)
+    if cached is not None:
+        return cache.respond(cached, request.headers.get("if-none-match"))
+    # Generación de la visita antes de leer: si se escribe mientras tanto, no se cachea
+    generation = cache.generation(visit_id)
+    
     try:
         # Consultar las entradas
         entries = await get_emr_entries_by_visit(
@@ -116,14 +129,16 @@ async def get_emr_entries(
                 logger.warning(f"Error al procesar entrada: {e}")
                 continue
         
-        # Preparar respuesta
-        return EMREntriesResponse(
+        # Preparar respuesta, serializada una sola vez para la caché
+        response = EMREntriesResponse(
             visit_id=visit_id,
             entries=parsed_entries,
             count=len(parsed_entries),
             filters=filters,
             timestamp=datetime.now()
         )
+        cached = cache.put(cache_key, response, generation)
+        return cache.respond(cached, request.headers.get("if-none-match"))
         
     except SupabaseClientError as e:
         # Para excepciones específicas de Supabase
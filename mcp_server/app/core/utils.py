@@ -104,4 +104,33 @@ def summarize_memory_blocks(memory_blocks: List[Dict[str, Any]], max_blocks: int
     if total_blocks > max_blocks:
         result += f"... y {total_blocks - max_blocks} bloques más"
     
-    return result 
\ No newline at end of file
+    return result 
+
+def summarize_node_update(update: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Convierte la actualización de un nodo del grafo en datos serializables a JSON.
+    
+    Los mensajes se reducen a su contenido y los bloques de memoria a su
+    número, para no reenviar en cada evento el estado acumulado.
+    
+    Args:
+        update: Actualización parcial devuelta por el nodo
+        
+    Returns:
+        Resumen de la actualización
+    """
+    if not update:
+        return {}
+    
+    summary: Dict[str, Any] = {}
+    for key, value in update.items():
+        if key == "messages":
+            summary[key] = [getattr(m, "content", str(m)) for m in value]
+        elif key in ("memory_blocks", "filtered_memory"):
+            summary[key] = len(value)
+        elif key == "context":
+            continue
+        else:
+            summary[key] = value
+    
+    return summary
@@ -15,8 +15,30 @@ from langraph_mcp import (
     build_mcp_graph,
     initialize_context,
     run_graph,
+    arun_graph,
+    astream_graph,
+    get_compiled_app,
+    get_default_graph,
+    warm_up_graph,
+    compiled_app_cache_info,
+    MCPGraphState,
     MCPState
 )
+from langraph_instrumentation import collect_node_timings, get_node_metrics
 
 # Reexportar para que estén disponibles desde este módulo
-__all__ = ['build_mcp_graph', 'initialize_context', 'run_graph', 'MCPState'] 
\ No newline at end of file
+__all__ = [
+    'build_mcp_graph',
+    'initialize_context',
+    'run_graph',
+    'arun_graph',
+    'astream_graph',
+    'get_compiled_app',
+    'get_default_graph',
+    'warm_up_graph',
+    'compiled_app_cache_info',
+    'MCPGraphState',
+    'MCPState',
+    'collect_node_timings',
+    'get_node_metrics'
+]
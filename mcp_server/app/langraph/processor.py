@@ -9,20 +9,24 @@ de trazabilidad y gestión de errores.
 import sys
 import traceback
 import time
-from typing import Dict, Any, List, Optional, Tuple
+from typing import Dict, Any, AsyncIterator, List, Optional, Tuple
 from datetime import datetime
 from langchain_core.messages import HumanMessage, AIMessage
 
 # Importar el MCP implementado con Langraph 
 # Utilizar el wrapper local de langraph_mcp
 from app.langraph.langraph_mcp import (
-    build_mcp_graph,
+    get_default_graph,
+    warm_up_graph,
     initialize_context,
     run_graph,
+    arun_graph,
+    astream_graph,
+    collect_node_timings,
     MCPState
 )
 
-from app.core.utils import create_trace_entry, logger, summarize_memory_blocks
+from app.core.utils import create_trace_entry, logger, summarize_memory_blocks, summarize_node_update
 from app.core.config import settings
 
 class MCPProcessor:
@@ -42,10 +46,188 @@ class MCPProcessor:
         self.debug = debug
         self.trace: List[Dict[str, Any]] = []
         
-        # Inicializar el grafo MCP
+        # Inicializar el grafo MCP y compilarlo una sola vez (calentamiento)
         logger.info(f"Inicializando grafo MCP con modelo: {self.model_name}")
-        self.graph = build_mcp_graph(model_name=self.model_name)
-        logger.info("Grafo MCP inicializado correctamente")
+        inicio = time.perf_counter()
+        self.graph = get_default_graph(self.model_name)
+        self.app = warm_up_graph(self.model_name)
+        logger.info(f"Grafo MCP compilado correctamente en {(time.perf_counter() - inicio) * 1000:.1f} ms")
+    
+    def _prepare_input(
+        self,
+        visit_id: str,
+        role: str,
+        user_input: str,
+        context_override: Optional[Dict[str, Any]],
+        previous_messages: Optional[List[Dict[str, Any]]],
+        trace: List[Dict[str, Any]]
+    ) -> Tuple[Dict[str, Any], List[Any]]:
+        """
+        Construye el contexto y los mensajes de entrada del grafo.
+        
+        Args:
+            visit_id: ID de la visita
+            role: Rol del usuario
+            user_input: Mensaje del usuario
+            context_override: Contexto adicional (opcional)
+            previous_messages: Mensajes previos (opcional)
+            trace: Traza de la solicitud
+            
+        Returns:
+            Tupla (contexto, mensajes)
+        """
+        # Registrar inicio de procesamiento
+        trace.append(create_trace_entry(
+            "request_received",
+            {"visit_id": visit_id, "role": role, "input_length": len(user_input)}
+        ))
+        
+        # Inicializar contexto
+        logger.debug(f"Inicializando contexto para visita: {visit_id}, rol: {role}")
+        context = initialize_context(visit_id=visit_id, user_role=role)
+        
+        # Aplicar override de contexto si existe
+        if context_override:
+            logger.debug("Aplicando override de contexto")
+            for key, value in context_override.items():
+                if key in context:
+                    if isinstance(context[key], dict) and isinstance(value, dict):
+                        context[key].update(value)
+                    else:
+                        context[key] = value
+                else:
+                    context[key] = value
+        
+        # Convertir mensajes previos si existen
+        messages = []
+        if previous_messages:
+            logger.debug(f"Procesando {len(previous_messages)} mensajes previos")
+            for msg in previous_messages:
+                if msg.get("role") == "user":
+                    messages.append(HumanMessage(content=msg.get("content", "")))
+                elif msg.get("role") == "assistant":
+                    messages.append(AIMessage(content=msg.get("content", "")))
+        
+        # Añadir mensaje actual
+        messages.append(HumanMessage(content=user_input))
+        
+        trace.append(create_trace_entry(
+            "context_initialized",
+            {"context_keys": list(context.keys()), "messages_count": len(messages)}
+        ))
+        
+        return context, messages
+    
+    def _append_node_timings(self, trace: List[Dict[str, Any]], timings: List[Dict[str, Any]]) -> None:
+        """
+        Añade a la traza una entrada por cada nodo ejecutado.
+        
+        Args:
+            trace: Traza de la solicitud
+            timings: Mediciones recogidas con collect_node_timings
+        """
+        for timing in timings:
+            metadata = dict(timing)
+            metadata["wall_ms"] = round(metadata["wall_ms"], 3)
+            metadata["cpu_ms"] = round(metadata["cpu_ms"], 3)
+            trace.append(create_trace_entry("node_completed", metadata))
+    
+    def _build_response(
+        self,
+        result: MCPState,
+        messages: List[Any],
+        trace: List[Dict[str, Any]],
+        start_time: float
+    ) -> Dict[str, Any]:
+        """
+        Construye la respuesta del MCP a partir del estado final del grafo.
+        
+        Args:
+            result: Estado final del grafo
+            messages: Mensajes de entrada
+            trace: Traza de la solicitud
+            start_time: Inicio del procesamiento (time.time())
+            
+        Returns:
+            Respuesta del MCP con la salida generada y metadatos
+        """
+        # Extraer respuesta y metadatos
+        if result.messages and len(result.messages) > len(messages):
+            response = result.messages[-1].content
+        else:
+            response = "No se pudo generar una respuesta."
+        
+        # Extraer resultados de herramientas utilizadas
+        tool_results = [
+            {"tool": t.get("tool", "unknown"), "result": t.get("result", "")}
+            for t in result.tool_results
+        ]
+        
+        trace.append(create_trace_entry(
+            "processing_completed",
+            {
+                "response_length": len(response),
+                "tools_used": [t["tool"] for t in tool_results],
+                "memory_blocks": len(result.memory_blocks),
+                "filtered_memory": len(result.filtered_memory),
+                "execution_time": time.time() - start_time
+            }
+        ))
+        
+        # Construir respuesta
+        response_data = {
+            "output": response,
+            "used_tools": tool_results,
+            "trace": trace
+        }
+        
+        # Añadir información de debug si está habilitado
+        if self.debug:
+            response_data["memory_summary"] = summarize_memory_blocks(result.filtered_memory)
+            response_data["token_usage"] = {"total": result.token_count}
+        
+        return response_data
+    
+    def _build_error_response(
+        self,
+        e: Exception,
+        trace: List[Dict[str, Any]],
+        start_time: float
+    ) -> Dict[str, Any]:
+        """
+        Registra un error de procesamiento y construye la respuesta de error.
+        
+        Args:
+            e: Excepción producida
+            trace: Traza de la solicitud
+            start_time: Inicio del procesamiento (time.time())
+            
+        Returns:
+            Respuesta de error del MCP
+        """
+        logger.error(f"Error procesando solicitud MCP: {str(e)}")
+        error_trace = traceback.format_exc()
+        logger.error(error_trace)
+        
+        trace.append(create_trace_entry(
+            "error",
+            {
+                "error_type": type(e).__name__,
+                "error_message": str(e),
+                "execution_time": time.time() - start_time
+            }
+        ))
+        
+        # Construir respuesta de error
+        return {
+            "output": "Se produjo un error al procesar la solicitud.",
+            "error": {
+                "message": str(e),
+                "type": type(e).__name__,
+                "traceback": error_trace if self.debug else None
+            },
+            "trace": trace
+        }
     
     def process_request(
         self,
@@ -58,6 +240,9 @@ class MCPProcessor:
         """
         Procesa una solicitud al MCP y devuelve la respuesta generada.
         
+        Bloquea hasta que termina el grafo; desde código asíncrono (FastAPI)
+        debe usarse aprocess_request.
+        
         Args:
             visit_id: ID de la visita
             role: Rol del usuario
@@ -72,111 +257,107 @@ class MCPProcessor:
         start_time = time.time()
         
         try:
-            # Registrar inicio de procesamiento
-            self.trace.append(create_trace_entry(
-                "request_received",
-                {"visit_id": visit_id, "role": role, "input_length": len(user_input)}
-            ))
-            
-            # Inicializar contexto
-            logger.debug(f"Inicializando contexto para visita: {visit_id}, rol: {role}")
-            context = initialize_context(visit_id=visit_id, user_role=role)
-            
-            # Aplicar override de contexto si existe
-            if context_override:
-                logger.debug("Aplicando override de contexto")
-                for key, value in context_override.items():
-                    if key in context:
-                        if isinstance(context[key], dict) and isinstance(value, dict):
-                            context[key].update(value)
-                        else:
-                            context[key] = value
-                    else:
-                        context[key] = value
-            
-            # Convertir mensajes previos si existen
-            messages = []
-            if previous_messages:
-                logger.debug(f"Procesando {len(previous_messages)} mensajes previos")
-                for msg in previous_messages:
-                    if msg.get("role") == "user":
-                        messages.append(HumanMessage(content=msg.get("content", "")))
-                    elif msg.get("role") == "assistant":
-                        messages.append(AIMessage(content=msg.get("content", "")))
-            
-            # Añadir mensaje actual
-            messages.append(HumanMessage(content=user_input))
-            
-            self.trace.append(create_trace_entry(
-                "context_initialized",
-                {"context_keys": list(context.keys()), "messages_count": len(messages)}
-            ))
+            context, messages = self._prepare_input(
+                visit_id, role, user_input, context_override, previous_messages, self.trace
+            )
             
             # Ejecutar grafo MCP
             logger.debug("Ejecutando grafo MCP")
-            result = run_graph(self.graph, context, messages)
-            
-            # Extraer respuesta y metadatos
-            if result.messages and len(result.messages) > len(messages):
-                response = result.messages[-1].content
-            else:
-                response = "No se pudo generar una respuesta."
+            with collect_node_timings() as timings:
+                result = run_graph(self.app, context, messages)
+            self._append_node_timings(self.trace, timings)
             
-            # Extraer resultados de herramientas utilizadas
-            tool_results = [
-                {"tool": t.get("tool", "unknown"), "result": t.get("result", "")}
-                for t in result.tool_results
-            ]
+            return self._build_response(result, messages, self.trace, start_time)
             
-            self.trace.append(create_trace_entry(
-                "processing_completed",
-                {
-                    "response_length": len(response),
-                    "tools_used": [t["tool"] for t in tool_results],
-                    "memory_blocks": len(result.memory_blocks),
-                    "filtered_memory": len(result.filtered_memory),
-                    "execution_time": time.time() - start_time
-                }
-            ))
+        except Exception as e:
+            return self._build_error_response(e, self.trace, start_time)
+    
+    async def aprocess_request(
+        self,
+        visit_id: str,
+        role: str,
+        user_input: str,
+        context_override: Optional[Dict[str, Any]] = None,
+        previous_messages: Optional[List[Dict[str, Any]]] = None
+    ) -> Dict[str, Any]:
+        """
+        Versión asíncrona de process_request.
+        
+        El bucle de eventos queda libre mientras se ejecutan los nodos del
+        grafo, por lo que las solicitudes concurrentes se solapan. Cada
+        solicitud usa su propia traza (self.trace no se modifica).
+        
+        Args:
+            visit_id: ID de la visita
+            role: Rol del usuario
+            user_input: Mensaje del usuario
+            context_override: Contexto adicional (opcional)
+            previous_messages: Mensajes previos (opcional)
             
-            # Construir respuesta
-            response_data = {
-                "output": response,
-                "used_tools": tool_results,
-                "trace": self.trace
-            }
+        Returns:
+            Respuesta del MCP con la salida generada y metadatos
+        """
+        trace: List[Dict[str, Any]] = []
+        start_time = time.time()
+        
+        try:
+            context, messages = self._prepare_input(
+                visit_id, role, user_input, context_override, previous_messages, trace
+            )
             
-            # Añadir información de debug si está habilitado
-            if self.debug:
-                response_data["memory_summary"] = summarize_memory_blocks(result.filtered_memory)
-                response_data["token_usage"] = {"total": result.token_count}
+            logger.debug("Ejecutando grafo MCP (asíncrono)")
+            with collect_node_timings() as timings:
+                result = await arun_graph(self.app, context, messages)
+            self._append_node_timings(trace, timings)
             
-            return response_data
+            return self._build_response(result, messages, trace, start_time)
             
         except Exception as e:
-            logger.error(f"Error procesando solicitud MCP: {str(e)}")
-            error_trace = traceback.format_exc()
-            logger.error(error_trace)
+            return self._build_error_response(e, trace, start_time)
+    
+    async def astream_request(
+        self,
+        visit_id: str,
+        role: str,
+        user_input: str,
+        context_override: Optional[Dict[str, Any]] = None,
+        previous_messages: Optional[List[Dict[str, Any]]] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Procesa una solicitud emitiendo un evento por cada nodo del grafo.
+        
+        Args:
+            visit_id: ID de la visita
+            role: Rol del usuario
+            user_input: Mensaje del usuario
+            context_override: Contexto adicional (opcional)
+            previous_messages: Mensajes previos (opcional)
             
-            self.trace.append(create_trace_entry(
-                "error",
-                {
-                    "error_type": type(e).__name__,
-                    "error_message": str(e),
-                    "execution_time": time.time() - start_time
-                }
-            ))
+        Yields:
+            Eventos {"event": "node", "node", "update"} a medida que terminan
+            los nodos y un último {"event": "final", "data"} con la misma
+            respuesta que aprocess_request (o {"event": "error", "data"})
+        """
+        trace: List[Dict[str, Any]] = []
+        start_time = time.time()
+        
+        try:
+            context, messages = self._prepare_input(
+                visit_id, role, user_input, context_override, previous_messages, trace
+            )
             
-            # Construir respuesta de error
-            return {
-                "output": "Se produjo un error al procesar la solicitud.",
-                "error": {
-                    "message": str(e),
-                    "type": type(e).__name__,
-                    "traceback": error_trace if self.debug else None
-                },
-                "trace": self.trace
-            }
+            logger.debug("Ejecutando grafo MCP (streaming)")
+            with collect_node_timings() as timings:
+                async for kind, data in astream_graph(self.app, context, messages):
+                    if kind == "node":
+                        node_name, update = data
+                        yield {"event": "node", "node": node_name, "update": summarize_node_update(update)}
+                    else:
+                        self._append_node_timings(trace, timings)
+                        yield {"event": "final", "data": self._build_response(data, messages, trace, start_time)}
+                    
+        except Exception as e:
+            yield {"event": "error", "data": self._build_error_response(e, trace, start_time)}
 
 # Instancia global del procesador
 mcp_processor = MCPProcessor(
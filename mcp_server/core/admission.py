@@ -0,0 +1,195 @@
+"""
+Control de admisión para los endpoints que ejecutan el grafo MCP.
+
+Limita las solicitudes en curso a settings.MAX_CONCURRENT_REQUESTS y deja
+esperar como mucho settings.MAX_QUEUED_REQUESTS más. Cuando la cola está
+llena, la solicitud se rechaza de inmediato con 429 y una cabecera
+Retry-After estimada a partir del tiempo medio de servicio, en lugar de
+acumular trabajo que acabaría superando el timeout del cliente.
+"""
+
+import asyncio
+import logging
+import math
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, Optional
+
+from fastapi import HTTPException, status
+
+from settings import settings
+
+logger = logging.getLogger("mcp-server")
+
+# Peso de cada nueva muestra en la media móvil del tiempo de servicio
+SERVICE_TIME_SMOOTHING = 0.2
+
+
+class AdmissionRejected(Exception):
+    """La solicitud no se admite porque la cola de espera está llena."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Servidor saturado, reintentar en {retry_after} s")
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Semáforo con cola de espera acotada para el bucle de eventos del servidor.
+
+    Las solicitudes admitidas se atienden en orden de llegada.
+    """
+
+    def __init__(self, max_concurrent: int, max_queued: int, initial_service_time: float = 1.0):
+        """
+        Inicializa el controlador.
+
+        Args:
+            max_concurrent: Solicitudes que pueden ejecutarse a la vez
+            max_queued: Solicitudes que pueden esperar turno
+            initial_service_time: Tiempo de servicio (s) supuesto antes de medir ninguno
+        """
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queued = max(0, max_queued)
+        self._active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._service_time = initial_service_time
+        self._stats = {"admitted": 0, "waited": 0, "rejected": 0}
+
+    def retry_after(self) -> int:
+        """
+        Estima en cuántos segundos habrá un hueco en la cola.
+
+        Returns:
+            Segundos (mínimo 1) para la cabecera Retry-After
+        """
+        turns = (len(self._waiters) + 1) / self.max_concurrent
+        return max(1, math.ceil(self._service_time * turns))
+
+    async def acquire(self) -> None:
+        """
+        Espera turno para ejecutar una solicitud.
+
+        Raises:
+            AdmissionRejected: Si todos los huecos y la cola están ocupados
+        """
+        if self._active < self.max_concurrent and not self._waiters:
+            self._active += 1
+            self._stats["admitted"] += 1
+            return
+
+        if len(self._waiters) >= self.max_queued:
+            self._stats["rejected"] += 1
+            raise AdmissionRejected(self.retry_after())
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self._stats["waited"] += 1
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # El hueco ya se había cedido a esta solicitud: pasarlo a la siguiente
+                self.release()
+            else:
+                self._waiters.remove(waiter)
+            raise
+        self._stats["admitted"] += 1
+
+    def release(self, service_time: Optional[float] = None) -> None:
+        """
+        Libera el hueco de una solicitud terminada.
+
+        Args:
+            service_time: Duración de la solicitud (s), para estimar Retry-After
+        """
+        if service_time is not None:
+            self._service_time += SERVICE_TIME_SMOOTHING * (service_time - self._service_time)
+
+        # Ceder el hueco directamente al primero de la cola
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._active -= 1
+
+    def metrics(self) -> Dict[str, Any]:
+        """
+        Devuelve el estado del controlador.
+
+        Returns:
+            Límites, solicitudes en curso y en cola, contadores (admitidas, que
+            esperaron turno, rechazadas) y tiempo medio de servicio
+        """
+        return {
+            "max_concurrent": self.max_concurrent,
+            "max_queued": self.max_queued,
+            "active": self._active,
+            "queued": len(self._waiters),
+            "service_time_ms": round(self._service_time * 1000, 1),
+            **self._stats
+        }
+
+
+_controller: Optional[AdmissionController] = None
+
+
+def get_admission_controller() -> AdmissionController:
+    """
+    Devuelve el controlador de admisión del proceso, creado a partir de settings.
+
+    Returns:
+        Controlador de admisión compartido
+    """
+    global _controller
+    if _controller is None:
+        _controller = AdmissionController(
+            max_concurrent=settings.MAX_CONCURRENT_REQUESTS,
+            max_queued=settings.MAX_QUEUED_REQUESTS
+        )
+    return _controller
+
+
+def configure_admission(max_concurrent: int, max_queued: int) -> AdmissionController:
+    """
+    Sustituye el controlador de admisión del proceso.
+
+    Args:
+        max_concurrent: Solicitudes que pueden ejecutarse a la vez
+        max_queued: Solicitudes que pueden esperar turno
+
+    Returns:
+        Nuevo controlador de admisión
+    """
+    global _controller
+    _controller = AdmissionController(max_concurrent=max_concurrent, max_queued=max_queued)
+    return _controller
+
+
+async def admission_slot() -> AsyncIterator[None]:
+    """
+    Dependencia de FastAPI que reserva un hueco durante toda la solicitud.
+
+    El hueco se libera cuando termina la respuesta, incluidas las respuestas
+    en streaming.
+
+    Raises:
+        HTTPException: 429 con Retry-After si la cola de espera está llena
+    """
+    controller = get_admission_controller()
+    try:
+        await controller.acquire()
+    except AdmissionRejected as e:
+        logger.warning(f"Solicitud rechazada por saturación: {controller.metrics()}")
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        controller.release(time.perf_counter() - start)
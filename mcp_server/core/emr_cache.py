@@ -0,0 +1,113 @@
+"""
+Acceso a la caché de visitas EMR del agente MCP desde el servidor.
+
+Reexporta la caché compartida del paquete mcp (ubicado en la raíz del
+proyecto) y permite invalidar una visita cuando se almacenan campos
+nuevos, además de publicar el cambio en el feed de cambios local para que
+los contextos activos de la visita se actualicen. Si el paquete mcp no está
+disponible, estas operaciones no hacen nada.
+"""
+
+import sys
+import os
+import logging
+from typing import Any, Dict, Optional
+
+# Añadir la raíz del proyecto al path para importar el paquete mcp
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+logger = logging.getLogger(__name__)
+
+try:
+    from mcp.cache_emr import obtener_cache_emr
+    from mcp.feed_cambios import ConsumidorCambios, obtener_fuente_cambios_local
+except ImportError:
+    obtener_cache_emr = None
+    ConsumidorCambios = None
+    obtener_fuente_cambios_local = None
+
+# Consumidor del feed de cambios local, lanzado en el arranque del servidor
+_consumer: Optional["ConsumidorCambios"] = None
+
+
+def invalidate_visit(visit_id: str) -> bool:
+    """
+    Invalida los datos en caché de una visita tras una escritura.
+
+    Args:
+        visit_id: ID de la visita modificada
+
+    Returns:
+        True si la visita estaba en caché
+    """
+    if obtener_cache_emr is None:
+        return False
+    invalidated = obtener_cache_emr().invalidar(visit_id)
+    logger.debug(f"Caché EMR invalidada para visita {visit_id} (estaba en caché: {invalidated})")
+    return invalidated
+
+
+def publish_visit_change(visit_id: str, field: Optional[str] = None) -> Optional[int]:
+    """
+    Publica el cambio de una visita en el feed de cambios local.
+
+    Args:
+        visit_id: ID de la visita modificada
+        field: Campo modificado (opcional)
+
+    Returns:
+        Número de secuencia del evento, o None si el feed no está disponible
+        o no hay ningún consumidor que lo lea
+    """
+    if obtener_fuente_cambios_local is None:
+        return None
+    source = obtener_fuente_cambios_local()
+    if not source.tiene_consumidor:
+        return None
+    return source.publicar(visit_id, field)
+
+
+async def start_change_consumer() -> bool:
+    """
+    Lanza el consumidor del feed de cambios local (evento de arranque del servidor).
+
+    Returns:
+        True si el consumidor quedó en marcha
+    """
+    global _consumer
+    if ConsumidorCambios is None:
+        return False
+    if _consumer is None:
+        _consumer = ConsumidorCambios(obtener_fuente_cambios_local())
+    _consumer.iniciar()
+    logger.info("Consumidor del feed de cambios EMR iniciado")
+    return True
+
+
+async def stop_change_consumer() -> None:
+    """Detiene el consumidor del feed de cambios local (evento de apagado)."""
+    global _consumer
+    if _consumer is not None:
+        await _consumer.detener()
+        _consumer = None
+        logger.info("Consumidor del feed de cambios EMR detenido")
+
+
+def get_cache_metrics() -> Dict[str, Any]:
+    """
+    Devuelve las métricas de aciertos y fallos de la caché de visitas.
+
+    Returns:
+        Dict con las métricas de la caché y del feed de cambios, o vacío si
+        la caché no está disponible
+    """
+    if obtener_cache_emr is None:
+        return {}
+    metrics = obtener_cache_emr().metricas()
+    source = obtener_fuente_cambios_local()
+    metrics["feed"] = {
+        "pending": source.pendientes(),
+        "dropped": source.descartados(),
+        "consumer": _consumer.metricas() if _consumer is not None else None
+    }
+    return metrics
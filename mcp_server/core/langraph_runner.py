@@ -6,6 +6,7 @@ que implementa el Model Context Protocol (MCP).
 """
 
 import os
+import asyncio
 import logging
 from typing import Dict, Any, List, Optional
 import json
@@ -62,9 +63,8 @@ class MCPGraphRunner:
         """
         logger.info(f"Recibida solicitud para visita: {visit_id}, rol: {role}")
         
-        # Simular tiempo de procesamiento
-        import time
-        time.sleep(0.2)  # 200ms de "procesamiento"
+        # Simular tiempo de procesamiento sin bloquear el bucle de eventos
+        await asyncio.sleep(0.2)  # 200ms de "procesamiento"
         
         # Generar respuesta simulada según el campo
         response = self._generate_simulated_response(user_input, field, role)
@@ -142,6 +142,27 @@ class MCPGraphRunner:
 # Instancia global del runner
 mcp_runner = MCPGraphRunner(model_name=os.environ.get("LLM_MODEL", "gpt-3.5-turbo"))
 
+# Procesador del grafo LangGraph real (app.langraph.processor). Se importa la
+# primera vez que se usa: compila el grafo y requiere las dependencias de LangChain
+_graph_processor = None
+
+def get_graph_processor():
+    """
+    Devuelve el procesador del grafo LangGraph del MCP.
+    
+    Returns:
+        Instancia de MCPProcessor, o None si sus dependencias no están disponibles
+    """
+    global _graph_processor
+    if _graph_processor is None:
+        try:
+            from app.langraph.processor import mcp_processor
+        except ImportError as e:
+            logger.warning(f"Procesador LangGraph no disponible: {str(e)}")
+            return None
+        _graph_processor = mcp_processor
+    return _graph_processor
+
 async def run_mcp_graph(
     visit_id: str,
     role: str,
@@ -191,4 +212,24 @@ async def run_mcp_graph(
             "trace": [
                 {"action": "error", "metadata": {"error": str(e), "timestamp": datetime.now().isoformat()}}
             ]
-        } 
\ No newline at end of file
+        }
+
+def get_graph_node_metrics(reset: bool = False) -> Optional[Dict[str, Dict[str, Any]]]:
+    """
+    Resume las mediciones por nodo del grafo LangGraph del proceso.
+    
+    Args:
+        reset: Si se descartan las mediciones después de leerlas
+    
+    Returns:
+        Percentiles por nodo, o None si el grafo no está disponible
+    """
+    if get_graph_processor() is None:
+        return None
+    
+    from langraph_instrumentation import get_node_metrics
+    registry = get_node_metrics()
+    summary = registry.summary()
+    if reset:
+        registry.reset()
+    return summary
@@ -0,0 +1,225 @@
+"""
+Caché de respuestas serializadas para las consultas de entradas EMR.
+
+El frontend consulta /mcp/entries con frecuencia y, mientras la visita no
+cambia, recibe siempre la misma respuesta. Esta caché guarda el cuerpo ya
+serializado de cada consulta (visit_id, field, role) junto con un ETag
+fuerte calculado sobre esos bytes, de modo que una consulta repetida cuesta
+una búsqueda en un diccionario: se devuelven los bytes tal cual o, si el
+cliente envía If-None-Match con el mismo ETag, un 304 sin cuerpo.
+
+Las rutas de almacenamiento invalidan todas las consultas de la visita
+modificada. Como en la caché de visitas del MCP, cada invalidación cambia la
+generación de la visita: una consulta que leyó los datos antes de una
+escritura no guarda su respuesta. El TTL acota lo que puede durar una
+respuesta obsoleta cuando la visita se modifica fuera de este proceso.
+"""
+
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+from fastapi import Response
+from fastapi.encoders import jsonable_encoder
+
+from settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Clave de una consulta de entradas: (visit_id, field, role)
+CacheKey = Tuple[str, Optional[str], Optional[str]]
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    """Respuesta serializada en caché."""
+
+    body: bytes
+    etag: str
+    created: float
+
+
+class ResponseCache:
+    """
+    Caché LRU de respuestas serializadas con ETag.
+
+    No es segura entre hilos; se usa desde el bucle de eventos del servidor.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 30.0):
+        """
+        Inicializa la caché.
+
+        Args:
+            max_entries: Máximo de respuestas guardadas
+            ttl: Segundos de validez de cada respuesta (0 para no caducar)
+        """
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl
+        self._entries: "OrderedDict[CacheKey, CachedResponse]" = OrderedDict()
+        # Generación de cada visita invalidada: número de secuencia de su última
+        # invalidación. Se conservan como mucho max_entries; las descartadas
+        # quedan cubiertas por _evicted_generation, que solo puede crecer.
+        self._generations: "OrderedDict[str, int]" = OrderedDict()
+        self._sequence = 0
+        self._evicted_generation = 0
+        self._stats = {"hits": 0, "misses": 0, "not_modified": 0, "invalidations": 0, "stale_fills": 0}
+
+    def get(self, key: CacheKey) -> Optional[CachedResponse]:
+        """
+        Busca la respuesta de una consulta.
+
+        Args:
+            key: (visit_id, field, role) de la consulta
+
+        Returns:
+            Respuesta en caché, o None si no existe o ha caducado
+        """
+        cached = self._entries.get(key)
+        if cached is not None and self.ttl and time.monotonic() - cached.created > self.ttl:
+            del self._entries[key]
+            cached = None
+        if cached is None:
+            self._stats["misses"] += 1
+            return None
+        self._entries.move_to_end(key)
+        self._stats["hits"] += 1
+        return cached
+
+    def generation(self, visit_id: str) -> int:
+        """
+        Devuelve la generación actual de una visita.
+
+        Se lee antes de consultar los datos y se pasa a put(): si la visita se
+        invalida entretanto, la respuesta no se guarda.
+
+        Args:
+            visit_id: ID de la visita
+
+        Returns:
+            Generación de la visita
+        """
+        return self._generations.get(visit_id, self._evicted_generation)
+
+    def put(self, key: CacheKey, payload: Any, generation: Optional[int] = None) -> CachedResponse:
+        """
+        Serializa una respuesta y la guarda con su ETag.
+
+        Args:
+            key: (visit_id, field, role) de la consulta
+            payload: Respuesta (dict o modelo Pydantic)
+            generation: Generación de la visita leída antes de la consulta; si
+                ha cambiado, la respuesta se devuelve pero no se guarda
+
+        Returns:
+            Respuesta serializada
+        """
+        body = json.dumps(
+            jsonable_encoder(payload), ensure_ascii=False, separators=(",", ":")
+        ).encode("utf-8")
+        etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+        cached = CachedResponse(body=body, etag=etag, created=time.monotonic())
+        if generation is not None and generation != self.generation(key[0]):
+            # La visita se modificó mientras se consultaba: los datos pueden ser anteriores
+            self._stats["stale_fills"] += 1
+            return cached
+        self._entries[key] = cached
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return cached
+
+    def invalidate_visit(self, visit_id: str) -> int:
+        """
+        Descarta todas las consultas en caché de una visita.
+
+        Args:
+            visit_id: ID de la visita modificada
+
+        Returns:
+            Número de respuestas descartadas
+        """
+        self._sequence += 1
+        self._generations[visit_id] = self._sequence
+        self._generations.move_to_end(visit_id)
+        while len(self._generations) > self.max_entries:
+            _, evicted = self._generations.popitem(last=False)
+            self._evicted_generation = evicted
+
+        keys = [key for key in self._entries if key[0] == visit_id]
+        for key in keys:
+            del self._entries[key]
+        self._stats["invalidations"] += len(keys)
+        if keys:
+            logger.debug(f"Descartadas {len(keys)} respuestas en caché de la visita {visit_id}")
+        return len(keys)
+
+    def clear(self) -> None:
+        """Vacía la caché; las consultas en curso tampoco guardan su respuesta."""
+        self._entries.clear()
+        self._sequence += 1
+        self._generations.clear()
+        self._evicted_generation = self._sequence
+
+    def respond(self, cached: CachedResponse, if_none_match: Optional[str]) -> Response:
+        """
+        Construye la respuesta HTTP para una respuesta en caché.
+
+        Args:
+            cached: Respuesta en caché
+            if_none_match: Valor de la cabecera If-None-Match de la petición
+
+        Returns:
+            304 sin cuerpo si el cliente ya tiene esta versión; si no, 200 con los bytes
+        """
+        headers = {"ETag": cached.etag, "Cache-Control": "no-cache"}
+        if if_none_match and _etag_matches(if_none_match, cached.etag):
+            self._stats["not_modified"] += 1
+            return Response(status_code=304, headers=headers)
+        return Response(content=cached.body, media_type="application/json", headers=headers)
+
+    def metrics(self) -> Dict[str, Any]:
+        """
+        Devuelve el estado de la caché.
+
+        Returns:
+            Tamaño, límites y contadores (aciertos, fallos, 304, descartes y
+            respuestas no guardadas por una escritura concurrente)
+        """
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            **self._stats
+        }
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """Compara If-None-Match con un ETag (comparación débil, RFC 9110)."""
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+_cache: Optional[ResponseCache] = None
+
+
+def get_response_cache() -> ResponseCache:
+    """
+    Devuelve la caché de respuestas del proceso, creada a partir de settings.
+
+    Returns:
+        Caché de respuestas compartida
+    """
+    global _cache
+    if _cache is None:
+        _cache = ResponseCache(
+            max_entries=settings.RESPONSE_CACHE_MAX_ENTRIES,
+            ttl=settings.RESPONSE_CACHE_TTL
+        )
+    return _cache
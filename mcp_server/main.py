@@ -124,6 +124,20 @@ async def startup_event():
     
     # Verificar conexión con servicios externos
     logger.info("Conexión con Supabase configurada")
+    
+    # Abrir el pool de conexiones HTTP compartido con Supabase
+    try:
+        from services.http_pool import startup_http_client
+        await startup_http_client()
+    except ImportError as e:
+        logger.warning(f"Pool HTTP de Supabase no disponible: {str(e)}")
+    
+    # Consumir el feed de cambios local que alimentan las rutas de almacenamiento
+    try:
+        from core.emr_cache import start_change_consumer
+        await start_change_consumer()
+    except ImportError as e:
+        logger.warning(f"Feed de cambios EMR no disponible: {str(e)}")
     if os.environ.get("ENABLE_TRACE", "TRUE").upper() == "TRUE":
         logger.info("Trazabilidad con Langfuse habilitada")
     else:
@@ -133,6 +147,20 @@ async def startup_event():
 async def shutdown_event():
     """Evento de cierre del servidor."""
     logger.info("Deteniendo servidor MCP")
+    
+    # Detener el consumidor del feed de cambios
+    try:
+        from core.emr_cache import stop_change_consumer
+        await stop_change_consumer()
+    except ImportError:
+        pass
+    
+    # Cerrar las conexiones del pool HTTP de Supabase
+    try:
+        from services.http_pool import shutdown_http_client
+        await shutdown_http_client()
+    except ImportError:
+        pass
 
 # Para ejecución directa
 if __name__ == "__main__":
@@ -7,22 +7,50 @@ endpoints del API, separando la lógica de la presentación.
 
 from .emr_service import (
     store_emr_entry,
-    get_emr_entries_by_visit
+    store_emr_entries,
+    get_emr_entries_by_visit,
+    EMREntryExistsError
 )
 
 from .supabase_client import (
+    get_supabase_client,
     get_supabase_status,
     SupabaseClientError,
-    store_validation_alerts
+    store_validation_alerts,
+    store_validation_alerts_bulk
+)
+
+from .query_builder import (
+    QueryBuilder,
+    QueryResult
+)
+
+from .http_pool import (
+    startup_http_client,
+    shutdown_http_client,
+    get_pool_metrics
 )
 
 __all__ = [
     # Servicios EMR
     "store_emr_entry",
+    "store_emr_entries",
     "get_emr_entries_by_visit",
+    "EMREntryExistsError",
     
     # Servicios Supabase
+    "get_supabase_client",
     "get_supabase_status",
     "SupabaseClientError",
-    "store_validation_alerts"
+    "store_validation_alerts",
+    "store_validation_alerts_bulk",
+    
+    # Constructor de consultas
+    "QueryBuilder",
+    "QueryResult",
+    
+    # Pool HTTP compartido
+    "startup_http_client",
+    "shutdown_http_client",
+    "get_pool_metrics"
 ] 
\ No newline at end of file
@@ -9,7 +9,8 @@ from typing import Dict, Any, List, Optional
 from datetime import datetime
 import logging
 
-from .supabase_client import SupabaseClient, SupabaseClientError
+from .supabase_client import SupabaseClientError, get_supabase_client
+from core.response_cache import get_response_cache
 from settings import settings
 
 # Configurar logging
@@ -17,6 +18,16 @@ logger = logging.getLogger(__name__)
 
 # Configuración de tablas y campos
 EMR_TABLE = "emr_entries"
+# Restricción única de emr_entries (sql/add_emr_entries_visit_field_unique.sql)
+EMR_UNIQUE_KEY = ["visit_id", "field"]
+# Columnas que usan las consultas de entradas (EMRFieldEntry más el id)
+EMR_ENTRY_COLUMNS = "id,field,content,role,timestamp,source,validated"
+
+class EMREntryExistsError(SupabaseClientError):
+    """La visita ya tiene una entrada para el campo y no se pidió sobrescribirla."""
+    
+    # Código de error de los resultados de store_emr_entries
+    code = "entry_exists"
 
 async def store_emr_entry(
     visit_id: str, 
@@ -39,21 +50,11 @@ async def store_emr_entry(
         Datos de la entrada almacenada
         
     Raises:
+        EMREntryExistsError: Si ya existe una entrada para el campo y no se pidió overwrite
         SupabaseClientError: Si hay un error con Supabase
     """
     # Inicializar cliente Supabase
-    supabase = SupabaseClient()
-    
-    # Verificar si ya existe una entrada para este campo
-    existing = await supabase.query(
-        EMR_TABLE,
-        "select", 
-        {"columns": "id", "filters": {"visit_id": visit_id, "field": field}}
-    )
-    
-    # Si existe y no se permite sobrescribir, error
-    if existing and not overwrite:
-        raise SupabaseClientError(f"Ya existe una entrada para el campo '{field}' en la visita {visit_id}")
+    supabase = get_supabase_client()
     
     # Datos para almacenar
     entry_data = {
@@ -66,23 +67,96 @@ async def store_emr_entry(
         "validated": True
     }
     
-    # Si existe, actualizar; si no, crear
-    if existing:
-        result = await supabase.query(
-            EMR_TABLE, 
-            "update",
-            {"data": entry_data, "filters": {"id": existing[0]["id"]}}
-        )
-        logger.info(f"Actualizada entrada EMR: {field} para visita {visit_id}")
-    else:
-        result = await supabase.query(
-            EMR_TABLE,
-            "insert",
-            {"data": entry_data}
-        )
-        logger.info(f"Creada nueva entrada EMR: {field} para visita {visit_id}")
-    
-    return result[0] if result else None
+    # Una sola petición: con overwrite se fusiona sobre la entrada existente;
+    # sin él, la inserción es condicional y no devuelve nada si ya existía
+    result = await supabase.upsert(
+        EMR_TABLE,
+        entry_data,
+        on_conflict=EMR_UNIQUE_KEY,
+        ignore_duplicates=not overwrite
+    )
+    
+    if not result:
+        raise EMREntryExistsError(f"Ya existe una entrada para el campo '{field}' en la visita {visit_id}")
+    
+    # Las consultas en caché de la visita ya no son las vigentes
+    get_response_cache().invalidate_visit(visit_id)
+    logger.info(f"Almacenada entrada EMR: {field} para visita {visit_id}")
+    return result[0]
+
+async def store_emr_entries(entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Almacena varias entradas validadas del EMR con upserts en bloque.
+    
+    Las entradas con overwrite se fusionan en una sola petición y las demás
+    se envían en otra como inserción condicional, así que el lote cuesta como
+    mucho dos peticiones sea cual sea su tamaño. Cada par (visit_id, field)
+    debe aparecer una sola vez en el lote.
+    
+    Args:
+        entries: Entradas con visit_id, field, role, content y overwrite (opcional)
+    
+    Returns:
+        Un resultado por entrada, en el mismo orden: {"entry": datos
+        almacenados} o {"error": mensaje}, con "code" igual a
+        EMREntryExistsError.code si la entrada ya existía
+    """
+    supabase = get_supabase_client()
+    timestamp = datetime.now().isoformat()
+    results: List[Dict[str, Any]] = [{} for _ in entries]
+    
+    groups: Dict[bool, List[int]] = {True: [], False: []}
+    for i, entry in enumerate(entries):
+        groups[bool(entry.get("overwrite", False))].append(i)
+    
+    for overwrite, indices in groups.items():
+        if not indices:
+            continue
+        rows = [
+            {
+                "visit_id": entries[i]["visit_id"],
+                "field": entries[i]["field"],
+                "content": entries[i]["content"],
+                "role": entries[i]["role"],
+                "timestamp": timestamp,
+                "source": "mcp",
+                "validated": True
+            }
+            for i in indices
+        ]
+        
+        try:
+            stored = await supabase.upsert(
+                EMR_TABLE,
+                rows,
+                on_conflict=EMR_UNIQUE_KEY,
+                ignore_duplicates=not overwrite,
+                columns="id,visit_id,field,timestamp"
+            )
+        except SupabaseClientError as e:
+            logger.error(f"Error al almacenar {len(rows)} entradas EMR en bloque: {str(e)}")
+            for i in indices:
+                results[i] = {"error": str(e)}
+            continue
+        
+        # Sin overwrite, las entradas que ya existían no se devuelven
+        stored_by_key = {(row["visit_id"], row["field"]): row for row in stored}
+        for i in indices:
+            key = (entries[i]["visit_id"], entries[i]["field"])
+            if key in stored_by_key:
+                results[i] = {"entry": stored_by_key[key]}
+            else:
+                results[i] = {
+                    "error": f"Ya existe una entrada para el campo '{key[1]}' en la visita {key[0]}",
+                    "code": EMREntryExistsError.code
+                }
+    
+    cache = get_response_cache()
+    for visit_id in {entries[i]["visit_id"] for i, r in enumerate(results) if "entry" in r}:
+        cache.invalidate_visit(visit_id)
+    
+    logger.info(f"Almacenadas {sum(1 for r in results if 'entry' in r)} de {len(entries)} entradas EMR en bloque")
+    return results
 
 async def get_emr_entries_by_visit(
     visit_id: str,
@@ -98,28 +172,26 @@ async def get_emr_entries_by_visit(
         role: Rol del usuario a filtrar (opcional)
         
     Returns:
-        Lista de entradas que cumplen con los criterios
+        Lista de entradas que cumplen con los criterios (columnas de
+        EMR_ENTRY_COLUMNS), por orden cronológico
         
     Raises:
         SupabaseClientError: Si hay un error con Supabase
     """
     # Inicializar cliente Supabase
-    supabase = SupabaseClient()
+    supabase = get_supabase_client()
     
-    # Construir filtros
-    filters = {"visit_id": visit_id}
+    # Construir la consulta: proyección, filtros y orden se resuelven en el servidor
+    query = supabase.table(EMR_TABLE).select(EMR_ENTRY_COLUMNS).eq("visit_id", visit_id)
     if field:
-        filters["field"] = field
+        query = query.eq("field", field)
     if role:
-        filters["role"] = role
+        query = query.eq("role", role)
+    query = query.order("timestamp")
     
     # Ejecutar consulta
     try:
-        results = await supabase.query(
-            EMR_TABLE,
-            "select",
-            {"filters": filters}
-        )
+        results = (await query.execute()).data
         
         logger.info(f"Recuperadas {len(results)} entradas EMR para visita {visit_id}")
         return results
@@ -0,0 +1,145 @@
+"""
+Cliente HTTP compartido para las llamadas a Supabase.
+
+Mantiene un único httpx.AsyncClient por proceso, con conexiones keep-alive
+reutilizables y HTTP/2 cuando el paquete h2 está instalado, para no pagar
+el establecimiento TCP/TLS en cada lectura o escritura del EMR. Se abre en
+el evento de arranque de FastAPI y se cierra en el de apagado; fuera del
+servidor (scripts, pruebas) se crea la primera vez que se usa.
+
+Los límites del pool y los timeouts se leen de settings.
+"""
+
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional
+
+import httpx
+
+from settings import settings
+
+logger = logging.getLogger(__name__)
+
+try:
+    import h2  # noqa: F401  (httpx lo necesita para HTTP/2)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+_client: Optional[httpx.AsyncClient] = None
+
+_metrics: Dict[str, Any] = {
+    "requests": 0,
+    "in_flight": 0,
+    "peak_in_flight": 0,
+    "saturated": 0,
+    "pool_timeouts": 0,
+    "clients_created": 0
+}
+
+
+def _create_client() -> httpx.AsyncClient:
+    """Crea el cliente HTTP con los límites y timeouts de settings."""
+    limits = httpx.Limits(
+        max_connections=settings.SUPABASE_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.SUPABASE_MAX_KEEPALIVE,
+        keepalive_expiry=settings.SUPABASE_KEEPALIVE_EXPIRY
+    )
+    timeout = httpx.Timeout(settings.SUPABASE_TIMEOUT, pool=settings.SUPABASE_POOL_TIMEOUT)
+    http2 = settings.SUPABASE_HTTP2 and HTTP2_AVAILABLE
+    _metrics["clients_created"] += 1
+    logger.info(
+        f"Cliente HTTP de Supabase creado (max_connections={limits.max_connections}, "
+        f"keepalive={limits.max_keepalive_connections}, http2={http2})"
+    )
+    return httpx.AsyncClient(limits=limits, timeout=timeout, http2=http2)
+
+
+async def startup_http_client() -> httpx.AsyncClient:
+    """
+    Abre el cliente HTTP compartido (evento de arranque del servidor).
+
+    Returns:
+        Cliente HTTP compartido
+    """
+    global _client
+    if _client is None or _client.is_closed:
+        _client = _create_client()
+    return _client
+
+
+async def shutdown_http_client() -> None:
+    """Cierra el cliente HTTP compartido y sus conexiones (evento de apagado)."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+        logger.info("Cliente HTTP de Supabase cerrado")
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Devuelve el cliente HTTP compartido, creándolo si aún no existe.
+
+    Returns:
+        Cliente HTTP compartido
+    """
+    global _client
+    if _client is None or _client.is_closed:
+        _client = _create_client()
+    return _client
+
+
+@asynccontextmanager
+async def pooled_request() -> AsyncIterator[httpx.AsyncClient]:
+    """
+    Contexto para una petición con el cliente compartido que registra la ocupación del pool.
+
+    Yields:
+        Cliente HTTP compartido
+
+    Raises:
+        httpx.PoolTimeout: Si no queda conexión libre dentro del timeout del pool
+    """
+    client = get_http_client()
+    _metrics["requests"] += 1
+    _metrics["in_flight"] += 1
+    _metrics["peak_in_flight"] = max(_metrics["peak_in_flight"], _metrics["in_flight"])
+    if _metrics["in_flight"] > settings.SUPABASE_MAX_CONNECTIONS:
+        # Hay más peticiones en curso que conexiones: esta esperará turno
+        _metrics["saturated"] += 1
+    try:
+        yield client
+    except httpx.PoolTimeout:
+        _metrics["pool_timeouts"] += 1
+        raise
+    finally:
+        _metrics["in_flight"] -= 1
+
+
+def get_pool_metrics() -> Dict[str, Any]:
+    """
+    Devuelve el estado del pool de conexiones.
+
+    Returns:
+        Límites, peticiones (totales, en curso, pico, que tuvieron que esperar
+        conexión, timeouts de pool) y conexiones abiertas y ociosas
+    """
+    connections = []
+    if _client is not None and not _client.is_closed:
+        # httpcore no expone el pool públicamente; si cambia, se omiten las conexiones
+        pool = getattr(getattr(_client, "_transport", None), "_pool", None)
+        connections = list(getattr(pool, "connections", []) or [])
+
+    return {
+        "open": _client is not None and not _client.is_closed,
+        "http2": settings.SUPABASE_HTTP2 and HTTP2_AVAILABLE,
+        "max_connections": settings.SUPABASE_MAX_CONNECTIONS,
+        "max_keepalive_connections": settings.SUPABASE_MAX_KEEPALIVE,
+        "connections": len(connections),
+        "idle_connections": sum(1 for c in connections if c.is_idle()),
+        "utilization": round(_metrics["in_flight"] / settings.SUPABASE_MAX_CONNECTIONS, 3),
+        "timestamp": time.time(),
+        **_metrics
+    }
@@ -0,0 +1,290 @@
+"""
+Constructor de consultas para SupabaseClient.
+
+Permite expresar en el servidor la proyección, los filtros, el orden y la
+paginación de una consulta, en lugar de traer filas completas o tablas
+enteras y filtrarlas en Python:
+
+    result = await client.table("emr_entries") \
+        .select("field,content", count="exact") \
+        .eq("visit_id", "VIS001") \
+        .in_("field", ["anamnesis", "plan"]) \
+        .gte("timestamp", "2023-09-01") \
+        .order("timestamp", desc=True) \
+        .limit(10) \
+        .execute()
+
+La consulta se reduce a un diccionario de parámetros que SupabaseClient
+traduce a parámetros de PostgREST (conexión real) o evalúa sobre los datos
+simulados, con el mismo resultado en ambos casos.
+"""
+
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .supabase_client import SupabaseClient
+
+# Operadores de comparación soportados (nombres de PostgREST)
+OPERATORS = ("eq", "neq", "gt", "gte", "lt", "lte", "in")
+
+# Caracteres que obligan a entrecomillar un valor dentro de in.(...)
+_RESERVED = set(',()"\\ ')
+
+
+@dataclass
+class QueryResult:
+    """Resultado de una consulta: filas y, si se pidió, el total sin paginar."""
+
+    data: List[Dict[str, Any]] = field(default_factory=list)
+    count: Optional[int] = None
+
+
+class QueryBuilder:
+    """
+    Consulta select sobre una tabla, construida encadenando métodos.
+
+    Cada método devuelve el propio constructor; execute() ejecuta la consulta.
+    """
+
+    def __init__(self, client: "SupabaseClient", table: str):
+        """
+        Inicializa el constructor.
+
+        Args:
+            client: Cliente que ejecutará la consulta
+            table: Nombre de la tabla
+        """
+        self._client = client
+        self._table = table
+        self._params: Dict[str, Any] = {"filters": {}, "conditions": []}
+
+    def select(self, columns: str = "*", count: Optional[str] = None) -> "QueryBuilder":
+        """
+        Define las columnas a devolver.
+
+        Args:
+            columns: Columnas separadas por comas ("*" para todas)
+            count: "exact" para obtener también el total de filas sin paginar
+        """
+        self._params["columns"] = columns
+        if count is not None:
+            if count != "exact":
+                raise ValueError(f"Tipo de conteo no soportado: {count}")
+            self._params["count"] = count
+        return self
+
+    def eq(self, column: str, value: Any) -> "QueryBuilder":
+        """Filtra las filas con column == value."""
+        self._params["filters"][column] = value
+        return self
+
+    def neq(self, column: str, value: Any) -> "QueryBuilder":
+        """Filtra las filas con column != value."""
+        return self._condition(column, "neq", value)
+
+    def gt(self, column: str, value: Any) -> "QueryBuilder":
+        """Filtra las filas con column > value."""
+        return self._condition(column, "gt", value)
+
+    def gte(self, column: str, value: Any) -> "QueryBuilder":
+        """Filtra las filas con column >= value."""
+        return self._condition(column, "gte", value)
+
+    def lt(self, column: str, value: Any) -> "QueryBuilder":
+        """Filtra las filas con column < value."""
+        return self._condition(column, "lt", value)
+
+    def lte(self, column: str, value: Any) -> "QueryBuilder":
+        """Filtra las filas con column <= value."""
+        return self._condition(column, "lte", value)
+
+    def in_(self, column: str, values: Iterable[Any]) -> "QueryBuilder":
+        """Filtra las filas cuyo valor de column está en values."""
+        return self._condition(column, "in", list(values))
+
+    def order(self, column: str, desc: bool = False) -> "QueryBuilder":
+        """
+        Ordena por una columna; llamadas sucesivas añaden criterios de desempate.
+
+        Args:
+            column: Columna de ordenación
+            desc: Si el orden es descendente
+        """
+        self._params.setdefault("order", []).append((column, desc))
+        return self
+
+    def limit(self, count: int) -> "QueryBuilder":
+        """Devuelve como máximo count filas."""
+        self._params["limit"] = count
+        return self
+
+    def offset(self, count: int) -> "QueryBuilder":
+        """Omite las primeras count filas."""
+        self._params["offset"] = count
+        return self
+
+    def range(self, start: int, end: int) -> "QueryBuilder":
+        """Devuelve las filas de las posiciones start a end, ambas incluidas."""
+        self._params["offset"] = start
+        self._params["limit"] = end - start + 1
+        return self
+
+    @property
+    def params(self) -> Dict[str, Any]:
+        """Parámetros de la consulta, en el formato de SupabaseClient.query."""
+        return self._params
+
+    async def execute(self) -> QueryResult:
+        """
+        Ejecuta la consulta.
+
+        Returns:
+            Filas y total (si se pidió count="exact")
+
+        Raises:
+            SupabaseClientError: Si hay un error en la operación
+        """
+        return await self._client.select(self._table, self._params)
+
+    def _condition(self, column: str, operator: str, value: Any) -> "QueryBuilder":
+        self._params["conditions"].append((column, operator, value))
+        return self
+
+
+def _format_value(value: Any) -> str:
+    """Formatea un valor para un filtro de PostgREST."""
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value)
+
+
+def _format_list_item(value: Any) -> str:
+    """Formatea un elemento de in.(...), entrecomillándolo si es necesario."""
+    text = _format_value(value)
+    if _RESERVED & set(text):
+        text = '"' + text.replace("\\", "\\\\").replace('"', '\\"') + '"'
+    return text
+
+
+def to_postgrest_params(params: Dict[str, Any]) -> List[Tuple[str, str]]:
+    """
+    Traduce los parámetros de una consulta a parámetros de URL de PostgREST.
+
+    Args:
+        params: Parámetros de la consulta (columns, filters, conditions,
+            order, limit, offset)
+
+    Returns:
+        Lista de pares (nombre, valor); una columna puede repetirse, por
+        ejemplo en un rango gte/lt
+    """
+    query: List[Tuple[str, str]] = []
+    if params.get("columns"):
+        query.append(("select", params["columns"]))
+    for column, value in (params.get("filters") or {}).items():
+        query.append((column, f"eq.{_format_value(value)}"))
+    for column, operator, value in params.get("conditions") or []:
+        if operator == "in":
+            query.append((column, "in.(" + ",".join(_format_list_item(v) for v in value) + ")"))
+        elif operator in OPERATORS:
+            query.append((column, f"{operator}.{_format_value(value)}"))
+        else:
+            raise ValueError(f"Operador no soportado: {operator}")
+    if params.get("order"):
+        query.append(("order", ",".join(
+            f"{column}.{'desc' if desc else 'asc'}" for column, desc in params["order"]
+        )))
+    if params.get("limit") is not None:
+        query.append(("limit", str(params["limit"])))
+    if params.get("offset"):
+        query.append(("offset", str(params["offset"])))
+    return query
+
+
+def parse_content_range(header: Optional[str]) -> Optional[int]:
+    """
+    Extrae el total de filas de una cabecera Content-Range de PostgREST.
+
+    Args:
+        header: Valor de la cabecera ("0-9/42", "*/0")
+
+    Returns:
+        Total de filas, o None si la cabecera no lo incluye
+    """
+    if not header or "/" not in header:
+        return None
+    total = header.rsplit("/", 1)[1]
+    return int(total) if total.isdigit() else None
+
+
+def _matches(row: Dict[str, Any], column: str, operator: str, value: Any) -> bool:
+    """Evalúa una condición sobre una fila, con la semántica de SQL para NULL."""
+    current = row.get(column)
+    if operator == "eq":
+        return current == value
+    if operator == "in":
+        return current in value
+    if current is None or value is None:
+        return False
+    if operator == "neq":
+        return current != value
+    if operator == "gt":
+        return current > value
+    if operator == "gte":
+        return current >= value
+    if operator == "lt":
+        return current < value
+    if operator == "lte":
+        return current <= value
+    raise ValueError(f"Operador no soportado: {operator}")
+
+
+def project(rows: List[Dict[str, Any]], columns: Optional[str]) -> List[Dict[str, Any]]:
+    """
+    Conserva solo las columnas pedidas de cada fila.
+
+    Args:
+        rows: Filas completas
+        columns: Columnas separadas por comas ("*" o None para todas)
+
+    Returns:
+        Filas con las columnas pedidas
+    """
+    if not columns or columns.strip() == "*":
+        return rows
+    names = [name.strip() for name in columns.split(",") if name.strip()]
+    return [{name: row.get(name) for name in names} for row in rows]
+
+
+def apply_query(rows: List[Dict[str, Any]], params: Dict[str, Any]) -> QueryResult:
+    """
+    Evalúa una consulta sobre filas en memoria, como lo haría PostgREST.
+
+    Args:
+        rows: Filas de la tabla
+        params: Parámetros de la consulta
+
+    Returns:
+        Filas resultantes y total (si se pidió count="exact")
+    """
+    conditions = [(c, "eq", v) for c, v in (params.get("filters") or {}).items()]
+    conditions += list(params.get("conditions") or [])
+    results = [row for row in rows if all(_matches(row, *cond) for cond in conditions)]
+
+    # Ordenar del criterio menos al más significativo; como en PostgreSQL, los
+    # NULL van al final en orden ascendente y al principio en descendente
+    for column, desc in reversed(params.get("order") or []):
+        present = [row for row in results if row.get(column) is not None]
+        missing = [row for row in results if row.get(column) is None]
+        present = sorted(present, key=lambda row: row[column], reverse=desc)
+        results = missing + present if desc else present + missing
+
+    total = len(results) if params.get("count") == "exact" else None
+    offset = params.get("offset") or 0
+    limit = params.get("limit")
+    results = results[offset:offset + limit if limit is not None else None]
+
+    return QueryResult(data=project(results, params.get("columns")), count=total)
@@ -13,10 +13,15 @@ from settings import settings
 from datetime import datetime
 import uuid
 from core.validators import ValidationAlert
+from .http_pool import pooled_request, get_pool_metrics
+from .query_builder import QueryBuilder, QueryResult, apply_query, parse_content_range, project, to_postgrest_params
 
 # Configurar logging
 logger = logging.getLogger(__name__)
 
+# Máximo de alertas de validación por petición de inserción en bloque
+ALERTS_BULK_CHUNK_SIZE = 500
+
 class SupabaseClientError(Exception):
     """Excepción personalizada para errores del cliente Supabase."""
     pass
@@ -32,9 +37,14 @@ class SupabaseClient:
     def __init__(self):
         """Inicializa el cliente con la configuración de conexión."""
         # Para pruebas, si no hay URL de Supabase, usar datos de prueba
-        self.is_mock = not settings.SUPABASE_URL or not settings.SUPABASE_KEY
+        self.key = settings.SUPABASE_KEY or settings.SUPABASE_SERVICE_ROLE_KEY
+        self.is_mock = not settings.SUPABASE_URL or not self.key
         self.base_url = settings.SUPABASE_URL
-        self.key = settings.SUPABASE_KEY
+        self.headers = {
+            "apikey": self.key,
+            "Authorization": f"Bearer {self.key}",
+            "Content-Type": "application/json"
+        }
         
         if self.is_mock:
             logger.warning("Usando datos de prueba para Supabase")
@@ -77,7 +87,7 @@ class SupabaseClient:
         
         Args:
             table: Nombre de la tabla
-            operation: Tipo de operación (select, insert, update, delete)
+            operation: Tipo de operación (select, insert, upsert, update, delete)
             params: Parámetros específicos de la operación
             
         Returns:
@@ -86,36 +96,33 @@ class SupabaseClient:
         Raises:
             SupabaseClientError: Si hay un error en la operación
         """
+        if operation == "select":
+            return (await self.select(table, params)).data
+        
         if self.is_mock:
             return await self._mock_query(table, operation, params)
         
-        # Implementación real para conexión con Supabase
+        # Implementación real para conexión con Supabase (cliente HTTP compartido)
         try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                headers = {
-                    "apikey": self.key,
-                    "Authorization": f"Bearer {self.key}",
-                    "Content-Type": "application/json"
-                }
+            async with pooled_request() as client:
+                headers = dict(self.headers)
                 
-                if operation == "select":
-                    # Construir URL con filtros
+                if operation == "insert":
                     url = f"{self.base_url}/rest/v1/{table}"
                     headers["Prefer"] = "return=representation"
-                    
-                    # Añadir filtros como parámetros de query
-                    query_params = {}
-                    if "filters" in params:
-                        for key, value in params["filters"].items():
-                            query_params[key] = f"eq.{value}"
-                    
-                    # Ejecutar consulta
-                    response = await client.get(url, headers=headers, params=query_params)
+                    # Devolver solo las columnas pedidas de las filas insertadas
+                    query_params = {"select": params["columns"]} if params.get("columns") else {}
+                    response = await client.post(url, headers=headers, params=query_params, json=params["data"])
                 
-                elif operation == "insert":
+                elif operation == "upsert":
+                    # Inserción con resolución de conflictos sobre una restricción única
                     url = f"{self.base_url}/rest/v1/{table}"
-                    headers["Prefer"] = "return=representation"
-                    response = await client.post(url, headers=headers, json=params["data"])
+                    resolution = "ignore-duplicates" if params.get("ignore_duplicates") else "merge-duplicates"
+                    headers["Prefer"] = f"resolution={resolution},return=representation"
+                    query_params = {"on_conflict": ",".join(params["on_conflict"])}
+                    if params.get("columns"):
+                        query_params["select"] = params["columns"]
+                    response = await client.post(url, headers=headers, params=query_params, json=params["data"])
                 
                 elif operation == "update":
                     url = f"{self.base_url}/rest/v1/{table}"
@@ -154,6 +161,99 @@ class SupabaseClient:
         except Exception as e:
             raise SupabaseClientError(f"Error al ejecutar operación en Supabase: {str(e)}")
     
+    def table(self, table: str) -> QueryBuilder:
+        """
+        Inicia una consulta select sobre una tabla.
+        
+        Args:
+            table: Nombre de la tabla
+            
+        Returns:
+            Constructor de la consulta
+        """
+        return QueryBuilder(self, table)
+    
+    async def select(self, table: str, params: Dict[str, Any]) -> QueryResult:
+        """
+        Ejecuta una consulta select con proyección, filtros, orden y paginación en el servidor.
+        
+        Args:
+            table: Nombre de la tabla
+            params: Parámetros de la consulta (columns, filters, conditions,
+                order, limit, offset, count), normalmente de un QueryBuilder
+            
+        Returns:
+            Filas y total (si se pidió count="exact")
+            
+        Raises:
+            SupabaseClientError: Si hay un error en la operación
+        """
+        if self.is_mock:
+            return apply_query(self.mock_data.get(table, []), params)
+        
+        try:
+            async with pooled_request() as client:
+                headers = dict(self.headers)
+                if params.get("count") == "exact":
+                    headers["Prefer"] = "count=exact"
+                
+                response = await client.get(
+                    f"{self.base_url}/rest/v1/{table}",
+                    headers=headers,
+                    params=to_postgrest_params(params)
+                )
+                
+                if response.status_code >= 400:
+                    raise SupabaseClientError(f"Error en Supabase: {response.text}")
+                
+                return QueryResult(
+                    data=response.json(),
+                    count=parse_content_range(response.headers.get("Content-Range"))
+                )
+        
+        except httpx.RequestError as e:
+            raise SupabaseClientError(f"Error de conexión con Supabase: {str(e)}")
+        except Exception as e:
+            raise SupabaseClientError(f"Error al ejecutar operación en Supabase: {str(e)}")
+    
+    async def upsert(self,
+                     table: str,
+                     data: Union[Dict[str, Any], List[Dict[str, Any]]],
+                     on_conflict: List[str],
+                     ignore_duplicates: bool = False,
+                     columns: Optional[str] = None
+                     ) -> List[Dict[str, Any]]:
+        """
+        Inserta o actualiza registros en una sola petición.
+        
+        Requiere una restricción única sobre las columnas de on_conflict. Con
+        ignore_duplicates la petición es una inserción condicional: las filas
+        que ya existen no se modifican ni se devuelven.
+        
+        Args:
+            table: Nombre de la tabla
+            data: Registro o lista de registros
+            on_conflict: Columnas de la restricción única
+            ignore_duplicates: Si se conservan las filas existentes en vez de fusionarlas
+            columns: Columnas a devolver de cada registro (todas si se omite)
+            
+        Returns:
+            Registros insertados o actualizados
+            
+        Raises:
+            SupabaseClientError: Si hay un error en la operación
+        """
+        return await self.query(
+            table,
+            "upsert",
+            {
+                "data": data,
+                "on_conflict": on_conflict,
+                "ignore_duplicates": ignore_duplicates,
+                "columns": columns
+            }
+        )
+    
     async def _mock_query(self, 
                         table: str, 
                         operation: str, 
@@ -174,22 +274,35 @@ class SupabaseClient:
         if table not in self.mock_data:
             self.mock_data[table] = []
         
-        if operation == "select":
-            # Filtrar datos según los criterios
-            results = self.mock_data[table]
-            
-            if "filters" in params:
-                for key, value in params["filters"].items():
-                    results = [item for item in results if item.get(key) == value]
-            
-            return results
+        if operation == "insert":
+            # Añadir uno o varios registros (array, como en PostgREST)
+            rows = params["data"] if isinstance(params["data"], list) else [params["data"]]
+            new_records = []
+            for row in rows:
+                new_id = str(len(self.mock_data[table]) + 1)
+                new_record = {"id": new_id, **row}
+                self.mock_data[table].append(new_record)
+                new_records.append(new_record)
+            return project(new_records, params.get("columns"))
         
-        elif operation == "insert":
-            # Añadir un nuevo registro
-            new_id = str(len(self.mock_data[table]) + 1)
-            new_record = {**params["data"], "id": new_id}
-            self.mock_data[table].append(new_record)
-            return [new_record]
+        elif operation == "upsert":
+            # Insertar o fusionar según las columnas de la restricción única
+            rows = params["data"] if isinstance(params["data"], list) else [params["data"]]
+            results = []
+            for row in rows:
+                existing = next((
+                    i for i, item in enumerate(self.mock_data[table])
+                    if all(item.get(col) == row.get(col) for col in params["on_conflict"])
+                ), None)
+                if existing is None:
+                    new_record = {"id": str(len(self.mock_data[table]) + 1), **row}
+                    self.mock_data[table].append(new_record)
+                    results.append(new_record)
+                elif not params.get("ignore_duplicates"):
+                    self.mock_data[table][existing] = {**self.mock_data[table][existing], **row}
+                    results.append(self.mock_data[table][existing])
+            
+            return project(results, params.get("columns"))
         
         elif operation == "update":
             # Actualizar registros existentes
@@ -234,14 +347,31 @@ class SupabaseClient:
         else:
             raise SupabaseClientError(f"Operación no soportada: {operation}")
 
+# Cliente Supabase compartido por los servicios del proceso
+_supabase_client: Optional[SupabaseClient] = None
+
+def get_supabase_client() -> SupabaseClient:
+    """
+    Devuelve el cliente Supabase compartido del proceso.
+    
+    Todas sus operaciones usan el pool de conexiones HTTP compartido.
+    
+    Returns:
+        Cliente Supabase
+    """
+    global _supabase_client
+    if _supabase_client is None:
+        _supabase_client = SupabaseClient()
+    return _supabase_client
+
 async def get_supabase_status() -> Dict[str, Any]:
     """
     Verifica el estado de la conexión con Supabase.
     
     Returns:
-        Información sobre el estado de la conexión
+        Información sobre el estado de la conexión y del pool HTTP
     """
-    client = SupabaseClient()
+    client = get_supabase_client()
     
     try:
         if client.is_mock:
@@ -252,16 +382,13 @@ async def get_supabase_status() -> Dict[str, Any]:
             }
         
         # Intentar una operación simple para verificar conexión
-        result = await client.query(
-            "emr_entries",
-            "select",
-            {"filters": {}, "limit": 1}
-        )
+        await client.table("emr_entries").select("id").limit(1).execute()
         
         return {
             "connected": True,
             "url": client.base_url,
-            "mock": False
+            "mock": False,
+            "pool": get_pool_metrics()
         }
     
     except Exception as e:
@@ -270,46 +397,125 @@ async def get_supabase_status() -> Dict[str, Any]:
             "connected": False,
             "url": client.base_url if not client.is_mock else "mock://supabase.local",
             "error": str(e),
-            "mock": client.is_mock
+            "mock": client.is_mock,
+            "pool": get_pool_metrics()
         }
 
-async def store_validation_alerts(visit_id: str, alerts: List[ValidationAlert]) -> bool:
+def _alert_rows(visit_id: str, alerts: List[ValidationAlert]) -> List[Dict[str, Any]]:
     """
-    Almacena alertas de validación en la tabla validation_alerts de Supabase.
+    Construye las filas de validation_alerts para las alertas de una visita.
+    
+    Args:
+        visit_id: ID de la visita validada
+        alerts: Alertas de validación
+        
+    Returns:
+        Filas a insertar, con su id ya asignado
+    """
+    timestamp = datetime.now().isoformat()
+    return [
+        {
+            "id": str(uuid.uuid4()),
+            "visit_id": visit_id,
+            "field": alert.field if alert.field else "general",
+            "severity": "warning",  # Por defecto todas son warnings
+            "type": alert.type,
+            "message": alert.message,
+            "timestamp": timestamp
+        }
+        for alert in alerts
+    ]
+
+async def store_validation_alerts_bulk(
+    visit_id: str,
+    alerts: List[ValidationAlert],
+    chunk_size: int = ALERTS_BULK_CHUNK_SIZE
+) -> Dict[str, Any]:
+    """
+    Almacena las alertas de una visita con inserciones en bloque.
+    
+    Todas las alertas se envían como un array en una sola petición (o en una
+    por cada chunk_size alertas). PostgREST inserta cada petición en una
+    transacción, así que si un bloque falla se reintentan sus filas una a
+    una para guardar las válidas e identificar las que fallan.
     
     Args:
         visit_id: ID de la visita validada
         alerts: Lista de alertas de validación encontradas
+        chunk_size: Máximo de alertas por petición
         
     Returns:
-        True si el almacenamiento fue exitoso, False en caso contrario
+        Diccionario con los ids almacenados (en el orden de las alertas, None
+        si la alerta falló), las alertas fallidas (índice y error) y el
+        número de peticiones realizadas
     """
-    client = SupabaseClient()
-    logger.info(f"Almacenando {len(alerts)} alertas de validación para visita {visit_id}")
+    client = get_supabase_client()
+    rows = _alert_rows(visit_id, alerts)
+    ids: List[Optional[str]] = [None] * len(rows)
+    failed: List[Dict[str, Any]] = []
+    round_trips = 0
+    chunk_size = max(1, chunk_size)
     
-    timestamp = datetime.now().isoformat()
+    logger.info(f"Almacenando {len(rows)} alertas de validación para visita {visit_id} en bloque")
     
-    try:
-        for alert in alerts:
-            alert_data = {
-                "id": str(uuid.uuid4()),
-                "visit_id": visit_id,
-                "field": alert.field if alert.field else "general",
-                "severity": "warning",  # Por defecto todas son warnings
-                "type": alert.type,
-                "message": alert.message,
-                "timestamp": timestamp
-            }
-            
-            await client.query(
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        round_trips += 1
+        try:
+            stored = await client.query(
                 table="validation_alerts",
                 operation="insert",
-                params={"data": alert_data}
+                params={"data": chunk, "columns": "id"}
             )
+            for offset, row in enumerate(chunk):
+                stored_row = stored[offset] if offset < len(stored) else {}
+                ids[start + offset] = stored_row.get("id", row["id"])
+            continue
+        except SupabaseClientError as e:
+            if len(chunk) == 1:
+                failed.append({"index": start, "error": str(e)})
+                continue
+            logger.warning(f"Fallo en bloque de {len(chunk)} alertas, reintentando una a una: {str(e)}")
         
-        logger.info(f"Alertas almacenadas correctamente para visita {visit_id}")
-        return True
+        # Aislar las filas inválidas del bloque fallido
+        for offset, row in enumerate(chunk):
+            round_trips += 1
+            try:
+                stored = await client.query(
+                    table="validation_alerts",
+                    operation="insert",
+                    params={"data": [row], "columns": "id"}
+                )
+                ids[start + offset] = stored[0].get("id", row["id"]) if stored else row["id"]
+            except SupabaseClientError as e:
+                failed.append({"index": start + offset, "error": str(e)})
+    
+    if failed:
+        logger.error(f"No se pudieron almacenar {len(failed)} de {len(rows)} alertas para visita {visit_id}")
+    else:
+        logger.info(f"Alertas almacenadas correctamente para visita {visit_id} ({round_trips} peticiones)")
     
+    return {
+        "ids": ids,
+        "stored": len(rows) - len(failed),
+        "failed": failed,
+        "round_trips": round_trips
+    }
+
+async def store_validation_alerts(visit_id: str, alerts: List[ValidationAlert]) -> bool:
+    """
+    Almacena alertas de validación en la tabla validation_alerts de Supabase.
+    
+    Args:
+        visit_id: ID de la visita validada
+        alerts: Lista de alertas de validación encontradas
+        
+    Returns:
+        True si se almacenaron todas las alertas, False en caso contrario
+    """
+    try:
+        result = await store_validation_alerts_bulk(visit_id, alerts)
+        return not result["failed"]
     except Exception as e:
         logger.error(f"Error al almacenar alertas de validación: {str(e)}")
-        return False 
\ No newline at end of file
+        return False
@@ -59,10 +59,22 @@ class Settings(BaseSettings):
     # Configuración Supabase
     SUPABASE_URL: str = Field(default="", description="URL de Supabase")
     SUPABASE_SERVICE_ROLE_KEY: str = Field(default="", description="Clave de servicio de Supabase")
+    SUPABASE_KEY: str = Field(default="", description="Clave de API de Supabase (por defecto, la clave de servicio)")
+    
+    # Pool de conexiones HTTP hacia Supabase
+    SUPABASE_HTTP2: bool = Field(default=True, description="Usar HTTP/2 si el paquete h2 está instalado")
+    SUPABASE_MAX_CONNECTIONS: int = Field(default=20, description="Máximo de conexiones abiertas con Supabase")
+    SUPABASE_MAX_KEEPALIVE: int = Field(default=10, description="Máximo de conexiones ociosas que se mantienen abiertas")
+    SUPABASE_KEEPALIVE_EXPIRY: float = Field(default=30.0, description="Segundos que se mantiene abierta una conexión ociosa")
+    SUPABASE_TIMEOUT: float = Field(default=10.0, description="Timeout de las peticiones a Supabase en segundos")
+    SUPABASE_POOL_TIMEOUT: float = Field(default=5.0, description="Segundos máximos de espera por una conexión libre")
     
     # Timeouts y configuraciones de rendimiento
     REQUEST_TIMEOUT: int = Field(default=60, description="Timeout para solicitudes en segundos")
     MAX_CONCURRENT_REQUESTS: int = Field(default=10, description="Máximo de solicitudes concurrentes")
+    MAX_QUEUED_REQUESTS: int = Field(default=20, description="Máximo de solicitudes en espera antes de responder 429")
+    RESPONSE_CACHE_TTL: float = Field(default=30.0, description="Segundos de validez de las respuestas de entradas EMR en caché")
+    RESPONSE_CACHE_MAX_ENTRIES: int = Field(default=1024, description="Máximo de respuestas de entradas EMR en caché")
     
     @field_validator("CORS_ORIGINS")
     def parse_cors_origins(cls, v):
@@ -0,0 +1,65 @@
+-- Restricción única (visit_id, field) en emr_entries
+-- Permite almacenar cada campo de una visita con un único upsert
+-- (on_conflict=visit_id,field) en lugar de consultar y después insertar o actualizar
+--
+-- Las entradas duplicadas de un mismo campo no se borran sin rastro: las
+-- anteriores a la más reciente se copian a emr_entries_duplicates_archive
+-- antes de eliminarlas de emr_entries. Todo se ejecuta en una transacción;
+-- si algo falla, emr_entries queda como estaba.
+
+BEGIN;
+
+-- Copia de las entradas sustituidas, con las mismas columnas que emr_entries
+CREATE TABLE IF NOT EXISTS emr_entries_duplicates_archive (
+    LIKE emr_entries INCLUDING DEFAULTS,
+    archived_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+COMMENT ON TABLE emr_entries_duplicates_archive IS 'Entradas de emr_entries archivadas al crear la restricción única (visit_id, field); cada fila tiene una entrada más reciente del mismo campo en emr_entries';
+COMMENT ON COLUMN emr_entries_duplicates_archive.archived_at IS 'Fecha y hora en que se archivó la entrada';
+
+-- Entradas con otra más reciente del mismo campo y visita
+CREATE TEMPORARY TABLE emr_entries_superseded ON COMMIT DROP AS
+SELECT e.id
+FROM emr_entries e
+WHERE EXISTS (
+    SELECT 1
+    FROM emr_entries newer
+    WHERE newer.visit_id = e.visit_id
+      AND newer.field = e.field
+      AND (newer.timestamp, newer.id::text) > (e.timestamp, e.id::text)
+);
+
+INSERT INTO emr_entries_duplicates_archive
+SELECT e.*, NOW()
+FROM emr_entries e
+JOIN emr_entries_superseded s ON s.id = e.id;
+
+-- Se aborta si no se ha archivado exactamente lo que se va a eliminar
+DO $$
+DECLARE
+    superseded BIGINT;
+    archived BIGINT;
+BEGIN
+    SELECT COUNT(*) INTO superseded FROM emr_entries_superseded;
+    SELECT COUNT(*) INTO archived
+    FROM emr_entries_duplicates_archive a
+    JOIN emr_entries_superseded s ON s.id = a.id;
+    IF archived <> superseded THEN
+        RAISE EXCEPTION 'Archivadas % de % entradas duplicadas de emr_entries; no se elimina ninguna', archived, superseded;
+    END IF;
+    IF superseded > 0 THEN
+        RAISE NOTICE 'Archivadas % entradas duplicadas de emr_entries en emr_entries_duplicates_archive', superseded;
+    END IF;
+END $$;
+
+DELETE FROM emr_entries e
+USING emr_entries_superseded s
+WHERE e.id = s.id;
+
+ALTER TABLE emr_entries
+    ADD CONSTRAINT emr_entries_visit_id_field_key UNIQUE (visit_id, field);
+
+COMMENT ON CONSTRAINT emr_entries_visit_id_field_key ON emr_entries IS 'Una entrada por campo clínico y visita; destino de on_conflict en los upserts del MCP';
+
+COMMIT;
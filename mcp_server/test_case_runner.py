@@ -4,7 +4,7 @@ Script para ejecutar casos clínicos simulados contra el servidor MCP.
 
 Este script prueba:
 1. POST /api/mcp/respond - Simulando envío de campos
-2. POST /api/mcp/store - Guardando la respuesta en Supabase
+2. POST /api/mcp/store/batch - Guardando todos los campos en Supabase en una petición
 3. GET /api/mcp/validate - Ejecutando validación automática
 """
 
@@ -149,15 +149,20 @@ def call_respond_endpoint(caso: Dict[str, Any], campo: str) -> Dict[str, Any]:
         print(f"{RED}Error al llamar a /api/mcp/respond: {str(e)}{RESET}")
         return {"error": str(e)}
 
-def call_store_endpoint(caso: Dict[str, Any], campo: str) -> Dict[str, Any]:
-    """Llama al endpoint /api/mcp/store con los datos del caso y campo."""
-    url = f"{BASE_URL}/api/mcp/store"
+def call_store_batch_endpoint(caso: Dict[str, Any]) -> Dict[str, Any]:
+    """Llama al endpoint /api/mcp/store/batch con todos los campos del caso."""
+    url = f"{BASE_URL}/api/mcp/store/batch"
     payload = {
-        "visit_id": caso["visit_id"],
-        "field": campo,
-        "role": "health_professional",
-        "content": caso["campos"][campo],
-        "overwrite": True
+        "entries": [
+            {
+                "visit_id": caso["visit_id"],
+                "field": campo,
+                "role": "health_professional",
+                "content": contenido,
+                "overwrite": True
+            }
+            for campo, contenido in caso["campos"].items()
+        ]
     }
     
     try:
@@ -165,7 +170,7 @@ def call_store_endpoint(caso: Dict[str, Any], campo: str) -> Dict[str, Any]:
         response.raise_for_status()
         return response.json()
     except requests.exceptions.RequestException as e:
-        print(f"{RED}Error al llamar a /api/mcp/store: {str(e)}{RESET}")
+        print(f"{RED}Error al llamar a /api/mcp/store/batch: {str(e)}{RESET}")
         return {"error": str(e)}
 
 def call_validate_endpoint(caso: Dict[str, Any]) -> Dict[str, Any]:
@@ -243,19 +248,22 @@ def ejecutar_caso(caso: Dict[str, Any]) -> None:
         if respond_success:
             print(f"{GREEN}Respuesta recibida correctamente{RESET}")
         
-        # 2. /store
-        print(f"\n{BLUE}2. Llamando a /api/mcp/store para {campo}...{RESET}")
-        store_result = call_store_endpoint(caso, campo)
-        resultados["store"][campo] = store_result
-        store_success = "success" in store_result and store_result["success"]
-        print_result(f"Endpoint /store para {campo}", store_success)
-        
-        if store_success:
-            print(f"{GREEN}Contenido almacenado con ID: {store_result.get('entry_id', 'N/A')}{RESET}")
-        
         # Pequeña pausa para no sobrecargar el servidor
         time.sleep(0.5)
     
+    # 2. /store/batch (todos los campos en una petición)
+    print(f"\n{BLUE}2. Llamando a /api/mcp/store/batch con {len(caso['campos'])} campos...{RESET}")
+    store_result = call_store_batch_endpoint(caso)
+    for res in store_result.get("results", []):
+        resultados["store"][res["field"]] = res
+        print_result(f"Almacenamiento de {res['field']}", res["success"])
+        if res["success"]:
+            print(f"{GREEN}Contenido almacenado con ID: {res.get('entry_id', 'N/A')}{RESET}")
+        else:
+            print(f"{RED}Error: {res.get('error')}{RESET}")
+    if "error" in store_result:
+        resultados["store"]["batch"] = store_result
+    
     # 3. /validate (después de almacenar todos los campos)
     print(f"\n{BLUE}3. Llamando a /api/mcp/validate...{RESET}")
     validate_result = call_validate_endpoint(caso)
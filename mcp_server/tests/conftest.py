@@ -0,0 +1,189 @@
+"""
+Utilidades compartidas por las pruebas del microservicio MCP.
+
+Incluye un servidor HTTP local que imita la API REST de Supabase
+(PostgREST) para probar SupabaseClient sin conexión real.
+"""
+
+import asyncio
+import json
+import operator
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlparse
+
+import pytest
+
+from services import http_pool, supabase_client
+from settings import settings
+
+
+# Operadores de filtro de PostgREST (los valores se comparan como texto)
+OPERADORES = {
+    "eq": operator.eq,
+    "neq": operator.ne,
+    "gt": operator.gt,
+    "gte": operator.ge,
+    "lt": operator.lt,
+    "lte": operator.le,
+}
+
+
+class ServidorSupabaseLocal(ThreadingHTTPServer):
+    """
+    Servidor REST mínimo por tabla.
+
+    GET devuelve las filas de la tabla con los filtros, orden, paginación,
+    proyección (select) y conteo (Prefer: count=exact) de PostgREST, y POST
+    las inserta (un objeto o un array). Como PostgREST, una petición con alguna fila inválida (campo
+    "message" igual a "RECHAZAR") se rechaza entera con 400, y con
+    on_conflict las filas duplicadas se fusionan o ignoran según la
+    cabecera Prefer (resolution=merge-duplicates / ignore-duplicates).
+    """
+
+    daemon_threads = True
+
+    def __init__(self, retraso=0.0):
+        super().__init__(("127.0.0.1", 0), ManejadorSupabase)
+        self.retraso = retraso
+        self.conexiones = 0
+        self.peticiones = []
+        self.tablas = {}
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def filas(self, tabla):
+        return self.tablas.setdefault(tabla, [])
+
+
+class ManejadorSupabase(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        self.server.conexiones += 1
+
+    def log_message(self, *args):
+        pass
+
+    @property
+    def tabla(self):
+        return self.path.split("?")[0].rsplit("/", 1)[-1]
+
+    def _responder(self, datos, codigo=200):
+        cuerpo = json.dumps(datos).encode()
+        self.send_response(codigo)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def _leer_cuerpo(self):
+        return json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+
+    @property
+    def consulta(self):
+        return parse_qsl(urlparse(self.path).query)
+
+    def _proyectar(self, filas):
+        columnas = dict(self.consulta).get("select", "*")
+        if columnas == "*":
+            return filas
+        return [{c: fila.get(c) for c in columnas.split(",")} for fila in filas]
+
+    def do_GET(self):
+        self.server.peticiones.append(("GET", self.path, dict(self.headers), None))
+        time.sleep(self.server.retraso)
+        filas = list(self.server.filas(self.tabla))
+        opciones = {}
+        for columna, valor in self.consulta:
+            if columna in ("select", "order", "limit", "offset"):
+                opciones[columna] = valor
+                continue
+            operador, _, operando = valor.partition(".")
+            if operador == "in":
+                valores = [v.strip('"') for v in operando.strip("()").split(",")]
+                filas = [f for f in filas if str(f.get(columna)) in valores]
+            else:
+                filas = [f for f in filas if f.get(columna) is not None and OPERADORES[operador](str(f[columna]), operando)]
+        for criterio in reversed(opciones.get("order", "").split(",") if "order" in opciones else []):
+            columna, _, sentido = criterio.partition(".")
+            filas.sort(key=lambda f: f[columna], reverse=sentido == "desc")
+        total = len(filas)
+        inicio = int(opciones.get("offset", 0))
+        fin = inicio + int(opciones["limit"]) if "limit" in opciones else None
+        filas = self._proyectar(filas[inicio:fin])
+
+        cuerpo = json.dumps(filas).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(cuerpo)))
+        if "count=exact" in self.headers.get("Prefer", ""):
+            self.send_header("Content-Range", f"{inicio}-{inicio + len(filas) - 1}/{total}" if filas else f"*/{total}")
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def do_POST(self):
+        cuerpo = self._leer_cuerpo()
+        self.server.peticiones.append(("POST", self.path, dict(self.headers), cuerpo))
+        filas = cuerpo if isinstance(cuerpo, list) else [cuerpo]
+        if any(fila.get("message") == "RECHAZAR" for fila in filas):
+            self._responder({"message": "violates check constraint"}, 400)
+            return
+
+        tabla = self.server.filas(self.tabla)
+        consulta = dict(self.consulta)
+        claves = consulta["on_conflict"].split(",") if "on_conflict" in consulta else None
+        preferencias = self.headers.get("Prefer", "")
+        insertadas = []
+        for fila in filas:
+            existente = next((
+                e for e in tabla if claves and all(e.get(c) == fila.get(c) for c in claves)
+            ), None)
+            if existente is None:
+                fila = {"id": str(len(tabla) + 1), **fila}
+                tabla.append(fila)
+                insertadas.append(fila)
+            elif "resolution=merge-duplicates" in preferencias:
+                existente.update(fila)
+                insertadas.append(existente)
+            elif "resolution=ignore-duplicates" not in preferencias:
+                self._responder({"message": "duplicate key value violates unique constraint"}, 409)
+                return
+        self._responder(self._proyectar(insertadas), 201)
+
+
+def ejecutar(escenario):
+    """Ejecuta un escenario asíncrono y cierra el pool HTTP en su mismo bucle de eventos."""
+    async def con_cierre():
+        try:
+            return await escenario()
+        finally:
+            await http_pool.shutdown_http_client()
+    return asyncio.run(con_cierre())
+
+
+@pytest.fixture
+def servidor_supabase(monkeypatch):
+    """Arranca servidores Supabase locales y apunta settings a ellos."""
+    servidores = []
+
+    def arrancar(retraso=0.0, max_conexiones=20):
+        srv = ServidorSupabaseLocal(retraso)
+        threading.Thread(target=srv.serve_forever, daemon=True).start()
+        servidores.append(srv)
+        monkeypatch.setattr(settings, "SUPABASE_URL", srv.url)
+        monkeypatch.setattr(settings, "SUPABASE_KEY", "clave-de-prueba")
+        monkeypatch.setattr(settings, "SUPABASE_MAX_CONNECTIONS", max_conexiones)
+        monkeypatch.setattr(settings, "SUPABASE_MAX_KEEPALIVE", max_conexiones)
+        monkeypatch.setattr(supabase_client, "_supabase_client", None)
+        return srv
+
+    yield arrancar
+
+    for srv in servidores:
+        srv.shutdown()
+        srv.server_close()
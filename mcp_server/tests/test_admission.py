@@ -0,0 +1,118 @@
+"""
+Pruebas del control de admisión y prueba de carga de /mcp/respond/respond.
+
+Se ejecutan desde el directorio mcp_server. Las solicitudes concurrentes
+se envían a la aplicación en el mismo proceso mediante httpx y ASGI.
+"""
+
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from core.admission import AdmissionController, AdmissionRejected, configure_admission
+from main import app
+from settings import settings
+
+SOLICITUD = {
+    "visit_id": "VISITA_TEST_001",
+    "role": "health_professional",
+    "user_input": "El paciente refiere dolor lumbar",
+    "field": "anamnesis",
+}
+
+
+@pytest.fixture(autouse=True)
+def restaurar_admision():
+    yield
+    configure_admission(settings.MAX_CONCURRENT_REQUESTS, settings.MAX_QUEUED_REQUESTS)
+
+
+async def enviar(n):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        inicio = time.perf_counter()
+        respuestas = await asyncio.gather(*[
+            client.post("/mcp/respond/respond", json=SOLICITUD) for _ in range(n)
+        ])
+        return respuestas, time.perf_counter() - inicio
+
+
+def test_cola_acotada_y_orden_de_llegada():
+    """Los huecos se ceden en orden y, con la cola llena, se rechaza."""
+    async def escenario():
+        controller = AdmissionController(max_concurrent=1, max_queued=2, initial_service_time=3.0)
+        orden = []
+
+        await controller.acquire()
+
+        async def esperar(nombre):
+            await controller.acquire()
+            orden.append(nombre)
+
+        tareas = [asyncio.create_task(esperar(n)) for n in ("a", "b")]
+        await asyncio.sleep(0)
+        assert controller.metrics()["queued"] == 2
+
+        with pytest.raises(AdmissionRejected) as rechazo:
+            await controller.acquire()
+        assert rechazo.value.retry_after == 9
+
+        controller.release()
+        controller.release()
+        await asyncio.gather(*tareas)
+        controller.release()
+
+        return orden, controller.metrics()
+
+    orden, metricas = asyncio.run(escenario())
+
+    assert orden == ["a", "b"]
+    assert metricas["active"] == 0
+    assert metricas["rejected"] == 1
+
+
+def test_cancelar_en_cola_no_pierde_huecos():
+    """Una solicitud cancelada mientras espera libera su sitio en la cola."""
+    async def escenario():
+        controller = AdmissionController(max_concurrent=1, max_queued=1)
+        await controller.acquire()
+        tarea = asyncio.create_task(controller.acquire())
+        await asyncio.sleep(0)
+        tarea.cancel()
+        await asyncio.gather(tarea, return_exceptions=True)
+        controller.release()
+        await controller.acquire()
+        return controller.metrics()
+
+    metricas = asyncio.run(escenario())
+
+    assert metricas["active"] == 1
+    assert metricas["queued"] == 0
+
+
+def test_carga_concurrente_escala():
+    """Con huecos suficientes, 10 solicitudes tardan lo mismo que una."""
+    configure_admission(max_concurrent=10, max_queued=10)
+
+    respuestas, duracion = asyncio.run(enviar(10))
+
+    assert all(r.status_code == 200 for r in respuestas)
+    # Cada solicitud simula 200 ms; en serie serían 2 s
+    assert duracion < 0.8
+
+
+def test_descarta_carga_con_429():
+    """Con la cola llena, el exceso se rechaza de inmediato con Retry-After."""
+    configure_admission(max_concurrent=2, max_queued=3)
+
+    respuestas, duracion = asyncio.run(enviar(10))
+
+    codigos = [r.status_code for r in respuestas]
+    assert codigos.count(200) == 5
+    assert codigos.count(429) == 5
+    rechazada = next(r for r in respuestas if r.status_code == 429)
+    assert int(rechazada.headers["Retry-After"]) >= 1
+    # Tres turnos de 200 ms para las cinco admitidas
+    assert duracion < 1.0
@@ -56,7 +56,7 @@ class MockStorageClient:
         self.stored_fields = {}
         self.validation_alerts = []
     
-    async def store_field(self, visit_id, field, content, role="health_professional"):
+    async def store_field(self, visit_id, field, content, role="health_professional", overwrite=False):
         """Simula almacenamiento de un campo clínico."""
         key = f"{visit_id}:{field}"
         self.stored_fields[key] = {
@@ -67,7 +67,7 @@ class MockStorageClient:
             "role": role,
             "timestamp": datetime.now().isoformat()
         }
-        return {"success": True, "entry_id": self.stored_fields[key]["id"]}
+        return self.stored_fields[key]
     
     async def store_alerts(self, visit_id, alerts):
         """Simula almacenamiento de alertas de validación."""
@@ -117,7 +117,7 @@ def mock_get_visit_fields(visit_id):
 async def test_audio_to_validation_complete_flow(mock_storage):
     """Prueba el flujo completo desde audio hasta validación con campos válidos."""
     # Configurar mocks para los endpoints
-    with patch('api.store.simulate_store_emr_entry', side_effect=mock_storage.store_field), \
+    with patch('api.store.store_emr_entry', side_effect=mock_storage.store_field), \
          patch('api.validate.get_visit_fields', side_effect=mock_get_visit_fields), \
          patch('api.validate.store_validation_alerts', side_effect=mock_storage.store_alerts):
         
@@ -158,7 +158,7 @@ async def test_audio_to_validation_complete_flow(mock_storage):
 async def test_audio_to_validation_incomplete_flow(mock_storage):
     """Prueba el flujo con campos incompletos que generan alertas de validación."""
     # Configurar mocks para los endpoints
-    with patch('api.store.simulate_store_emr_entry', side_effect=mock_storage.store_field), \
+    with patch('api.store.store_emr_entry', side_effect=mock_storage.store_field), \
          patch('api.validate.get_visit_fields', side_effect=mock_get_visit_fields), \
          patch('api.validate.store_validation_alerts', side_effect=mock_storage.store_alerts):
         
@@ -209,7 +209,7 @@ async def test_error_handling_in_audio_validation_flow(mock_storage):
         raise Exception("Error simulado en almacenamiento")
     
     # Configurar mocks para simular error
-    with patch('api.store.simulate_store_emr_entry', side_effect=store_with_error):
+    with patch('api.store.store_emr_entry', side_effect=store_with_error):
         # Intentar almacenar un campo
         store_payload = {
             "visit_id": VIS_TEST,
@@ -0,0 +1,71 @@
+"""
+Pruebas del almacenamiento de entradas EMR con upsert.
+
+Se ejecutan desde el directorio mcp_server contra el servidor local que
+imita la API REST de Supabase (ver conftest.py).
+"""
+
+import pytest
+
+from conftest import ejecutar
+from services import supabase_client
+from services.emr_service import store_emr_entry
+from services.supabase_client import SupabaseClientError
+from settings import settings
+
+
+def guardar(contenido, overwrite=False, visit_id="VIS001"):
+    return lambda: store_emr_entry(visit_id, "anamnesis", "health_professional", contenido, overwrite)
+
+
+def test_nueva_entrada_en_una_peticion(servidor_supabase):
+    """Una entrada nueva se guarda con un único POST condicional."""
+    srv = servidor_supabase()
+
+    entrada = ejecutar(guardar("Dolor lumbar"))
+
+    assert entrada["content"] == "Dolor lumbar"
+    assert len(srv.peticiones) == 1
+    metodo, ruta, cabeceras, _ = srv.peticiones[0]
+    assert metodo == "POST"
+    assert ruta == "/rest/v1/emr_entries?on_conflict=visit_id%2Cfield"
+    assert "resolution=ignore-duplicates" in cabeceras["Prefer"]
+
+
+def test_sin_sobrescribir_no_modifica(servidor_supabase):
+    """Sin overwrite, una entrada existente produce error y no se modifica."""
+    srv = servidor_supabase()
+    ejecutar(guardar("Dolor lumbar"))
+
+    with pytest.raises(SupabaseClientError, match="Ya existe"):
+        ejecutar(guardar("Otro contenido"))
+
+    assert len(srv.peticiones) == 2
+    assert [f["content"] for f in srv.filas("emr_entries")] == ["Dolor lumbar"]
+
+
+def test_sobrescribir_fusiona(servidor_supabase):
+    """Con overwrite, la entrada existente se actualiza conservando su id."""
+    srv = servidor_supabase()
+    original = ejecutar(guardar("Dolor lumbar"))
+
+    actualizada = ejecutar(guardar("Dolor lumbar irradiado", overwrite=True))
+
+    assert actualizada["id"] == original["id"]
+    assert actualizada["content"] == "Dolor lumbar irradiado"
+    assert len(srv.filas("emr_entries")) == 1
+    assert "resolution=merge-duplicates" in srv.peticiones[1][2]["Prefer"]
+
+
+def test_modo_simulado(monkeypatch):
+    """Los datos simulados respetan la misma semántica de upsert."""
+    monkeypatch.setattr(settings, "SUPABASE_URL", "")
+    monkeypatch.setattr(supabase_client, "_supabase_client", None)
+
+    original = ejecutar(guardar("Dolor lumbar", visit_id="VIS900"))
+    with pytest.raises(SupabaseClientError):
+        ejecutar(guardar("Otro contenido", visit_id="VIS900"))
+    actualizada = ejecutar(guardar("Otro contenido", overwrite=True, visit_id="VIS900"))
+
+    assert actualizada["id"] == original["id"]
+    assert actualizada["content"] == "Otro contenido"
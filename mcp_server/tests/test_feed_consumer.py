@@ -0,0 +1,41 @@
+"""
+Pruebas del consumidor del feed de cambios EMR del servidor.
+
+Se ejecutan desde el directorio mcp_server.
+"""
+
+import asyncio
+
+from core.emr_cache import publish_visit_change, start_change_consumer, stop_change_consumer
+from mcp.feed_cambios import obtener_fuente_cambios_local
+
+
+def test_sin_consumidor_no_se_publica():
+    """Sin consumidor en marcha, los cambios no se acumulan en la cola."""
+    fuente = obtener_fuente_cambios_local()
+    pendientes = fuente.pendientes()
+
+    assert publish_visit_change("VIS001", "plan") is None
+    assert fuente.pendientes() == pendientes
+
+
+def test_arranque_y_apagado_del_consumidor():
+    """El consumidor del arranque vacía la cola de cambios publicados."""
+    fuente = obtener_fuente_cambios_local()
+
+    async def escenario():
+        assert await start_change_consumer() is True
+        secuencias = [publish_visit_change("VIS001", campo) for campo in ("anamnesis", "plan")]
+        for _ in range(100):
+            if fuente.pendientes() == 0:
+                break
+            await asyncio.sleep(0.01)
+        pendientes = fuente.pendientes()
+        await stop_change_consumer()
+        return secuencias, pendientes
+
+    secuencias, pendientes = asyncio.run(escenario())
+
+    assert all(isinstance(s, int) for s in secuencias)
+    assert pendientes == 0
+    assert fuente.tiene_consumidor is False
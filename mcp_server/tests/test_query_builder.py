@@ -0,0 +1,112 @@
+"""
+Pruebas del constructor de consultas de SupabaseClient.
+
+Cada consulta se ejecuta contra el servidor local que imita la API REST de
+Supabase (ver conftest.py) y contra los datos simulados, que deben dar el
+mismo resultado.
+"""
+
+from urllib.parse import parse_qsl, urlparse
+
+import pytest
+
+from conftest import ejecutar
+from services import supabase_client
+from services.emr_service import get_emr_entries_by_visit
+from services.query_builder import to_postgrest_params
+from services.supabase_client import SupabaseClient, get_supabase_status
+from settings import settings
+
+FILAS = [
+    {"id": str(i), "visit_id": visita, "field": campo, "role": "health_professional",
+     "content": f"Contenido {i}", "timestamp": f"2023-09-0{i}T10:00:00", "source": "mcp", "validated": True}
+    for i, (visita, campo) in enumerate([
+        ("VIS001", "anamnesis"), ("VIS001", "exploracion"), ("VIS001", "diagnostico"),
+        ("VIS001", "plan"), ("VIS002", "anamnesis"), ("VIS001", "notas"),
+    ], start=1)
+]
+
+
+@pytest.fixture(params=["servidor", "simulado"])
+def cliente(request, servidor_supabase, monkeypatch):
+    """Cliente Supabase con FILAS en emr_entries, real (servidor local) o simulado."""
+    if request.param == "servidor":
+        srv = servidor_supabase()
+        srv.tablas["emr_entries"] = [dict(f) for f in FILAS]
+        return SupabaseClient()
+
+    monkeypatch.setattr(settings, "SUPABASE_URL", "")
+    monkeypatch.setattr(supabase_client, "_supabase_client", None)
+    cliente = supabase_client.get_supabase_client()
+    cliente.mock_data["emr_entries"] = [dict(f) for f in FILAS]
+    return cliente
+
+
+def test_filtros_orden_paginacion_y_conteo(cliente):
+    """in, rangos, orden, range y count=exact dan el mismo resultado en ambos modos."""
+    consulta = cliente.table("emr_entries") \
+        .select("id,field", count="exact") \
+        .eq("visit_id", "VIS001") \
+        .in_("field", ["anamnesis", "exploracion", "diagnostico", "plan"]) \
+        .gte("timestamp", "2023-09-02") \
+        .lt("timestamp", "2023-09-05") \
+        .order("timestamp", desc=True) \
+        .range(0, 1)
+
+    resultado = ejecutar(consulta.execute)
+
+    assert resultado.data == [{"id": "4", "field": "plan"}, {"id": "3", "field": "diagnostico"}]
+    assert resultado.count == 3
+
+
+def test_limit_offset_y_neq(cliente):
+    """limit/offset paginan después de filtrar; sin count no se informa el total."""
+    consulta = cliente.table("emr_entries").select("id") \
+        .neq("field", "notas").order("id").offset(2).limit(2)
+
+    resultado = ejecutar(consulta.execute)
+
+    assert resultado.data == [{"id": "3"}, {"id": "4"}]
+    assert resultado.count is None
+
+
+def test_parametros_postgrest():
+    """Los filtros se traducen a la sintaxis de PostgREST, repitiendo columnas en los rangos."""
+    consulta = SupabaseClient().table("emr_entries").select("id,field") \
+        .eq("visit_id", "VIS001").in_("field", ["plan", "a,b"]) \
+        .gte("timestamp", "2023-09-01").lt("timestamp", "2023-10-01") \
+        .order("field").order("timestamp", desc=True).range(10, 19)
+
+    assert to_postgrest_params(consulta.params) == [
+        ("select", "id,field"),
+        ("visit_id", "eq.VIS001"),
+        ("field", 'in.(plan,"a,b")'),
+        ("timestamp", "gte.2023-09-01"),
+        ("timestamp", "lt.2023-10-01"),
+        ("order", "field.asc,timestamp.desc"),
+        ("limit", "10"),
+        ("offset", "10"),
+    ]
+
+
+def test_servicios_delegan_en_el_servidor(servidor_supabase):
+    """Las consultas de los servicios piden solo las columnas y filas que usan."""
+    srv = servidor_supabase()
+    srv.tablas["emr_entries"] = [dict(f) for f in FILAS]
+
+    async def escenario():
+        entradas = await get_emr_entries_by_visit("VIS001", field="plan")
+        estado = await get_supabase_status()
+        return entradas, estado
+
+    entradas, estado = ejecutar(escenario)
+
+    assert estado["connected"] is True
+    assert [e["content"] for e in entradas] == ["Contenido 4"]
+    assert "visit_id" not in entradas[0]
+    consulta_entradas = dict(parse_qsl(urlparse(srv.peticiones[0][1]).query))
+    assert consulta_entradas["select"] == "id,field,content,role,timestamp,source,validated"
+    assert consulta_entradas["field"] == "eq.plan"
+    assert consulta_entradas["order"] == "timestamp.asc"
+    consulta_estado = dict(parse_qsl(urlparse(srv.peticiones[1][1]).query))
+    assert consulta_estado == {"select": "id", "limit": "1"}
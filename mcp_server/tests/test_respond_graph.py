@@ -0,0 +1,141 @@
+"""
+Pruebas de los endpoints asíncronos y en streaming del grafo LangGraph del MCP.
+
+Se ejecutan desde el directorio mcp_server con el LLM sustituido por uno
+simulado que tarda un tiempo fijo en responder.
+"""
+
+import asyncio
+import json
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+from langchain_core.messages import AIMessage
+
+from app.langraph.processor import mcp_processor
+from core.csrf import require_csrf
+from core.middleware import require_auth
+import langraph_mcp
+from main import app
+
+client = TestClient(app)
+
+# Los endpoints de métricas requieren autenticación y CSRF
+app.dependency_overrides[require_auth] = lambda: {"email": "medico@aiduxcare.com"}
+app.dependency_overrides[require_csrf] = lambda: None
+
+SOLICITUD = {
+    "visit_id": "VISITA_TEST_001",
+    "role": "health_professional",
+    "user_input": "Necesito un diagnóstico y revisar el riesgo legal",
+}
+
+
+class LLMLento:
+    """Sustituto de ChatOpenAI que tarda 0,2 s en responder."""
+
+    def __init__(self, **kwargs):
+        pass
+
+    def invoke(self, messages):
+        time.sleep(0.2)
+        return AIMessage(content="Respuesta simulada")
+
+
+@pytest.fixture(autouse=True)
+def llm_lento(monkeypatch):
+    monkeypatch.setattr(langraph_mcp, "ChatOpenAI", LLMLento)
+
+
+def test_respond_graph():
+    """El endpoint asíncrono devuelve la respuesta y las herramientas usadas."""
+    response = client.post("/mcp/respond/graph", json=SOLICITUD)
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["output"] == "Respuesta simulada"
+    assert [t["tool"] for t in data["used_tools"]] == ["diagnostico", "riesgo_legal"]
+
+    nodos = [t["metadata"] for t in data["trace"] if t["action"] == "node_completed"]
+    assert [n["node"] for n in nodos].count("run_tool") == 2
+    assert all({"wall_ms", "cpu_ms", "update_bytes", "memory_blocks"} <= set(n) for n in nodos)
+
+
+def test_respond_stream_emite_eventos_por_nodo():
+    """El streaming emite un evento por nodo y termina con la respuesta completa."""
+    response = client.post("/mcp/respond/stream", json=SOLICITUD)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    eventos = [json.loads(linea) for linea in response.text.splitlines() if linea]
+
+    nodos = [e["node"] for e in eventos if e["event"] == "node"]
+    assert nodos[:3] == ["process_user_message", "filter_memory_blocks", "determine_tools_needed"]
+    assert nodos.count("run_tool") == 2
+    assert nodos[-1] == "generate_final_response"
+    assert eventos[-1]["event"] == "final"
+    assert eventos[-1]["data"]["output"] == "Respuesta simulada"
+
+
+def test_metricas_por_nodo():
+    """El endpoint de depuración muestra qué nodo domina la latencia."""
+    assert client.post("/mcp/respond/nodes/reset").status_code == 200
+    client.post("/mcp/respond/graph", json=SOLICITUD)
+
+    response = client.get("/mcp/respond/nodes")
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["slowest"] == "generate_final_response"
+    assert data["nodes"]["generate_final_response"]["wall_p50_ms"] >= 200
+    assert data["nodes"]["run_tool"]["count"] == 2
+
+
+def test_metricas_por_nodo_requieren_autenticacion():
+    """Sin credenciales no se pueden leer ni descartar las mediciones."""
+    autenticacion = app.dependency_overrides.pop(require_auth)
+    try:
+        assert client.get("/mcp/respond/nodes").status_code == 401
+        assert client.post("/mcp/respond/nodes/reset").status_code == 401
+    finally:
+        app.dependency_overrides[require_auth] = autenticacion
+
+
+def test_consultar_metricas_no_las_descarta():
+    """El GET es de solo lectura: el parámetro reset ya no tiene efecto."""
+    client.post("/mcp/respond/graph", json=SOLICITUD)
+    antes = client.get("/mcp/respond/nodes", params={"reset": True}).json()["nodes"]
+    despues = client.get("/mcp/respond/nodes").json()["nodes"]
+
+    assert despues["run_tool"]["count"] == antes["run_tool"]["count"] > 0
+
+
+def test_solicitudes_concurrentes_se_solapan():
+    """El bucle de eventos queda libre mientras se ejecuta el grafo."""
+    async def ejecutar():
+        latidos = 0
+        terminado = asyncio.Event()
+
+        async def latido():
+            nonlocal latidos
+            while not terminado.is_set():
+                latidos += 1
+                await asyncio.sleep(0.01)
+
+        tarea = asyncio.create_task(latido())
+        inicio = time.perf_counter()
+        respuestas = await asyncio.gather(*[
+            mcp_processor.aprocess_request(visit_id=f"V{i}", role="health_professional", user_input="Dolor cervical")
+            for i in range(4)
+        ])
+        duracion = time.perf_counter() - inicio
+        terminado.set()
+        await tarea
+        return respuestas, duracion, latidos
+
+    respuestas, duracion, latidos = asyncio.run(ejecutar())
+
+    assert all(r["output"] == "Respuesta simulada" for r in respuestas)
+    assert duracion < 0.6
+    assert latidos >= 10
@@ -0,0 +1,139 @@
+"""
+Pruebas de la caché de respuestas con ETag de /api/mcp/entries.
+
+Se ejecutan desde el directorio mcp_server.
+"""
+
+from unittest.mock import patch
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from api.entries import router as entries_router
+from api.store import router as store_router
+from core.csrf import require_csrf
+from core.middleware import require_auth
+from core.response_cache import ResponseCache, get_response_cache
+
+app = FastAPI()
+app.include_router(entries_router)
+app.include_router(store_router)
+app.dependency_overrides[require_auth] = lambda: {"email": "medico@aiduxcare.com"}
+app.dependency_overrides[require_csrf] = lambda: None
+
+client = TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def cache_vacia():
+    get_response_cache().clear()
+    yield
+    get_response_cache().clear()
+
+
+def test_etag_y_304():
+    """Una consulta repetida con If-None-Match recibe 304 sin cuerpo."""
+    primera = client.get("/api/mcp/entries", params={"visit_id": "VIS001"})
+    etag = primera.headers["ETag"]
+
+    repetida = client.get("/api/mcp/entries", params={"visit_id": "VIS001"}, headers={"If-None-Match": etag})
+    sin_etag = client.get("/api/mcp/entries", params={"visit_id": "VIS001"})
+
+    assert primera.status_code == 200
+    assert primera.json()["count"] == 4
+    assert repetida.status_code == 304
+    assert repetida.content == b""
+    assert repetida.headers["ETag"] == etag
+    # Sin If-None-Match se devuelven los mismos bytes en caché
+    assert sin_etag.content == primera.content
+
+
+def test_repeticion_no_vuelve_a_consultar():
+    """Las consultas repetidas se sirven de la caché, por clave (visit_id, field, role)."""
+    antes = get_response_cache().metrics()["hits"]
+    with patch("api.entries.logger") as registro:
+        for _ in range(5):
+            client.get("/api/mcp/entries", params={"visit_id": "VIS001", "field": "plan"})
+        client.get("/api/mcp/entries", params={"visit_id": "VIS001", "field": "anamnesis"})
+
+    metricas = get_response_cache().metrics()
+    assert metricas["size"] == 2
+    assert metricas["hits"] - antes == 4
+    # Solo las dos consultas no cacheadas llegan a filtrar las entradas
+    assert registro.info.call_count == 4
+
+
+def test_store_invalida_la_visita():
+    """Almacenar un campo descarta las respuestas en caché de la visita."""
+    etag = client.get("/api/mcp/entries", params={"visit_id": "VIS001"}).headers["ETag"]
+    antes = get_response_cache().metrics()["invalidations"]
+
+    client.post("/api/mcp/store", json={
+        "visit_id": "VIS001",
+        "field": "plan",
+        "role": "health_professional",
+        "content": "Reevaluación en 48 horas.",
+        "overwrite": True,
+    })
+    respuesta = client.get("/api/mcp/entries", params={"visit_id": "VIS001"}, headers={"If-None-Match": etag})
+
+    assert respuesta.status_code == 200
+    assert get_response_cache().metrics()["invalidations"] - antes == 1
+
+
+def test_lru_ttl_y_comparacion_debil():
+    """La caché respeta su tamaño máximo y su TTL, y acepta ETags débiles y listas."""
+    cache = ResponseCache(max_entries=2, ttl=0)
+    for visita in ("VIS001", "VIS002", "VIS003"):
+        guardada = cache.put((visita, None, None), {"visit_id": visita})
+
+    assert cache.get(("VIS001", None, None)) is None
+    assert cache.respond(guardada, f'"otro", W/{guardada.etag}').status_code == 304
+    assert cache.respond(guardada, '"otro"').status_code == 200
+
+    caducada = ResponseCache(ttl=0.001)
+    caducada.put(("VIS001", None, None), {})
+    with patch("core.response_cache.time.monotonic", return_value=10**9):
+        assert caducada.get(("VIS001", None, None)) is None
+
+
+def test_escritura_durante_la_lectura_no_se_cachea():
+    """Una consulta que leyó antes de un /store no guarda su respuesta obsoleta."""
+    cache = get_response_cache()
+    clave = ("VIS001", "plan", None)
+
+    # Secuencia de los endpoints de consulta: generación, lectura (await), put
+    generacion = cache.generation("VIS001")
+    leida = {"visit_id": "VIS001", "entries": [{"field": "plan", "content": "Plan anterior."}]}
+    almacenado = client.post("/api/mcp/store", json={
+        "visit_id": "VIS001",
+        "field": "plan",
+        "role": "health_professional",
+        "content": "Plan nuevo.",
+        "overwrite": True,
+    })
+    obsoleta = cache.put(clave, leida, generacion)
+
+    assert almacenado.status_code == 200
+    assert cache.get(clave) is None
+    assert cache.metrics()["stale_fills"] == 1
+    respuesta = client.get("/api/mcp/entries", params={"visit_id": "VIS001", "field": "plan"},
+                           headers={"If-None-Match": obsoleta.etag})
+    assert respuesta.status_code == 200
+
+
+def test_generaciones_acotadas():
+    """Descartar generaciones antiguas nunca deja pasar una respuesta obsoleta."""
+    cache = ResponseCache(max_entries=2)
+    generacion = cache.generation("VIS001")
+    cache.invalidate_visit("VIS001")
+    cache.invalidate_visit("VIS002")
+    cache.invalidate_visit("VIS003")  # descarta la generación de VIS001
+
+    cache.put(("VIS001", None, None), {}, generacion)
+    assert cache.get(("VIS001", None, None)) is None
+
+    cache.put(("VIS001", None, None), {}, cache.generation("VIS001"))
+    assert cache.get(("VIS001", None, None)) is not None
+
@@ -0,0 +1,114 @@
+"""
+Pruebas del endpoint de almacenamiento en bloque /api/mcp/store/batch.
+
+Se ejecutan desde el directorio mcp_server contra el servidor local que
+imita la API REST de Supabase (ver conftest.py).
+"""
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from api.store import router as store_router
+from conftest import ejecutar
+from core.csrf import require_csrf
+from core.middleware import require_auth
+
+app = FastAPI()
+app.include_router(store_router)
+app.dependency_overrides[require_auth] = lambda: {"email": "medico@aiduxcare.com"}
+app.dependency_overrides[require_csrf] = lambda: None
+
+CAMPOS = {
+    "anamnesis": "Dolor precordial de inicio súbito hace 2 horas.",
+    "exploracion": "PA 160/95, FC 95, afebril.",
+    "diagnostico": "Síndrome coronario agudo.",
+    "plan": "ECG urgente y marcadores cardíacos.",
+}
+
+
+def entrada(visit_id, campo, contenido="Contenido", overwrite=False):
+    return {
+        "visit_id": visit_id,
+        "field": campo,
+        "role": "health_professional",
+        "content": contenido,
+        "overwrite": overwrite,
+    }
+
+
+def enviar(entradas, ruta="/api/mcp/store/batch"):
+    cuerpo = {"entries": entradas} if ruta.endswith("/batch") else entradas
+    async def escenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post(ruta, json=cuerpo)
+    return ejecutar(escenario)
+
+
+def test_todos_los_campos_en_una_peticion(servidor_supabase):
+    """Los cuatro campos de la visita se guardan con un único upsert."""
+    srv = servidor_supabase()
+
+    respuesta = enviar([entrada("VIS_TEST", c, t) for c, t in CAMPOS.items()])
+
+    assert respuesta.status_code == 200
+    datos = respuesta.json()
+    assert datos["success"] is True
+    assert datos["stored"] == 4
+    assert [r["field"] for r in datos["results"]] == list(CAMPOS)
+    assert all(r["entry_id"] for r in datos["results"])
+    assert len(srv.peticiones) == 1
+    assert len(srv.peticiones[0][3]) == 4
+
+
+def test_resultados_por_campo(servidor_supabase):
+    """Los errores de validación y los conflictos no impiden guardar el resto."""
+    srv = servidor_supabase()
+    enviar([entrada("VIS001", "anamnesis")])
+
+    respuesta = enviar([
+        entrada("VIS001", "anamnesis"),                       # ya existe
+        entrada("VIS001", "plan", "Reposo", overwrite=True),  # nueva, con overwrite
+        entrada("VIS002", "anamnesis"),                       # otra visita
+        {"visit_id": "VIS002", "field": "plan", "role": "health_professional"},
+        entrada("VIS002", "anamnesis"),                       # repetida en el lote
+    ])
+
+    datos = respuesta.json()
+    assert [r["status"] for r in datos["results"]] == [409, 200, 200, 422, 422]
+    assert datos["stored"] == 2
+    assert datos["failed"] == 3
+    assert datos["success"] is False
+    # Una petición inicial y, en el lote, una por modo de resolución
+    assert len(srv.peticiones) == 3
+    assert len(srv.filas("emr_entries")) == 3
+
+
+def test_store_y_batch_comparten_almacenamiento(servidor_supabase):
+    """Un campo guardado por /store entra en conflicto en /store/batch y viceversa."""
+    srv = servidor_supabase()
+
+    individual = enviar(entrada("VIS001", "anamnesis"), ruta="/api/mcp/store")
+    lote = enviar([entrada("VIS001", "anamnesis"), entrada("VIS001", "plan")])
+    repetido = enviar(entrada("VIS001", "plan"), ruta="/api/mcp/store")
+    sobrescrito = enviar(entrada("VIS001", "plan", "Reposo", overwrite=True), ruta="/api/mcp/store")
+
+    assert individual.status_code == 200
+    assert individual.json()["entry_id"]
+    assert [r["status"] for r in lote.json()["results"]] == [409, 200]
+    assert repetido.status_code == 409
+    assert sobrescrito.status_code == 200
+    contenidos = {f["field"]: f["content"] for f in srv.filas("emr_entries")}
+    assert contenidos == {"anamnesis": "Contenido", "plan": "Reposo"}
+
+
+@pytest.mark.parametrize("cuerpo", [[], [entrada("VIS001", "c")] * 201])
+def test_lote_invalido(servidor_supabase, cuerpo):
+    """Un lote vacío o demasiado grande se rechaza sin escribir nada."""
+    srv = servidor_supabase()
+
+    respuesta = enviar(cuerpo)
+
+    assert respuesta.status_code == 422
+    assert srv.peticiones == []
@@ -0,0 +1,78 @@
+"""
+Pruebas del pool HTTP compartido de SupabaseClient.
+
+Se ejecutan desde el directorio mcp_server contra un servidor HTTP local
+que imita la API REST de Supabase y cuenta las conexiones TCP recibidas.
+"""
+
+import asyncio
+import time
+
+from conftest import ejecutar
+from services import http_pool
+from services.supabase_client import SupabaseClient, get_supabase_status
+
+
+def test_reutiliza_conexiones_entre_operaciones(servidor_supabase):
+    """Las operaciones sucesivas, incluso de clientes distintos, comparten conexión."""
+    srv = servidor_supabase()
+
+    async def escenario():
+        await http_pool.startup_http_client()
+        await SupabaseClient().query("emr_entries", "insert", {"data": {"visit_id": "VIS001", "field": "plan"}})
+        for _ in range(20):
+            filas = await SupabaseClient().query("emr_entries", "select", {"filters": {"visit_id": "VIS001"}})
+        return filas, http_pool.get_pool_metrics()
+
+    filas, metricas = ejecutar(escenario)
+
+    assert filas[0]["field"] == "plan"
+    assert srv.conexiones == 1
+    assert srv.peticiones[1][2]["apikey"] == "clave-de-prueba"
+    assert metricas["open"] is True
+    assert metricas["requests"] >= 21
+    assert metricas["connections"] == 1
+    assert metricas["idle_connections"] == 1
+
+
+def test_saturacion_del_pool(servidor_supabase):
+    """Con más peticiones que conexiones, se esperan turnos y se registra la saturación."""
+    srv = servidor_supabase(retraso=0.1, max_conexiones=2)
+
+    async def escenario():
+        await http_pool.startup_http_client()
+        antes = http_pool.get_pool_metrics()["saturated"]
+        cliente = SupabaseClient()
+        inicio = time.perf_counter()
+        await asyncio.gather(*[
+            cliente.query("emr_entries", "select", {"filters": {"visit_id": "VIS001"}}) for _ in range(6)
+        ])
+        return time.perf_counter() - inicio, http_pool.get_pool_metrics(), antes
+
+    duracion, metricas, antes = ejecutar(escenario)
+
+    assert srv.conexiones == 2
+    assert metricas["saturated"] - antes == 4
+    assert metricas["peak_in_flight"] >= 6
+    assert metricas["in_flight"] == 0
+    # Tres turnos de 100 ms con dos conexiones
+    assert duracion >= 0.3
+
+
+def test_ciclo_de_vida(servidor_supabase):
+    """El apagado cierra el cliente; después se vuelve a crear bajo demanda."""
+    servidor_supabase()
+
+    async def escenario():
+        cliente = await http_pool.startup_http_client()
+        assert await http_pool.startup_http_client() is cliente
+        await http_pool.shutdown_http_client()
+        cerrado = cliente.is_closed
+        estado = await get_supabase_status()
+        return cerrado, estado, http_pool.get_http_client() is not cliente
+
+    cerrado, estado, recreado = ejecutar(escenario)
+
+    assert cerrado
+    assert recreado
+    assert estado["pool"]["max_connections"] == 20
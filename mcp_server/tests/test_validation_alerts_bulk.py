@@ -0,0 +1,74 @@
+"""
+Pruebas de la inserción en bloque de alertas de validación.
+
+Se ejecutan desde el directorio mcp_server contra el servidor local que
+imita la API REST de Supabase (ver conftest.py).
+"""
+
+from conftest import ejecutar
+from core.validators import ValidationAlert
+from services import supabase_client
+from services.supabase_client import store_validation_alerts, store_validation_alerts_bulk
+from settings import settings
+
+
+def crear_alertas(n, rechazar=()):
+    return [
+        ValidationAlert("texto_breve", "RECHAZAR" if i in rechazar else f"Alerta {i}", f"campo_{i}")
+        for i in range(n)
+    ]
+
+
+def test_una_peticion_para_todas_las_alertas(servidor_supabase):
+    """Todas las alertas de la visita se envían en un único array."""
+    srv = servidor_supabase()
+
+    resultado = ejecutar(lambda: store_validation_alerts_bulk("VIS001", crear_alertas(12)))
+
+    assert len(srv.peticiones) == 1
+    metodo, ruta, _, cuerpo = srv.peticiones[0]
+    assert (metodo, ruta) == ("POST", "/rest/v1/validation_alerts?select=id")
+    assert len(cuerpo) == 12
+    assert resultado["round_trips"] == 1
+    assert resultado["stored"] == 12
+    assert resultado["failed"] == []
+    assert resultado["ids"] == [fila["id"] for fila in srv.filas("validation_alerts")]
+
+
+def test_divide_en_bloques(servidor_supabase):
+    """Los conjuntos grandes se envían en bloques de chunk_size alertas."""
+    srv = servidor_supabase()
+
+    resultado = ejecutar(lambda: store_validation_alerts_bulk("VIS001", crear_alertas(12), chunk_size=5))
+
+    assert [len(p[3]) for p in srv.peticiones] == [5, 5, 2]
+    assert resultado["round_trips"] == 3
+    assert len(srv.filas("validation_alerts")) == 12
+
+
+def test_fallo_parcial(servidor_supabase):
+    """Si un bloque falla, se guardan las alertas válidas y se informa de la inválida."""
+    srv = servidor_supabase()
+
+    resultado = ejecutar(lambda: store_validation_alerts_bulk("VIS001", crear_alertas(4, rechazar={2})))
+
+    assert resultado["stored"] == 3
+    assert [f["index"] for f in resultado["failed"]] == [2]
+    assert resultado["ids"][2] is None
+    assert all(resultado["ids"][i] for i in (0, 1, 3))
+    # Un intento en bloque y uno por alerta para aislar la inválida
+    assert resultado["round_trips"] == 5
+    assert len(srv.filas("validation_alerts")) == 3
+    assert ejecutar(lambda: store_validation_alerts("VIS001", crear_alertas(2, rechazar={0}))) is False
+
+
+def test_modo_simulado(monkeypatch):
+    """Sin Supabase configurado, la inserción en bloque usa los datos simulados."""
+    monkeypatch.setattr(settings, "SUPABASE_URL", "")
+    monkeypatch.setattr(supabase_client, "_supabase_client", None)
+
+    resultado = ejecutar(lambda: store_validation_alerts_bulk("VIS001", crear_alertas(3)))
+
+    assert resultado["stored"] == 3
+    assert len(set(resultado["ids"])) == 3
+    assert ejecutar(lambda: store_validation_alerts("VIS001", crear_alertas(2))) is True
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Pruebas del checkpointer SQLite con deltas para el grafo LangGraph del MCP.
+"""
+
+import threading
+import time
+
+import pytest
+from langchain_core.messages import HumanMessage
+
+from langraph_checkpoint import OP_APPEND, SQLiteDeltaSaver, visit_config
+from langraph_mcp import MemorySaver, build_mcp_graph, initialize_context, run_graph
+
+MENSAJES = [
+    "Dolor cervical irradiado al brazo derecho",
+    "Revisar visitas anteriores",
+    "Necesito un diagnóstico de los síntomas",
+    "¿Hay riesgo legal en el tratamiento?",
+    "El paciente refiere mejoría",
+]
+
+
+pytestmark = pytest.mark.usefixtures("llm_simulado")
+
+
+def conversar(app, visit_id, turnos):
+    config = visit_config(visit_id)
+    estado = None
+    for i in range(turnos):
+        entrada = {"messages": [HumanMessage(content=MENSAJES[i % len(MENSAJES)], id=f"h{i}")]}
+        if i == 0:
+            entrada["context"] = initialize_context(visit_id)
+        estado = app.invoke(entrada, config)
+    return estado
+
+
+def resumen(estado):
+    return (
+        [b["id"] for b in estado.get("memory_blocks", [])],
+        [t["tool"] for t in estado.get("tool_results", [])],
+        [m.content for m in estado.get("messages", [])],
+        estado.get("token_count"),
+    )
+
+
+def historial(app, visit_id):
+    return [
+        (h.metadata.get("step"), h.next, resumen(h.values))
+        for h in app.get_state_history(visit_config(visit_id))
+    ]
+
+
+def test_reconstruye_el_mismo_estado_que_memorysaver():
+    """Instantáneas más deltas reproducen el estado completo de cada turno."""
+    graph = build_mcp_graph()
+    saver = SQLiteDeltaSaver(snapshot_interval=4)
+
+    esperado = conversar(graph.compile(checkpointer=MemorySaver()), "V1", 12)
+    obtenido = conversar(graph.compile(checkpointer=saver), "V1", 12)
+
+    assert resumen(obtenido) == resumen(esperado)
+    app = graph.compile(checkpointer=saver)
+    assert resumen(app.get_state(visit_config("V1")).values) == resumen(esperado)
+
+    # Las listas acumuladas se guardan como sufijos y la cadena de lectura está acotada
+    assert saver.stats["appends"] > 0
+    assert saver.stats["snapshots"] >= 2
+    assert saver.chain_length(visit_config("V1")) <= 4
+    assert OP_APPEND in {op for (op,) in saver._conn.execute("SELECT op FROM channel_deltas")}
+
+    # Cualquier checkpoint intermedio también se puede reconstruir
+    historial = list(app.get_state_history(visit_config("V1")))
+    assert len(historial[0].values["memory_blocks"]) == 12
+    longitudes = [len(h.values.get("memory_blocks", [])) for h in historial]
+    assert longitudes == sorted(longitudes, reverse=True)
+    assert set(longitudes) == set(range(13))
+
+
+def test_historial_identico_a_memorysaver():
+    """Cada checkpoint intermedio coincide paso a paso con el de MemorySaver."""
+    graph = build_mcp_graph()
+    memoria = graph.compile(checkpointer=MemorySaver())
+    deltas = graph.compile(checkpointer=SQLiteDeltaSaver(snapshot_interval=4))
+
+    conversar(memoria, "V1", 12)
+    conversar(deltas, "V1", 12)
+
+    esperado = historial(memoria, "V1")
+    assert len(esperado) > 12
+    assert historial(deltas, "V1") == esperado
+
+
+def test_reanuda_la_visita_tras_reabrir(tmp_path):
+    """El estado sobrevive al cierre del proceso y la visita continúa."""
+    ruta = str(tmp_path / "checkpoints.sqlite")
+    graph = build_mcp_graph()
+
+    with SQLiteDeltaSaver(ruta) as saver:
+        run_graph(graph, initialize_context("V1"), [HumanMessage(content=MENSAJES[0])], checkpoint=saver)
+        run_graph(graph, initialize_context("V1"), [HumanMessage(content=MENSAJES[1])], checkpoint=saver)
+
+    with SQLiteDeltaSaver(ruta) as saver:
+        resultado = run_graph(graph, initialize_context("V1"), [HumanMessage(content=MENSAJES[2])], checkpoint=saver)
+
+        assert [b["id"] for b in resultado.memory_blocks] == ["msg_1", "msg_2", "msg_3"]
+        assert len(resultado.messages) == 6
+        assert saver.get_tuple(visit_config("V2")) is None
+
+
+def test_compactacion_conserva_los_ultimos_checkpoints():
+    """La compactación borra la cadena antigua sin perder el estado reciente."""
+    saver = SQLiteDeltaSaver(snapshot_interval=3, keep_last=2)
+    app = build_mcp_graph().compile(checkpointer=saver)
+    estado = conversar(app, "V1", 10)
+    antes = saver._conn.execute("SELECT COUNT(*) FROM checkpoints").fetchone()[0]
+
+    eliminados = saver.compact()
+
+    assert eliminados > 0
+    assert saver._conn.execute("SELECT COUNT(*) FROM checkpoints").fetchone()[0] == antes - eliminados
+    assert resumen(app.get_state(visit_config("V1")).values) == resumen(estado)
+    assert len(list(saver.list(visit_config("V1")))) < antes
+
+    siguiente = app.invoke({"messages": [HumanMessage(content="Control", id="h-extra")]}, visit_config("V1"))
+    assert len(siguiente["memory_blocks"]) == 11
+
+
+def test_compactacion_en_segundo_plano():
+    """Cerrar una cadena con una nueva instantánea despierta la compactación."""
+    saver = SQLiteDeltaSaver(snapshot_interval=2, keep_last=1)
+    saver.start_compaction(interval=60.0)
+    try:
+        conversar(build_mcp_graph().compile(checkpointer=saver), "V1", 6)
+        limite = time.monotonic() + 2.0
+        while saver.stats["compacted"] == 0 and time.monotonic() < limite:
+            time.sleep(0.01)
+        assert saver.stats["compacted"] > 0
+    finally:
+        saver.stop_compaction()
+
+
+def test_elimina_el_hilo_de_una_visita():
+    """delete_thread borra solo la visita indicada."""
+    saver = SQLiteDeltaSaver()
+    app = build_mcp_graph().compile(checkpointer=saver)
+    conversar(app, "V1", 2)
+    conversar(app, "V2", 2)
+
+    saver.delete_thread("V1")
+
+    assert saver.get_tuple(visit_config("V1")) is None
+    assert len(saver.get_tuple(visit_config("V2")).checkpoint["channel_values"]["memory_blocks"]) == 2
+
+
+def test_get_tuple_dentro_de_list():
+    """Recorrer list() no retiene el candado: get_tuple y put no se bloquean."""
+    saver = SQLiteDeltaSaver()
+    app = build_mcp_graph().compile(checkpointer=saver)
+    conversar(app, "V1", 2)
+    resultado = {}
+
+    def recorrer():
+        ids = []
+        for item in saver.list(visit_config("V1")):
+            ids.append(saver.get_tuple(item.config).config["configurable"]["checkpoint_id"])
+            assert ids[-1] == item.config["configurable"]["checkpoint_id"]
+        resultado["ids"] = ids
+
+    hilo = threading.Thread(target=recorrer, daemon=True)
+    hilo.start()
+    hilo.join(timeout=5.0)
+
+    assert not hilo.is_alive(), "list() sigue reteniendo el candado"
+    assert len(resultado["ids"]) > 2
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
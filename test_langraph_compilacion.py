@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Pruebas de la caché de grafos LangGraph compilados del MCP.
+"""
+
+import pytest
+
+import langraph_mcp
+from langraph_mcp import (
+    MemorySaver,
+    build_mcp_graph,
+    clear_compiled_apps,
+    compiled_app_cache_info,
+    get_compiled_app,
+    get_default_graph,
+    warm_up_graph
+)
+
+
+@pytest.fixture(autouse=True)
+def cache_vacia():
+    clear_compiled_apps()
+    yield
+    clear_compiled_apps()
+
+
+def test_compila_una_vez_por_grafo_y_checkpointer():
+    """El mismo grafo y checkpointer reutilizan la aplicación compilada."""
+    graph = build_mcp_graph()
+    checkpoint = MemorySaver()
+
+    app = get_compiled_app(graph)
+    assert get_compiled_app(graph) is app
+
+    app_checkpoint = get_compiled_app(graph, checkpoint)
+    assert app_checkpoint is not app
+    assert get_compiled_app(graph, checkpoint) is app_checkpoint
+    assert get_compiled_app(graph, MemorySaver()) is not app_checkpoint
+
+    assert compiled_app_cache_info() == {"hits": 2, "misses": 3, "evictions": 0, "size": 3}
+
+
+def test_calentamiento_del_grafo_por_defecto():
+    """El calentamiento deja compilado el grafo por defecto del modelo."""
+    app = warm_up_graph("gpt-3.5-turbo")
+
+    assert get_default_graph("gpt-3.5-turbo") is get_default_graph("gpt-3.5-turbo")
+    assert get_compiled_app(get_default_graph("gpt-3.5-turbo")) is app
+    assert compiled_app_cache_info()["misses"] == 1
+
+
+def test_cache_acotada_lru(monkeypatch):
+    """Al superar el máximo se descarta la aplicación usada hace más tiempo."""
+    monkeypatch.setattr(langraph_mcp, "MAX_COMPILED_APPS", 2)
+    graph = build_mcp_graph()
+    primero, segundo, tercero = MemorySaver(), MemorySaver(), MemorySaver()
+
+    app_primero = get_compiled_app(graph, primero)
+    get_compiled_app(graph, segundo)
+    assert get_compiled_app(graph, primero) is app_primero
+    get_compiled_app(graph, tercero)
+
+    assert compiled_app_cache_info() == {"hits": 1, "misses": 3, "evictions": 1, "size": 2}
+    assert get_compiled_app(graph, primero) is app_primero
+    get_compiled_app(graph, segundo)
+    assert compiled_app_cache_info()["misses"] == 4
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Pruebas del estado del grafo LangGraph del MCP: actualizaciones parciales y reductores.
+"""
+
+import pytest
+from langchain_core.messages import HumanMessage
+
+from langraph_mcp import (
+    MCPState,
+    MemorySaver,
+    ResetItems,
+    append_items,
+    build_mcp_graph,
+    execute_tools,
+    initialize_context,
+    process_user_message,
+    run_graph
+)
+
+
+pytestmark = pytest.mark.usefixtures("llm_simulado")
+
+
+def test_reductor_no_modifica_la_lista_acumulada():
+    """Cada paso obtiene una lista nueva: los checkpoints anteriores no cambian."""
+    acumulada = append_items(None, [{"id": 1}])
+    resultado = append_items(acumulada, [{"id": 2}])
+
+    assert resultado is not acumulada
+    assert [b["id"] for b in acumulada] == [1]
+    assert [b["id"] for b in resultado] == [1, 2]
+    assert append_items(resultado, ResetItems([{"id": 3}])) == [{"id": 3}]
+
+
+def test_nodos_devuelven_solo_lo_nuevo():
+    """Los nodos devuelven actualizaciones parciales, no el estado completo."""
+    bloques = [{"id": f"msg_{i}", "text": "x", "priority": "low"} for i in range(1000)]
+    estado = {
+        "context": initialize_context("V1"),
+        "messages": [HumanMessage(content="Dolor urgente, revisar diagnóstico")],
+        "memory_blocks": bloques,
+        "required_tools": ["diagnostico"]
+    }
+
+    actualizacion = process_user_message(estado)
+    assert set(actualizacion) == {"memory_blocks", "tool_results", "last_processed_message", "token_count"}
+    assert actualizacion["tool_results"] == []
+    assert len(actualizacion["memory_blocks"]) == 1
+    assert actualizacion["memory_blocks"][0]["id"] == "msg_1001"
+    assert len(estado["memory_blocks"]) == 1000
+
+    assert list(execute_tools(estado)) == ["tool_results"]
+
+
+def test_ejecucion_completa():
+    """El grafo acumula bloques, resultados y tokens mediante los reductores."""
+    mensaje = "Necesito un diagnóstico de los síntomas y revisar el riesgo legal"
+    resultado = run_graph(build_mcp_graph(), initialize_context("V1"), [HumanMessage(content=mensaje)])
+
+    assert isinstance(resultado, MCPState)
+    assert len(resultado.memory_blocks) == 1
+    assert [t["tool"] for t in resultado.tool_results] == ["diagnostico", "riesgo_legal"]
+    assert resultado.token_count == len(mensaje) // 4
+    assert resultado.messages[-1].content == "Respuesta simulada"
+
+
+def test_estado_crece_entre_turnos():
+    """Con checkpointer, cada turno añade al estado acumulado del hilo."""
+    app = build_mcp_graph().compile(checkpointer=MemorySaver())
+    config = {"configurable": {"thread_id": "V1"}}
+
+    app.invoke({"context": initialize_context("V1"), "messages": [HumanMessage(content="Dolor cervical")]}, config)
+    estado = app.invoke({"messages": [HumanMessage(content="Revisar visitas anteriores")]}, config)
+
+    assert [b["id"] for b in estado["memory_blocks"]] == ["msg_1", "msg_2"]
+    assert [t["tool"] for t in estado["tool_results"]] == ["visitas_anteriores"]
+    assert len(estado["messages"]) == 4
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
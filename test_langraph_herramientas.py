@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Pruebas de la ejecución en paralelo de herramientas en el grafo LangGraph del MCP.
+"""
+
+import time
+
+import pytest
+from langchain_core.messages import HumanMessage
+
+from langraph_mcp import MemorySaver, build_mcp_graph, initialize_context, run_graph
+
+MENSAJE_TRES_HERRAMIENTAS = "Diagnóstico de los síntomas, riesgo legal y visitas anteriores"
+
+
+pytestmark = pytest.mark.usefixtures("llm_simulado")
+
+
+def herramienta_lenta(segundos, resultado):
+    def herramienta(task):
+        time.sleep(segundos)
+        return resultado
+    return herramienta
+
+
+def ejecutar(graph):
+    return run_graph(graph, initialize_context("V1"), [HumanMessage(content=MENSAJE_TRES_HERRAMIENTAS)])
+
+
+def test_latencia_acotada_por_la_herramienta_mas_lenta(llm_simulado):
+    """Las herramientas se ejecutan en paralelo y se reúnen antes de la respuesta."""
+    graph = build_mcp_graph(tools={
+        "diagnostico": herramienta_lenta(0.3, "diagnóstico"),
+        "riesgo_legal": herramienta_lenta(0.2, {"nivel_riesgo": "bajo"}),
+        "visitas_anteriores": herramienta_lenta(0.2, "sin visitas")
+    })
+
+    inicio = time.perf_counter()
+    resultado = ejecutar(graph)
+    duracion = time.perf_counter() - inicio
+
+    assert duracion < 0.6
+    assert [t["tool"] for t in resultado.tool_results] == ["diagnostico", "riesgo_legal", "visitas_anteriores"]
+    assert resultado.tool_results[1]["result"] == '{"nivel_riesgo": "bajo"}'
+    assert llm_simulado.llamadas == 1
+
+
+def test_timeout_por_herramienta():
+    """Una herramienta que supera su timeout no bloquea al resto del grafo."""
+    graph = build_mcp_graph(
+        tools={"diagnostico": herramienta_lenta(1.0, "tarde")},
+        tool_timeouts={"diagnostico": 0.1}
+    )
+
+    inicio = time.perf_counter()
+    resultado = ejecutar(graph)
+
+    assert time.perf_counter() - inicio < 0.8
+    por_herramienta = {t["tool"]: t for t in resultado.tool_results}
+    assert por_herramienta["diagnostico"]["error"] == "timeout"
+    assert "error" not in por_herramienta["riesgo_legal"]
+    assert resultado.messages[-1].content == "Respuesta simulada"
+
+
+def test_error_de_herramienta():
+    """El fallo de una herramienta se registra en su resultado."""
+    def falla(task):
+        raise RuntimeError("EMR no disponible")
+
+    resultado = ejecutar(build_mcp_graph(tools={"visitas_anteriores": falla}))
+
+    por_herramienta = {t["tool"]: t for t in resultado.tool_results}
+    assert por_herramienta["visitas_anteriores"]["error"] == "EMR no disponible"
+    assert len(resultado.tool_results) == 3
+
+
+def test_resultados_de_herramientas_por_turno():
+    """Con checkpointer, cada turno solo ve los resultados de sus herramientas."""
+    app = build_mcp_graph().compile(checkpointer=MemorySaver())
+    contexto = initialize_context("V1")
+
+    primero = run_graph(app, contexto, [HumanMessage(content="Necesito un diagnóstico de los síntomas", id="h1")])
+    segundo = run_graph(app, contexto, [HumanMessage(content="¿Hay riesgo legal en el tratamiento?", id="h2")])
+
+    assert [r["tool"] for r in primero.tool_results] == ["diagnostico"]
+    assert [r["tool"] for r in segundo.tool_results] == ["riesgo_legal"]
+    # La memoria sí se acumula en el hilo de la visita
+    assert len(segundo.memory_blocks) == 2
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Pruebas de la instrumentación por nodo del grafo LangGraph del MCP.
+"""
+
+import pytest
+from langchain_core.messages import HumanMessage
+
+import langraph_mcp
+from langraph_instrumentation import NodeMetricsRegistry, collect_node_timings, get_node_metrics
+from langraph_mcp import build_mcp_graph, initialize_context, run_graph
+
+
+@pytest.fixture(autouse=True)
+def llm_lento(llm_simulado, monkeypatch):
+    """El LLM simulado tarda 50 ms en responder."""
+    monkeypatch.setattr(llm_simulado, "retardo", 0.05)
+    get_node_metrics().reset()
+    yield
+    get_node_metrics().reset()
+
+
+def test_mediciones_por_peticion_y_globales():
+    """Cada nodo ejecutado se mide en la petición y en el registro del proceso."""
+    graph = build_mcp_graph()
+    mensaje = "Necesito un diagnóstico y revisar el riesgo legal"
+
+    with collect_node_timings() as timings:
+        run_graph(graph, initialize_context("V1"), [HumanMessage(content=mensaje)])
+    run_graph(graph, initialize_context("V2"), [HumanMessage(content=mensaje)])
+
+    nodos = [t["node"] for t in timings]
+    assert nodos[:3] == ["process_user_message", "filter_memory_blocks", "determine_tools_needed"]
+    assert nodos.count("run_tool") == 2
+    assert nodos[-1] == "generate_final_response"
+
+    final = timings[-1]
+    assert final["wall_ms"] >= 50
+    assert final["cpu_ms"] < final["wall_ms"]
+    assert final["memory_blocks"] == 1
+    assert final["tool_results"] == 2
+    assert timings[0]["update_bytes"] > len(mensaje)
+
+    resumen = get_node_metrics().summary()
+    assert resumen["run_tool"]["count"] == 4
+    assert resumen["generate_final_response"]["count"] == 2
+    assert max(resumen, key=lambda n: resumen[n]["share"]) == "generate_final_response"
+
+
+def test_errores_de_nodo(llm_simulado, monkeypatch):
+    """Un nodo que falla se mide y se contabiliza como error."""
+    class LLMRoto(llm_simulado):
+        def invoke(self, messages):
+            raise RuntimeError("sin conexión")
+
+    monkeypatch.setattr(langraph_mcp, "ChatOpenAI", LLMRoto)
+    with pytest.raises(RuntimeError):
+        run_graph(build_mcp_graph(), initialize_context("V1"), [HumanMessage(content="Dolor cervical")])
+
+    assert get_node_metrics().summary()["generate_final_response"]["errors"] == 1
+
+
+def test_percentiles_del_registro():
+    """El registro calcula p50/p95 sobre una ventana acotada de muestras."""
+    registro = NodeMetricsRegistry(max_samples=100)
+    for i in range(1, 201):
+        registro.record({"node": "n", "wall_ms": float(i), "cpu_ms": 1.0, "update_bytes": 10})
+
+    resumen = registro.summary()["n"]
+    assert resumen["count"] == 200
+    assert resumen["wall_p50_ms"] == 150.0
+    assert resumen["wall_p95_ms"] == 195.0
+    assert resumen["share"] == 1.0
+
+
+def test_grafo_sin_instrumentar():
+    """Con instrument=False los nodos no se miden."""
+    with collect_node_timings() as timings:
+        run_graph(build_mcp_graph(instrument=False), initialize_context("V1"), [HumanMessage(content="Hola")])
+
+    assert timings == []
+    assert get_node_metrics().summary() == {}
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Pruebas de los perfiles precompilados por rol y del pool de agentes MCP.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from mcp.agent_factory import (
+    PERFILES_POR_ROL,
+    AgentPool,
+    create_agent_by_role,
+    crear_agente_paciente
+)
+
+
+def test_perfiles_inmutables(crear_contexto):
+    """Los perfiles compilados no pueden modificarse desde un agente."""
+    perfil = PERFILES_POR_ROL["patient"]
+    with pytest.raises(TypeError):
+        perfil["max_iteraciones"] = 10
+
+    agente = create_agent_by_role(crear_contexto("patient"), {"nivel_detalle": "alto"})
+    assert agente.config["nivel_detalle"] == "alto"
+    assert PERFILES_POR_ROL["patient"]["nivel_detalle"] == "bajo"
+
+
+def test_fabrica_especializada_mantiene_opciones(crear_contexto):
+    """Las fábricas por rol siguen aplicando sus opciones específicas."""
+    agente = crear_agente_paciente(crear_contexto())
+    assert agente.config["formato_respuesta"] == "simplificado"
+    assert agente.max_iteraciones == 3
+    assert "evaluar_riesgo_legal" not in agente.config["herramientas_permitidas"]
+
+
+def test_pool_reutiliza_agentes_entre_contextos(crear_contexto):
+    """Un agente liberado se reutiliza vinculado al nuevo contexto."""
+    pool = AgentPool(max_por_rol=2)
+    primero = crear_contexto()
+    with pool.usar(primero) as agente:
+        respuesta = agente.procesar_mensaje("El paciente refiere dolor cervical")
+        assert respuesta
+
+    segundo = crear_contexto(visita_id="V20250508-002")
+    with pool.usar(segundo) as reutilizado:
+        assert reutilizado is agente
+        assert reutilizado.contexto is segundo
+
+    assert pool.metricas["creados"] == 1
+    assert pool.metricas["reutilizados"] == 1
+    assert any(e["tipo"] == "configuracion" for e in segundo.historia)
+
+
+def test_pool_concurrente_no_comparte_agentes(crear_contexto):
+    """Bajo concurrencia cada petición recibe un agente exclusivo."""
+    pool = AgentPool(max_por_rol=4, precalentar=4)
+
+    def tarea(indice):
+        contexto = crear_contexto(visita_id=f"V{indice}")
+        with pool.usar(contexto) as agente:
+            assert agente.contexto is contexto
+            agente.procesar_mensaje("Control de dolor cervical")
+            return agente.contexto is contexto
+
+    with ThreadPoolExecutor(max_workers=4) as ejecutor:
+        assert all(ejecutor.map(tarea, range(40)))
+
+    assert pool.inactivos("health_professional") <= 4
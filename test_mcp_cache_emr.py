@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Pruebas de la caché de lectura de visitas del EMR.
+"""
+
+import asyncio
+
+import pytest
+
+from mcp.agent_mcp import MCPAgent
+from mcp.cache_emr import CacheVisitasEMR, configurar_cache_emr
+from mcp.cliente_emr import ClienteEMR
+from mcp.integracion_emr import obtener_datos_visita
+from mcp.servidor_emr_local import ServidorEMRLocal
+
+
+@pytest.fixture(autouse=True)
+def cache_limpia():
+    """Cada prueba usa una caché compartida vacía."""
+    yield configurar_cache_emr()
+    configurar_cache_emr()
+
+
+def crear_cargador(llamadas, retardo=0.0):
+    async def cargar(visit_id):
+        llamadas.append(visit_id)
+        await asyncio.sleep(retardo)
+        return {"visita": {"id": visit_id}, "carga": len(llamadas)}
+    return cargar
+
+
+def test_aciertos_y_fallos():
+    """La segunda lectura de una visita sale de la caché."""
+    cache = CacheVisitasEMR()
+    llamadas = []
+    cargar = crear_cargador(llamadas)
+
+    async def escenario():
+        primera = await cache.obtener("V1", cargar)
+        segunda = await cache.obtener("V1", cargar)
+        return primera, segunda
+
+    primera, segunda = asyncio.run(escenario())
+
+    assert primera is segunda
+    assert llamadas == ["V1"]
+    metricas = cache.metricas()
+    assert metricas["aciertos"] == 1
+    assert metricas["fallos"] == 1
+    assert metricas["tasa_aciertos"] == 0.5
+
+
+def test_single_flight():
+    """Los fallos concurrentes de una misma visita comparten una sola carga."""
+    cache = CacheVisitasEMR()
+    llamadas = []
+    cargar = crear_cargador(llamadas, retardo=0.05)
+
+    async def escenario():
+        return await asyncio.gather(*(cache.obtener("V1", cargar) for _ in range(10)))
+
+    resultados = asyncio.run(escenario())
+
+    assert llamadas == ["V1"]
+    assert all(r is resultados[0] for r in resultados)
+    assert cache.metricas()["coalescidas"] == 9
+
+
+def test_error_se_propaga_y_no_se_cachea():
+    """Un error de carga llega a todos los que esperaban y no queda en caché."""
+    cache = CacheVisitasEMR()
+    intentos = []
+
+    async def cargar_con_error(visit_id):
+        intentos.append(visit_id)
+        await asyncio.sleep(0.02)
+        raise ValueError(f"Visita no encontrada: {visit_id}")
+
+    async def escenario():
+        return await asyncio.gather(
+            *(cache.obtener("V1", cargar_con_error) for _ in range(3)),
+            return_exceptions=True
+        )
+
+    resultados = asyncio.run(escenario())
+    assert all(isinstance(r, ValueError) for r in resultados)
+    assert len(intentos) == 1
+
+    asyncio.run(escenario())
+    assert len(intentos) == 2
+    assert cache.metricas()["entradas"] == 0
+
+
+def test_ttl_y_limite():
+    """Las entradas caducan tras el TTL y se desalojan las menos usadas."""
+    cache = CacheVisitasEMR(max_entradas=2, ttl=0.05)
+    llamadas = []
+    cargar = crear_cargador(llamadas)
+
+    async def escenario():
+        await cache.obtener("V1", cargar)
+        await cache.obtener("V2", cargar)
+        await cache.obtener("V1", cargar)
+        await cache.obtener("V3", cargar)  # desaloja V2
+        await cache.obtener("V1", cargar)
+        await cache.obtener("V2", cargar)
+        await asyncio.sleep(0.06)
+        await cache.obtener("V1", cargar)
+
+    asyncio.run(escenario())
+
+    assert llamadas == ["V1", "V2", "V3", "V2", "V1"]
+    metricas = cache.metricas()
+    assert metricas["desalojadas"] >= 1
+    assert metricas["expiradas"] == 1
+
+
+def test_invalidacion_durante_carga():
+    """Una invalidación mientras se carga impide guardar datos ya obsoletos."""
+    cache = CacheVisitasEMR()
+    llamadas = []
+    cargar = crear_cargador(llamadas, retardo=0.05)
+
+    async def escenario():
+        carga = asyncio.ensure_future(cache.obtener("V1", cargar))
+        await asyncio.sleep(0.01)
+        cache.invalidar("V1")
+        await carga
+        await cache.obtener("V1", cargar)
+
+    asyncio.run(escenario())
+    assert llamadas == ["V1", "V1"]
+
+
+def test_cancelar_al_propietario_no_cancela_a_los_demas():
+    """Si se cancela la petición que carga, las que esperaban reintentan la carga."""
+    cache = CacheVisitasEMR()
+    llamadas = []
+    cargar = crear_cargador(llamadas, retardo=0.05)
+
+    async def escenario():
+        propietario = asyncio.ensure_future(cache.obtener("V1", cargar))
+        await asyncio.sleep(0.01)
+        esperando = [asyncio.ensure_future(cache.obtener("V1", cargar)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        propietario.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await propietario
+        return await asyncio.gather(*esperando)
+
+    resultados = asyncio.run(escenario())
+
+    assert all(r is resultados[0] for r in resultados)
+    assert resultados[0]["carga"] == 2
+    assert llamadas == ["V1", "V1"]
+    assert cache._cargas == {}
+
+
+def test_esperar_y_ser_cancelado_se_propaga():
+    """Cancelar una petición que esperaba una carga ajena la cancela solo a ella."""
+    cache = CacheVisitasEMR()
+    llamadas = []
+    cargar = crear_cargador(llamadas, retardo=0.05)
+
+    async def escenario():
+        propietario = asyncio.ensure_future(cache.obtener("V1", cargar))
+        await asyncio.sleep(0.01)
+        esperando = asyncio.ensure_future(cache.obtener("V1", cargar))
+        await asyncio.sleep(0.01)
+        esperando.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await esperando
+        return await propietario
+
+    assert asyncio.run(escenario())["carga"] == 1
+    assert llamadas == ["V1"]
+
+
+def test_generaciones_solo_durante_la_carga():
+    """Las invalidaciones no dejan estado por visita una vez terminadas las cargas."""
+    cache = CacheVisitasEMR(max_entradas=2)
+    llamadas = []
+    cargar = crear_cargador(llamadas, retardo=0.05)
+
+    async def escenario():
+        for i in range(10):
+            await cache.obtener(f"V{i}", crear_cargador([]))
+            cache.invalidar(f"V{i}")
+        carga = asyncio.ensure_future(cache.obtener("V1", cargar))
+        await asyncio.sleep(0.01)
+        cache.invalidar_todo()
+        return await carga
+
+    asyncio.run(escenario())
+
+    # La carga invalidada por invalidar_todo no se guardó
+    assert cache.metricas()["entradas"] == 0
+    assert cache._generaciones == {}
+    assert cache._cargas == {}
+
+
+def test_agentes_comparten_carga_del_emr():
+    """Varios roles que abren la misma visita generan una sola consulta al EMR."""
+    async def escenario(url):
+        async with ClienteEMR(url) as cliente:
+            agentes = await asyncio.gather(*(
+                MCPAgent.desde_visita_emr("VISITA123", user_role=rol, cliente_emr=cliente)
+                for rol in ("health_professional", "patient", "admin_staff")
+            ))
+            return agentes, cliente.metricas["cargas_visita"]
+
+    with ServidorEMRLocal(latencias={"visita": 0.05}) as servidor:
+        agentes, cargas = asyncio.run(escenario(servidor.url))
+
+    assert cargas == 1
+    assert {a.contexto.user_role for a in agentes} == {"health_professional", "patient", "admin_staff"}
+
+
+def test_escritura_invalida_visita(cache_limpia):
+    """Tras invalidar una visita, la siguiente lectura vuelve al EMR."""
+    async def escenario():
+        await obtener_datos_visita("VISITA123", usar_cache=True)
+        await obtener_datos_visita("VISITA123", usar_cache=True)
+        cache_limpia.invalidar("VISITA123")
+        await obtener_datos_visita("VISITA123", usar_cache=True)
+
+    asyncio.run(escenario())
+
+    metricas = cache_limpia.metricas()
+    assert metricas["fallos"] == 2
+    assert metricas["aciertos"] == 1
+    assert metricas["invalidaciones"] == 1
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
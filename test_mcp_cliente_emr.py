@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Pruebas del cliente EMR asíncrono contra el servidor EMR local.
+"""
+
+import asyncio
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from mcp.agent_mcp import MCPAgent
+from mcp.cliente_emr import ClienteEMR, ErrorClienteEMR
+from mcp.integracion_emr import EMR_VISITAS_SIMULADAS, configurar_cliente_emr, obtener_datos_visita
+from mcp.servidor_emr_local import ServidorEMRLocal
+
+
+def test_obtener_visita_completa():
+    """El cliente reconstruye la misma estructura que los datos simulados."""
+    async def escenario(url):
+        async with ClienteEMR(url) as cliente:
+            return await cliente.obtener_visita("VISITA123")
+
+    with ServidorEMRLocal() as servidor:
+        datos = asyncio.run(escenario(servidor.url))
+
+    assert datos == EMR_VISITAS_SIMULADAS["VISITA123"]
+
+
+def test_subpeticiones_concurrentes():
+    """La latencia total está acotada por el subrecurso más lento, no por la suma."""
+    latencias = {"visita": 0.2, "paciente": 0.2, "profesional": 0.2, "visitas_anteriores": 0.2, "formularios": 0.3}
+
+    async def escenario(url):
+        async with ClienteEMR(url) as cliente:
+            inicio = time.perf_counter()
+            await cliente.obtener_visita("VISITA456")
+            return time.perf_counter() - inicio
+
+    with ServidorEMRLocal(latencias=latencias) as servidor:
+        duracion = asyncio.run(escenario(servidor.url))
+
+    assert 0.3 <= duracion < sum(latencias.values()) / 2
+
+
+def test_timeouts_por_llamada():
+    """Un subrecurso opcional lento se omite; uno obligatorio lento provoca error."""
+    async def escenario(url):
+        async with ClienteEMR(url, timeout_por_llamada=0.1) as cliente:
+            datos = await cliente.obtener_visita("VISITA123")
+            return datos, cliente.metricas["timeouts"]
+
+    with ServidorEMRLocal(latencias={"formularios": 0.5}) as servidor:
+        datos, timeouts = asyncio.run(escenario(servidor.url))
+    assert datos["formularios"] == {}
+    assert datos["paciente"]["nombre"] == "Juan Pérez"
+    assert timeouts == 1
+
+    with ServidorEMRLocal(latencias={"paciente": 0.5}) as servidor:
+        with pytest.raises(ErrorClienteEMR):
+            asyncio.run(escenario(servidor.url))
+
+
+def test_visita_inexistente():
+    """Una visita inexistente produce el mismo ValueError que el EMR simulado."""
+    async def escenario(url):
+        async with ClienteEMR(url) as cliente:
+            await obtener_datos_visita("NO_EXISTE", cliente)
+
+    with ServidorEMRLocal() as servidor:
+        with pytest.raises(ValueError, match="Visita no encontrada"):
+            asyncio.run(escenario(servidor.url))
+
+
+def test_agente_desde_visita_emr_con_cliente():
+    """MCPAgent.desde_visita_emr usa el cliente indicado o el configurado."""
+    with ServidorEMRLocal() as servidor:
+        cliente = ClienteEMR(servidor.url)
+        agente = asyncio.run(MCPAgent.desde_visita_emr("VISITA123", cliente_emr=cliente))
+        assert agente.contexto.paciente["nombre"] == "Juan Pérez"
+
+        configurar_cliente_emr(cliente)
+        try:
+            agente = asyncio.run(MCPAgent.desde_visita_emr("VISITA456", user_role="patient"))
+        finally:
+            configurar_cliente_emr(None)
+        assert agente.contexto.paciente["nombre"] == "Elena Gómez"
+        assert servidor.peticiones["visita"] == 2
+
+
+def test_cliente_se_cierra_al_terminar_cada_bucle():
+    """Usar el cliente desde varios asyncio.run no deja transportes abiertos."""
+    async def escenario(cliente):
+        await cliente.obtener_visita("VISITA123")
+        return await cliente._obtener_cliente()
+
+    with ServidorEMRLocal() as servidor:
+        cliente = ClienteEMR(servidor.url)
+        primero = asyncio.run(escenario(cliente))
+        assert primero.is_closed
+
+        segundo = asyncio.run(escenario(cliente))
+        assert segundo is not primero
+        assert segundo.is_closed
+
+
+def test_respuesta_no_json():
+    """Una respuesta 200 que no es JSON produce ErrorClienteEMR, no un ValueError suelto."""
+    class PaginaDeProxy(BaseHTTPRequestHandler):
+        def do_GET(self):
+            cuerpo = b"<html>502 Bad Gateway</html>"
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html")
+            self.send_header("Content-Length", str(len(cuerpo)))
+            self.end_headers()
+            self.wfile.write(cuerpo)
+
+        def log_message(self, *args):
+            pass
+
+    servidor = ThreadingHTTPServer(("127.0.0.1", 0), PaginaDeProxy)
+    hilo = threading.Thread(target=servidor.serve_forever, daemon=True)
+    hilo.start()
+    url = f"http://127.0.0.1:{servidor.server_address[1]}"
+
+    async def escenario(operacion):
+        async with ClienteEMR(url) as cliente:
+            await operacion(cliente)
+
+    try:
+        with pytest.raises(ErrorClienteEMR, match="no JSON"):
+            asyncio.run(escenario(lambda c: c.obtener_visita("VISITA123")))
+        with pytest.raises(ErrorClienteEMR, match="text/html"):
+            asyncio.run(escenario(lambda c: c.listar_visitas("PROF001")))
+        with pytest.raises(ErrorClienteEMR):
+            asyncio.run(escenario(lambda c: c.obtener_cambios()))
+    finally:
+        servidor.shutdown()
+        servidor.server_close()
+
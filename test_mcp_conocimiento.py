@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Pruebas de la base de conocimiento clínico indexada.
+"""
+
+import json
+import os
+
+from mcp.conocimiento import BaseConocimientoClinico, tokenizar
+from mcp.tools import sugerir_diagnostico_clinico
+
+
+def escribir_base(ruta, condiciones):
+    """Escribe un fichero de conocimiento con las condiciones indicadas."""
+    ruta.write_text(json.dumps({"version": 1, "condiciones": condiciones}, ensure_ascii=False), encoding="utf-8")
+
+
+def condicion(clave, principal, confianza=0.8, sinonimos=None):
+    """Crea una condición mínima para las pruebas."""
+    return {
+        "clave": clave,
+        "principal": principal,
+        "secundarios": [],
+        "confianza": confianza,
+        "referencias": [],
+        "sinonimos": sinonimos or []
+    }
+
+
+def test_tokenizar_normaliza_acentos():
+    """La tokenización ignora mayúsculas, acentos y palabras vacías."""
+    assert tokenizar("Dolor en la Rótula") == ["dolor", "rotula"]
+
+
+def test_diagnosticos_originales():
+    """Las condiciones originales se siguen sugiriendo con su confianza."""
+    resultado = sugerir_diagnostico_clinico("Dolor cervical persistente", [])
+    assert resultado["diagnósticos"]["principal"] == "Cervicalgia mecánica"
+    assert resultado["diagnósticos"]["confianza"] == 0.85
+
+    resultado = sugerir_diagnostico_clinico("Consulta", ["dolor de rodilla al subir escaleras"])
+    assert resultado["diagnósticos"]["principal"] == "Condropatía rotuliana"
+
+
+def test_termino_generico_sin_diagnostico():
+    """Un término genérico como "dolor" no basta para sugerir un diagnóstico."""
+    resultado = sugerir_diagnostico_clinico("Dolor", ["dolor"])
+    assert resultado["diagnósticos"]["principal"] == "No determinado"
+    assert resultado["alternativas"] == []
+
+
+def test_ranking_por_solapamiento():
+    """Las condiciones se ordenan por solapamiento de síntomas."""
+    resultado = sugerir_diagnostico_clinico("Dolor lumbar", ["dolor irradiado a la pierna", "ciática"])
+    assert resultado["diagnósticos"]["principal"] == "Lumbociática"
+    assert [a["principal"] for a in resultado["alternativas"]] == ["Lumbalgia inespecífica"]
+
+
+def test_recarga_en_caliente(tmp_path):
+    """El índice se reconstruye cuando cambia el fichero."""
+    ruta = tmp_path / "conocimiento.json"
+    escribir_base(ruta, [condicion("dolor cervical", "Cervicalgia")])
+    base = BaseConocimientoClinico(str(ruta), intervalo_comprobacion=0)
+    assert base.buscar(["dolor de hombro"]) == []
+
+    escribir_base(ruta, [condicion("dolor cervical", "Cervicalgia"), condicion("dolor hombro", "Hombro doloroso")])
+    estado = os.stat(ruta)
+    os.utime(ruta, ns=(estado.st_atime_ns, estado.st_mtime_ns + 1_000_000))
+
+    sugerencias = base.buscar(["dolor de hombro"])
+    assert base.recargas == 1
+    assert base.total_condiciones == 2
+    assert sugerencias[0]["principal"] == "Hombro doloroso"
+
+
+def test_recarga_con_fichero_invalido(tmp_path):
+    """Un fichero mal formado no rompe las búsquedas: se conserva el índice anterior."""
+    ruta = tmp_path / "conocimiento.json"
+    escribir_base(ruta, [condicion("dolor cervical", "Cervicalgia")])
+    base = BaseConocimientoClinico(str(ruta), intervalo_comprobacion=0)
+
+    ruta.write_text('{"condiciones": [{"clave": "dolor', encoding="utf-8")
+    estado = os.stat(ruta)
+    os.utime(ruta, ns=(estado.st_atime_ns, estado.st_mtime_ns + 1_000_000))
+
+    assert base.buscar(["dolor cervical"])[0]["principal"] == "Cervicalgia"
+    assert base.buscar(["dolor cervical"])[0]["principal"] == "Cervicalgia"
+    # El fichero inválido se lee una sola vez
+    assert base.errores_recarga == 1
+    assert base.recargas == 0
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Pruebas del feed de cambios del EMR y de su consumidor.
+"""
+
+import asyncio
+import copy
+
+import pytest
+
+from mcp.agent_mcp import MCPAgent
+from mcp.cache_emr import configurar_cache_emr
+from mcp.cliente_emr import ClienteEMR
+from mcp.feed_cambios import ConsumidorCambios, FuenteCambiosCola, FuenteCambiosSondeo
+from mcp.integracion_emr import EMR_VISITAS_SIMULADAS
+from mcp.servidor_emr_local import ServidorEMRLocal
+from mcp.sesiones import configurar_almacen_sesiones
+
+
+@pytest.fixture(autouse=True)
+def almacen():
+    """Cada prueba usa un almacén de sesiones y una caché vacíos."""
+    configurar_cache_emr()
+    yield configurar_almacen_sesiones()
+    configurar_almacen_sesiones()
+    configurar_cache_emr()
+
+
+def bloques_actualizacion(contexto):
+    """Devuelve los textos de los bloques añadidos por sincronización."""
+    return [
+        evento["contenido"] for evento in contexto.historia
+        if evento["tipo"] == "bloque_conversacion" and "(actualización)" in str(evento["contenido"])
+    ]
+
+
+def test_cola_entre_hilos():
+    """Los eventos publicados desde otro hilo despiertan al lector."""
+    fuente = FuenteCambiosCola()
+
+    async def escenario():
+        bucle = asyncio.get_running_loop()
+        bucle.call_later(0.02, lambda: bucle.run_in_executor(None, fuente.publicar, "V1", "anamnesis"))
+        return await fuente.leer(timeout=2.0)
+
+    eventos = asyncio.run(escenario())
+    assert [e["visit_id"] for e in eventos] == ["V1"]
+    assert asyncio.run(fuente.leer(timeout=0)) == []
+
+
+def test_cola_acotada_y_consumidores():
+    """La cola descarta los eventos más antiguos al llenarse y registra a sus consumidores."""
+    fuente = FuenteCambiosCola(max_pendientes=3)
+    for i in range(5):
+        fuente.publicar(f"V{i}")
+
+    assert fuente.pendientes() == 3
+    assert fuente.descartados() == 2
+    assert [e["visit_id"] for e in asyncio.run(fuente.leer(timeout=0))] == ["V2", "V3", "V4"]
+
+    async def escenario():
+        consumidor = ConsumidorCambios(fuente, ventana=0)
+        consumidor.iniciar()
+        conectado = fuente.tiene_consumidor
+        await consumidor.detener()
+        return conectado
+
+    assert fuente.tiene_consumidor is False
+    assert asyncio.run(escenario()) is True
+    assert fuente.tiene_consumidor is False
+
+
+def test_esperas_caducadas_no_se_acumulan():
+    """Las lecturas que agotan el timeout no dejan esperas registradas."""
+    fuente = FuenteCambiosCola()
+
+    async def escenario():
+        for _ in range(50):
+            assert await fuente.leer(timeout=0.001) == []
+        assert fuente._esperas == []
+        lectura = asyncio.ensure_future(fuente.leer(timeout=1.0))
+        await asyncio.sleep(0.01)
+        fuente.publicar("V1")
+        return await lectura
+
+    assert [e["visit_id"] for e in asyncio.run(escenario())] == ["V1"]
+
+
+def test_rafaga_agrupada_por_visita():
+    """Una ráfaga de ediciones de una visita genera una sola actualización por contexto."""
+    datos = copy.deepcopy(EMR_VISITAS_SIMULADAS)
+
+    async def escenario(servidor):
+        async with ClienteEMR(servidor.url) as cliente:
+            agentes = [
+                await MCPAgent.desde_visita_emr("VISITA123", user_role=rol, cliente_emr=cliente)
+                for rol in ("health_professional", "patient")
+            ]
+            fuente = FuenteCambiosCola()
+            consumidor = ConsumidorCambios(fuente, cliente_emr=cliente, ventana=0.02)
+
+            for intensidad in (6, 5, 4):
+                servidor.actualizar_formulario("VISITA123", "anamnesis", {"intensidad_dolor": intensidad})
+                fuente.publicar("VISITA123", "anamnesis")
+            fuente.publicar("VISITA456", "anamnesis")
+
+            actualizados = await consumidor.procesar_lote()
+            return agentes, actualizados, consumidor.metricas()
+
+    with ServidorEMRLocal(datos=datos) as servidor:
+        agentes, actualizados, metricas = asyncio.run(escenario(servidor))
+        peticiones = servidor.peticiones.get("formularios", 0)
+
+    assert actualizados == {"VISITA123": 2, "VISITA456": 0}
+    assert metricas["eventos"] == 4
+    assert metricas["coalescidos"] == 2
+    assert metricas["consultas_emr"] == 1
+    for agente in agentes:
+        bloques = bloques_actualizacion(agente.contexto)
+        assert len(bloques) == 1
+        assert "intensidad_dolor: 4" in bloques[0]
+    # Carga inicial (una por la caché) + una consulta del consumidor
+    assert peticiones == 2
+
+
+def test_sondeo_del_registro_de_cambios():
+    """La fuente por sondeo lee el registro /api/cambios a partir de su secuencia."""
+    datos = copy.deepcopy(EMR_VISITAS_SIMULADAS)
+
+    async def escenario(servidor):
+        async with ClienteEMR(servidor.url) as cliente:
+            agente = await MCPAgent.desde_visita_emr("VISITA123", cliente_emr=cliente)
+            fuente = FuenteCambiosSondeo(cliente, intervalo=0.01)
+            consumidor = ConsumidorCambios(fuente, cliente_emr=cliente, ventana=0)
+
+            assert await consumidor.procesar_lote(timeout=0) == {}
+
+            servidor.actualizar_formulario("VISITA123", "anamnesis", {"dolor_actual": "Sin dolor"})
+            servidor.actualizar_formulario("VISITA123", "anamnesis", {"intensidad_dolor": 1})
+            primero = await consumidor.procesar_lote(timeout=0)
+            segundo = await consumidor.procesar_lote(timeout=0)
+            return agente, primero, segundo, fuente.secuencia
+
+    with ServidorEMRLocal(datos=datos) as servidor:
+        agente, primero, segundo, secuencia = asyncio.run(escenario(servidor))
+
+    assert primero == {"VISITA123": 1}
+    assert segundo == {}
+    assert secuencia == 2
+    bloques = bloques_actualizacion(agente.contexto)
+    assert len(bloques) == 1
+    assert "dolor_actual: Sin dolor" in bloques[0] and "intensidad_dolor: 1" in bloques[0]
+
+
+def test_consumidor_en_segundo_plano():
+    """El consumidor lanzado como tarea mantiene el contexto actualizado."""
+    datos = copy.deepcopy(EMR_VISITAS_SIMULADAS)
+
+    async def escenario(servidor):
+        async with ClienteEMR(servidor.url) as cliente:
+            agente = await MCPAgent.desde_visita_emr("VISITA456", cliente_emr=cliente)
+            fuente = FuenteCambiosCola()
+            consumidor = ConsumidorCambios(fuente, cliente_emr=cliente, ventana=0.01)
+            consumidor.iniciar()
+
+            servidor.actualizar_formulario("VISITA456", "exploracion", {"flexion_rodilla": "90 grados"})
+            fuente.publicar("VISITA456", "exploracion")
+            for _ in range(100):
+                if consumidor.metricas()["contextos_actualizados"]:
+                    break
+                await asyncio.sleep(0.01)
+            await consumidor.detener()
+            return agente
+
+    with ServidorEMRLocal(datos=datos) as servidor:
+        agente = asyncio.run(escenario(servidor))
+
+    bloques = bloques_actualizacion(agente.contexto)
+    assert bloques and "flexion_rodilla: 90 grados" in bloques[0]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Pruebas del formateo perezoso y precompilado de resultados de herramientas.
+"""
+
+import json
+
+from mcp import tools
+from mcp.agent_factory import create_agent_by_role
+from mcp.tools import (
+    ResultadoHerramienta,
+    formatear_resultado_herramienta,
+    recordar_visitas_anteriores,
+    sugerir_diagnostico_clinico
+)
+
+
+def contar_renderizados(monkeypatch):
+    """Envuelve los formateadores registrados para contar cuántas veces se ejecutan."""
+    llamadas = []
+    for nombre, formateador in list(tools.FORMATEADORES.items()):
+        def espia(resultado, _nombre=nombre, _formateador=formateador):
+            llamadas.append(_nombre)
+            return _formateador(resultado)
+        monkeypatch.setitem(tools.FORMATEADORES, nombre, espia)
+    return llamadas
+
+
+def test_vista_formateada_se_renderiza_una_vez(monkeypatch):
+    """La vista formateada se calcula al consultarla y queda en caché."""
+    llamadas = contar_renderizados(monkeypatch)
+    resultado = sugerir_diagnostico_clinico("Dolor cervical persistente", [])
+
+    assert isinstance(resultado, ResultadoHerramienta)
+    assert not resultado.renderizado
+    texto = resultado.formateado
+    assert texto.startswith("📋 SUGERENCIA DIAGNÓSTICA (85% confianza)")
+    assert formatear_resultado_herramienta(resultado) is texto
+    assert llamadas == ["sugerir_diagnostico_clinico"]
+
+
+def test_resultado_sigue_siendo_diccionario():
+    """El resultado se serializa igual que un diccionario y admite diccionarios planos."""
+    resultado = recordar_visitas_anteriores("P001", limite=1)
+    assert json.loads(json.dumps(resultado))["tool"] == "recordar_visitas_anteriores"
+    assert formatear_resultado_herramienta(dict(resultado)) == resultado.formateado
+    assert formatear_resultado_herramienta({}) == "No se obtuvo resultado de la herramienta."
+
+
+def test_historia_reutiliza_vista(crear_contexto, monkeypatch):
+    """La historia formateada reutiliza el texto ya renderizado por el agente."""
+    llamadas = contar_renderizados(monkeypatch)
+    contexto = crear_contexto()
+    agente = create_agent_by_role(contexto)
+    agente.procesar_mensaje("El paciente presenta dolor cervical, quiero aplicar manipulación")
+    renderizados = len(llamadas)
+    assert renderizados > 0
+
+    contexto.obtener_historia_formateada()
+    contexto.obtener_historia_formateada()
+    assert len(llamadas) == renderizados
+
+
+def test_sin_razonamiento_no_renderiza_innecesario(crear_contexto, monkeypatch):
+    """Sin razonamiento visible solo se renderiza lo que usa la respuesta final."""
+    llamadas = contar_renderizados(monkeypatch)
+    contexto = crear_contexto("patient")
+    agente = create_agent_by_role(contexto)
+    assert agente.config["mostrar_razonamiento"] is False
+
+    respuesta = agente.procesar_mensaje("Hola, ¿qué tal?")
+    assert "Hola Juan Pérez" in respuesta
+    assert llamadas == []
+
+    respuesta = agente.procesar_mensaje("¿Puedo ver mi historial de visitas anteriores?")
+    assert "Basado en tus visitas anteriores:" in respuesta
+    assert llamadas == ["recordar_visitas_anteriores"]
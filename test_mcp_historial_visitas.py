@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Pruebas del almacén de historial de visitas y de recordar_visitas_anteriores.
+"""
+
+import pytest
+
+from mcp.historial_visitas import HistorialVisitas
+from mcp.tools import recordar_visitas_anteriores
+
+
+def crear_historial_largo(total=500):
+    """Crea un almacén en memoria con un paciente de historial largo."""
+    historial = HistorialVisitas(":memory:", sembrar=False)
+    historial.agregar_visitas("P900", [
+        {
+            "fecha": f"20{10 + i // 365:02d}-{1 + (i // 30) % 12:02d}-{1 + i % 28:02d}",
+            "motivo": f"Control {i}",
+            "diagnostico": "Cervicalgia",
+            "tratamiento": "Ejercicios",
+            "evolucion": "Estable"
+        }
+        for i in range(total)
+    ])
+    historial.agregar_visitas("P901", [{"fecha": "2030-01-01", "motivo": "Otro paciente"}])
+    return historial
+
+
+def test_visitas_simuladas():
+    """La herramienta mantiene el resultado para los pacientes simulados."""
+    resultado = recordar_visitas_anteriores("P002", limite=3)
+    visitas = resultado["visitas_anteriores"]
+    assert visitas["total_encontradas"] == 3
+    assert [v["fecha"] for v in visitas["registros"]] == ["2025-05-01", "2025-04-20", "2024-11-15"]
+    assert visitas["siguiente_cursor"] is None
+
+    assert recordar_visitas_anteriores("P003")["visitas_anteriores"]["registros"] == []
+
+
+def test_paginacion_por_cursor():
+    """Recorrer todas las páginas devuelve cada visita una sola vez y en orden."""
+    historial = crear_historial_largo()
+    fechas = []
+    cursor = None
+    while True:
+        visitas, cursor = historial.consultar("P900", limite=37, cursor=cursor, campos=["fecha"])
+        fechas.extend(v["fecha"] for v in visitas)
+        if cursor is None:
+            break
+
+    assert len(fechas) == 500
+    assert fechas == sorted(fechas, reverse=True)
+
+
+def test_filtro_fechas_y_proyeccion():
+    """Los filtros de fecha y la proyección se aplican en la consulta."""
+    historial = crear_historial_largo()
+    visitas, _ = historial.consultar(
+        "P900", limite=100, fecha_desde="2010-01-01", fecha_hasta="2010-01-31", campos=["fecha", "motivo"]
+    )
+    assert visitas
+    assert all("2010-01-01" <= v["fecha"] <= "2010-01-31" for v in visitas)
+    assert all(set(v) == {"fecha", "motivo"} for v in visitas)
+
+    with pytest.raises(ValueError):
+        historial.consultar("P900", campos=["contraseña"])
+    with pytest.raises(ValueError):
+        historial.consultar("P900", cursor="no-es-un-cursor")
+
+
+def test_consulta_por_indice():
+    """La consulta de un paciente usa la clave primaria, sin recorrer ni ordenar la tabla."""
+    plan = " ".join(crear_historial_largo().plan_consulta("P900"))
+    assert "USING PRIMARY KEY" in plan
+    assert "TEMP B-TREE" not in plan
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Pruebas del almacén de sesiones y del precalentamiento de visitas programadas.
+"""
+
+import asyncio
+import copy
+import gc
+
+import pytest
+
+from mcp.agent_mcp import MCPAgent
+from mcp.cache_emr import configurar_cache_emr
+from mcp.cliente_emr import ClienteEMR
+from mcp.integracion_emr import EMR_VISITAS_SIMULADAS, convertir_a_contexto_mcp, obtener_visitas_programadas
+from mcp.precalentamiento import PrecalentadorVisitas
+from mcp.servidor_emr_local import ServidorEMRLocal
+from mcp.sesiones import AlmacenSesiones, configurar_almacen_sesiones
+
+
+@pytest.fixture(autouse=True)
+def almacen():
+    """Cada prueba usa un almacén de sesiones y una caché vacíos."""
+    configurar_cache_emr()
+    yield configurar_almacen_sesiones()
+    configurar_almacen_sesiones()
+    configurar_cache_emr()
+
+
+def test_visitas_programadas():
+    """Solo se listan las visitas en estado programada del profesional."""
+    assert asyncio.run(obtener_visitas_programadas("PROF001")) == ["VISITA456"]
+    assert asyncio.run(obtener_visitas_programadas("PROF999")) == []
+
+    async def escenario(url):
+        async with ClienteEMR(url) as cliente:
+            return await obtener_visitas_programadas("PROF001", cliente=cliente)
+
+    with ServidorEMRLocal() as servidor:
+        assert asyncio.run(escenario(servidor.url)) == ["VISITA456"]
+
+
+def test_almacen_tomar_una_vez():
+    """Un contexto aparcado se entrega una vez y pasa a estar activo."""
+    almacen = AlmacenSesiones()
+    contexto = convertir_a_contexto_mcp(EMR_VISITAS_SIMULADAS["VISITA456"], "patient")
+    almacen.aparcar(contexto)
+
+    assert almacen.tomar("VISITA456", "health_professional") is None
+    assert almacen.tomar("VISITA456", "patient") is contexto
+    assert almacen.tomar("VISITA456", "patient") is None
+    assert almacen.activos("VISITA456") == [contexto]
+
+    metricas = almacen.metricas()
+    assert metricas["aciertos"] == 1
+    assert metricas["fallos"] == 2
+    assert metricas["en_espera"] == 0
+
+    del contexto
+    gc.collect()
+    assert almacen.activos("VISITA456") == []
+
+
+def test_almacen_ttl():
+    """Los contextos aparcados caducan."""
+    almacen = AlmacenSesiones(ttl_aparcado=0)
+    almacen.aparcar(convertir_a_contexto_mcp(EMR_VISITAS_SIMULADAS["VISITA456"]))
+
+    assert almacen.tomar("VISITA456", "health_professional") is None
+    assert almacen.metricas()["expirados"] == 1
+
+
+def test_precalentar_y_abrir(almacen):
+    """Abrir una visita precalentada usa el contexto aparcado."""
+    precalentador = PrecalentadorVisitas(roles=("health_professional", "patient"))
+    progreso = asyncio.run(precalentador.precalentar("PROF001"))
+
+    assert progreso["estado"] == "completado"
+    assert progreso["visitas"] == 1
+    assert progreso["completadas"] == 1
+    assert progreso["pendientes"] == 0 and progreso["en_curso"] == 0
+    assert almacen.metricas()["en_espera"] == 2
+
+    agente = asyncio.run(MCPAgent.desde_visita_emr("VISITA456", user_role="patient"))
+    evento = [e for e in agente.contexto.historia if e["tipo"] == "inicializacion_emr"][-1]
+    assert evento["metadatos"]["precalentado"] is True
+    assert agente.contexto.user_role == "patient"
+
+    # Una segunda ejecución solo completa lo que falta
+    progreso = asyncio.run(precalentador.precalentar("PROF001"))
+    assert progreso["completadas"] == 1 and progreso["omitidas"] == 0
+    progreso = asyncio.run(precalentador.precalentar("PROF001"))
+    assert progreso["omitidas"] == 1
+
+    # Una visita no programada se construye en frío
+    agente = asyncio.run(MCPAgent.desde_visita_emr("VISITA123"))
+    evento = [e for e in agente.contexto.historia if e["tipo"] == "inicializacion_emr"][-1]
+    assert evento["metadatos"]["precalentado"] is False
+
+
+def test_precalentado_recibe_cambios_del_emr():
+    """Al abrir un contexto precalentado se incorporan los cambios posteriores."""
+    datos = copy.deepcopy(EMR_VISITAS_SIMULADAS)
+
+    async def escenario(url):
+        async with ClienteEMR(url) as cliente:
+            precalentador = PrecalentadorVisitas(cliente_emr=cliente)
+            await precalentador.precalentar("PROF001")
+            datos["VISITA456"]["formularios"]["anamnesis"]["intensidad_dolor"] = 3
+            return await MCPAgent.desde_visita_emr("VISITA456", cliente_emr=cliente)
+
+    with ServidorEMRLocal(datos=datos) as servidor:
+        agente = asyncio.run(escenario(servidor.url))
+
+    textos = [
+        str(evento["contenido"]) for evento in agente.contexto.historia
+        if evento["tipo"] == "bloque_conversacion" and "(actualización)" in str(evento["contenido"])
+    ]
+    assert any("intensidad_dolor: 3" in t for t in textos)
+
+
+def test_concurrencia_acotada():
+    """El número de visitas construyéndose a la vez no supera el límite."""
+    datos = {}
+    for i in range(8):
+        visita = copy.deepcopy(EMR_VISITAS_SIMULADAS["VISITA456"])
+        visita["visita"]["id"] = f"VP{i}"
+        datos[f"VP{i}"] = visita
+
+    async def escenario(url, precalentador):
+        async with ClienteEMR(url) as cliente:
+            precalentador.cliente_emr = cliente
+            tarea = asyncio.ensure_future(precalentador.precalentar("PROF001"))
+            maximo = 0
+            while not tarea.done():
+                maximo = max(maximo, precalentador.progreso()["en_curso"])
+                await asyncio.sleep(0.005)
+            return tarea.result(), maximo
+
+    precalentador = PrecalentadorVisitas(max_concurrencia=2)
+    with ServidorEMRLocal(datos=datos, latencias={"visita": 0.03}) as servidor:
+        progreso, maximo = asyncio.run(escenario(servidor.url, precalentador))
+
+    assert progreso["completadas"] == 8
+    assert 1 <= maximo <= 2
+
+
+def test_precalentar_en_segundo_plano(almacen):
+    """El precalentamiento puede lanzarse en un hilo en segundo plano."""
+    precalentador = PrecalentadorVisitas()
+    hilo = precalentador.precalentar_en_segundo_plano("PROF001")
+    hilo.join(timeout=5)
+
+    assert precalentador.progreso()["estado"] == "completado"
+    assert almacen.esta_aparcado("VISITA456", "health_professional")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Pruebas de la evaluación de riesgo legal por lotes.
+"""
+
+from mcp.tools import evaluar_riesgo_legal, evaluar_riesgo_legal_lote
+
+CASOS = [
+    ("Cervicalgia", "Manipulación cervical de alta intensidad", True, None),
+    ("Cervicalgia", "Ejercicios domiciliarios", False, None),
+    ("Lumbalgia", "Tracción lumbar y calor local", True, None),
+    ("Lumbalgia", "Tracción lumbar", False, ["Embarazo"]),
+    ("Tendinitis", "Ejercicios excéntricos", True, ["Diabetes", "Anticoagulación"]),
+    ("Tendinitis", "Ejercicios excéntricos", True, []),
+    ("Cervicalgia", "Punción seca con AGUJA", True, ["Marcapasos"])
+]
+
+
+def sin_timestamp(resultado):
+    """Elimina el timestamp para comparar resultados."""
+    return {clave: valor for clave, valor in resultado.items() if clave != "timestamp"}
+
+
+def test_lote_equivale_a_evaluacion_individual():
+    """Cada fila del lote coincide con la evaluación individual del mismo caso."""
+    lote = evaluar_riesgo_legal_lote(CASOS)
+    assert len(lote) == len(CASOS)
+    for caso, resultado in zip(CASOS, lote):
+        assert sin_timestamp(resultado) == sin_timestamp(evaluar_riesgo_legal(*caso))
+
+
+def test_niveles_lote():
+    """Los niveles del lote siguen las reglas de la evaluación individual."""
+    niveles = [r["evaluacion_riesgo"]["nivel"] for r in evaluar_riesgo_legal_lote(CASOS)]
+    assert niveles == ["alto", "alto", "medio", "alto", "medio", "bajo", "alto"]
+
+
+def test_lote_vacio():
+    """Un lote vacío devuelve una lista vacía."""
+    assert evaluar_riesgo_legal_lote([]) == []
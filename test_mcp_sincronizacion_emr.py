@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Pruebas de la sincronización incremental y versionada con el EMR.
+"""
+
+import asyncio
+import copy
+
+from mcp import integracion_emr
+from mcp.agent_mcp import MCPAgent
+from mcp.cliente_emr import ClienteEMR
+from mcp.context import MCPContext
+from mcp.integracion_emr import EMR_VISITAS_SIMULADAS, diferencias_formularios, sincronizar_con_emr, versionar_formulario
+from mcp.servidor_emr_local import ServidorEMRLocal
+
+
+def bloques_actualizacion(contexto):
+    """Devuelve los textos de los bloques añadidos por sincronización."""
+    return [
+        evento["contenido"] for evento in contexto.historia
+        if evento["tipo"] == "bloque_conversacion" and "(actualización)" in str(evento["contenido"])
+    ]
+
+
+def test_diferencias_por_campo():
+    """Solo los campos modificados, nuevos o eliminados aparecen en el diff."""
+    formulario = {"dolor": "leve", "intensidad": 3, "notas": "sin cambios"}
+    versiones = {"anamnesis": versionar_formulario(formulario)}
+
+    assert diferencias_formularios(versiones, {"anamnesis": dict(formulario)}) == {}
+
+    cambios = diferencias_formularios(versiones, {
+        "anamnesis": {"dolor": "intenso", "intensidad": 3, "fiebre": "no"},
+        "exploracion": {"movilidad": "limitada"}
+    })
+    assert cambios["anamnesis"]["modificados"] == {"dolor": "intenso", "fiebre": "no"}
+    assert cambios["anamnesis"]["eliminados"] == ["notas"]
+    assert cambios["exploracion"]["nuevo"] is True
+
+
+def test_sincronizacion_simulada_detecta_ediciones(monkeypatch):
+    """Las ediciones de formularios existentes se añaden campo a campo."""
+    datos = copy.deepcopy(EMR_VISITAS_SIMULADAS)
+    monkeypatch.setattr(integracion_emr, "EMR_VISITAS_SIMULADAS", datos)
+
+    agente = asyncio.run(MCPAgent.desde_visita_emr("VISITA123"))
+    contexto = agente.contexto
+
+    assert asyncio.run(agente.sincronizar_contexto_emr())["estado"] == "sin_cambios"
+    eventos = len(contexto.historia)
+    assert asyncio.run(agente.sincronizar_contexto_emr())["estado"] == "sin_cambios"
+    assert len(contexto.historia) == eventos
+
+    datos["VISITA123"]["formularios"]["anamnesis"]["intensidad_dolor"] = 4
+    resumen = asyncio.run(agente.sincronizar_contexto_emr())
+    assert resumen == {"estado": "actualizado", "cambios": {"anamnesis": ["intensidad_dolor"]}}
+    assert bloques_actualizacion(contexto) == ["Formulario anamnesis (actualización): intensidad_dolor: 4. "]
+
+
+def test_sincronizacion_condicional_con_cliente():
+    """Una visita sin cambios se resuelve con un 304 del EMR."""
+    datos = copy.deepcopy(EMR_VISITAS_SIMULADAS)
+
+    async def escenario(url):
+        async with ClienteEMR(url) as cliente:
+            agente = await MCPAgent.desde_visita_emr("VISITA456", cliente_emr=cliente)
+            estados = [(await agente.sincronizar_contexto_emr(cliente))["estado"] for _ in range(3)]
+
+            datos["VISITA456"]["formularios"]["evolucion"] = {"dolor_actual": "Leve"}
+            estados.append((await agente.sincronizar_contexto_emr(cliente))["estado"])
+            estados.append((await agente.sincronizar_contexto_emr(cliente))["estado"])
+            return agente.contexto, estados
+
+    with ServidorEMRLocal(datos=datos) as servidor:
+        contexto, estados = asyncio.run(escenario(servidor.url))
+        no_modificados = servidor.peticiones["no_modificado"]
+
+    assert estados == ["sin_cambios", "sin_cambios", "sin_cambios", "actualizado", "sin_cambios"]
+    assert no_modificados == 3
+    assert bloques_actualizacion(contexto) == ["Formulario evolucion (actualización): dolor_actual: Leve. "]
+
+
+def test_versiones_se_exportan():
+    """Las versiones y el ETag sobreviven a la exportación del contexto."""
+    agente = asyncio.run(MCPAgent.desde_visita_emr("VISITA123"))
+    asyncio.run(sincronizar_con_emr(agente.contexto, "VISITA123"))
+
+    restaurado = MCPContext.desde_json(agente.contexto.exportar_json())
+    assert restaurado.versiones_emr == agente.contexto.versiones_emr
+    assert restaurado.etag_emr == agente.contexto.etag_emr
+    assert asyncio.run(sincronizar_con_emr(restaurado, "VISITA123"))["estado"] == "sin_cambios"
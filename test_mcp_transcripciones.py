@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Pruebas de la grabación y reproducción de transcripciones del agente MCP.
+"""
+
+import json
+
+import pytest
+
+from mcp.agent_mcp import MCPAgent
+from mcp.agent_factory import create_agent_by_role
+from mcp.transcripciones import (
+    GrabadorTranscripcion,
+    cargar_transcripcion,
+    reproducir_transcripcion
+)
+
+MENSAJES = [
+    "El paciente presenta dolor cervical irradiado al brazo",
+    "Quiero aplicar manipulación cervical",
+    "¿Tiene visitas anteriores?"
+]
+
+
+def grabar_sesion(ruta, contexto):
+    """Graba una sesión con los mensajes de prueba y devuelve las respuestas."""
+    agente = MCPAgent(contexto)
+    with GrabadorTranscripcion(str(ruta), contexto, agente.config) as grabador:
+        return [grabador.procesar(agente, mensaje) for mensaje in MENSAJES]
+
+
+def test_grabacion_jsonl(tmp_path, crear_contexto):
+    """La transcripción contiene la cabecera y un turno por mensaje."""
+    ruta = tmp_path / "sesion.jsonl"
+    respuestas = grabar_sesion(ruta, crear_contexto())
+
+    lineas = [json.loads(linea) for linea in ruta.read_text(encoding="utf-8").splitlines()]
+    assert lineas[0]["tipo"] == "sesion"
+    assert lineas[0]["paciente"]["id"] == "P001"
+
+    transcripcion = cargar_transcripcion(str(ruta))
+    assert [t["mensaje"] for t in transcripcion["turnos"]] == MENSAJES
+    assert [t["respuesta"] for t in transcripcion["turnos"]] == respuestas
+    desfases = [t["desfase_s"] for t in transcripcion["turnos"]]
+    assert desfases == sorted(desfases)
+
+
+def test_reproduccion_maxima_velocidad(tmp_path, crear_contexto):
+    """La reproducción con la configuración grabada produce las mismas respuestas."""
+    ruta = tmp_path / "sesion.jsonl"
+    grabar_sesion(ruta, crear_contexto())
+
+    informe = reproducir_transcripcion(str(ruta))
+    resumen = informe["resumen"]
+    assert resumen["total_turnos"] == len(MENSAJES)
+    assert resumen["respuestas_coincidentes"] == len(MENSAJES)
+    assert all(t["latencia_ms"] >= 0 for t in informe["turnos"])
+    assert resumen["p50_ms"] <= resumen["p99_ms"] <= resumen["max_ms"]
+
+
+def test_reproduccion_otra_configuracion(tmp_path, crear_contexto):
+    """Una transcripción puede reproducirse con otro rol o fábrica de agentes."""
+    ruta = tmp_path / "sesion.jsonl"
+    grabar_sesion(ruta, crear_contexto())
+
+    agentes = []
+
+    def crear_agente(contexto):
+        agente = create_agent_by_role(contexto)
+        agentes.append(agente)
+        return agente
+
+    informe = reproducir_transcripcion(str(ruta), crear_agente=crear_agente, user_role="patient")
+    assert informe["user_role"] == "patient"
+    assert agentes[0].contexto.user_role == "patient"
+    assert informe["resumen"]["total_turnos"] == len(MENSAJES)
+
+
+def test_reproduccion_ritmo_original(tmp_path):
+    """El ritmo original respeta los desfases grabados."""
+    transcripcion = {
+        "sesion": {
+            "tipo": "sesion",
+            "user_role": "patient",
+            "paciente": {"id": "P001", "nombre": "Juan Pérez"},
+            "visita": {
+                "id": "V1",
+                "profesional_email": "fisio@aiduxcare.com",
+                "motivo_consulta": "Dolor cervical"
+            }
+        },
+        "turnos": [
+            {"indice": 0, "desfase_s": 0.0, "mensaje": "Hola"},
+            {"indice": 1, "desfase_s": 0.05, "mensaje": "Me duele el cuello"}
+        ]
+    }
+
+    informe = reproducir_transcripcion(transcripcion, ritmo="original")
+    assert informe["resumen"]["duracion_total_s"] >= 0.05
+
+    with pytest.raises(ValueError):
+        reproducir_transcripcion(transcripcion, ritmo="rapido")
+
+
+def test_transcripcion_sin_cabecera(tmp_path):
+    """Un fichero sin cabecera de sesión se rechaza."""
+    ruta = tmp_path / "invalida.jsonl"
+    ruta.write_text(json.dumps({"tipo": "turno", "mensaje": "Hola"}) + "\n", encoding="utf-8")
+    with pytest.raises(ValueError):
+        cargar_transcripcion(str(ruta))